@@ -0,0 +1,44 @@
+import os
+import time
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from routes import analyze
+from utils.analysis_pipeline import preload_shared
+from utils.metrics import get_registry, CONTENT_TYPE, REQUEST_SECONDS
+
+app = FastAPI(title="Decentralized Academic Plagiarism Checker API")
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.include_router(analyze.router)
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route templates rather than paths keep the number of series bounded;
+        # streamed responses are timed until their headers are sent
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_SECONDS.observe(time.perf_counter() - start, app="fastapi", method=request.method,
+                                route=route, status=status)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics, summed over the server workers sharing METRICS_DIR, including analyses their job workers ran
+    """
+    return Response(get_registry().render(), media_type=CONTENT_TYPE)
+
+# Under the production server profile this module is imported once in the
+# gunicorn master; loading here lets every forked worker share the corpus
+# index and model weights instead of loading its own copy
+if os.getenv("PRELOAD_SHARED") == "1":
+    preload_shared()
@@ -0,0 +1,75 @@
+"""
+Production server profile for the backend apps
+
+Run from the backend directory:
+
+    gunicorn -c gunicorn.conf.py main:app                                  # Flask app
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker api:app  # FastAPI analysis API
+
+The app is imported once in the master (preload_app); for the analysis API
+that also loads the corpus index and summarization model. Workers are forked
+from the master and share that memory copy-on-write.
+
+Signals to the master process:
+    HUP    replace the workers; old ones finish their requests and accepted
+           background analyses first (up to GRACEFUL_TIMEOUT seconds)
+    TERM   graceful stop, same draining as HUP
+    USR2   start a new master running updated code next to this one; send
+           TERM to the old master once the new workers are up
+"""
+
+import gc
+import os
+import sys
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", "0")) or (os.cpu_count() or 1)
+# Threads per worker for the Flask app (uvicorn workers use their own thread pool)
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "120"))
+keepalive = 5
+# Recycle workers after this many requests (0 never does)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+# Read by the apps when the master imports them
+os.environ.setdefault("PRELOAD_SHARED", "1")
+# Background analyses run on threads of each worker, sharing its preloaded
+# model, instead of in separate job processes that would each load their own
+os.environ.setdefault("JOB_BACKEND", "local")
+# A job's status may be polled through any worker, not only the one running it
+os.environ.setdefault("JOB_STORE", "sqlite")
+# Leave the worker time to shut down after draining, before it is killed
+os.environ.setdefault("JOB_DRAIN_TIMEOUT", str(max(graceful_timeout - 10, 0)))
+# Scrapes land on any worker; /metrics sums the counters of all of them
+os.environ.setdefault("METRICS_DIR", "data/metrics")
+
+
+def on_starting(server):
+    from utils.metrics import remove_exited, METRICS_DIR
+    if METRICS_DIR:
+        remove_exited(METRICS_DIR)
+
+
+def when_ready(server):
+    # Objects created so far are shared by all workers; moving them out of the
+    # collector's reach keeps garbage collection from writing to (and copying)
+    # the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from utils.metrics import get_registry, METRICS_DIR
+    if METRICS_DIR:
+        get_registry().share(METRICS_DIR)
+
+    # Workers run side by side; without a limit each would use one inference thread per core
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS", "0")) or max(1, (os.cpu_count() or 1) // workers))
@@ -1,64 +1,113 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, g, request, jsonify, make_response, send_file
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 import uuid
 import os
-import json
 from datetime import datetime
-import shutil
+import time
+import functools
+from utils.history_index import HistoryIndex
+from utils.nft_registry import NFTRegistry, NFTRecord
+from utils.storage import get_storage
+from utils.upload_stream import StreamingUpload, UploadLimitError, MAX_UPLOAD_BYTES, get_upload_store
+from utils.metrics import get_registry, stage, CONTENT_TYPE, DOCUMENT_CHARACTERS, REQUEST_SECONDS
+from utils.request_profiler import ProfileDenied, check_token, resolve_profile, run_profiled, get_profile_store
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+class UploadRequest(Request):
+    """Request whose files posted to /upload stream into the upload store as they arrive"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint == 'upload_file':
+            return StreamingUpload(get_upload_store(), filename)
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
 
 app = Flask(__name__)
+app.request_class = UploadRequest
+# Room for the other form fields next to the largest accepted file
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES + 64 * 1024
 CORS(app)
 
 # Create necessary directories
 os.makedirs("uploads", exist_ok=True)
 os.makedirs("corpus", exist_ok=True)
 
-# In-memory storage for demo purposes
-uploaded_files = {}
-nfts = []
+# Uploads and NFTs; SQLite by default, so several worker processes share them
+storage = get_storage()
+
+# Index of previously checked documents in the ipfs_mock folder; only listing
+# fields are loaded, on first use, and document bodies are read on demand
+history = HistoryIndex("../ipfs_mock")
+
+# Largest page served by /nfts
+MAX_NFT_PAGE_SIZE = 500
+
+def mock_nft_from_history(entry):
+    """Build the mock NFT entry of a previously checked document"""
+    doc_id, title, summary, plagiarism_score, timestamp = entry
+    return NFTRecord(
+        id=doc_id,
+        title=title,
+        summary=summary,
+        plagiarism_score=plagiarism_score,
+        wallet_address="mock_wallet_address",
+        ipfs_cid=doc_id,
+        timestamp=timestamp,
+        transaction_hash=f"mock_tx_{doc_id}",
+        filename=f"{title or 'document'}.txt",
+        student_name="Previous User",
+        user_email="previous@example.com",
+        is_mock=True
+    )
 
 def load_mock_ipfs_documents():
-    """Load previously checked documents from ipfs_mock folder"""
-    mock_documents = []
-    ipfs_mock_dir = "../ipfs_mock"
-    
-    try:
-        if os.path.exists(ipfs_mock_dir):
-            for filename in os.listdir(ipfs_mock_dir):
-                if filename.endswith('.json'):
-                    file_path = os.path.join(ipfs_mock_dir, filename)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            
-                        # Create a mock NFT entry from the IPFS data
-                        mock_nft = {
-                            "id": filename.replace('.json', ''),
-                            "title": data.get('title', 'Untitled Document'),
-                            "summary": data.get('summary', ''),
-                            "plagiarism_score": data.get('plagiarism_score', 0.0),
-                            "wallet_address": "mock_wallet_address",
-                            "ipfs_cid": filename.replace('.json', ''),
-                            "timestamp": data.get('timestamp', ''),
-                            "transaction_hash": f"mock_tx_{filename.replace('.json', '')}",
-                            "feedback": None,
-                            "filename": f"{data.get('title', 'document')}.txt",
-                            "student_name": "Previous User",
-                            "user_email": "previous@example.com",
-                            "teacher_feedback": None,
-                            "is_mock": True
-                        }
-                        mock_documents.append(mock_nft)
-                    except Exception as e:
-                        print(f"Error loading mock document {filename}: {e}")
-    except Exception as e:
-        print(f"Error accessing ipfs_mock directory: {e}")
-    
-    return mock_documents
+    """Add previously checked documents from the ipfs_mock folder not registered yet"""
+    with stage("history_sync"):
+        try:
+            # Sequence number of the last history entry registered, the same in every worker
+            synced = int(storage.get_meta("history_synced_seq") or 0)
+            entries, latest = history.entries_since(synced)
+            if entries:
+                # Other workers may register the same documents concurrently
+                storage.add_nfts([mock_nft_from_history(entry) for entry in entries], skip_existing=True)
+                storage.set_meta("history_synced_seq", str(latest))
+        except Exception as e:
+            log.error("Error accessing ipfs_mock directory", error=str(e))
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
 
-# Load mock documents on startup
-mock_documents = load_mock_ipfs_documents()
-nfts.extend(mock_documents)
+@app.after_request
+def record_request(response):
+    # Route templates rather than paths keep the number of series bounded
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, app="flask", method=request.method,
+                            route=route, status=response.status_code)
+    return response
+
+def profiled(view):
+    """Run a view under the request profiler when the request asks for it or is sampled"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            profile = resolve_profile(request.headers, request.args)
+        except ProfileDenied as e:
+            return jsonify({"error": str(e)}), 403
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        response = make_response(run_profiled(profile, request.path, view, *args, **kwargs))
+        if profile is not None:
+            response.headers["X-Profile-Id"] = profile.request_id
+        return response
+    return wrapper
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics, summed over the server workers sharing METRICS_DIR"""
+    return Response(get_registry().render(), content_type=CONTENT_TYPE)
 
 @app.route('/')
 def read_root():
@@ -79,35 +128,42 @@ def upload_file():
         # Generate a unique ID for the file
         file_id = str(uuid.uuid4())
         
-        # Save the file
-        file_path = f"uploads/{file_id}_{file.filename}"
-        file.save(file_path)
+        # The file was hashed, stored and its text extracted while the request
+        # was read; a file uploaded before is not stored or extracted again
+        with stage("upload_store"):
+            stored = file.stream.finish()
+        DOCUMENT_CHARACTERS.observe(len(stored["text"]))
         
-        # Extract text from the file (simplified)
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                text = f.read()
-        except:
-            text = "Text extraction not available for this file type"
-        
-        # Store file info in memory
-        uploaded_files[file_id] = {
-            "id": file_id,
-            "filename": file.filename,
-            "title": title,
-            "path": file_path,
-            "text": text,
-            "upload_time": datetime.now().isoformat()
-        }
+        # Store file info
+        with stage("storage_write"):
+            storage.put_upload({
+                "id": file_id,
+                "filename": file.filename,
+                "title": title,
+                "content_cid": stored["cid"],
+                "size": stored["size"],
+                "text": stored["text"],
+                "upload_time": datetime.now().isoformat()
+            })
         
-        return jsonify({"file_id": file_id, "message": "File uploaded successfully"})
+        return jsonify({
+            "file_id": file_id,
+            "content_cid": stored["cid"],
+            "duplicate": stored["duplicate"],
+            "message": "File uploaded successfully"
+        })
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"File is larger than {MAX_UPLOAD_BYTES} bytes"}), 413
+    except UploadLimitError as e:
+        return jsonify({"error": str(e)}), 413
     except Exception as e:
         return jsonify({"error": f"Upload failed: {str(e)}"}), 500
 
 @app.route('/analyze', methods=['POST'])
+@profiled
 def analyze_file():
     try:
-        print(f"Received analyze request: {request.data}")
+        log.debug("Received analyze request", body=request.get_data, sample=True)
         
         # Handle both JSON and form data
         if request.is_json:
@@ -116,17 +172,14 @@ def analyze_file():
             data = request.form.to_dict()
             
         file_id = data.get('file_id')
-        print(f"File ID: {file_id}")
-        
-        if not file_id or file_id not in uploaded_files:
-            print(f"File not found: {file_id}")
-            print(f"Available files: {list(uploaded_files.keys())}")
+        file_info = storage.get_upload(file_id) if file_id else None
+        if file_info is None:
+            log.warning("File not found", file_id=file_id)
             return jsonify({"error": "File not found"}), 404
         
-        file_info = uploaded_files[file_id]
         text = file_info["text"]
         
-        print(f"Starting analysis for file: {file_info['filename']}")
+        log.info("Starting analysis", file_id=file_id, filename=file_info['filename'])
         
         # Mock plagiarism check (simplified)
         import random
@@ -138,26 +191,46 @@ def analyze_file():
         # Mock IPFS CID
         ipfs_cid = f"mock_cid_{file_id}"
         
-        print(f"Analysis complete. Plagiarism score: {plagiarism_score}")
+        log.info("Analysis complete", file_id=file_id, plagiarism_score=round(plagiarism_score, 4))
         
         result = {
             "plagiarism_score": plagiarism_score,
             "summary": summary,
             "ipfs_cid": ipfs_cid
         }
-        print(f"Returning result: {result}")
+        log.debug("Returning result", result=result, sample=True)
         
         return jsonify(result)
     except Exception as e:
-        import traceback
-        print(f"Analysis failed: {str(e)}")
-        print(traceback.format_exc())
+        log.exception("Analysis failed", error=str(e))
         return jsonify({"error": f"Analysis failed: {str(e)}"}), 500
 
+@app.route('/profiles', methods=['GET'])
+def list_profiles():
+    """List the stored request profiles, newest first"""
+    try:
+        check_token(request.headers)
+    except ProfileDenied as e:
+        return jsonify({"error": str(e)}), 403
+    return jsonify(get_profile_store().list())
+
+@app.route('/profiles/<request_id>', methods=['GET'])
+def download_profile(request_id):
+    """Download the profile of a request"""
+    try:
+        check_token(request.headers)
+    except ProfileDenied as e:
+        return jsonify({"error": str(e)}), 403
+    found = get_profile_store().get(request_id)
+    if found is None:
+        return jsonify({"error": "Profile not found"}), 404
+    path, media_type, info = found
+    return send_file(path, mimetype=media_type, as_attachment=True, download_name=info["file"])
+
 @app.route('/mint', methods=['POST'])
 def mint_nft():
     try:
-        print(f"Received mint request: {request.data}")
+        log.debug("Received mint request", body=request.get_data, sample=True)
         
         # Handle both JSON and form data
         if request.is_json:
@@ -171,48 +244,65 @@ def mint_nft():
                 except ValueError:
                     data['plagiarism_score'] = 0.0
         
-        print(f"Mint data: {data}")
-        
-        # Create NFT entry
+        # Create NFT entry; earlier documents are registered first to keep the order
+        load_mock_ipfs_documents()
         nft_id = str(uuid.uuid4())
-        nft = {
-            "id": nft_id,
-            "title": data.get('title', 'Untitled'),
-            "summary": data.get('summary', ''),
-            "plagiarism_score": data.get('plagiarism_score', 0.0),
-            "wallet_address": data.get('wallet_address', 'mock_wallet'),
-            "ipfs_cid": data.get('ipfs_cid', ''),
-            "timestamp": data.get('timestamp', datetime.now().isoformat()),
-            "transaction_hash": f"mock_tx_{nft_id}",
-            "feedback": None,
-            "student_name": "Current User",
-            "user_email": "user@example.com",
-            "teacher_feedback": None
-        }
-        
-        nfts.append(nft)
+        nft = storage.add_nft(NFTRecord(
+            id=nft_id,
+            title=data.get('title', 'Untitled'),
+            summary=data.get('summary', ''),
+            plagiarism_score=data.get('plagiarism_score', 0.0),
+            wallet_address=data.get('wallet_address', 'mock_wallet'),
+            ipfs_cid=data.get('ipfs_cid', ''),
+            timestamp=data.get('timestamp', datetime.now().isoformat()),
+            transaction_hash=f"mock_tx_{nft_id}",
+            student_name="Current User",
+            user_email="user@example.com"
+        ))
         
         result = {
             "nft_id": nft_id,
-            "transaction_hash": nft["transaction_hash"],
+            "transaction_hash": nft.transaction_hash,
             "message": "NFT minted successfully"
         }
-        print(f"Mint successful: {result}")
+        log.info("Mint successful", nft_id=nft_id, transaction_hash=nft.transaction_hash)
         
         return jsonify(result)
     except Exception as e:
-        import traceback
-        print(f"Minting failed: {str(e)}")
-        print(traceback.format_exc())
+        log.exception("Minting failed", error=str(e))
         return jsonify({"error": f"Minting failed: {str(e)}"}), 500
 
 @app.route('/nfts', methods=['GET'])
 def get_nfts():
     try:
-        return jsonify(nfts)
+        load_mock_ipfs_documents()
+        
+        # Without paging or filter parameters, list everything as before
+        paged = ('cursor', 'limit') + NFTRegistry.INDEXED_FIELDS
+        if not any(param in request.args for param in paged):
+            return jsonify([nft.to_dict() for nft in storage.iter_nfts()])
+        
+        filters = {field: request.args[field] for field in NFTRegistry.INDEXED_FIELDS if field in request.args}
+        try:
+            limit = min(int(request.args.get('limit', 50)), MAX_NFT_PAGE_SIZE)
+            page, next_cursor = storage.page_nfts(request.args.get('cursor'), limit, **filters)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify({"items": [nft.to_dict() for nft in page], "next_cursor": next_cursor})
     except Exception as e:
         return jsonify({"error": f"Failed to get NFTs: {str(e)}"}), 500
 
+@app.route('/history/<doc_id>', methods=['GET'])
+def get_history_document(doc_id):
+    try:
+        document = history.document(doc_id)
+        if document is None:
+            return jsonify({"error": "Document not found"}), 404
+        return jsonify(document)
+    except Exception as e:
+        return jsonify({"error": f"Failed to get document: {str(e)}"}), 500
+
 @app.route('/feedback', methods=['POST'])
 def submit_feedback():
     try:
@@ -221,10 +311,9 @@ def submit_feedback():
         feedback = data.get('feedback')
         
         # Find and update NFT
-        for nft in nfts:
-            if nft['id'] == nft_id:
-                nft['feedback'] = feedback
-                return jsonify({"message": "Feedback submitted successfully"})
+        load_mock_ipfs_documents()
+        if storage.update_nft(nft_id, feedback=feedback):
+            return jsonify({"message": "Feedback submitted successfully"})
         
         return jsonify({"error": "NFT not found"}), 404
     except Exception as e:
@@ -238,16 +327,16 @@ def submit_teacher_comment():
         feedback = data.get('feedback')
         
         # Find and update NFT
-        for nft in nfts:
-            if nft['id'] == nft_id:
-                nft['teacher_feedback'] = feedback
-                return jsonify({"message": "Teacher comment submitted successfully"})
+        load_mock_ipfs_documents()
+        if storage.update_nft(nft_id, teacher_feedback=feedback):
+            return jsonify({"message": "Teacher comment submitted successfully"})
         
         return jsonify({"error": "NFT not found"}), 404
     except Exception as e:
         return jsonify({"error": f"Failed to submit teacher comment: {str(e)}"}), 500
 
 if __name__ == '__main__':
-    print("🚀 Starting Flask backend server...")
-    print("📚 API will be available at http://localhost:8000")
-    app.run(host='0.0.0.0', port=8000, debug=True) 
\ No newline at end of file
+    port = int(os.getenv("PORT", "8000"))
+    # Development server; see gunicorn.conf.py for the production profile
+    log.info("Starting Flask backend server", url=f"http://localhost:{port}")
+    app.run(host='0.0.0.0', port=port, debug=True) 
\ No newline at end of file
@@ -1,55 +1,102 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request, Response
+from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Any, List, Optional
+import asyncio
+import json
 import os
 from utils.plagiarism_algorithms import PlagiarismDetector
-from utils.plagiarism_check import load_corpus
-from utils.summarizer import generate_summary
-from utils.ipfs_upload import upload_to_ipfs
+from utils.plagiarism_check import get_corpus_index, get_similar_passages
+from utils.analysis_pipeline import (
+    run_text_analysis, run_detailed_analysis, analyze_batch_document, preload, get_result_cache
+)
+from utils.summarizer import get_summary_metrics
+from utils.auth_cache import get_auth_cache
+from utils.metrics import get_registry
+from utils.text_pipeline import get_pipeline
+from utils.request_profiler import (
+    ProfileDenied, ProfileSpec, check_token, resolve_profile, run_profiled, get_profile_store
+)
+from utils.job_queue import get_job_queue, shutdown_job_queue, QueueFullError
+from utils.log import get_logger
+from utils.batch_analysis import (
+    BatchInputError, BatchLimitError, read_zip_documents, SUPPORTED_EXTENSIONS, BATCH_MAX_DOCUMENTS,
+    BATCH_MAX_FILE_BYTES, BATCH_MAX_BYTES, BATCH_PAIR_THRESHOLD, build_batch_report
+)
 from datetime import datetime
 
 router = APIRouter()
+
+log = get_logger(__name__)
+
+# How often job event streams check for status changes, and send keep-alives
+SSE_POLL_INTERVAL = 0.25
+SSE_KEEPALIVE_INTERVAL = 15.0
+
+# Seconds a stopping worker lets accepted background analyses finish
+JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", "110"))
+
 detector = PlagiarismDetector()
 
+# Stats of this worker's caches and job queue, reported by /metrics
+registry = get_registry()
+registry.register_collector("plagiarism_result_cache", "Analysis result cache of this worker", lambda: get_result_cache().stats())
+registry.register_collector("plagiarism_summarizer", "Summary cache and batching of this worker", get_summary_metrics)
+registry.register_collector("plagiarism_job_queue", "Analysis job queue of this worker", lambda: get_job_queue().stats())
+registry.register_collector("plagiarism_auth_cache", "Token and user profile caches of this worker", lambda: get_auth_cache().stats())
+registry.register_collector("plagiarism_text_pipeline", "Token stream cache of this worker", lambda: get_pipeline().stats())
+
+@router.on_event("startup")
+async def warm_up():
+    """
+    Open the corpus index and start loading the summarizer before the first request
+    """
+    preload()
+    # Create the job queue now so its worker processes preload as well
+    get_job_queue(initializer=preload)
+
+@router.on_event("shutdown")
+async def drain_jobs():
+    """
+    Let accepted background analyses finish before the worker exits, so a
+    graceful restart does not drop them
+    """
+    await run_in_threadpool(shutdown_job_queue, JOB_DRAIN_TIMEOUT)
+
+def request_profile(request: Request, response: Response) -> Optional[ProfileSpec]:
+    """
+    Decide whether an analysis request is profiled, and tell the client where to find its profile
+    """
+    try:
+        profile = resolve_profile(request.headers, request.query_params)
+    except ProfileDenied as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if profile is not None:
+        response.headers["X-Profile-Id"] = profile.request_id
+    return profile
+
 @router.post("/analyze-text")
-async def analyze_text(text: str = Form(...), title: str = Form("Untitled Document")):
+async def analyze_text(
+    request: Request,
+    response: Response,
+    text: str = Form(...),
+    title: str = Form("Untitled Document")
+):
     """
     Analyze text for plagiarism using multiple algorithms
     """
+    profile = request_profile(request, response)
     try:
-        print(f"Analyzing text: {title}")
-        
-        # Load corpus for comparison
-        corpus = load_corpus()
-        
-        # Perform comprehensive plagiarism analysis
-        results = detector.check_plagiarism_comprehensive(text, corpus)
-        
-        # Generate summary
-        summary = generate_summary(text)
-        
-        # Create metadata for IPFS
-        metadata = {
-            "title": title,
-            "text": text,
-            "summary": summary,
-            "plagiarism_analysis": results,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Upload to IPFS (using text as file content)
-        ipfs_cid = upload_to_ipfs(None, metadata, text_content=text)
+        log.info("Analyzing text", title=title, characters=len(text))
         
-        return {
-            "success": True,
-            "title": title,
-            "summary": summary,
-            "plagiarism_analysis": results,
-            "ipfs_cid": ipfs_cid,
-            "timestamp": metadata["timestamp"]
-        }
+        # Scoring and summarization are CPU-bound; keep them off the event loop
+        return await run_in_threadpool(run_profiled, profile, "/analyze-text", run_text_analysis, text, title)
         
     except Exception as e:
-        print(f"Error in text analysis: {str(e)}")
+        log.exception("Error in text analysis", title=title, error=str(e))
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @router.post("/compare-texts")
@@ -58,8 +105,6 @@ async def compare_texts(text1: str = Form(...), text2: str = Form(...)):
     Compare two texts directly for similarity
     """
     try:
-        print("Comparing two texts...")
-        
         # Compare texts using multiple algorithms
         results = detector.compare_two_texts(text1, text2)
         
@@ -80,11 +125,13 @@ async def compare_texts(text1: str = Form(...), text2: str = Form(...)):
         }
         
     except Exception as e:
-        print(f"Error in text comparison: {str(e)}")
+        log.exception("Error in text comparison", error=str(e))
         raise HTTPException(status_code=500, detail=f"Comparison failed: {str(e)}")
 
 @router.post("/analyze-detailed")
 async def analyze_detailed(
+    request: Request,
+    response: Response,
     text: str = Form(...),
     title: str = Form("Untitled Document"),
     include_ngram: bool = Form(True),
@@ -94,93 +141,42 @@ async def analyze_detailed(
     """
     Detailed analysis with configurable algorithms
     """
+    profile = request_profile(request, response)
     try:
-        print(f"Performing detailed analysis: {title}")
-        
-        # Load corpus
-        corpus = load_corpus()
-        
-        # Initialize results
-        results = {
-            "cosine_similarity": 0.0,
-            "file_similarity": 0.0,
-            "ngram_similarity": 0.0,
-            "overall_score": 0.0,
-            "similar_passages": [],
-            "details": {},
-            "algorithms_used": []
-        }
-        
-        # Perform cosine similarity analysis
-        if include_cosine and corpus:
-            cosine_scores = []
-            for i, ref_text in enumerate(corpus):
-                cosine_score = detector.cosine_sim.cosine_sim(text, ref_text)
-                cosine_scores.append(cosine_score)
-                if cosine_score > 0.7:
-                    results["similar_passages"].append({
-                        "reference_index": i,
-                        "cosine_similarity": cosine_score,
-                        "reference_preview": ref_text[:200] + "..." if len(ref_text) > 200 else ref_text
-                    })
-            
-            if cosine_scores:
-                results["cosine_similarity"] = max(cosine_scores)
-            results["algorithms_used"].append("cosine_similarity")
-        
-        # Perform file similarity analysis
-        if include_file_similarity and corpus:
-            file_scores = []
-            for ref_text in corpus:
-                file_score = detector.file_sim.find_file_similarity(text, ref_text)
-                file_scores.append(file_score)
-            
-            if file_scores:
-                results["file_similarity"] = max(file_scores)
-            results["algorithms_used"].append("file_similarity")
-        
-        # Perform n-gram analysis
-        if include_ngram:
-            ngram_score, _ = detector.ngram_sim.find_similarity(text)
-            results["ngram_similarity"] = ngram_score
-            results["algorithms_used"].append("ngram_similarity")
-        
-        # Calculate overall score
-        weights = {
-            "cosine": 0.4 if include_cosine else 0,
-            "file": 0.4 if include_file_similarity else 0,
-            "ngram": 0.2 if include_ngram else 0
-        }
+        log.info("Performing detailed analysis", title=title, characters=len(text))
         
-        # Normalize weights if some algorithms are disabled
-        total_weight = sum(weights.values())
-        if total_weight > 0:
-            for key in weights:
-                weights[key] /= total_weight
-        
-        overall_score = (
-            results["cosine_similarity"] * weights["cosine"] +
-            (results["file_similarity"] / 100.0) * weights["file"] +
-            (results["ngram_similarity"] / 100.0) * weights["ngram"]
+        return await run_in_threadpool(
+            run_profiled, profile, "/analyze-detailed",
+            run_detailed_analysis, text, title, include_ngram, include_cosine, include_file_similarity
         )
         
-        results["overall_score"] = min(1.0, overall_score)
-        results["details"]["weights"] = weights
-        
-        # Generate summary
-        summary = generate_summary(text)
+    except Exception as e:
+        log.exception("Error in detailed analysis", title=title, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Detailed analysis failed: {str(e)}")
+
+@router.post("/similar-passages")
+async def similar_passages(
+    text: str = Form(...),
+    threshold: float = Form(0.7),
+    top_k: int = Form(5)
+):
+    """
+    Find corpus paragraphs matching the paragraphs of a text
+    """
+    try:
+        passages = await run_in_threadpool(get_similar_passages, text, threshold, top_k)
         
         return {
             "success": True,
-            "title": title,
-            "summary": summary,
-            "plagiarism_analysis": results,
+            "threshold": threshold,
+            "passage_count": len(passages),
+            "similar_passages": passages,
             "timestamp": datetime.now().isoformat()
         }
         
     except Exception as e:
-        print(f"Error in detailed analysis: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Detailed analysis failed: {str(e)}")
+        log.exception("Error finding similar passages", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Passage search failed: {str(e)}")
 
 @router.get("/corpus-info")
 async def get_corpus_info():
@@ -188,16 +184,219 @@ async def get_corpus_info():
     Get information about the current corpus
     """
     try:
-        corpus = load_corpus()
+        corpus_index = get_corpus_index()
+        corpus_size = len(corpus_index)
+        total_characters = corpus_index.total_characters
         
         return {
             "success": True,
-            "corpus_size": len(corpus),
-            "total_characters": sum(len(doc) for doc in corpus),
-            "average_document_length": sum(len(doc) for doc in corpus) / len(corpus) if corpus else 0,
-            "corpus_loaded": len(corpus) > 0
+            "corpus_size": corpus_size,
+            "total_characters": total_characters,
+            "average_document_length": total_characters / corpus_size if corpus_size else 0,
+            "corpus_loaded": corpus_size > 0,
+            "index_version": corpus_index.version
         }
         
     except Exception as e:
-        print(f"Error getting corpus info: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to get corpus info: {str(e)}")
\ No newline at end of file
+        log.exception("Error getting corpus info", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to get corpus info: {str(e)}")
+
+def submit_job(request: Request, kind: str, fn, *args, submit=None) -> Dict[str, Any]:
+    """
+    Queue an analysis job, answering 429 when the queue is full
+    
+    Args:
+        request: Request the job was submitted with, to link the job's routes
+        submit: Queue method to use (default: get_job_queue().submit)
+    """
+    try:
+        job = (submit or get_job_queue().submit)(kind, fn, *args)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    
+    return {
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": str(request.url_for("get_job", job_id=job.id)),
+        "events_url": str(request.url_for("job_events", job_id=job.id))
+    }
+
+@router.post("/jobs/analyze-text", status_code=202)
+async def submit_text_analysis(request: Request, text: str = Form(...), title: str = Form("Untitled Document")):
+    """
+    Queue a plagiarism analysis and return its job id immediately
+    """
+    log.info("Queueing text analysis", title=title)
+    return submit_job(request, "analyze-text", run_text_analysis, text, title)
+
+@router.post("/jobs/analyze-detailed", status_code=202)
+async def submit_detailed_analysis(
+    request: Request,
+    text: str = Form(...),
+    title: str = Form("Untitled Document"),
+    include_ngram: bool = Form(True),
+    include_cosine: bool = Form(True),
+    include_file_similarity: bool = Form(True)
+):
+    """
+    Queue a detailed analysis and return its job id immediately
+    """
+    log.info("Queueing detailed analysis", title=title)
+    return submit_job(
+        request, "analyze-detailed", run_detailed_analysis, text, title,
+        include_ngram, include_cosine, include_file_similarity
+    )
+
+async def read_batch_documents(files: List[UploadFile]) -> List[tuple]:
+    """
+    Read the documents of a batch upload, expanding zip archives
+    
+    Raises:
+        BatchInputError: If the batch is empty or unreadable
+        BatchLimitError: If it has too many or too large documents
+    """
+    documents = []
+    total = 0
+    for upload in files:
+        name = upload.filename or ""
+        ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ""
+        if ext != "zip" and ext not in SUPPORTED_EXTENSIONS:
+            raise BatchInputError(f"Unsupported file format: {name}")
+        
+        limit = BATCH_MAX_BYTES if ext == "zip" else BATCH_MAX_FILE_BYTES
+        data = await upload.read(limit + 1)
+        if len(data) > limit:
+            raise BatchLimitError(f"{name} is larger than {limit} bytes")
+        total += len(data)
+        if total > BATCH_MAX_BYTES:
+            raise BatchLimitError(f"Batch is larger than {BATCH_MAX_BYTES} bytes")
+        
+        if ext == "zip":
+            documents.extend(read_zip_documents(data, BATCH_MAX_DOCUMENTS - len(documents)))
+        else:
+            documents.append((name, data))
+        if len(documents) > BATCH_MAX_DOCUMENTS:
+            raise BatchLimitError(f"Batch has more than {BATCH_MAX_DOCUMENTS} documents")
+    
+    if not documents:
+        raise BatchInputError("No PDF, DOCX or TXT documents in batch")
+    return documents
+
+@router.post("/jobs/analyze-batch", status_code=202)
+async def submit_batch_analysis(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    threshold: float = Form(BATCH_PAIR_THRESHOLD)
+):
+    """
+    Queue the analysis of a class's submissions and return its job id immediately
+    
+    Accepts PDF, DOCX and TXT files and zip archives of them. Each document
+    is scored against the corpus in parallel; the job's progress counts the
+    documents done. The finished job's result ranks the documents and lists
+    the pairs of submissions at least ``threshold`` (0-1) similar to each other.
+    """
+    if not 0 <= threshold <= 1:
+        raise HTTPException(status_code=400, detail="threshold must be between 0 and 1")
+    try:
+        documents = await read_batch_documents(files)
+    except BatchLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except BatchInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    log.info("Queueing batch analysis", documents=len(documents))
+    return submit_job(
+        request, "analyze-batch", analyze_batch_document, documents, build_batch_report, threshold,
+        submit=get_job_queue().submit_map
+    )
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Get the status of a job, with its result once it has finished
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    
+    return {"success": True, **job.to_dict()}
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Stream job status changes as server-sent events until the job finishes
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    
+    async def events():
+        current = job
+        revision = -1
+        idle = 0.0
+        while True:
+            if current.revision != revision:
+                revision = current.revision
+                idle = 0.0
+                yield f"event: status\ndata: {json.dumps(current.to_dict())}\n\n"
+                if current.finished:
+                    return
+            elif idle >= SSE_KEEPALIVE_INTERVAL:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(SSE_POLL_INTERVAL)
+            idle += SSE_POLL_INTERVAL
+            # A job run by another worker is a snapshot; read its stored state again
+            current = get_job_queue().get(job_id) or current
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.get("/summarizer-stats")
+async def get_summarizer_stats():
+    """
+    Get summary cache hit rate and batch size metrics of this worker
+    """
+    return {"success": True, **get_summary_metrics()}
+
+@router.get("/auth-cache-stats")
+async def get_auth_cache_stats():
+    """
+    Get token verification and user profile cache hit rates of this worker
+    """
+    return {"success": True, **get_auth_cache().stats()}
+
+@router.get("/profiles")
+async def list_profiles(request: Request):
+    """
+    List the stored request profiles, newest first
+    """
+    try:
+        check_token(request.headers)
+    except ProfileDenied as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    return {"success": True, "profiles": get_profile_store().list()}
+
+@router.get("/profiles/{request_id}")
+async def download_profile(request_id: str, request: Request):
+    """
+    Download the profile of a request: collapsed stacks for sampled
+    profiles, a pstats file for traced ones
+    """
+    try:
+        check_token(request.headers)
+    except ProfileDenied as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    found = get_profile_store().get(request_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    path, media_type, info = found
+    return FileResponse(path, media_type=media_type, filename=info["file"])
+
+@router.get("/jobs")
+async def get_job_queue_info():
+    """
+    Get the state of the analysis job queue
+    """
+    return {"success": True, **get_job_queue().stats()}
@@ -5,6 +5,9 @@ import json
 import time
 import uuid
 from dotenv import load_dotenv
+from utils.log import get_logger
+
+log = get_logger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -31,7 +34,7 @@ def mint_nft(metadata: Dict[str, Any]) -> str:
     Returns:
         Transaction hash
     """
-    print("Using mock NFT minting (Aptos SDK not available)")
+    log.info("Using mock NFT minting (Aptos SDK not available)")
     
     # For demo purposes, return a mock transaction hash
     mock_tx = f"mock_tx_{uuid.uuid4().hex[:16]}"
@@ -46,5 +49,5 @@ def mint_nft(metadata: Dict[str, Any]) -> str:
             "status": "mock_success"
         }, f, indent=2)
     
-    print(f"Mock transaction created: {mock_tx}")
+    log.info("Mock transaction created", transaction_hash=mock_tx)
     return mock_tx
\ No newline at end of file
@@ -1,8 +1,8 @@
 from fastapi import UploadFile, HTTPException, Depends
 import os
-import PyPDF2
-import docx
-from typing import Dict, Any
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Tuple
+from utils.text_extraction import iter_text, extract_document, ExtractionLimitError
 from utils.firebase_auth import require_student_role
 
 def handle_upload(file: UploadFile, file_id: str) -> Dict[str, Any]:
@@ -39,73 +39,49 @@ def extract_text_from_file(file_path: str) -> str:
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
     
-    # Get file extension
-    ext = file_path.split('.')[-1].lower()
-    
-    # Extract text based on file type
-    if ext == 'pdf':
-        return extract_text_from_pdf(file_path)
-    elif ext == 'docx':
-        return extract_text_from_docx(file_path)
-    elif ext == 'txt':
-        return extract_text_from_txt(file_path)
-    else:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Unsupported file format: {ext}"
-        )
+    return "".join(iter_text_from_file(file_path))
 
-def extract_text_from_pdf(file_path: str) -> str:
+def iter_text_from_file(file_path: str) -> Iterator[str]:
     """
-    Extract text from PDF file
+    Yield the text of an uploaded file page by page (PDF), paragraph by
+    paragraph (DOCX) or block by block (TXT), so consumers can process it
+    without waiting for the whole document
     """
-    try:
-        text = ""
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Error extracting text from PDF: {str(e)}"
-        )
+    with extraction_errors(file_path):
+        yield from iter_text(file_path)
 
-def extract_text_from_docx(file_path: str) -> str:
+def extract_text_and_terms(file_path: str) -> Tuple[str, Dict[str, int]]:
     """
-    Extract text from DOCX file
+    Extract text together with its term vector in one streaming pass
+    
+    The term vector can be passed to FileSimilarity as query_vector so the
+    document is not tokenized a second time.
     """
-    try:
-        doc = docx.Document(file_path)
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        return text
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Error extracting text from DOCX: {str(e)}"
-        )
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
+    
+    with extraction_errors(file_path):
+        return extract_document(file_path)
 
-def extract_text_from_txt(file_path: str) -> str:
+@contextmanager
+def extraction_errors(file_path: str):
     """
-    Extract text from TXT file
+    Turn extraction errors into HTTP errors
     """
+    ext = file_path.split('.')[-1].lower()
+    kind = {"pdf": "PDF", "docx": "DOCX", "txt": "TXT file"}.get(ext)
+    if kind is None:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Unsupported file format: {ext}"
+        )
+    
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    except UnicodeDecodeError:
-        # Try with a different encoding if UTF-8 fails
-        try:
-            with open(file_path, 'r', encoding='latin-1') as file:
-                return file.read()
-        except Exception as e:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Error reading TXT file: {str(e)}"
-            )
+        yield
+    except ExtractionLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, 
-            detail=f"Error reading TXT file: {str(e)}"
-        )
\ No newline at end of file
+            detail=f"Error extracting text from {kind}: {str(e)}"
+        )
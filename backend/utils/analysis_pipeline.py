@@ -0,0 +1,345 @@
+import os
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+from utils.plagiarism_algorithms import PlagiarismDetector
+from utils.plagiarism_check import get_corpus_index
+from utils import summarizer
+from utils.summarizer import generate_summary, load_summarizer, start_background_load, MODEL_NAME, SUMMARIZER_BACKEND
+from utils.ipfs_upload import upload_to_ipfs, get_blob_store
+from utils.result_cache import ResultCache, ANALYSIS_VERSION, normalize_text, text_hash
+from utils.winnowing import Winnower
+from utils.text_pipeline import analyze, get_pipeline
+from utils.batch_analysis import BatchDocument, document_features, extract_text
+from utils.metrics import stage, algorithm, CORPUS_DOCUMENTS, DOCUMENT_CHARACTERS
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Analysis steps shared by the synchronous routes and queued jobs. These are
+# module-level functions so process-pool workers can unpickle them; each
+# worker process opens its own view of the persisted corpus index.
+
+detector = PlagiarismDetector()
+
+# Cache of analysis results, shared on disk by worker processes (empty RESULT_CACHE_DIR disables the disk tier)
+RESULT_CACHE_DIR = os.getenv(
+    "RESULT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "results")
+)
+_result_cache: Optional[ResultCache] = None
+
+def preload() -> None:
+    """
+    Prepare this process for analyses: open the corpus index and, unless
+    SUMMARIZER_PRELOAD=0, start loading the summarization model in the background
+    
+    Used at API startup and as the initializer of job worker processes.
+    """
+    get_corpus_index()
+    if os.getenv("SUMMARIZER_PRELOAD", "1") != "0":
+        start_background_load()
+
+def preload_shared() -> None:
+    """
+    Load the corpus index and summarization model synchronously, without running the model
+    
+    Used in a pre-fork server master: workers forked afterwards share the loaded
+    arrays and model weights copy-on-write. Inference thread pools do not survive
+    a fork, so each worker warms the model up itself, in preload().
+    """
+    get_corpus_index()
+    if os.getenv("SUMMARIZER_PRELOAD", "1") != "0":
+        load_summarizer(warmup=False)
+
+def get_result_cache() -> ResultCache:
+    """
+    Get this process's analysis result cache, creating it on first use
+    """
+    global _result_cache
+    
+    if _result_cache is None:
+        _result_cache = ResultCache(
+            RESULT_CACHE_DIR or None,
+            max_entries=int(os.getenv("RESULT_CACHE_ENTRIES", "256")),
+            max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        )
+    return _result_cache
+
+def cached_analysis(kind: str, text: str, options: Dict[str, Any], compute: Callable) -> tuple:
+    """
+    Run an analysis unless its result for this text, corpus version and
+    configuration is already cached
+    
+    Args:
+        kind: Analysis type, part of the cache key
+        text: Normalized text
+        options: Request options that change the result
+        compute: Called with the corpus index to produce the result
+        
+    Returns:
+        Tuple of (result, cache_hit)
+    """
+    with stage("load_corpus"):
+        corpus_index = get_corpus_index()
+    CORPUS_DOCUMENTS.observe(len(corpus_index))
+    DOCUMENT_CHARACTERS.observe(len(text))
+    winnower = Winnower()
+    config = {
+        "analysis_version": ANALYSIS_VERSION,
+        "kind": kind,
+        "options": options,
+        "lsh": asdict(corpus_index.lsh_config) if corpus_index.lsh_enabled else None,
+        "winnowing": [winnower.k, winnower.window],
+        "text_pipeline": get_pipeline().config.to_dict(),
+        # Summaries made before the model was loaded are extractive; don't serve them once it is
+        "summarizer": [MODEL_NAME, SUMMARIZER_BACKEND, summarizer.summarizer is not None]
+    }
+    
+    cache = get_result_cache()
+    digest = text_hash(text)
+    with stage("result_cache"):
+        cached = cache.get(digest, corpus_index.version, config)
+    if cached is not None:
+        return cached, True
+    
+    result = compute(corpus_index)
+    cache.put(digest, corpus_index.version, config, result)
+    return result, False
+
+def store_document(text: str, title: str, summary: str, results: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Store an analyzed document on IPFS
+    
+    Args:
+        text: Normalized text
+        title: Document title
+        summary: Generated summary
+        results: Plagiarism analysis
+        
+    Returns:
+        The document's title, CID and timestamp
+    """
+    # Create metadata for IPFS
+    metadata = {
+        "title": title,
+        "text": text,
+        "summary": summary,
+        "plagiarism_analysis": results,
+        "timestamp": datetime.now().isoformat()
+    }
+
+    # Upload to IPFS (using text as file content)
+    with stage("ipfs_upload"):
+        ipfs_cid = upload_to_ipfs(None, metadata, text_content=text)
+    return {"title": title, "cid": ipfs_cid, "timestamp": metadata["timestamp"]}
+
+def run_text_analysis(text: str, title: str = "Untitled Document") -> Dict[str, Any]:
+    """
+    Analyze text for plagiarism, summarize it and store it on IPFS
+    
+    Args:
+        text: Text to analyze
+        title: Document title
+        
+    Returns:
+        Response body of /analyze-text
+    """
+    text = normalize_text(text)
+    
+    def score(corpus_index):
+        # Perform comprehensive plagiarism analysis
+        with stage("plagiarism_check"):
+            plagiarism_analysis = detector.check_plagiarism_comprehensive(text, corpus_index=corpus_index)
+        # Generate summary
+        with stage("summary"):
+            summary = generate_summary(text)
+        document = store_document(text, title, summary, plagiarism_analysis)
+        return {"plagiarism_analysis": plagiarism_analysis, "summary": summary, "document": document}
+    
+    # Resubmissions of the same text reuse the analysis and the stored document while the corpus is unchanged
+    analysis, cache_hit = cached_analysis("analyze-text", text, {}, score)
+    results, summary = analysis["plagiarism_analysis"], analysis["summary"]
+    document = analysis.get("document")
+    if cache_hit and (document is None or document["title"] != title
+                      or not get_blob_store().exists(document["cid"])):
+        # Submitted under another title, or the stored document is gone
+        document = store_document(text, title, summary, results)
+
+    return {
+        "success": True,
+        "title": title,
+        "summary": summary,
+        "plagiarism_analysis": results,
+        "ipfs_cid": document["cid"],
+        "cache_hit": cache_hit,
+        "timestamp": document["timestamp"]
+    }
+
+def run_detailed_analysis(
+    text: str,
+    title: str = "Untitled Document",
+    include_ngram: bool = True,
+    include_cosine: bool = True,
+    include_file_similarity: bool = True
+) -> Dict[str, Any]:
+    """
+    Analyze text with a configurable set of algorithms
+    
+    Args:
+        text: Text to analyze
+        title: Document title
+        include_ngram: Run fingerprint (n-gram) copy detection
+        include_cosine: Run cosine similarity
+        include_file_similarity: Run file similarity
+        
+    Returns:
+        Response body of /analyze-detailed
+    """
+    text = normalize_text(text)
+    options = {
+        "include_ngram": include_ngram,
+        "include_cosine": include_cosine,
+        "include_file_similarity": include_file_similarity
+    }
+    
+    def score(corpus_index):
+        with stage("plagiarism_check"):
+            plagiarism_analysis = score_detailed(text, corpus_index, **options)
+        with stage("summary"):
+            summary = generate_summary(text)
+        return {"plagiarism_analysis": plagiarism_analysis, "summary": summary}
+    
+    analysis, cache_hit = cached_analysis("analyze-detailed", text, options, score)
+    
+    return {
+        "success": True,
+        "title": title,
+        "summary": analysis["summary"],
+        "plagiarism_analysis": analysis["plagiarism_analysis"],
+        "cache_hit": cache_hit,
+        "timestamp": datetime.now().isoformat()
+    }
+
+def score_detailed(
+    text: str,
+    corpus_index,
+    include_ngram: bool,
+    include_cosine: bool,
+    include_file_similarity: bool
+) -> Dict[str, Any]:
+    """
+    Score a text against the corpus with the selected algorithms
+    
+    Returns:
+        Plagiarism analysis of /analyze-detailed
+    """
+    # Initialize results
+    results = {
+        "cosine_similarity": 0.0,
+        "file_similarity": 0.0,
+        "ngram_similarity": 0.0,
+        "overall_score": 0.0,
+        "similar_passages": [],
+        "fingerprint_matches": [],
+        "details": {},
+        "algorithms_used": []
+    }
+
+    # Score against the index once; both algorithms share the postings walk
+    if (include_cosine or include_file_similarity) and len(corpus_index) > 0:
+        doc_ids = None
+        if corpus_index.lsh_enabled:
+            with algorithm("lsh_candidates"):
+                doc_ids = corpus_index.candidates(text)
+        with algorithm("cosine_file_similarity"):
+            cosine_scores, file_scores = corpus_index.score(text, doc_ids=doc_ids)
+    else:
+        cosine_scores, file_scores = [], []
+
+    # Perform cosine similarity analysis
+    if include_cosine and cosine_scores:
+        for i, cosine_score in enumerate(cosine_scores):
+            if cosine_score > 0.7:
+                ref_text = corpus_index.document_text(i)
+                results["similar_passages"].append({
+                    "reference_index": i,
+                    "cosine_similarity": cosine_score,
+                    "reference_preview": ref_text[:200] + "..." if len(ref_text) > 200 else ref_text
+                })
+
+        results["cosine_similarity"] = max(cosine_scores)
+        results["algorithms_used"].append("cosine_similarity")
+
+    # Perform file similarity analysis
+    if include_file_similarity and file_scores:
+        results["file_similarity"] = max(file_scores)
+        results["algorithms_used"].append("file_similarity")
+
+    # Perform n-gram analysis
+    if include_ngram:
+        if len(corpus_index) > 0:
+            with algorithm("fingerprint"):
+                fingerprint_result = corpus_index.fingerprint_index().match(text, normalized=analyze(text).normalized)
+            results["ngram_similarity"] = fingerprint_result["similarity"]
+            results["fingerprint_matches"] = fingerprint_result["spans"]
+        results["algorithms_used"].append("ngram_similarity")
+
+    # Calculate overall score
+    weights = {
+        "cosine": 0.4 if include_cosine else 0,
+        "file": 0.4 if include_file_similarity else 0,
+        "ngram": 0.2 if include_ngram else 0
+    }
+
+    # Normalize weights if some algorithms are disabled
+    total_weight = sum(weights.values())
+    if total_weight > 0:
+        for key in weights:
+            weights[key] /= total_weight
+
+    overall_score = (
+        results["cosine_similarity"] * weights["cosine"] +
+        (results["file_similarity"] / 100.0) * weights["file"] +
+        (results["ngram_similarity"] / 100.0) * weights["ngram"]
+    )
+
+    results["overall_score"] = min(1.0, overall_score)
+    results["details"]["weights"] = weights
+
+    return results
+
+def analyze_batch_document(document: BatchDocument) -> Dict[str, Any]:
+    """
+    Score one document of a batch against the corpus, for build_batch_report
+    
+    Args:
+        document: (filename, file content)
+        
+    Returns:
+        The document's corpus analysis and its features for the intra-batch
+        comparison, or its name and "error" if it could not be read
+    """
+    name, data = document
+    try:
+        with stage("extract_text"):
+            text = normalize_text(extract_text(name, data))
+        if not text.strip():
+            raise ValueError("No text found in document")
+        
+        def score(corpus_index):
+            with stage("plagiarism_check"):
+                return {"plagiarism_analysis": score_detailed(text, corpus_index, True, True, True)}
+        
+        # Shares cached results with resubmissions of the same text in later batches
+        analysis, cache_hit = cached_analysis("batch-document", text, {}, score)
+        return {
+            "name": name,
+            "characters": len(text),
+            "plagiarism_analysis": analysis["plagiarism_analysis"],
+            "cache_hit": cache_hit,
+            "features": document_features(text)
+        }
+    except Exception as e:
+        log.exception("Error analyzing batch document", name=name, error=str(e))
+        return {"name": name, "error": str(e)}
@@ -0,0 +1,272 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# Verified tokens kept per process; each is trusted until its exp claim
+AUTH_TOKEN_CACHE_ENTRIES = int(os.getenv("AUTH_TOKEN_CACHE_ENTRIES", "4096"))
+
+# Seconds before a token's exp at which it is verified again
+AUTH_TOKEN_LEEWAY = float(os.getenv("AUTH_TOKEN_LEEWAY", "30"))
+
+# User profiles kept per process, and for how many seconds
+AUTH_PROFILE_CACHE_ENTRIES = int(os.getenv("AUTH_PROFILE_CACHE_ENTRIES", "4096"))
+AUTH_PROFILE_TTL = float(os.getenv("AUTH_PROFILE_TTL", "60"))
+
+
+class ExpiringCache:
+    """
+    Thread-safe LRU cache whose entries each carry an expiry time
+    """
+
+    def __init__(self, max_entries: int, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            max_entries: Number of entries kept (0 disables the cache)
+            clock: Time source, in seconds
+        """
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a live entry, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any, expires_at: float) -> None:
+        """Store an entry until expires_at"""
+        if self.max_entries <= 0 or expires_at <= self.clock():
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_where(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop every entry whose value matches; returns the number dropped"""
+        with self._lock:
+            keys = [key for key, (_, value) in self._entries.items() if predicate(value)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class AuthCache:
+    """
+    Cache of verified ID tokens and Firestore user profiles
+
+    A token is verified once and its claims reused until shortly before its
+    exp claim, so a revoked token keeps working until it expires, as it would
+    without revocation checks. Profiles are kept for AUTH_PROFILE_TTL seconds;
+    code that changes a user's role calls invalidate_user so this worker sees
+    the change at once, while other workers see it within the TTL.
+    """
+
+    def __init__(self, token_entries: int = AUTH_TOKEN_CACHE_ENTRIES, token_leeway: float = AUTH_TOKEN_LEEWAY,
+                 profile_entries: int = AUTH_PROFILE_CACHE_ENTRIES, profile_ttl: float = AUTH_PROFILE_TTL,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            token_entries: Verified tokens kept
+            token_leeway: Seconds before exp at which a token is verified again
+            profile_entries: User profiles kept
+            profile_ttl: Seconds a profile is kept
+            clock: Time source, in seconds
+        """
+        self.token_leeway = token_leeway
+        self.profile_ttl = profile_ttl
+        self.clock = clock
+        self.tokens = ExpiringCache(token_entries, clock)
+        self.profiles = ExpiringCache(profile_entries, clock)
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        # Tokens are bearer credentials; keep only their digests in memory
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def verify(self, token: str, verifier: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Get the claims of a token, verifying it only if it is not cached
+
+        Args:
+            token: ID token
+            verifier: Function verifying a token and returning its claims
+                (raises if the token is invalid; failures are not cached)
+
+        Returns:
+            A copy of the decoded token claims
+        """
+        key = self._token_key(token)
+        claims = self.tokens.get(key)
+        if claims is None:
+            claims = verifier(token)
+            expires_at = claims.get("exp")
+            if expires_at is not None:
+                self.tokens.put(key, claims, float(expires_at) - self.token_leeway)
+        return dict(claims)
+
+    def profile(self, uid: str, loader: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Get a user's profile, loading it only if it is not cached
+
+        Args:
+            uid: User id
+            loader: Function loading a profile, returning None if the user
+                does not exist (missing users are not cached, so a new
+                account is found on its next request)
+
+        Returns:
+            A copy of the profile, or None
+        """
+        profile = self.profiles.get(uid)
+        if profile is None:
+            profile = loader(uid)
+            if profile is None:
+                return None
+            self.profiles.put(uid, profile, self.clock() + self.profile_ttl)
+        return dict(profile)
+
+    def invalidate_user(self, uid: str) -> None:
+        """
+        Drop a user's cached profile and tokens, e.g. after their role changed
+
+        Args:
+            uid: User id
+        """
+        self.profiles.discard(uid)
+        self.tokens.discard_where(lambda claims: claims.get("uid") == uid)
+
+    def clear(self) -> None:
+        self.tokens.clear()
+        self.profiles.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tokens": self.tokens.stats(), "profiles": self.profiles.stats()}
+
+
+_auth_cache: Optional[AuthCache] = None
+_auth_cache_lock = threading.Lock()
+
+
+def get_auth_cache() -> AuthCache:
+    """
+    Get the process-wide auth cache, created on first use
+    """
+    global _auth_cache
+
+    with _auth_cache_lock:
+        if _auth_cache is None:
+            _auth_cache = AuthCache()
+        return _auth_cache
+
+
+class LocalSnapshot:
+    """Document snapshot of LocalFirestore, shaped like firestore.DocumentSnapshot"""
+
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+
+class LocalDocument:
+    """Document reference of LocalFirestore"""
+
+    def __init__(self, store: "LocalFirestore", collection: str, doc_id: str):
+        self._store = store
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self) -> LocalSnapshot:
+        with self._store._lock:
+            self._store.reads += 1
+            data = self._store._data.get(self._collection, {}).get(self.id)
+            return LocalSnapshot(self.id, dict(data) if data is not None else None)
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        with self._store._lock:
+            documents = self._store._data.setdefault(self._collection, {})
+            if merge and self.id in documents:
+                documents[self.id].update(data)
+            else:
+                documents[self.id] = dict(data)
+
+    def update(self, data: Dict[str, Any]) -> None:
+        with self._store._lock:
+            documents = self._store._data.get(self._collection, {})
+            if self.id not in documents:
+                raise KeyError(f"No document to update: {self._collection}/{self.id}")
+            documents[self.id].update(data)
+
+    def delete(self) -> None:
+        with self._store._lock:
+            self._store._data.get(self._collection, {}).pop(self.id, None)
+
+
+class LocalCollection:
+    """Collection reference of LocalFirestore"""
+
+    def __init__(self, store: "LocalFirestore", name: str):
+        self._store = store
+        self.id = name
+
+    def document(self, doc_id: str) -> LocalDocument:
+        return LocalDocument(self._store, self.id, doc_id)
+
+
+class LocalFirestore:
+    """
+    In-memory stand-in for the Firestore client, for tests and local development
+
+    Supports the document reads and writes the backend uses, and counts
+    reads so callers can check how many round trips the real client would make.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.reads = 0
+
+    def collection(self, name: str) -> LocalCollection:
+        return LocalCollection(self, name)
@@ -0,0 +1,250 @@
+import io
+import os
+import tempfile
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from utils.text_extraction import iter_text
+from utils.text_pipeline import analyze
+from utils.winnowing import Winnower
+
+# Most documents in one batch, and largest document and batch, in bytes
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "200"))
+BATCH_MAX_FILE_BYTES = int(os.getenv("BATCH_MAX_FILE_BYTES", str(25 * 1024 * 1024)))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# Pairs of submissions at least this similar are listed in the report
+BATCH_PAIR_THRESHOLD = float(os.getenv("BATCH_PAIR_THRESHOLD", "0.5"))
+# Most pairs listed, most similar first
+BATCH_MAX_PAIRS = 200
+
+SUPPORTED_EXTENSIONS = ("pdf", "docx", "txt")
+
+# (filename, file content)
+BatchDocument = Tuple[str, bytes]
+
+
+class BatchInputError(ValueError):
+    """Raised for batches that are empty or not readable"""
+
+
+class BatchLimitError(BatchInputError):
+    """Raised for batches with too many or too large documents"""
+
+
+def _extension(name: str) -> str:
+    return name.rsplit('.', 1)[-1].lower() if '.' in name else ""
+
+
+def read_zip_documents(data: bytes, max_documents: int = BATCH_MAX_DOCUMENTS) -> List[BatchDocument]:
+    """
+    Read the supported documents of a zip archive, such as a class assignment download
+
+    Args:
+        data: Zip archive
+        max_documents: Most documents accepted
+
+    Returns:
+        (path in the archive, content) of each PDF, DOCX and TXT member, in archive order
+
+    Raises:
+        BatchInputError: If the archive is unreadable
+        BatchLimitError: If it has too many or too large documents
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile as e:
+        raise BatchInputError(f"Not a zip archive: {e}")
+
+    documents = []
+    with archive:
+        for info in archive.infolist():
+            name = info.filename
+            base = os.path.basename(name)
+            # Folders, macOS resource forks and hidden files
+            if info.is_dir() or name.startswith("__MACOSX/") or base.startswith("."):
+                continue
+            if _extension(name) not in SUPPORTED_EXTENSIONS:
+                continue
+            if len(documents) == max_documents:
+                raise BatchLimitError(f"Archive has more than {max_documents} documents")
+            if info.file_size > BATCH_MAX_FILE_BYTES:
+                raise BatchLimitError(f"{name} is larger than {BATCH_MAX_FILE_BYTES} bytes")
+            with archive.open(info) as member:
+                # The declared size can lie; never inflate more than the limit
+                content = member.read(BATCH_MAX_FILE_BYTES + 1)
+            if len(content) > BATCH_MAX_FILE_BYTES:
+                raise BatchLimitError(f"{name} is larger than {BATCH_MAX_FILE_BYTES} bytes")
+            documents.append((name, content))
+    return documents
+
+
+def extract_text(name: str, data: bytes) -> str:
+    """
+    Extract the text of one batch document
+
+    Args:
+        name: Filename; its extension selects the extractor
+        data: File content
+
+    Returns:
+        The document's text
+
+    Raises:
+        ValueError: For unsupported file types
+        ExtractionLimitError: If the document has too much text
+    """
+    ext = _extension(name)
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Unsupported file format: {ext}")
+
+    # The extractors read files from disk
+    fd, path = tempfile.mkstemp(suffix=f".{ext}")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return "".join(iter_text(path))
+    finally:
+        os.remove(path)
+
+
+def document_features(text: str, winnower: Optional[Winnower] = None) -> Dict[str, Any]:
+    """
+    Compact representation of a document for the intra-batch comparison
+
+    Args:
+        text: Document text
+        winnower: Fingerprint selection (default: Winnower())
+
+    Returns:
+        Dict with "terms", the FileSimilarity term vector, and "fingerprints",
+        the sorted unique winnowed k-gram hashes
+    """
+    # The token stream is usually still cached from scoring the text against the corpus
+    stream = analyze(text)
+    winnower = winnower or Winnower()
+    hashes, _ = winnower.fingerprints(stream.normalized[0])
+    return {
+        "terms": stream.content_counts,
+        "fingerprints": np.unique(hashes),
+    }
+
+
+def similarity_matrices(features: Sequence[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compare every document of a batch with every other, with one sparse product per measure
+
+    Args:
+        features: document_features of each document
+
+    Returns:
+        Tuple of (file_similarity, fingerprint_overlap), both n x n:
+        ``file_similarity[i, j]`` is FileSimilarity.vector_similarity of the
+        two term vectors (0-100), ``fingerprint_overlap[i, j]`` the share of
+        document i's fingerprints also found in document j (0-1)
+    """
+    n = len(features)
+
+    vocab: Dict[str, int] = {}
+    rows, columns, values = [], [], []
+    for row, feature in enumerate(features):
+        for term, count in feature["terms"].items():
+            rows.append(row)
+            columns.append(vocab.setdefault(term, len(vocab)))
+            values.append(count)
+    terms = sparse.csr_matrix((np.array(values, dtype=np.float64), (rows, columns)), shape=(n, len(vocab)))
+    norms = np.sqrt(np.asarray(terms.multiply(terms).sum(axis=1)).ravel())
+    unit = sparse.diags(np.divide(1.0, norms, out=np.zeros(n), where=norms > 0)) @ terms
+    file_similarity = (unit @ unit.T).toarray() * 100
+
+    counts = np.array([len(feature["fingerprints"]) for feature in features], dtype=np.int64)
+    if counts.sum():
+        hashes = np.concatenate([feature["fingerprints"] for feature in features])
+        _, hash_columns = np.unique(hashes, return_inverse=True)
+        fingerprints = sparse.csr_matrix(
+            (np.ones(len(hashes)), (np.repeat(np.arange(n), counts), hash_columns)),
+            shape=(n, hash_columns.max() + 1)
+        )
+        shared = (fingerprints @ fingerprints.T).toarray()
+    else:
+        shared = np.zeros((n, n))
+    fingerprint_overlap = np.divide(shared, counts[:, None], out=np.zeros((n, n)), where=counts[:, None] > 0)
+
+    return file_similarity, fingerprint_overlap
+
+
+def build_batch_report(results: List[Dict[str, Any]], threshold: float = BATCH_PAIR_THRESHOLD) -> Dict[str, Any]:
+    """
+    Rank a batch's documents by their similarity to the corpus and to each other
+
+    Args:
+        results: Per-document results of analysis_pipeline.analyze_batch_document,
+            in submission order
+        threshold: Least share (0-1) of either document's fingerprints found
+            in the other for the pair to be listed in "pairs"
+
+    Returns:
+        Report with "ranking", every readable document from most to least
+        suspicious, "pairs" of similar submissions, and "errors" for
+        documents that could not be read
+    """
+    documents = [result for result in results if "error" not in result]
+    errors = [{"name": result["name"], "error": result["error"]} for result in results if "error" in result]
+    n = len(documents)
+
+    if n:
+        file_similarity, fingerprint_overlap = similarity_matrices([doc["features"] for doc in documents])
+        # Shared passages, not shared vocabulary: essays on one assignment all use
+        # the same words. A short text copied into a longer one counts in full.
+        pair_similarity = np.maximum(fingerprint_overlap, fingerprint_overlap.T)
+        np.fill_diagonal(pair_similarity, 0.0)
+    else:
+        file_similarity = fingerprint_overlap = pair_similarity = np.zeros((0, 0))
+
+    pairs = []
+    for i, j in zip(*np.nonzero(np.triu(pair_similarity >= threshold, k=1))):
+        pairs.append({
+            "documents": [documents[i]["name"], documents[j]["name"]],
+            "similarity": float(pair_similarity[i, j]),
+            "file_similarity": float(file_similarity[i, j]),
+            "fingerprint_overlap": [float(fingerprint_overlap[i, j]), float(fingerprint_overlap[j, i])],
+        })
+    pairs.sort(key=lambda pair: pair["similarity"], reverse=True)
+
+    ranking = []
+    for i, doc in enumerate(documents):
+        analysis = doc["plagiarism_analysis"]
+        peer = int(np.argmax(pair_similarity[i])) if n > 1 else None
+        peer_similarity = float(pair_similarity[i, peer]) if peer is not None else 0.0
+        ranking.append({
+            "name": doc["name"],
+            "risk_score": max(analysis["overall_score"], peer_similarity),
+            "corpus_score": analysis["overall_score"],
+            "peer_similarity": peer_similarity,
+            "most_similar_peer": documents[peer]["name"] if peer is not None and peer_similarity > 0 else None,
+            "cosine_similarity": analysis["cosine_similarity"],
+            "file_similarity": analysis["file_similarity"],
+            "ngram_similarity": analysis["ngram_similarity"],
+            "similar_passage_count": len(analysis["similar_passages"]),
+            "characters": doc["characters"],
+            "cache_hit": doc["cache_hit"],
+        })
+    ranking.sort(key=lambda entry: entry["risk_score"], reverse=True)
+    for rank, entry in enumerate(ranking, 1):
+        entry["rank"] = rank
+
+    return {
+        "success": True,
+        "document_count": len(results),
+        "analyzed_count": n,
+        "threshold": threshold,
+        "ranking": ranking,
+        "pairs": pairs[:BATCH_MAX_PAIRS],
+        "pair_count": len(pairs),
+        "errors": errors,
+        "timestamp": datetime.now().isoformat(),
+    }
@@ -0,0 +1,105 @@
+import os
+import time
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from concurrent callers into batched calls
+
+    A background thread takes the first waiting item, keeps collecting for
+    up to ``max_wait`` seconds or ``max_batch_size`` items, and runs items
+    with equal parameters through a single ``run_batch(items, params)`` call.
+    """
+
+    def __init__(self, run_batch: Callable[[List[Any], Any], List[Any]],
+                 max_batch_size: int = 8, max_wait: float = 0.01, name: str = "micro-batcher"):
+        """
+        Args:
+            run_batch: Function returning one result per item
+            max_batch_size: Maximum number of items per call
+            max_wait: Seconds to wait for more items after the first arrives
+            name: Name of the background thread
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._queue: "queue.Queue[Tuple[Any, Any, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes: Counter = Counter()
+
+    def submit(self, item: Any, params: Any = None) -> Future:
+        """
+        Queue an item for the next batch
+
+        Args:
+            item: Input of run_batch
+            params: Hashable parameters; only items with equal params share a call
+
+        Returns:
+            Future resolving to the item's result
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((item, params, future))
+        return future
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # Forked (e.g. a pre-fork server worker): the thread stayed in the parent
+                self._queue = queue.Queue()
+                self._thread = None
+                self._pid = os.getpid()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    # Items already waiting always join, even past the deadline
+                    batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            groups: Dict[Any, List[Tuple[Any, Future]]] = {}
+            for item, params, future in batch:
+                groups.setdefault(params, []).append((item, future))
+            for params, entries in groups.items():
+                self._run(params, entries)
+
+    def _run(self, params: Any, entries: List[Tuple[Any, Future]]) -> None:
+        self.batches += 1
+        self.items += len(entries)
+        self.batch_sizes[len(entries)] += 1
+        try:
+            results = self.run_batch([item for item, _ in entries], params)
+        except Exception as e:
+            for _, future in entries:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(entries, results):
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": max(self.batch_sizes) if self.batch_sizes else 0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+        }
@@ -0,0 +1,417 @@
+import os
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Optional dependency: pip install zstandard
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content-defined chunking: chunk sizes in bytes
+MIN_CHUNK_SIZE = 1 * 1024
+AVG_CHUNK_BITS = 12  # average chunk of about 4 KiB past the minimum
+MAX_CHUNK_SIZE = 64 * 1024
+
+# Bytes a BlobWriter cuts into chunks at a time; every chunk but the last of
+# such a window is final, since a boundary depends only on the bytes before it
+WRITER_BUFFER_SIZE = 4 * MAX_CHUNK_SIZE
+
+# Bytes that influence the rolling hash at each position (a power of two, at most 64)
+_GEAR_WINDOW = 64
+# Bytes hashed per vectorized step
+_HASH_BLOCK_SIZE = 64 * 1024
+# Boundary test on the high bits of the hash, which depend on the whole window
+_BOUNDARY_MASK = np.uint64(((1 << AVG_CHUNK_BITS) - 1) << (_GEAR_WINDOW - AVG_CHUNK_BITS))
+_GEAR = np.random.default_rng(0x5EED).integers(0, 2**63, size=256, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+# CIDs look like IPFS CIDv1 base32 strings
+CID_PREFIX = "bafk"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    cid TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    chunks TEXT NOT NULL,
+    metadata TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objects_created_at ON objects (created_at);
+CREATE TABLE IF NOT EXISTS chunks (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    refs INTEGER NOT NULL
+);
+"""
+
+
+def _gear_hashes(byte_values: np.ndarray) -> np.ndarray:
+    """
+    Gear hash h[i] = sum_j gear[data[i - j]] << j for j < 64, the value the
+    sequential update h = (h << 1) + gear[byte] has after each byte
+
+    Built by doubling the summed span: log2(64) vectorized passes instead of 64.
+    """
+    hashes = _GEAR[byte_values]
+    shifted = np.empty_like(hashes)
+    n = len(hashes)
+    span = 1
+    while span < _GEAR_WINDOW:
+        # Shifted copy first: the sum reads positions it also writes
+        np.left_shift(hashes[:n - span], np.uint64(span), out=shifted[:n - span])
+        np.add(hashes[span:], shifted[:n - span], out=hashes[span:])
+        span *= 2
+    return hashes
+
+
+def chunk_boundaries(data: bytes) -> List[int]:
+    """
+    Split data into content-defined chunks with a gear rolling hash
+
+    Boundaries depend only on the bytes just before them, so an edit moves
+    at most the boundaries around it and the other chunks are stored once.
+
+    Args:
+        data: Bytes to split
+
+    Returns:
+        End offsets of the chunks, the last one being ``len(data)``
+    """
+    n = len(data)
+    if n <= MIN_CHUNK_SIZE:
+        return [n] if n else []
+
+    # Hashed a block at a time so the working arrays stay in cache; each block
+    # also reads the bytes before it that its first hashes cover
+    byte_values = np.frombuffer(data, dtype=np.uint8)
+    candidates = []
+    for block_start in range(0, n, _HASH_BLOCK_SIZE):
+        lead = min(block_start, _GEAR_WINDOW - 1)
+        hashes = _gear_hashes(byte_values[block_start - lead:block_start + _HASH_BLOCK_SIZE])[lead:]
+        candidates.append(np.flatnonzero((hashes & _BOUNDARY_MASK) == 0) + (block_start + 1))
+    candidates = np.concatenate(candidates)
+
+    boundaries = []
+    start = 0
+    while start < n:
+        if n - start <= MIN_CHUNK_SIZE:
+            end = n
+        else:
+            i = np.searchsorted(candidates, start + MIN_CHUNK_SIZE)
+            end = int(candidates[i]) if i < len(candidates) else n
+            end = min(end, start + MAX_CHUNK_SIZE)
+        boundaries.append(end)
+        start = end
+    return boundaries
+
+
+def make_cid(digest: bytes) -> str:
+    """Format a SHA-256 digest as a CID-like base32 string"""
+    return CID_PREFIX + base64.b32encode(digest).decode("ascii").lower().rstrip("=")
+
+
+class BlobStore:
+    """
+    Local content-addressed blob store standing in for IPFS
+
+    Objects are split into content-defined chunks stored once under their
+    SHA-256 in a sharded directory tree (``chunks/ab/<hash>``), optionally
+    zstd-compressed. An SQLite index maps each object's CID to its chunk list
+    and to small metadata for lookups without reading the object.
+    """
+
+    def __init__(self, root: str, compression: Optional[str] = "auto", level: int = 3):
+        """
+        Args:
+            root: Directory of the store
+            compression: "zstd", None, or "auto" to use zstd when installed
+            level: zstd compression level
+        """
+        if compression == "auto":
+            compression = "zstd" if zstandard is not None else None
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd compression requires the zstandard package")
+        if compression not in ("zstd", None):
+            raise ValueError(f"Unknown compression: {compression}")
+
+        self.root = root
+        self.compression = compression
+        self.level = level
+        os.makedirs(os.path.join(root, "chunks"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._shard_dirs = set()
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Safe with WAL: a crash can lose the last commits but never corrupts the index
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _chunk_path(self, chunk_hash: str) -> str:
+        return os.path.join(self.root, "chunks", chunk_hash[:2], chunk_hash)
+
+    def _write_chunk(self, chunk_hash: str, chunk: bytes) -> int:
+        """Write a chunk unless present; returns its size on disk"""
+        path = self._chunk_path(chunk_hash)
+        if os.path.exists(path):
+            return os.path.getsize(path)
+
+        if self.compression == "zstd":
+            compressed = zstandard.ZstdCompressor(level=self.level).compress(chunk)
+            # Keep incompressible chunks raw; the frame magic tells them apart on read
+            stored = compressed if len(compressed) < len(chunk) else chunk
+        else:
+            stored = chunk
+
+        shard_dir = os.path.dirname(path)
+        if shard_dir not in self._shard_dirs:
+            os.makedirs(shard_dir, exist_ok=True)
+            self._shard_dirs.add(shard_dir)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(stored)
+        os.replace(tmp_path, path)
+        return len(stored)
+
+    def _read_chunk(self, chunk_hash: str) -> bytes:
+        with open(self._chunk_path(chunk_hash), "rb") as f:
+            stored = f.read()
+        if stored[:4] == b"\x28\xb5\x2f\xfd":
+            if zstandard is None:
+                raise RuntimeError("Chunk is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(stored)
+        return stored
+
+    def put(self, data: bytes, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Store bytes, sharing chunks with everything already stored
+
+        Args:
+            data: Object content
+            metadata: Small JSON-serializable fields kept in the index
+
+        Returns:
+            CID of the content; storing the same bytes again returns the same CID
+        """
+        cid = make_cid(hashlib.sha256(data).digest())
+        if self.exists(cid):
+            if metadata is not None:
+                self.set_metadata(cid, metadata)
+            return cid
+
+        writer = self.writer()
+        writer.write(data)
+        return writer.commit(metadata)
+
+    def writer(self) -> "BlobWriter":
+        """
+        Start storing an object whose bytes arrive in pieces
+
+        Returns:
+            A BlobWriter; nothing is visible in the store until its commit()
+        """
+        return BlobWriter(self)
+
+    def _store_chunk(self, chunk: bytes, new_chunks: Dict[str, Tuple[str, int, int]]) -> str:
+        """Write a chunk unless the store or new_chunks has it; returns its hash"""
+        chunk_hash = hashlib.sha256(chunk).hexdigest()
+        if chunk_hash in new_chunks:
+            return chunk_hash
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM chunks WHERE hash = ?", (chunk_hash,)).fetchone() is None:
+                # Chunk files are written before the index references them
+                new_chunks[chunk_hash] = (chunk_hash, len(chunk), self._write_chunk(chunk_hash, chunk))
+        return chunk_hash
+
+    def _add_object(self, cid: str, size: int, chunk_hashes: List[str],
+                    new_chunks: Dict[str, Tuple[str, int, int]], metadata: Optional[Dict[str, Any]]) -> None:
+        """Index an object whose chunks are written"""
+        encoded_metadata = json.dumps(metadata) if metadata is not None else None
+        with self._lock, self._db:
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO objects (cid, size, chunks, metadata, created_at) VALUES (?, ?, ?, ?, ?)",
+                (cid, size, json.dumps(chunk_hashes), encoded_metadata, time.time())
+            ).rowcount
+            # Another writer may have stored the same object in the meantime
+            if inserted:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO chunks (hash, size, stored_size, refs) VALUES (?, ?, ?, 0)",
+                    list(new_chunks.values())
+                )
+                self._db.executemany(
+                    "UPDATE chunks SET refs = refs + 1 WHERE hash = ?", [(h,) for h in chunk_hashes]
+                )
+            elif metadata is not None:
+                self._db.execute("UPDATE objects SET metadata = ? WHERE cid = ?", (encoded_metadata, cid))
+
+    def put_json(self, obj: Any, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Store a JSON document; keys are sorted so equal documents share a CID"""
+        return self.put(json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8"), metadata)
+
+    def get(self, cid: str) -> bytes:
+        """
+        Read an object
+
+        Raises:
+            KeyError: If the CID is not stored
+        """
+        return b"".join(self.iter_chunks(cid))
+
+    def iter_chunks(self, cid: str) -> Iterator[bytes]:
+        """
+        Read an object chunk by chunk, without holding all of it in memory
+
+        Raises:
+            KeyError: If the CID is not stored
+        """
+        with self._lock:
+            row = self._db.execute("SELECT chunks FROM objects WHERE cid = ?", (cid,)).fetchone()
+        if row is None:
+            raise KeyError(cid)
+        return (self._read_chunk(chunk_hash) for chunk_hash in json.loads(row[0]))
+
+    def get_json(self, cid: str) -> Any:
+        return json.loads(self.get(cid))
+
+    def exists(self, cid: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM objects WHERE cid = ?", (cid,)).fetchone() is not None
+
+    def metadata(self, cid: str) -> Optional[Dict[str, Any]]:
+        """Index metadata of an object, or None if it has none or is not stored"""
+        with self._lock:
+            row = self._db.execute("SELECT metadata FROM objects WHERE cid = ?", (cid,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def set_metadata(self, cid: str, metadata: Optional[Dict[str, Any]]) -> bool:
+        """
+        Replace the index metadata of a stored object
+
+        Returns:
+            False if the CID is not stored
+        """
+        encoded_metadata = json.dumps(metadata) if metadata is not None else None
+        with self._lock, self._db:
+            return self._db.execute(
+                "UPDATE objects SET metadata = ? WHERE cid = ?", (encoded_metadata, cid)
+            ).rowcount > 0
+
+    def iter_metadata(self, since: float = 0.0) -> Iterator[Tuple[str, float, Optional[Dict[str, Any]]]]:
+        """
+        Iterate (cid, created_at, metadata) of objects stored after a time, oldest first
+
+        Args:
+            since: Only objects created after this UNIX time
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT cid, created_at, metadata FROM objects WHERE created_at > ? ORDER BY created_at", (since,)
+            ).fetchall()
+        for cid, created_at, metadata in rows:
+            yield cid, created_at, json.loads(metadata) if metadata else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            objects, logical = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+            chunks, unique, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM chunks"
+            ).fetchone()
+        return {
+            "objects": objects,
+            "chunks": chunks,
+            "logical_bytes": logical,
+            "unique_bytes": unique,
+            "stored_bytes": stored,
+            "dedup_ratio": logical / unique if unique else 1.0,
+            "compression": self.compression,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class BlobWriter:
+    """
+    Stores an object from pieces written one after the other
+
+    Complete chunks are written to the store while the object is still
+    arriving, so only about WRITER_BUFFER_SIZE bytes are held at a time. The
+    object gets the same chunks and CID as storing all its bytes with put().
+    Chunk files of a writer that is never committed stay on disk unindexed
+    and are reused when the same chunk is stored again.
+    """
+
+    def __init__(self, store: BlobStore):
+        self._store = store
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        self._chunk_hashes: List[str] = []
+        self._new_chunks: Dict[str, Tuple[str, int, int]] = {}
+        self.size = 0
+        self._cid: Optional[str] = None
+
+    def write(self, data: bytes) -> int:
+        """
+        Add the next piece of the object
+
+        Returns:
+            Number of bytes written
+        """
+        if self._cid is not None:
+            raise ValueError("Cannot write to a committed BlobWriter")
+        self._hash.update(data)
+        self.size += len(data)
+        self._buffer += data
+        # Cut a window at a time, so large pieces are chunked in cache-sized steps
+        start = 0
+        while len(self._buffer) - start >= WRITER_BUFFER_SIZE:
+            start = self._cut(start, start + WRITER_BUFFER_SIZE, final=False)
+        del self._buffer[:start]
+        return len(data)
+
+    def _cut(self, start: int, stop: int, final: bool) -> int:
+        """Store the chunks of buffer[start:stop] starting at a chunk boundary; returns where the rest starts"""
+        window = bytes(self._buffer[start:stop])
+        boundaries = chunk_boundaries(window)
+        if not final:
+            # The last chunk may continue past the window
+            boundaries = boundaries[:-1]
+        offset = 0
+        for end in boundaries:
+            self._chunk_hashes.append(self._store._store_chunk(window[offset:end], self._new_chunks))
+            offset = end
+        return start + offset
+
+    @property
+    def cid(self) -> str:
+        """CID of the bytes written so far"""
+        return self._cid or make_cid(self._hash.digest())
+
+    def commit(self, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Add the object to the store
+
+        Args:
+            metadata: Small JSON-serializable fields kept in the index; for an
+                object that is already stored, replaces its metadata if given
+
+        Returns:
+            CID of the object
+        """
+        if self._cid is None:
+            self._cut(0, len(self._buffer), final=True)
+            self._buffer.clear()
+            self._cid = make_cid(self._hash.digest())
+            self._store._add_object(self._cid, self.size, self._chunk_hashes, self._new_chunks, metadata)
+        elif metadata is not None:
+            self._store.set_metadata(self._cid, metadata)
+        return self._cid
@@ -0,0 +1,504 @@
+import os
+import json
+import mmap
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Any
+
+import numpy as np
+from scipy import sparse
+
+from utils.plagiarism_algorithms import CorpusMatrix
+from utils.text_pipeline import analyze, get_pipeline
+from utils.minhash_lsh import LSHConfig, LSHIndex, MinHasher
+from utils.winnowing import FingerprintIndex
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Index files live next to the corpus documents in a hidden directory
+INDEX_DIRNAME = ".index"
+MANIFEST_FILE = "manifest.json"
+INDEX_FORMAT = 3
+
+# Array files making up one index generation: term-major postings and MinHash signatures
+ARRAY_NAMES = ("term_ptr", "post_docs", "post_tfs", "signatures")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenize text the same way the similarity algorithms do
+
+    Args:
+        text: Input text
+
+    Returns:
+        List of normalized word tokens
+    """
+    return get_pipeline().tokens(text)
+
+
+def read_corpus_file(file_path: str) -> str:
+    """
+    Read a corpus document, falling back to latin-1 if UTF-8 fails
+
+    Args:
+        file_path: Path to the document
+
+    Returns:
+        Document text
+    """
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except UnicodeDecodeError:
+        with open(file_path, "r", encoding="latin-1") as f:
+            return f.read()
+
+
+class CorpusIndex:
+    """
+    Persistent inverted index over the ``.txt`` documents of the reference corpus.
+
+    Each document is tokenized once. The index keeps term postings
+    (term -> documents and term frequencies), per-document norms and the
+    document texts on disk as numpy arrays and a text blob, which are
+    memory-mapped when the index is opened. ``refresh`` compares the corpus
+    directory against the manifest and only re-tokenizes files that were
+    added or changed; removed files are dropped from the postings.
+
+    A MinHash signature is stored per document so that large corpora can
+    be narrowed to a small candidate set with LSH before exact scoring.
+    """
+
+    def __init__(self, corpus_dir: str, index_dir: Optional[str] = None, refresh_interval: float = 2.0,
+                 lsh_config: Optional[LSHConfig] = None):
+        """
+        Args:
+            corpus_dir: Directory containing the reference ``.txt`` documents
+            index_dir: Directory for the index files (default: ``<corpus_dir>/.index``)
+            refresh_interval: Minimum seconds between two directory scans
+            lsh_config: MinHash/LSH settings (default: from LSH_* environment variables)
+        """
+        self.corpus_dir = corpus_dir
+        self.index_dir = index_dir or os.path.join(corpus_dir, INDEX_DIRNAME)
+        self.refresh_interval = refresh_interval
+        self.lsh_config = lsh_config or LSHConfig.from_env()
+        self.minhasher = MinHasher.from_config(self.lsh_config)
+        self._lsh: Optional[LSHIndex] = None
+        self._matrix: Optional[CorpusMatrix] = None
+        self._fingerprints: Optional[FingerprintIndex] = None
+
+        self._lock = threading.RLock()
+        self._last_refresh = 0.0
+        self._manifest_mtime = None
+
+        self.version = ""
+        self.documents: List[Dict[str, Any]] = []
+        self.vocab: List[str] = []
+        self._term_ids: Dict[str, int] = {}
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._norms = np.zeros(0, dtype=np.float64)
+        self._texts: Optional[mmap.mmap] = None
+
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @property
+    def filenames(self) -> List[str]:
+        """Filenames of the indexed documents, in index order"""
+        return [doc["filename"] for doc in self.documents]
+
+    @property
+    def total_characters(self) -> int:
+        """Total number of characters across all indexed documents"""
+        return sum(doc["length"] for doc in self.documents)
+
+    def document_text(self, doc_id: int) -> str:
+        """
+        Get the text of an indexed document from the memory-mapped text blob
+
+        Args:
+            doc_id: Position of the document in the index
+
+        Returns:
+            Document text
+        """
+        doc = self.documents[doc_id]
+        start = doc["text_offset"]
+        return self._texts[start:start + doc["text_bytes"]].decode("utf-8")
+
+    def texts(self) -> List[str]:
+        """
+        Get the texts of all indexed documents
+
+        Returns:
+            List of document texts, in index order
+        """
+        return [self.document_text(i) for i in range(len(self.documents))]
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Bring the index up to date with the corpus directory
+
+        Only files whose size or modification time changed are re-read and
+        re-tokenized. Scans are throttled to one per ``refresh_interval``.
+
+        Args:
+            force: Scan the directory even if the refresh interval has not elapsed
+
+        Returns:
+            True if the index changed
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return False
+            self._last_refresh = now
+
+            # Pick up an index written by another process first
+            reloaded = False
+            manifest_mtime = self._stat_manifest()
+            if manifest_mtime != self._manifest_mtime:
+                self._load()
+                reloaded = True
+
+            current = self._scan_corpus_dir()
+            indexed = {doc["filename"]: doc for doc in self.documents}
+
+            changed = [
+                name for name, stat in current.items()
+                if name not in indexed
+                or indexed[name]["mtime_ns"] != stat[0]
+                or indexed[name]["size"] != stat[1]
+            ]
+            removed = [name for name in indexed if name not in current]
+
+            if not changed and not removed:
+                return reloaded
+
+            self._update(current, changed)
+            return True
+
+    @property
+    def lsh_enabled(self) -> bool:
+        """Whether the corpus is large enough for LSH candidate retrieval"""
+        return len(self.documents) >= self.lsh_config.min_corpus_size
+
+    def candidates(self, text: str) -> np.ndarray:
+        """
+        Find documents likely to be similar to the text using MinHash LSH
+
+        Args:
+            text: Text to look up
+
+        Returns:
+            Sorted array of candidate document ids
+        """
+        with self._lock:
+            if self._lsh is None:
+                self._lsh = LSHIndex(np.asarray(self._arrays["signatures"]),
+                                     self.lsh_config.bands, self.lsh_config.rows)
+            lsh = self._lsh
+
+        signature = self.minhasher.signature(analyze(text).tokens)
+        return lsh.query(signature, self.lsh_config.max_candidates)
+
+    def matrix(self) -> CorpusMatrix:
+        """
+        Get a sparse document-term matrix backed by the memory-mapped postings
+
+        The term-major postings are already a CSC layout, so the matrix is
+        built without re-tokenizing and cached until the index changes.
+
+        Returns:
+            CorpusMatrix with one row per indexed document
+        """
+        with self._lock:
+            if self._matrix is None:
+                counts = sparse.csc_matrix(
+                    (self._arrays["post_tfs"], self._arrays["post_docs"], self._arrays["term_ptr"]),
+                    shape=(len(self.documents), len(self.vocab)),
+                )
+                self._matrix = CorpusMatrix(counts, self._term_ids, file_norms=self._norms)
+            return self._matrix
+
+    def fingerprint_index(self) -> FingerprintIndex:
+        """
+        Get the winnowing fingerprint index of the corpus, cached until the index changes
+
+        Returns:
+            FingerprintIndex over the indexed documents
+        """
+        with self._lock:
+            if self._fingerprints is None:
+                self._fingerprints = FingerprintIndex.from_corpus_index(self)
+            return self._fingerprints
+
+    def score(self, text: str, doc_ids: Optional[np.ndarray] = None) -> Tuple[List[float], List[float]]:
+        """
+        Score a text against indexed documents
+
+        Produces the same values as ``CosineSimilarity.cosine_sim`` and
+        ``FileSimilarity.find_file_similarity`` computed against each
+        document, using sparse products restricted to the query's terms.
+
+        Args:
+            text: Text to score
+            doc_ids: Only score these documents (e.g. LSH candidates); the
+                others get a score of 0
+
+        Returns:
+            Tuple of (cosine_scores, file_scores), one entry per document
+        """
+        if not self.documents:
+            return [], []
+        return self.matrix().score(text, doc_ids=doc_ids)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _stat_manifest(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.index_dir, MANIFEST_FILE)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self) -> None:
+        """Open the on-disk index, rebuilding it if it is missing or unreadable"""
+        manifest_path = os.path.join(self.index_dir, MANIFEST_FILE)
+        self._manifest_mtime = self._stat_manifest()
+
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("format") != INDEX_FORMAT:
+                raise ValueError(f"unsupported index format {manifest.get('format')}")
+            if manifest.get("minhash") != self.lsh_config.signature_params():
+                raise ValueError("MinHash parameters changed")
+            if manifest.get("text_pipeline") != get_pipeline().config.to_dict():
+                raise ValueError("text pipeline settings changed")
+
+            generation = manifest["generation"]
+            arrays = {
+                name: np.load(self._generation_path(generation, f"{name}.npy"), mmap_mode="r")
+                for name in ARRAY_NAMES
+            }
+            with open(self._generation_path(generation, "vocab.json"), "r", encoding="utf-8") as f:
+                vocab = json.load(f)
+            texts = self._map_texts(self._generation_path(generation, "texts.bin"))
+        except FileNotFoundError:
+            self._reset()
+            self.refresh(force=True)
+            return
+        except Exception as e:
+            log.warning("Corpus index is unreadable, rebuilding", index_dir=self.index_dir, error=str(e))
+            self._reset()
+            self.refresh(force=True)
+            return
+
+        self.version = generation
+        self.documents = manifest["documents"]
+        self.vocab = vocab
+        self._term_ids = {term: i for i, term in enumerate(vocab)}
+        self._arrays = arrays
+        self._norms = np.array([doc["norm"] for doc in self.documents], dtype=np.float64)
+        self._texts = texts
+        self._lsh = None
+        self._matrix = None
+        self._fingerprints = None
+
+    def _reset(self) -> None:
+        self.version = ""
+        self.documents = []
+        self.vocab = []
+        self._term_ids = {}
+        self._arrays = {
+            "term_ptr": np.zeros(1, dtype=np.int64),
+            "post_docs": np.zeros(0, dtype=np.int32),
+            "post_tfs": np.zeros(0, dtype=np.int32),
+            "signatures": np.zeros((0, self.lsh_config.num_perm), dtype=np.uint32),
+        }
+        self._norms = np.zeros(0, dtype=np.float64)
+        self._texts = b""
+        self._lsh = None
+        self._matrix = None
+        self._fingerprints = None
+
+    @staticmethod
+    def _map_texts(path: str):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _generation_path(self, generation: str, name: str) -> str:
+        return os.path.join(self.index_dir, f"{generation}.{name}")
+
+    # ------------------------------------------------------------------
+    # Updating
+    # ------------------------------------------------------------------
+
+    def _scan_corpus_dir(self) -> Dict[str, Tuple[int, int]]:
+        """List corpus documents as {filename: (mtime_ns, size)}"""
+        current = {}
+        try:
+            with os.scandir(self.corpus_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".txt") and entry.is_file():
+                        stat = entry.stat()
+                        current[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.error("Error listing corpus directory", error=str(e))
+        return current
+
+    def _update(self, current: Dict[str, Tuple[int, int]], changed: List[str]) -> None:
+        """Write a new index generation for the current corpus directory listing"""
+        changed_set = set(changed)
+
+        # Map old document ids of kept documents to their new position
+        kept = []
+        kept_ids = []
+        doc_map = np.full(len(self.documents), -1, dtype=np.int64)
+        for old_id, doc in enumerate(self.documents):
+            if doc["filename"] in current and doc["filename"] not in changed_set:
+                doc_map[old_id] = len(kept)
+                kept.append(doc)
+                kept_ids.append(old_id)
+
+        term_ptr = self._arrays["term_ptr"]
+        old_terms = np.repeat(np.arange(len(self.vocab), dtype=np.int64), np.diff(term_ptr))
+        old_docs = doc_map[np.asarray(self._arrays["post_docs"], dtype=np.int64)]
+        keep_mask = old_docs >= 0
+
+        terms_parts = [old_terms[keep_mask]]
+        docs_parts = [old_docs[keep_mask]]
+        tfs_parts = [np.asarray(self._arrays["post_tfs"], dtype=np.int64)[keep_mask]]
+
+        vocab = list(self.vocab)
+        term_ids = dict(self._term_ids)
+        documents = [dict(doc) for doc in kept]
+        texts = [self._texts[doc["text_offset"]:doc["text_offset"] + doc["text_bytes"]] for doc in kept]
+        signatures = [np.asarray(self._arrays["signatures"])[kept_ids]]
+
+        for filename in sorted(changed):
+            file_path = os.path.join(self.corpus_dir, filename)
+            try:
+                content = read_corpus_file(file_path)
+            except Exception as e:
+                log.error("Error reading corpus file", filename=filename, error=str(e))
+                continue
+
+            tokens = tokenize(content)
+            counts = Counter(tokens)
+            signatures.append(self.minhasher.signature(tokens)[None, :])
+            doc_terms = np.empty(len(counts), dtype=np.int64)
+            doc_tfs = np.empty(len(counts), dtype=np.int64)
+            for i, (term, tf) in enumerate(counts.items()):
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    term_id = term_ids[term] = len(vocab)
+                    vocab.append(term)
+                doc_terms[i] = term_id
+                doc_tfs[i] = tf
+
+            terms_parts.append(doc_terms)
+            docs_parts.append(np.full(len(counts), len(documents), dtype=np.int64))
+            tfs_parts.append(doc_tfs)
+
+            encoded = content.encode("utf-8")
+            texts.append(encoded)
+            mtime_ns, size = current[filename]
+            documents.append({
+                "filename": filename,
+                "mtime_ns": mtime_ns,
+                "size": size,
+                "length": len(content),
+            })
+
+        terms = np.concatenate(terms_parts)
+        docs = np.concatenate(docs_parts)
+        tfs = np.concatenate(tfs_parts)
+
+        # Drop terms that no longer occur anywhere and renumber the rest
+        used_terms, terms = np.unique(terms, return_inverse=True)
+        vocab = [vocab[t] for t in used_terms]
+
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+        new_term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocab)), out=new_term_ptr[1:])
+
+        # Per-document norms over non-stopword terms, as FileSimilarity uses
+        stops = get_pipeline().stopwords
+        is_stop = np.fromiter((term in stops for term in vocab), dtype=bool, count=len(vocab))
+        weights = np.where(is_stop[terms], 0, tfs * tfs).astype(np.float64)
+        norms = np.sqrt(np.bincount(docs, weights=weights, minlength=len(documents)))
+
+        offset = 0
+        for doc, encoded, norm in zip(documents, texts, norms):
+            doc["text_offset"] = offset
+            doc["text_bytes"] = len(encoded)
+            doc["norm"] = float(norm)
+            offset += len(encoded)
+
+        self._write_generation(
+            documents,
+            vocab,
+            {
+                "term_ptr": new_term_ptr,
+                "post_docs": docs.astype(np.int32),
+                "post_tfs": tfs.astype(np.int32),
+                "signatures": np.concatenate(signatures).astype(np.uint32),
+            },
+            texts,
+        )
+        self._load()
+        log.info("Corpus index updated", documents=len(documents), terms=len(vocab))
+
+    def _write_generation(self, documents: List[Dict[str, Any]], vocab: List[str],
+                          arrays: Dict[str, np.ndarray], texts: List[bytes]) -> None:
+        """Write index files under a fresh generation id and switch the manifest to it"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        generation = uuid.uuid4().hex[:12]
+
+        for name, array in arrays.items():
+            np.save(self._generation_path(generation, f"{name}.npy"), array)
+        with open(self._generation_path(generation, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(vocab, f)
+        with open(self._generation_path(generation, "texts.bin"), "wb") as f:
+            for encoded in texts:
+                f.write(encoded)
+
+        manifest = {
+            "format": INDEX_FORMAT,
+            "generation": generation,
+            "minhash": self.lsh_config.signature_params(),
+            "text_pipeline": get_pipeline().config.to_dict(),
+            "documents": documents,
+        }
+        manifest_path = os.path.join(self.index_dir, MANIFEST_FILE)
+        tmp_path = f"{manifest_path}.{generation}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+        # Remove files of older generations; open memory maps stay valid on POSIX
+        for filename in os.listdir(self.index_dir):
+            if filename == MANIFEST_FILE or filename.startswith(generation + "."):
+                continue
+            try:
+                os.remove(os.path.join(self.index_dir, filename))
+            except OSError:
+                pass
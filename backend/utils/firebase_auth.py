@@ -2,13 +2,17 @@ import firebase_admin
 from firebase_admin import credentials, auth, firestore
 from fastapi import HTTPException, Depends, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional
+from typing import Any, Dict, Optional
 import os
 from dotenv import load_dotenv
 import time
+from utils.auth_cache import get_auth_cache
+from utils.log import get_logger
 
 load_dotenv()
 
+log = get_logger(__name__)
+
 # Initialize Firebase Admin SDK
 # For development, you can use a service account key file
 # For production, use environment variables or Google Cloud default credentials
@@ -16,20 +20,20 @@ try:
     # Try to initialize with service account key file
     service_account_path = os.getenv('FIREBASE_SERVICE_ACCOUNT_PATH', '../firebase-service-account.json')
     if service_account_path and os.path.exists(service_account_path):
-        print(f"Initializing Firebase with service account: {service_account_path}")
+        log.info("Initializing Firebase with service account", path=service_account_path)
         cred = credentials.Certificate(service_account_path)
         firebase_admin.initialize_app(cred)
     else:
         # Try to initialize with default credentials (for production)
-        print("Service account file not found, trying default credentials")
+        log.info("Service account file not found, trying default credentials")
         firebase_admin.initialize_app()
 except ValueError:
     # App already initialized
-    print("Firebase app already initialized")
+    log.debug("Firebase app already initialized")
     pass
 except Exception as e:
-    print(f"Warning: Firebase Admin SDK initialization failed: {e}")
-    print("Using mock authentication for development...")
+    log.warning("Firebase Admin SDK initialization failed, using mock authentication for development",
+                error=str(e))
     # Create a mock app for development
     try:
         firebase_admin.initialize_app()
@@ -42,6 +46,43 @@ db = firestore.client()
 # Security scheme for JWT tokens
 security = HTTPBearer()
 
+def verify_id_token(token: str) -> dict:
+    """
+    Verify a Firebase ID token, reusing the claims of tokens verified before
+
+    The SDK keeps Google's signing certificates for as long as their
+    Cache-Control headers allow, so a miss costs a signature check rather
+    than a certificate download.
+    """
+    return get_auth_cache().verify(token, auth.verify_id_token)
+
+def load_user_profile(uid: str) -> Optional[Dict[str, Any]]:
+    """
+    Read a user's profile from Firestore
+
+    Returns:
+        Profile data with its uid, or None if the user does not exist
+    """
+    user_doc = db.collection('users').document(uid).get()
+    if not user_doc.exists:
+        return None
+    user_data = user_doc.to_dict()
+    user_data['uid'] = uid
+    return user_data
+
+def get_user_profile(uid: str) -> Optional[Dict[str, Any]]:
+    """
+    Get a user's profile, reading Firestore only if it is not cached
+    """
+    return get_auth_cache().profile(uid, load_user_profile)
+
+def set_user_role(uid: str, role: str) -> None:
+    """
+    Change a user's role and drop their cached profile and tokens
+    """
+    db.collection('users').document(uid).update({'role': role})
+    get_auth_cache().invalidate_user(uid)
+
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """
     Verify Firebase ID token and return user information
@@ -50,17 +91,16 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
     
     # For development, if token is "mock_token_for_development", use mock auth
     if token == "mock_token_for_development":
-        print("Using mock token for development")
+        log.debug("Using mock token for development", sample=True)
         return mock_verify_token(token)
         
     try:
         # Verify the ID token
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = verify_id_token(token)
         return decoded_token
     except Exception as e:
         # For development, if Firebase auth fails, use mock authentication
-        print(f"Firebase auth failed: {e}")
-        print("Using mock authentication for development...")
+        log.warning("Firebase auth failed, using mock authentication for development", error=str(e))
         return mock_verify_token(token)
 
 def mock_verify_token(token: str) -> dict:
@@ -108,19 +148,17 @@ async def get_current_user(token_data: dict = Depends(verify_token)) -> dict:
         
         # Try to get user from Firestore
         try:
-            user_doc = db.collection('users').document(uid).get()
+            user_data = get_user_profile(uid)
             
-            if not user_doc.exists:
+            if user_data is None:
                 raise HTTPException(
                     status_code=404,
                     detail="User not found in database"
                 )
             
-            user_data = user_doc.to_dict()
-            user_data['uid'] = uid
             return user_data
         except Exception as e:
-            print(f"Firestore error: {e}")
+            log.error("Firestore error", uid=uid, error=str(e))
             # Fallback to mock data
             return {
                 "uid": uid,
@@ -182,7 +220,7 @@ async def get_optional_user(authorization: Optional[str] = Header(None)) -> Opti
         
         # For development, if token is "mock_token_for_development", use mock auth
         if token == "mock_token_for_development":
-            print("Using mock token for development in optional auth")
+            log.debug("Using mock token for development in optional auth", sample=True)
             return {
                 "uid": "mock_user_id",
                 "email": "student@example.com",
@@ -191,18 +229,16 @@ async def get_optional_user(authorization: Optional[str] = Header(None)) -> Opti
                 "createdAt": "2024-01-01T00:00:00Z"
             }
             
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = verify_id_token(token)
         uid = decoded_token['uid']
         
         try:
-            user_doc = db.collection('users').document(uid).get()
+            user_data = get_user_profile(uid)
             
-            if user_doc.exists:
-                user_data = user_doc.to_dict()
-                user_data['uid'] = uid
+            if user_data is not None:
                 return user_data
         except Exception as e:
-            print(f"Firestore error in optional auth: {e}")
+            log.error("Firestore error in optional auth", uid=uid, error=str(e))
             # Return basic user data from token
             return {
                 "uid": uid,
@@ -214,5 +250,5 @@ async def get_optional_user(authorization: Optional[str] = Header(None)) -> Opti
             
         return None
     except Exception as e:
-        print(f"Optional auth error: {e}")
+        log.warning("Optional auth error", error=str(e))
         return None 
\ No newline at end of file
@@ -0,0 +1,260 @@
+import os
+import json
+import sqlite3
+import time
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.blob_store import BlobStore
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# (id, title, summary, plagiarism_score, timestamp)
+HistoryEntry = Tuple[str, str, str, Any, str]
+
+# Blob store objects are re-read this many seconds back, in case another
+# process committed an object stamped just before the previous refresh
+BLOB_RESCAN_OVERLAP = 5.0
+
+# Modification times are coarse on some filesystems: a change in the same tick
+# as a scan keeps the mtime, so a recent mtime is never trusted as up to date
+MTIME_SETTLE_SECONDS = 1.0
+
+# Rows read per query when iterating over all entries
+_PAGE_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    source TEXT NOT NULL,
+    title TEXT,
+    summary TEXT,
+    plagiarism_score,
+    timestamp TEXT
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+
+def _path_signature(*paths: str) -> List[Optional[int]]:
+    """Modification times of paths (None for missing ones), to detect changes"""
+    signature = []
+    for path in paths:
+        try:
+            signature.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            signature.append(None)
+    return signature
+
+
+def _settled(signature: List[Optional[int]]) -> bool:
+    """Whether no path of a signature changed recently enough to change again unnoticed"""
+    horizon = time.time_ns() - int(MTIME_SETTLE_SECONDS * 1e9)
+    return all(mtime is None or mtime < horizon for mtime in signature)
+
+
+class HistoryIndex:
+    """
+    Compact index of previously checked documents in the mock IPFS folder
+
+    Covers the legacy one-JSON-file-per-upload documents and the documents of
+    the blob store (``<directory>/store``). Only listing fields are indexed;
+    the index lives in SQLite next to the documents and is updated
+    incrementally, so each document body is parsed once, when it first
+    appears, and otherwise read on demand with document(). Entries are read
+    from SQLite on every call rather than held in memory, so opening the
+    index costs the same at any history size.
+    """
+
+    def __init__(self, directory: str, index_path: Optional[str] = None, store_dir: Optional[str] = None):
+        """
+        Args:
+            directory: Folder of the legacy ``<cid>.json`` documents
+            index_path: SQLite index file (default: history_index.sqlite in directory)
+            store_dir: Blob store folder (default: store in directory)
+        """
+        self.directory = directory
+        self.index_path = index_path or os.path.join(directory, "history_index.sqlite")
+        self.store_dir = store_dir or os.path.join(directory, "store")
+        self._store_index = os.path.join(self.store_dir, "index.sqlite")
+        self._lock = threading.Lock()
+        self._db = None
+        self._store = None
+        self._signature = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+            self._db = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def _blob_store(self) -> Optional[BlobStore]:
+        if self._store is None and os.path.exists(self._store_index):
+            self._store = BlobStore(self.store_dir)
+        return self._store
+
+    def _get_state(self, key: str, default: Any = None) -> Any:
+        row = self._db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_state(self, key: str, value: Any) -> None:
+        self._db.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def _sync_legacy(self) -> Tuple[int, int]:
+        """Index new legacy files and drop removed ones; returns (added, removed)"""
+        signature = _path_signature(self.directory)[0]
+        if signature is None or signature == self._get_state("legacy_mtime"):
+            return 0, 0
+
+        # Files are write-once, so only the listing needs comparing
+        on_disk = {name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json")}
+        indexed = {row[0] for row in self._db.execute("SELECT id FROM entries WHERE source = 'file'")}
+
+        added = []
+        for doc_id in sorted(on_disk - indexed):
+            try:
+                with open(os.path.join(self.directory, f"{doc_id}.json"), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                log.error("Error loading mock document", doc_id=doc_id, error=str(e))
+                continue
+            added.append((doc_id, "file", data.get('title', 'Untitled Document'), data.get('summary', ''),
+                          data.get('plagiarism_score', 0.0), data.get('timestamp', '')))
+        removed = [(doc_id,) for doc_id in indexed - on_disk]
+
+        self._db.executemany(
+            "INSERT OR IGNORE INTO entries (id, source, title, summary, plagiarism_score, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?)", added
+        )
+        self._db.executemany("DELETE FROM entries WHERE id = ? AND source = 'file'", removed)
+        if _settled([signature]):
+            self._set_state("legacy_mtime", signature)
+        return len(added), len(removed)
+
+    def _sync_blob_store(self) -> int:
+        """Index documents stored in the blob store since the last sync; returns the number added"""
+        store = self._blob_store()
+        if store is None:
+            return 0
+
+        since = self._get_state("blob_since", 0.0)
+        latest = since
+        added = 0
+        for cid, created_at, fields in store.iter_metadata(max(0.0, since - BLOB_RESCAN_OVERLAP)):
+            latest = max(latest, created_at)
+            # Objects without index fields are file contents, not documents
+            if not fields:
+                continue
+            added += self._db.execute(
+                "INSERT OR IGNORE INTO entries (id, source, title, summary, plagiarism_score, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cid, "blob", fields.get('title', 'Untitled Document'), fields.get('summary', ''),
+                 fields.get('plagiarism_score', 0.0), fields.get('timestamp', ''))
+            ).rowcount
+        self._set_state("blob_since", latest)
+        return added
+
+    def refresh(self) -> int:
+        """
+        Bring the index up to date with the folder
+
+        Cheap when nothing changed: a stat of the folder and of the blob
+        store index decides whether anything needs to be read.
+
+        Returns:
+            Number of entries added or removed
+        """
+        with self._lock:
+            signature = _path_signature(self.directory, self._store_index, self._store_index + "-wal")
+            if signature == self._signature and self._db is not None:
+                return 0
+
+            db = self._connect()
+            with db:
+                added, removed = self._sync_legacy()
+                added += self._sync_blob_store()
+            self._signature = signature if _settled(signature) else None
+            return added + removed
+
+    def entries(self) -> Iterator[HistoryEntry]:
+        """
+        Yields:
+            Listing fields of every indexed document, oldest first
+        """
+        self.refresh()
+        seq = 0
+        while True:
+            rows, seq = self._read_since(seq, _PAGE_SIZE)
+            yield from rows
+            if len(rows) < _PAGE_SIZE:
+                return
+
+    def entries_since(self, seq: int) -> Tuple[List[HistoryEntry], int]:
+        """
+        Entries indexed after a sequence number, e.g. ones not yet processed
+
+        Sequence numbers come from the shared index, so they mean the same in
+        every process, unlike positions in entries().
+
+        Args:
+            seq: Sequence number returned by an earlier call (0 for all entries)
+
+        Returns:
+            Tuple of (entries oldest first, sequence number of the last one or seq)
+        """
+        self.refresh()
+        return self._read_since(seq)
+
+    def _read_since(self, seq: int, limit: int = -1) -> Tuple[List[HistoryEntry], int]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT seq, id, title, summary, plagiarism_score, timestamp FROM entries "
+                "WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+            ).fetchall()
+        if rows:
+            seq = rows[-1][0]
+        return [tuple(row[1:]) for row in rows], seq
+
+    def _source(self, doc_id: str) -> Optional[str]:
+        self.refresh()
+        with self._lock:
+            row = self._connect().execute("SELECT source FROM entries WHERE id = ?", (doc_id,)).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self._source(doc_id) is not None
+
+    def document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a document's full stored metadata, including its text
+
+        Args:
+            doc_id: Entry id (the document's CID)
+
+        Returns:
+            The stored document, or None if it is not indexed
+        """
+        source = self._source(doc_id)
+        if source == "file":
+            with open(os.path.join(self.directory, f"{doc_id}.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        if source == "blob":
+            return self._blob_store().get_json(doc_id)
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            if self._store is not None:
+                self._store.close()
+                self._store = None
+            self._signature = None
@@ -1,10 +1,11 @@
 import os
-import json
-import time
-import uuid
-import hashlib
+import threading
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
+from utils.blob_store import BlobStore
+from utils.log import get_logger
+
+log = get_logger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -12,9 +13,47 @@ load_dotenv()
 # Get NFT.Storage API key from environment (will be None since we're not using it)
 NFT_STORAGE_API_KEY = os.getenv("NFT_STORAGE_API_KEY")
 
+# Local content-addressed store standing in for IPFS
+IPFS_STORE_DIR = os.getenv("IPFS_STORE_DIR", os.path.join("ipfs_mock", "store"))
+IPFS_STORE_COMPRESSION = os.getenv("IPFS_STORE_COMPRESSION", "auto")
+
+_blob_store = None
+_blob_store_pid = None
+_blob_store_lock = threading.Lock()
+
+def get_blob_store() -> BlobStore:
+    """
+    Get the shared local blob store, opening it on first use in each process
+    """
+    global _blob_store, _blob_store_pid
+    
+    with _blob_store_lock:
+        # A forked worker must not share the parent's SQLite connection
+        if _blob_store is None or _blob_store_pid != os.getpid():
+            compression = None if IPFS_STORE_COMPRESSION == "none" else IPFS_STORE_COMPRESSION
+            _blob_store = BlobStore(IPFS_STORE_DIR, compression=compression)
+            _blob_store_pid = os.getpid()
+        return _blob_store
+
+def index_fields(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Small fields of a document's metadata kept in the store index for listings
+    """
+    analysis = metadata.get("plagiarism_analysis") or {}
+    return {
+        "title": metadata.get("title", "Untitled Document"),
+        "summary": metadata.get("summary", ""),
+        "plagiarism_score": metadata.get("plagiarism_score", analysis.get("overall_score", 0.0)),
+        "timestamp": metadata.get("timestamp", ""),
+        "content_cid": metadata.get("content_cid")
+    }
+
 def upload_to_ipfs(file_path: Optional[str], metadata: Dict[str, Any], text_content: Optional[str] = None) -> str:
     """
-    Mock IPFS upload function that generates a deterministic CID
+    Store a document in the local content-addressed store
+    
+    The CID is derived from the content only, so identical uploads are
+    stored once, and near-identical ones share most of their chunks.
     
     Args:
         file_path: Path to the file to upload (optional if text_content is provided)
@@ -24,38 +63,35 @@ def upload_to_ipfs(file_path: Optional[str], metadata: Dict[str, Any], text_cont
     Returns:
         IPFS CID (Content Identifier)
     """
-    # Generate a mock CID based on content and metadata
-    timestamp = int(time.time())
-    
-    # Create a unique hash based on content and metadata
-    content_hash = ""
+    store = get_blob_store()
+    record = dict(metadata)
     
-    if text_content:
-        # Use text content for hash
-        content_hash = hashlib.sha256(text_content.encode()).hexdigest()[:16]
-    elif file_path and os.path.exists(file_path):
-        # Use file content for hash
-        filename = os.path.basename(file_path)
-        try:
-            with open(file_path, "rb") as f:
-                file_content = f.read(1024)  # Read first 1KB for the hash
-                content_hash = hashlib.sha256(file_content).hexdigest()[:16]
-        except Exception:
-            content_hash = hashlib.sha256(filename.encode()).hexdigest()[:16]
-    else:
-        # Use metadata for hash
-        content_hash = hashlib.sha256(json.dumps(metadata, sort_keys=True).encode()).hexdigest()[:16]
+    if file_path and os.path.exists(file_path):
+        # Store the original file next to its metadata
+        with open(file_path, "rb") as f:
+            record["content_cid"] = store.put(f.read())
+    elif text_content and text_content != metadata.get("text"):
+        record["content_cid"] = store.put(text_content.encode("utf-8"))
     
-    # Create a mock CID
-    mock_cid = f"bafybeih{content_hash}{timestamp}"
+    cid = store.put_json(record, metadata=index_fields(record))
     
-    # Store metadata in a local file for reference
-    os.makedirs("ipfs_mock", exist_ok=True)
-    with open(f"ipfs_mock/{mock_cid}.json", "w") as f:
-        json.dump(metadata, f, indent=2)
+    log.info("Mock IPFS upload successful", cid=cid)
+    return cid
+
+def get_from_ipfs(cid: str) -> Dict[str, Any]:
+    """
+    Read a document's metadata from the local store
     
-    print(f"Mock IPFS upload successful. CID: {mock_cid}")
-    return mock_cid
+    Args:
+        cid: CID returned by upload_to_ipfs
+        
+    Returns:
+        The stored metadata
+        
+    Raises:
+        KeyError: If the CID is not stored
+    """
+    return get_blob_store().get_json(cid)
 
 def get_ipfs_url(cid: str) -> str:
     """
@@ -0,0 +1,482 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from utils.metrics import get_registry, run_recorded
+from utils.storage import create_storage
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Where job state is shared between server worker processes: "sqlite", or
+# "memory" to keep jobs visible only to the worker that accepted them
+JOB_STORE = os.getenv("JOB_STORE", "sqlite")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join("data", "jobs.sqlite"))
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    """State of one submitted job"""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        # {"done": n, "total": m} for jobs made of several tasks
+        self.progress: Optional[Dict[str, int]] = None
+        # Incremented on every state change so watchers can tell when to report
+        self.revision = 0
+        self._done = threading.Event()
+        # Called after every state change, e.g. to share it with other workers
+        self._on_change: Optional[Callable[["Job"], None]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def _set(self, **fields) -> None:
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.revision += 1
+        if self.finished:
+            self._done.set()
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the job has finished
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Whether the job finished in time
+        """
+        return self._done.wait(timeout)
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.progress is not None:
+            data["progress"] = dict(self.progress)
+        if self.status == FAILED:
+            data["error"] = self.error
+        if include_result and self.status == SUCCEEDED:
+            data["result"] = self.result
+        return data
+
+    def to_record(self) -> Dict[str, Any]:
+        """The job's state as stored in a job store"""
+        return {**self.to_dict(), "revision": self.revision}
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "Job":
+        """
+        Snapshot of a job run by another worker process, from its stored state
+
+        The snapshot does not change; look the job up again for its progress.
+        """
+        job = cls(record["kind"])
+        job.id = record["job_id"]
+        job.status = record["status"]
+        job.created_at = record["created_at"]
+        job.started_at = record["started_at"]
+        job.finished_at = record["finished_at"]
+        job.result = record.get("result")
+        job.error = record.get("error")
+        job.progress = record.get("progress")
+        job.revision = record["revision"]
+        if job.finished:
+            job._done.set()
+        return job
+
+
+class LocalBackend:
+    """Runs jobs on threads of the current process; used for tests and offline development"""
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self.executor: Executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait)
+
+
+class ProcessPoolBackend(LocalBackend):
+    """
+    Runs jobs on a pool of worker processes so CPU-bound scoring and model
+    inference do not hold the server's GIL
+
+    Job functions and their arguments and results must be picklable.
+    """
+
+    def __init__(self, workers: Optional[int] = None, start_method: str = "spawn",
+                 initializer: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            workers: Number of worker processes (default: CPU count)
+            start_method: multiprocessing start method
+            initializer: Picklable function run once in each worker, e.g. to preload models
+        """
+        self.workers = workers or os.cpu_count() or 1
+        # Spawned workers do not inherit the server's threads and locks
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=initializer,
+        )
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        # Metrics recorded in the worker are merged into this process's
+        # registry, so its /metrics covers queued analyses too
+        recorded = self.executor.submit(run_recorded, fn, *args, **kwargs)
+        future = Future()
+
+        def unwrap(done: Future) -> None:
+            if done.cancelled():
+                future.cancel()
+                return
+            error = done.exception()
+            if error is not None:
+                future.set_exception(error)
+                return
+            result, snapshot = done.result()
+            get_registry().merge(snapshot)
+            future.set_result(result)
+
+        recorded.add_done_callback(unwrap)
+        return future
+
+
+class JobQueue:
+    """
+    In-process job queue with bounded concurrency and backpressure
+
+    Jobs are handed to the backend only when one of its workers is free, so
+    a job's status is accurate whichever backend runs it. A job may consist
+    of several tasks (submit_map) that share the workers with other jobs'
+    tasks. At most
+    ``max_pending`` jobs may be queued or running at once; further
+    submissions raise QueueFullError instead of growing the backlog. The
+    most recent ``max_finished`` finished jobs are kept for status queries.
+
+    Jobs run in the process that accepted them. With a ``store`` shared by
+    several server worker processes, every state change is also written to
+    it, so a status query or event stream reaching any worker finds the job.
+    """
+
+    def __init__(self, backend=None, max_pending: int = 32, max_finished: int = 1000, store=None):
+        """
+        Args:
+            backend: Executes jobs (default: LocalBackend())
+            max_pending: Maximum number of unfinished jobs of this queue
+            max_finished: Number of finished jobs kept for status queries
+            store: Job store shared with other processes, e.g. a SQLiteStorage
+                (default: jobs are only known to this queue)
+        """
+        self.backend = backend or LocalBackend()
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.store = store
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._waiting = deque()
+        self._running = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, kind: str, fn: Callable, *args, **kwargs) -> Job:
+        """
+        Submit a job
+
+        Args:
+            kind: Name of the job type, reported in its status
+            fn: Function to run; must be picklable for process backends
+            *args, **kwargs: Arguments passed to fn
+
+        Returns:
+            The queued Job
+
+        Raises:
+            QueueFullError: If max_pending jobs are already unfinished
+        """
+        job = self._add_job(kind)
+        with self._lock:
+            self._waiting.append((job, fn, args, kwargs, partial(self._complete, job)))
+        self._dispatch()
+        return job
+
+    def submit_map(self, kind: str, fn: Callable, items: Iterable[Any],
+                   reduce: Optional[Callable] = None, *reduce_args) -> Job:
+        """
+        Submit a job made of one call of fn per item, run in parallel
+
+        The job's progress counts the calls that have returned. Once all have,
+        ``reduce(results, *reduce_args)`` runs on the backend too, with the
+        results in item order, and gives the job's result (default: the list
+        of results). A failing call fails the job and drops its waiting calls.
+
+        Args:
+            kind: Name of the job type, reported in its status
+            fn: Function called with each item; must be picklable for process backends
+            items: Arguments of the calls
+            reduce: Combines the results; must be picklable for process backends
+            *reduce_args: Further arguments passed to reduce
+
+        Returns:
+            The queued Job
+
+        Raises:
+            QueueFullError: If max_pending jobs are already unfinished
+        """
+        items = list(items)
+        job = self._add_job(kind)
+        job._set(progress={"done": 0, "total": len(items)})
+        results: List[Any] = [None] * len(items)
+
+        def finish_map() -> None:
+            if reduce is None:
+                self._complete(job, _resolved(results))
+            else:
+                with self._lock:
+                    # Ahead of other waiting tasks: everything else of this job is done
+                    self._waiting.appendleft((job, reduce, (results,) + reduce_args, {}, partial(self._complete, job)))
+
+        def item_done(index: int, future: Future) -> None:
+            if job.finished:
+                return
+            if future.exception() is not None:
+                self._complete(job, future)
+                return
+            results[index] = future.result()
+            with self._lock:
+                done = job.progress["done"] + 1
+                job._set(progress={"done": done, "total": len(items)})
+            if done == len(items):
+                finish_map()
+
+        with self._lock:
+            for index, item in enumerate(items):
+                self._waiting.append((job, fn, (item,), {}, partial(item_done, index)))
+        if not items:
+            finish_map()
+        self._dispatch()
+        return job
+
+    def _add_job(self, kind: str) -> Job:
+        """Register a new job, enforcing max_pending"""
+        job = Job(kind)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({self.max_pending} jobs pending)")
+            self._pending += 1
+            self._jobs[job.id] = job
+            self._evict_finished()
+        if self.store is not None:
+            # Visible to every worker before its id is returned to the client
+            self._persist(job, wait=True)
+            job._on_change = self._persist
+            self.store.prune_jobs(self.max_finished)
+        return job
+
+    def _persist(self, job: Job, wait: bool = False) -> None:
+        """Write a job's state to the store; called on every change, often under the lock"""
+        try:
+            self.store.put_job(job.to_record(), wait=wait)
+        except Exception as e:
+            # The job still runs and is reported by this worker
+            log.error("Could not store job state", job_id=job.id, status=job.status, error=str(e))
+
+    def _dispatch(self) -> None:
+        """Hand waiting tasks to the backend while it has free workers"""
+        while True:
+            with self._lock:
+                if not self._waiting or self._running >= self.backend.workers:
+                    return
+                job, fn, args, kwargs, on_done = self._waiting.popleft()
+                if job.finished:
+                    # A task of a job that has already failed
+                    continue
+                self._running += 1
+
+            if job.status == QUEUED:
+                job._set(status=RUNNING, started_at=time.time())
+            try:
+                future = self.backend.submit(fn, *args, **kwargs)
+            except Exception as e:
+                # The backend is broken or shut down; fail the job rather than lose it
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(partial(self._task_done, on_done))
+
+    def _task_done(self, on_done: Callable[[Future], None], future: Future) -> None:
+        with self._lock:
+            self._running -= 1
+        on_done(future)
+        self._dispatch()
+
+    def _complete(self, job: Job, future: Future) -> None:
+        """Finish a job with the outcome of its last task"""
+        error = future.exception()
+        with self._lock:
+            if job.finished:
+                return
+            if error is not None:
+                job._set(status=FAILED, error=str(error) or type(error).__name__, finished_at=time.time())
+            else:
+                job._set(status=SUCCEEDED, result=future.result(), finished_at=time.time())
+            self._pending -= 1
+            if not self._pending:
+                self._idle.notify_all()
+
+    def _evict_finished(self) -> None:
+        finished = sum(1 for job in self._jobs.values() if job.finished)
+        for job_id in list(self._jobs):
+            if finished <= self.max_finished:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+                finished -= 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Find a job of this queue, or a snapshot of one another worker stored
+
+        Returns:
+            Job, or None if no queue sharing the store knows it
+        """
+        job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            record = self.store.get_job(job_id)
+            if record is not None:
+                job = Job.from_record(record)
+        return job
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "workers": self.backend.workers,
+            "running": self._running,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "tracked": len(self._jobs),
+        }
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for every queued and running job to finish
+
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            True if the queue is empty, False if the timeout expired first
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.backend.shutdown(wait=wait)
+
+
+def _resolved(result: Any) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def create_backend(name: str, workers: Optional[int] = None, initializer: Optional[Callable[[], None]] = None):
+    """
+    Create a job backend by name
+
+    Args:
+        name: "process" or "local"
+        workers: Number of workers (default: backend specific)
+        initializer: Run once in each worker process (process backend only)
+
+    Returns:
+        Backend instance
+    """
+    if name == "process":
+        return ProcessPoolBackend(workers, initializer=initializer)
+    if name == "local":
+        return LocalBackend(workers or 2)
+    raise ValueError(f"Unknown job backend: {name}")
+
+
+def get_job_queue(initializer: Optional[Callable[[], None]] = None) -> JobQueue:
+    """
+    Get the shared job queue, configured from JOB_BACKEND, JOB_WORKERS, JOB_MAX_PENDING and JOB_STORE
+
+    Args:
+        initializer: Worker initializer, used when this call creates the queue
+
+    Returns:
+        The process-wide JobQueue
+    """
+    global _job_queue
+
+    with _job_queue_lock:
+        if _job_queue is None:
+            workers = int(os.getenv("JOB_WORKERS", "0")) or None
+            backend = create_backend(os.getenv("JOB_BACKEND", "process"), workers, initializer)
+            _job_queue = JobQueue(backend, max_pending=int(os.getenv("JOB_MAX_PENDING", "32")),
+                                  store=create_storage(JOB_STORE, JOB_STORE_PATH))
+        return _job_queue
+
+
+def shutdown_job_queue(drain_timeout: float = 0.0) -> None:
+    """
+    Stop the shared job queue's workers
+
+    Args:
+        drain_timeout: Seconds to let queued and running jobs finish first
+    """
+    global _job_queue
+
+    with _job_queue_lock:
+        if _job_queue is not None:
+            if drain_timeout > 0 and not _job_queue.drain(drain_timeout):
+                log.warning("Job queue shut down with unfinished jobs", pending=_job_queue.pending, drain_timeout=drain_timeout)
+            _job_queue.shutdown(wait=False)
+            _job_queue = None
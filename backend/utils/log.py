@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import queue
+import random
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Union
+
+# Lowest level written: DEBUG, INFO, WARNING, ERROR
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# "text" (message followed by key=value fields) or "json" (one object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Records waiting to be written; when full, new records are dropped rather than blocking
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Longest message or field value written; the rest is replaced by a marker
+LOG_MAX_CHARS = int(os.getenv("LOG_MAX_CHARS", "500"))
+
+# Share of hot-path messages (logged with sample=True) that are written
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+# Keyword arguments of logging calls that are not fields
+_RESERVED = {"exc_info", "stack_info", "stacklevel", "extra"}
+
+
+def truncate(value: Any, limit: int = LOG_MAX_CHARS) -> Any:
+    """
+    Snapshot a value for logging, shortening long ones
+
+    Numbers, booleans and None are kept; anything else is logged as a
+    string, so objects changed after the call do not change the record.
+    A callable is called first, so an expensive value such as a request
+    body (``body=request.get_data``) is only built for records that are
+    written.
+
+    Args:
+        value: Value to log, or a function returning it
+        limit: Characters kept
+
+    Returns:
+        The value, or its first ``limit`` characters and the number dropped
+    """
+    if callable(value):
+        value = value()
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="replace")
+    elif not isinstance(value, str):
+        value = str(value)
+    if len(value) > limit:
+        return f"{value[:limit]}...(+{len(value) - limit} chars)"
+    return value
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """
+    Logger taking structured fields as keyword arguments
+
+    ``log.info("Analysis complete", file_id=file_id, score=0.12)`` logs the
+    message with its fields. Long values are truncated here, in the calling
+    thread, so large request bodies never sit in the log queue.
+    ``sample=0.01`` logs only that share of the calls, deciding before any
+    formatting work, for messages on hot paths; ``sample=True`` uses
+    LOG_SAMPLE_RATE. Field values that are costly to compute can be passed
+    as functions, which are called only for records that are written.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        super().__init__(logger, {})
+
+    def log(self, level: int, msg: Any, *args, sample: Union[float, bool, None] = None, **kwargs) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        if sample is True:
+            sample = LOG_SAMPLE_RATE
+        if sample is not None and random.random() >= sample:
+            return
+        options = {key: kwargs.pop(key) for key in list(kwargs) if key in _RESERVED}
+        fields = {key: truncate(value) for key, value in kwargs.items()}
+        if sample is not None:
+            fields["sampled"] = sample
+        extra = options.pop("extra", None) or {}
+        options.setdefault("stacklevel", 3)
+        self.logger.log(level, truncate(str(msg)), *args, extra={**extra, "fields": fields}, **options)
+
+    def debug(self, msg: Any, *args, **kwargs) -> None:
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg: Any, *args, **kwargs) -> None:
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg: Any, *args, **kwargs) -> None:
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+    def error(self, msg: Any, *args, **kwargs) -> None:
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def exception(self, msg: Any, *args, **kwargs) -> None:
+        kwargs.setdefault("exc_info", True)
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+
+class TextFormatter(logging.Formatter):
+    """``time level logger message key=value ...``"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        timestamp = datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S")
+        line = f"{timestamp} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        for key, value in getattr(record, "fields", {}).items():
+            text = str(value)
+            if not text or any(c.isspace() or c in '"=' for c in text):
+                text = json.dumps(text)
+            line += f" {key}={text}"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the fields at the top level"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+            **getattr(record, "fields", {})
+        }
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is when the record is written, like print"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a background writer thread without ever blocking the caller
+
+    The writer thread is started on first use in each process, so a server
+    that forks workers after logging still gets a writer per worker. When
+    the queue is full, records are counted as dropped instead of waiting
+    for the output to catch up.
+    """
+
+    def __init__(self, output: logging.Handler, maxsize: int = LOG_QUEUE_SIZE, flush_timeout: float = 5.0):
+        """
+        Args:
+            output: Handler writing the records, run on the writer thread
+            maxsize: Records waiting to be written
+            flush_timeout: Longest wait for the queued records to be written on flush
+        """
+        super().__init__(queue.Queue(maxsize))
+        self.output = output
+        self.flush_timeout = flush_timeout
+        self.dropped = 0
+        self._writer: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def _write(self, records: queue.Queue) -> None:
+        while True:
+            record = records.get()
+            if record is None:
+                return
+            self.output.handle(record)
+
+    def _ensure_writer(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # A writer inherited through fork has no thread; records queued before the fork belong to the parent
+                self.queue = queue.Queue(self.queue.maxsize)
+                self._writer = threading.Thread(target=self._write, args=(self.queue,), name="log-writer",
+                                                daemon=True)
+                self._writer.start()
+                self._pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep formatting on the writer thread: only resolve what cannot cross threads
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._ensure_writer()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """
+        Write the queued records, waiting at most flush_timeout
+
+        Called by logging.shutdown at exit. The writer stops once the queue
+        is drained; the next record starts a new one.
+        """
+        with self._start_lock:
+            writer, records = self._writer, self.queue
+            if writer is None or self._pid != os.getpid():
+                return
+            self._writer = self._pid = None
+            self.queue = queue.Queue(records.maxsize)
+        try:
+            records.put(None, timeout=self.flush_timeout)
+            writer.join(self.flush_timeout)
+        except queue.Full:
+            pass
+        self.output.flush()
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None) -> NonBlockingQueueHandler:
+    """
+    Route the backend's loggers through the queue handler, once per process
+
+    Args:
+        level: Lowest level written
+        fmt: "text" or "json"
+        stream: Output stream (default: sys.stdout at the time of writing)
+
+    Returns:
+        The queue handler
+    """
+    global _handler
+
+    with _configure_lock:
+        if _handler is None:
+            output = logging.StreamHandler(stream) if stream is not None else StdoutHandler()
+            output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+            _handler = NonBlockingQueueHandler(output)
+            root = logging.getLogger("backend")
+            root.addHandler(_handler)
+            root.setLevel(level)
+            # Written once, by our handler, not again by the root logger's
+            root.propagate = False
+        return _handler
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """
+    Get a structured logger, configuring logging on first use
+
+    Args:
+        name: Logger name, usually the module's __name__
+
+    Returns:
+        StructuredLogger writing under ``backend.<name>``
+    """
+    configure_logging()
+    return StructuredLogger(logging.getLogger(f"backend.{name}"))
+
+
+def logging_stats() -> Dict[str, Any]:
+    """Queue depth and records dropped because the queue was full, in this process"""
+    if _handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
@@ -0,0 +1,488 @@
+import os
+import re
+import json
+import time
+import uuid
+import atexit
+import bisect
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Set to 0 to make timers and observations no-ops
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Latency buckets in seconds, from a cached lookup to a cold model load
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Size buckets (documents, characters), powers of ten
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000, 10000000)
+
+# Directory where each server worker writes its metrics, so /metrics reports
+# the sum over all workers (empty: each process reports only its own)
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+
+# Seconds between writes of a worker's metrics to METRICS_DIR
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "5"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_INVALID_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+# {metric name: {label values: series state}}, picklable
+Snapshot = Dict[str, Dict[Tuple[str, ...], Any]]
+
+
+def _format_labels(names: Iterable[str], values: Iterable[Any]) -> str:
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Timer:
+    """Context manager observing the seconds spent in its block"""
+
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: "Histogram", labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram._observe(time.perf_counter() - self.start, self.labels)
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopTimer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class Counter:
+    """Monotonic count, per combination of label values"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return [f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in series]
+
+    def drain(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def copy(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._series)
+
+    def empty(self) -> "Counter":
+        return Counter(self.name, self.description, self.labelnames)
+
+    def merge(self, series: Dict[Tuple[str, ...], float]) -> None:
+        with self._lock:
+            for key, value in series.items():
+                self._series[key] = self._series.get(key, 0) + value
+
+
+class Histogram:
+    """
+    Distribution of observed values over fixed buckets, per combination of label values
+
+    An observation costs a bisect and a locked increment, so histograms can
+    stay on in production.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Iterable[float] = LATENCY_BUCKETS,
+                 labelnames: Tuple[str, ...] = ()):
+        """
+        Args:
+            name: Metric name
+            description: Description shown by /metrics
+            buckets: Upper bounds of the buckets; +Inf is added
+            labelnames: Names of the labels observations are split by
+        """
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # Label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _observe(self, value: float, key: Tuple[str, ...]) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Record a value
+
+        Args:
+            value: Observed value
+            **labels: Value of each of the histogram's labels
+        """
+        if METRICS_ENABLED:
+            self._observe(value, self._key(labels))
+
+    def time(self, **labels):
+        """
+        Time a block: ``with histogram.time(stage="summary"): ...``
+
+        Args:
+            **labels: Value of each of the histogram's labels
+        """
+        if not METRICS_ENABLED:
+            return _NOOP_TIMER
+        return _Timer(self, self._key(labels))
+
+    def series(self, **labels) -> Tuple[List[int], float]:
+        """Per-bucket counts (last is +Inf) and sum of one series"""
+        with self._lock:
+            counts, total = self._series.get(self._key(labels), [[0] * (len(self.buckets) + 1), 0.0])
+            return list(counts), total
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+
+        lines = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        names = self.labelnames + ("le",)
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (bound,))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def drain(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def copy(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            return {key: [list(counts), total] for key, (counts, total) in self._series.items()}
+
+    def empty(self) -> "Histogram":
+        return Histogram(self.name, self.description, self.buckets, self.labelnames)
+
+    def merge(self, series: Dict[Tuple[str, ...], list]) -> None:
+        with self._lock:
+            for key, (counts, total) in series.items():
+                own = self._series.get(key)
+                if own is None:
+                    own = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+                own[0] = [a + b for a, b in zip(own[0], counts)]
+                own[1] += total
+
+
+class MetricsRegistry:
+    """
+    Metrics of one process, rendered in the Prometheus text format
+
+    Besides its own counters and histograms, the registry renders gauges
+    read from collectors: functions returning the stats dict of an existing
+    component (caches, the job queue) at scrape time.
+
+    Server workers behind one scrape target share their counters and
+    histograms through a directory (see share): every worker writes its
+    totals to its own file, and render sums the files of all workers, so
+    successive scrapes never go backwards whichever worker answers them.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Tuple[str, str, Callable[[], Dict[str, Any]]]] = []
+        self._lock = threading.Lock()
+        self._share_dir = ""
+        self._share_path = ""
+        self._share_pid = None
+        self._export_lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, description, labelnames))
+
+    def histogram(self, name: str, description: str, buckets: Iterable[float] = LATENCY_BUCKETS,
+                  labelnames: Tuple[str, ...] = ()) -> Histogram:
+        return self._register(Histogram(name, description, buckets, labelnames))
+
+    def register_collector(self, prefix: str, description: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Report the numeric fields of a stats dict as gauges named ``<prefix>_<field>``
+
+        Nested dicts are flattened with underscores; other values are skipped.
+        Registering a prefix again replaces its collector.
+
+        Args:
+            prefix: Metric name prefix
+            description: Description shown by /metrics
+            stats: Returns the current stats
+        """
+        with self._lock:
+            self._collectors = [c for c in self._collectors if c[0] != prefix]
+            self._collectors.append((prefix, description, stats))
+
+    @staticmethod
+    def _flatten(prefix: str, stats: Dict[str, Any]) -> Iterable[Tuple[str, float]]:
+        for key, value in stats.items():
+            name = f"{prefix}_{_INVALID_NAME.sub('_', str(key))}"
+            if isinstance(value, dict):
+                yield from MetricsRegistry._flatten(name, value)
+            elif isinstance(value, bool):
+                yield name, int(value)
+            elif isinstance(value, (int, float)):
+                yield name, value
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        gauge_labels = ""
+        if self._shared():
+            metrics = self._combined(metrics)
+            # Gauges describe the worker answering the scrape
+            gauge_labels = _format_labels(("pid",), (os.getpid(),))
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+
+        for prefix, description, stats in collectors:
+            try:
+                values = list(self._flatten(prefix, stats()))
+            except Exception as e:
+                log.error("Metrics collector failed", collector=prefix, error=str(e))
+                continue
+            for name, value in values:
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name}{gauge_labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def share(self, directory: str, interval: float = METRICS_EXPORT_INTERVAL) -> None:
+        """
+        Report counters and histograms summed over every process sharing a directory
+
+        Starts a thread writing this process's totals to its own file in the
+        directory every ``interval`` seconds and at exit. Call it in each
+        server worker after the fork; files of exited workers are kept, so
+        their counts stay in the sums.
+
+        Args:
+            directory: Directory shared by the workers
+            interval: Seconds between writes
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self._export_lock:
+            self._share_dir = directory
+            # Unique per process, so a worker reusing an old pid does not overwrite its totals
+            self._share_path = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+            self._share_pid = os.getpid()
+        self._export()
+        atexit.register(self._export)
+
+        def export_periodically():
+            while True:
+                time.sleep(interval)
+                self._export()
+
+        threading.Thread(target=export_periodically, name="metrics-export", daemon=True).start()
+
+    def _shared(self) -> bool:
+        return bool(self._share_dir) and self._share_pid == os.getpid()
+
+    def _export(self) -> None:
+        # Nothing to do in a forked child, or once the directory has been removed
+        if not self._shared() or not os.path.isdir(self._share_dir):
+            return
+        with self._lock:
+            metrics = list(self._metrics.values())
+        data = {metric.name: [[list(key), value] for key, value in metric.copy().items()] for metric in metrics}
+        with self._export_lock:
+            tmp_path = f"{self._share_path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self._share_path)
+            except OSError as e:
+                log.error("Error writing metrics", path=self._share_path, error=str(e))
+
+    def _combined(self, metrics: List[Any]) -> List[Any]:
+        # Write our totals first: what this scrape shows is then already on disk,
+        # so a later scrape answered by another worker never shows less
+        self._export()
+        combined = {metric.name: metric.empty() for metric in metrics}
+        for entry in os.scandir(self._share_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, series in data.items():
+                metric = combined.get(name)
+                if metric is not None:
+                    metric.merge({tuple(key): value for key, value in series})
+        return list(combined.values())
+
+    def drain(self) -> Snapshot:
+        """Take and reset the observations of every counter and histogram"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: series for metric in metrics if (series := metric.drain())}
+
+    def merge(self, snapshot: Snapshot) -> None:
+        """Add observations drained from another process's registry"""
+        for name, series in snapshot.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(series)
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "plagiarism_stage_seconds", "Seconds spent in each analysis pipeline stage", labelnames=("stage",)
+)
+ALGORITHM_SECONDS = REGISTRY.histogram(
+    "plagiarism_algorithm_seconds", "Seconds spent in each similarity algorithm", labelnames=("algorithm",)
+)
+CORPUS_DOCUMENTS = REGISTRY.histogram(
+    "plagiarism_corpus_documents", "Reference documents a submission was scored against", SIZE_BUCKETS
+)
+DOCUMENT_CHARACTERS = REGISTRY.histogram(
+    "plagiarism_document_characters", "Length of analyzed and uploaded documents in characters", SIZE_BUCKETS
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Seconds spent handling HTTP requests",
+    labelnames=("app", "method", "route", "status")
+)
+
+
+def stage(name: str):
+    """Time an analysis pipeline stage: ``with stage("summary"): ...``"""
+    return STAGE_SECONDS.time(stage=name)
+
+
+def algorithm(name: str):
+    """Time a similarity algorithm: ``with algorithm("fingerprint"): ...``"""
+    return ALGORITHM_SECONDS.time(algorithm=name)
+
+
+def run_recorded(fn: Callable, *args, **kwargs) -> Tuple[Any, Snapshot]:
+    """
+    Run a function in a worker process and return its result together with
+    the metrics it recorded, for the parent to merge
+
+    Args:
+        fn: Function to run
+        *args, **kwargs: Arguments passed to fn
+
+    Returns:
+        Tuple of (result, snapshot)
+    """
+    # Drop anything recorded outside a task, e.g. by the initializer
+    REGISTRY.drain()
+    result = fn(*args, **kwargs)
+    return result, REGISTRY.drain()
+
+
+def get_registry() -> MetricsRegistry:
+    """Get the process-wide metrics registry"""
+    return REGISTRY
+
+
+def remove_exited(directory: str) -> None:
+    """
+    Remove the metrics files of processes that are no longer running
+
+    Run by the server master at startup, so counts of a previous server run
+    do not accumulate forever; Prometheus reads the drop as one restart.
+
+    Args:
+        directory: Directory passed to MetricsRegistry.share
+    """
+    if not os.path.isdir(directory):
+        return
+    for entry in os.scandir(directory):
+        try:
+            pid = int(entry.name.split("-", 1)[0])
+        except ValueError:
+            continue
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+        except OSError:
+            # Running under another user
+            pass
@@ -0,0 +1,250 @@
+import os
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Any
+
+import numpy as np
+
+# Multiplier used to combine token hashes into shingle hashes
+_SHINGLE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+# Largest 32-bit value, used as the "empty" minhash
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+
+# Number of shingles hashed at once when computing a signature
+_SHINGLE_BLOCK = 4096
+
+
+@dataclass
+class LSHConfig:
+    """
+    Recall/precision knobs for MinHash candidate retrieval
+
+    ``bands * rows`` must not exceed ``num_perm``. Two documents with
+    Jaccard similarity ``s`` become candidates with probability
+    ``1 - (1 - s**rows)**bands``; more bands or fewer rows raise recall,
+    fewer bands or more rows raise precision.
+    """
+    num_perm: int = 128
+    shingle_size: int = 5
+    bands: int = 32
+    rows: int = 4
+    seed: int = 1
+    # Below this corpus size every document is scored exactly
+    min_corpus_size: int = 1000
+    # Keep at most this many candidates, ranked by estimated Jaccard similarity
+    max_candidates: int = 200
+
+    def __post_init__(self):
+        if self.bands < 1 or self.rows < 1:
+            raise ValueError(f"LSH bands ({self.bands}) and rows ({self.rows}) must be positive")
+        if self.bands * self.rows > self.num_perm:
+            raise ValueError(
+                f"LSH bands * rows ({self.bands} * {self.rows} = {self.bands * self.rows}) "
+                f"exceeds num_perm ({self.num_perm})"
+            )
+
+    @classmethod
+    def from_env(cls) -> "LSHConfig":
+        """
+        Build a config from LSH_* environment variables, falling back to defaults
+
+        Returns:
+            LSHConfig instance
+
+        Raises:
+            ValueError: If bands * rows exceeds num_perm
+        """
+        values = {}
+        for field in ("num_perm", "shingle_size", "bands", "rows", "seed", "min_corpus_size", "max_candidates"):
+            value = os.getenv(f"LSH_{field.upper()}")
+            if value:
+                values[field] = int(value)
+        return cls(**values)
+
+    @property
+    def threshold(self) -> float:
+        """Approximate Jaccard similarity at which the candidate probability is 50%"""
+        return (1.0 / self.bands) ** (1.0 / self.rows)
+
+    def signature_params(self) -> Dict[str, int]:
+        """Parameters that determine signature values; changing them needs new signatures"""
+        return {"num_perm": self.num_perm, "shingle_size": self.shingle_size, "seed": self.seed}
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) whose S-curve threshold is closest to the target
+
+    Args:
+        num_perm: Number of MinHash permutations available
+        threshold: Target Jaccard similarity
+
+    Returns:
+        Tuple of (bands, rows)
+    """
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    """MinHash signatures over hashed word shingles"""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        """
+        Args:
+            num_perm: Number of hash functions (signature length)
+            shingle_size: Number of consecutive tokens per shingle
+            seed: Seed for the hash function parameters
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+        # Multiply-shift hash family: h(x) = ((a * x + b) mod 2**64) >> 32
+        rng = np.random.RandomState(seed)
+        self._a = (rng.randint(0, 2**32, size=num_perm, dtype=np.uint64) << np.uint64(32)) \
+            | rng.randint(0, 2**32, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = (rng.randint(0, 2**32, size=num_perm, dtype=np.uint64) << np.uint64(32)) \
+            | rng.randint(0, 2**32, size=num_perm, dtype=np.uint64)
+
+    @classmethod
+    def from_config(cls, config: LSHConfig) -> "MinHasher":
+        return cls(config.num_perm, config.shingle_size, config.seed)
+
+    def shingle_hashes(self, tokens: List[str]) -> np.ndarray:
+        """
+        Hash every run of ``shingle_size`` consecutive tokens
+
+        Args:
+            tokens: Document tokens
+
+        Returns:
+            Array of unique 32-bit shingle hashes
+        """
+        if not tokens:
+            return np.zeros(0, dtype=np.uint64)
+
+        cache: Dict[str, int] = {}
+        token_hashes = np.fromiter(
+            (cache.setdefault(t, zlib.crc32(t.encode("utf-8"))) for t in tokens),
+            dtype=np.uint64,
+            count=len(tokens),
+        )
+
+        k = min(self.shingle_size, len(token_hashes))
+        n_shingles = len(token_hashes) - k + 1
+        shingles = np.zeros(n_shingles, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for j in range(k):
+                shingles = shingles * _SHINGLE_MULTIPLIER + token_hashes[j:j + n_shingles]
+        return np.unique(shingles >> np.uint64(32))
+
+    def signature(self, tokens: List[str]) -> np.ndarray:
+        """
+        Compute the MinHash signature of a token sequence
+
+        Args:
+            tokens: Document tokens
+
+        Returns:
+            uint32 array of length ``num_perm``; all values are 0xFFFFFFFF for empty input
+        """
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        shingles = self.shingle_hashes(tokens)
+
+        with np.errstate(over="ignore"):
+            for start in range(0, len(shingles), _SHINGLE_BLOCK):
+                block = shingles[start:start + _SHINGLE_BLOCK, None]
+                hashed = ((block * self._a + self._b) >> np.uint64(32)).astype(np.uint32)
+                np.minimum(signature, hashed.min(axis=0), out=signature)
+        return signature
+
+
+class LSHIndex:
+    """
+    Banded locality-sensitive hashing over a matrix of MinHash signatures
+
+    Each band's row-slice of every signature is reduced to one 64-bit key;
+    keys are kept sorted per band so a query is one binary search per band.
+    """
+
+    def __init__(self, signatures: np.ndarray, bands: int, rows: int):
+        """
+        Args:
+            signatures: (n_docs, num_perm) uint32 signature matrix
+            bands: Number of bands
+            rows: Rows (signature values) per band
+        """
+        if bands * rows > signatures.shape[1]:
+            raise ValueError(f"bands * rows ({bands * rows}) exceeds signature length ({signatures.shape[1]})")
+
+        self.signatures = signatures
+        self.bands = bands
+        self.rows = rows
+
+        rng = np.random.RandomState(bands * 1000 + rows)
+        self._mix = rng.randint(1, 2**63, size=rows, dtype=np.uint64) | np.uint64(1)
+
+        # Empty documents would all share the same buckets, so keep them out
+        non_empty = np.flatnonzero((signatures != _MAX_HASH).any(axis=1))
+
+        self._sorted_keys = []
+        self._sorted_docs = []
+        for band in range(bands):
+            keys = self._band_keys(signatures[non_empty], band)
+            order = np.argsort(keys, kind="stable")
+            self._sorted_keys.append(keys[order])
+            self._sorted_docs.append(non_empty[order])
+
+    def _band_keys(self, signatures: np.ndarray, band: int) -> np.ndarray:
+        block = signatures[:, band * self.rows:(band + 1) * self.rows].astype(np.uint64)
+        with np.errstate(over="ignore"):
+            return (block * self._mix).sum(axis=1, dtype=np.uint64)
+
+    def query(self, signature: np.ndarray, max_candidates: Optional[int] = None) -> np.ndarray:
+        """
+        Find documents sharing at least one band bucket with the signature
+
+        Args:
+            signature: Query MinHash signature
+            max_candidates: Keep only this many candidates, ranked by estimated Jaccard similarity
+
+        Returns:
+            Sorted array of candidate document ids
+        """
+        if (signature == _MAX_HASH).all():
+            return np.zeros(0, dtype=np.int64)
+
+        found = []
+        query_keys = [self._band_keys(signature[None, :], band)[0] for band in range(self.bands)]
+        for band, key in enumerate(query_keys):
+            keys = self._sorted_keys[band]
+            lo = np.searchsorted(keys, key, side="left")
+            hi = np.searchsorted(keys, key, side="right")
+            if hi > lo:
+                found.append(self._sorted_docs[band][lo:hi])
+
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+
+        candidates = np.unique(np.concatenate(found))
+        if max_candidates is not None and len(candidates) > max_candidates:
+            estimates = (self.signatures[candidates] == signature).mean(axis=1)
+            keep = np.argsort(-estimates, kind="stable")[:max_candidates]
+            candidates = np.sort(candidates[keep])
+        return candidates
+
+    def stats(self) -> Dict[str, Any]:
+        """Describe the band layout and its approximate threshold"""
+        return {
+            "documents": int(self.signatures.shape[0]),
+            "bands": self.bands,
+            "rows": self.rows,
+            "threshold": (1.0 / self.bands) ** (1.0 / self.rows),
+        }
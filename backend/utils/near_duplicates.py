@@ -0,0 +1,413 @@
+import os
+import json
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from utils.corpus_index import tokenize
+from utils.minhash_lsh import LSHConfig, MinHasher, choose_bands
+from utils.text_pipeline import get_pipeline
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Estimated Jaccard similarity of word shingles at which two submissions are near-duplicates
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.5"))
+
+# Documents read, signed and joined per pass; bounds memory use
+NEAR_DUP_CHUNK_SIZE = int(os.getenv("NEAR_DUP_CHUNK_SIZE", "2000"))
+
+# Processes computing signatures (default: CPU count)
+NEAR_DUP_WORKERS = int(os.getenv("NEAR_DUP_WORKERS", "0")) or None
+
+# Signatures, band buckets and near-duplicate pairs
+NEAR_DUP_INDEX_PATH = os.getenv("NEAR_DUP_INDEX_PATH", os.path.join("data", "near_duplicates.sqlite"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    seq INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    band INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS buckets_key ON buckets (band, key);
+CREATE TABLE IF NOT EXISTS pairs (
+    a INTEGER NOT NULL,
+    b INTEGER NOT NULL,
+    similarity REAL NOT NULL,
+    PRIMARY KEY (a, b)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+# MinHash value of an empty document
+_EMPTY = np.uint32(0xFFFFFFFF)
+
+
+def _compute_signatures(texts: List[str], num_perm: int, shingle_size: int, seed: int) -> np.ndarray:
+    """MinHash signatures of texts, one row each; runs in the worker processes"""
+    minhasher = MinHasher(num_perm, shingle_size, seed)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for row, text in enumerate(texts):
+        signatures[row] = minhasher.signature(tokenize(text))
+    return signatures
+
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class NearDuplicateIndex:
+    """
+    Incremental all-pairs near-duplicate detection over an archive of submissions
+
+    Each document's MinHash signature is split into bands; documents sharing
+    a band bucket are candidates, and candidates whose signatures agree on
+    at least ``threshold`` of their values are stored as near-duplicate
+    pairs. Signatures, buckets and pairs live in SQLite, so adding documents
+    later only signs the new ones and joins them against the stored
+    buckets; no pass holds more than one chunk of documents in memory.
+    Clusters are the connected components of the pair graph.
+    """
+
+    def __init__(self, path: str = NEAR_DUP_INDEX_PATH, threshold: float = NEAR_DUP_THRESHOLD,
+                 lsh_config: Optional[LSHConfig] = None, workers: Optional[int] = NEAR_DUP_WORKERS,
+                 chunk_size: int = NEAR_DUP_CHUNK_SIZE):
+        """
+        Args:
+            path: SQLite file of the index
+            threshold: Least estimated Jaccard similarity of a near-duplicate pair
+            lsh_config: Signature parameters (default: from LSH_* environment variables);
+                its bands and rows are replaced by ones suited to the threshold
+            workers: Processes computing signatures (default: CPU count; 1 computes them inline)
+            chunk_size: Documents per pass
+        """
+        self.path = path
+        self.threshold = threshold
+        self.config = lsh_config or LSHConfig.from_env()
+        # Candidates are 50% likely a bit below the threshold, so pairs just
+        # above it are found with high probability
+        self.bands, self.rows = choose_bands(self.config.num_perm, 0.8 * threshold)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+        rng = np.random.RandomState(self.bands * 1000 + self.rows)
+        self._mix = rng.randint(1, 2**63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.execute("CREATE TEMP TABLE IF NOT EXISTS new_buckets (band INTEGER, key INTEGER, seq INTEGER)")
+        self._check_params()
+
+    def _check_params(self) -> None:
+        """Start over if the index was built with other parameters"""
+        params = json.dumps({**self.config.signature_params(), "bands": self.bands, "rows": self.rows,
+                             "threshold": self.threshold, "text_pipeline": get_pipeline().config.to_dict()},
+                            sort_keys=True)
+        row = self._db.execute("SELECT value FROM state WHERE key = 'params'").fetchone()
+        if row is not None and row[0] == params:
+            return
+        with self._db:
+            if row is not None:
+                log.warning("Near-duplicate index parameters changed; rebuilding")
+            for table in ("documents", "buckets", "pairs"):
+                self._db.execute(f"DELETE FROM {table}")
+            self._db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('params', ?)", (params,))
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def missing(self, doc_ids: Sequence[str]) -> List[str]:
+        """
+        Args:
+            doc_ids: Document ids
+
+        Returns:
+            Those not indexed yet, in the given order
+        """
+        known = set()
+        # SQLite limits the number of bound parameters; id lists are passed as JSON instead
+        for chunk in _chunks(doc_ids, 10000):
+            known.update(row[0] for row in self._db.execute(
+                "SELECT id FROM documents WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(chunk),)
+            ))
+        return [doc_id for doc_id in doc_ids if doc_id not in known]
+
+    def add_documents(self, documents: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+        """
+        Index documents and find their near-duplicates among all indexed ones
+
+        Signatures of the next chunk are computed by the worker processes
+        while the current chunk is joined against the index.
+
+        Args:
+            documents: (id, text) pairs, read lazily; already indexed ids are skipped
+
+        Returns:
+            Dict with the numbers of documents "added", "candidates" checked and "pairs" found
+        """
+        totals = {"added": 0, "candidates": 0, "pairs": 0}
+        executor = None
+        if self.workers > 1:
+            # Spawned workers do not inherit the caller's threads and locks
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            pending = None
+            for chunk in _chunks(documents, self.chunk_size):
+                doc_ids = self.missing(list(dict.fromkeys(doc_id for doc_id, _ in chunk)))
+                if pending is not None:
+                    # The previous chunk is not stored yet
+                    signed = set(pending[0])
+                    doc_ids = [doc_id for doc_id in doc_ids if doc_id not in signed]
+                texts = dict(chunk)
+                signing = self._sign([texts[doc_id] for doc_id in doc_ids], executor)
+                if pending is not None:
+                    self._add_chunk(pending[0], pending[1], totals)
+                pending = (doc_ids, signing)
+            if pending is not None:
+                self._add_chunk(pending[0], pending[1], totals)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return totals
+
+    def _sign(self, texts: List[str], executor: Optional[ProcessPoolExecutor]) -> List[Future]:
+        """Start computing the signatures of texts, in slices spread over the workers"""
+        params = (self.config.num_perm, self.config.shingle_size, self.config.seed)
+        if executor is None or len(texts) < 2:
+            future = Future()
+            future.set_result(_compute_signatures(texts, *params))
+            return [future]
+        step = -(-len(texts) // self.workers)
+        return [executor.submit(_compute_signatures, texts[start:start + step], *params)
+                for start in range(0, len(texts), step)]
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """One 64-bit key per band and document, as SQLite's signed integers"""
+        block = signatures[:, :self.bands * self.rows].reshape(len(signatures), self.bands, self.rows)
+        with np.errstate(over="ignore"):
+            keys = (block.astype(np.uint64) * self._mix).sum(axis=2, dtype=np.uint64)
+        return keys.view(np.int64)
+
+    def _add_chunk(self, doc_ids: List[str], signing: List[Future], totals: Dict[str, int]) -> None:
+        if not doc_ids:
+            return
+        signatures = np.vstack([future.result() for future in signing])
+
+        with self._lock, self._db:
+            db = self._db
+            first = (db.execute("SELECT MAX(seq) FROM documents").fetchone()[0] or 0) + 1
+            seqs = np.arange(first, first + len(doc_ids))
+            db.executemany(
+                "INSERT INTO documents (seq, id, signature) VALUES (?, ?, ?)",
+                ((int(seq), doc_id, signature.tobytes()) for seq, doc_id, signature in zip(seqs, doc_ids, signatures))
+            )
+
+            # Empty documents would all share the same buckets, so keep them out
+            non_empty = np.flatnonzero((signatures != _EMPTY).any(axis=1))
+            keys = self._band_keys(signatures[non_empty])
+            rows = [(band, int(key), int(seq))
+                    for seq, doc_keys in zip(seqs[non_empty], keys)
+                    for band, key in enumerate(doc_keys)]
+            db.execute("DELETE FROM new_buckets")
+            db.executemany("INSERT INTO new_buckets (band, key, seq) VALUES (?, ?, ?)", rows)
+            db.executemany("INSERT INTO buckets (band, key, seq) VALUES (?, ?, ?)", rows)
+
+            # Earlier documents, including those of this chunk, sharing a bucket
+            candidates = np.array(db.execute(
+                "SELECT DISTINCT n.seq, o.seq FROM new_buckets n "
+                "JOIN buckets o ON o.band = n.band AND o.key = n.key AND o.seq < n.seq"
+            ).fetchall(), dtype=np.int64).reshape(-1, 2)
+            totals["added"] += len(doc_ids)
+            totals["candidates"] += len(candidates)
+            if not len(candidates):
+                return
+
+            # Signatures of the candidates' earlier documents not in this chunk
+            older = np.setdiff1d(candidates[:, 1], seqs)
+            loaded = [np.zeros((0, self.config.num_perm), dtype=np.uint32)]
+            for chunk in _chunks(older.tolist(), 10000):
+                rows = db.execute(
+                    "SELECT signature FROM documents WHERE seq IN (SELECT value FROM json_each(?)) ORDER BY seq",
+                    (json.dumps(chunk),)
+                ).fetchall()
+                loaded.append(np.frombuffer(b"".join(row[0] for row in rows), dtype=np.uint32).reshape(len(rows), -1))
+            known_seqs = np.concatenate([seqs, older])
+            known = np.vstack([signatures] + loaded)
+            order = np.argsort(known_seqs)
+            rows_a = order[np.searchsorted(known_seqs, candidates[:, 0], sorter=order)]
+            rows_b = order[np.searchsorted(known_seqs, candidates[:, 1], sorter=order)]
+
+            similarity = np.empty(len(candidates))
+            for start in range(0, len(candidates), 10000):
+                stop = start + 10000
+                similarity[start:stop] = (known[rows_a[start:stop]] == known[rows_b[start:stop]]).mean(axis=1)
+            found = similarity >= self.threshold
+            db.executemany(
+                "INSERT OR REPLACE INTO pairs (a, b, similarity) VALUES (?, ?, ?)",
+                ((int(b), int(a), float(s)) for (a, b), s in zip(candidates[found], similarity[found]))
+            )
+            totals["pairs"] += int(found.sum())
+
+    def update_from_history(self, history) -> Dict[str, int]:
+        """
+        Index the documents of a HistoryIndex that are not indexed yet
+
+        Args:
+            history: HistoryIndex of the ipfs_mock folder
+
+        Returns:
+            Counts as returned by add_documents
+        """
+        doc_ids = self.missing([entry[0] for entry in history.entries()])
+
+        def documents():
+            for doc_id in doc_ids:
+                document = history.document(doc_id) or {}
+                yield doc_id, document.get("text") or ""
+
+        return self.add_documents(documents())
+
+    def clusters(self, min_size: int = 2) -> List[Dict[str, Any]]:
+        """
+        Group near-duplicates into connected clusters
+
+        Documents are in one cluster if a chain of near-duplicate pairs joins them.
+
+        Args:
+            min_size: Smallest cluster returned
+
+        Returns:
+            Clusters, largest first, each with its "documents" ids (oldest
+            first), "size", and the "max_similarity" and "min_similarity"
+            of its pairs
+        """
+        with self._lock:
+            pairs = np.array(self._db.execute("SELECT a, b, similarity FROM pairs").fetchall()).reshape(-1, 3)
+            if not len(pairs):
+                return []
+            a, b = pairs[:, 0].astype(np.int64), pairs[:, 1].astype(np.int64)
+            n = int(max(a.max(), b.max())) + 1
+            graph = sparse.coo_matrix((np.ones(len(a)), (a, b)), shape=(n, n))
+            _, labels = connected_components(graph, directed=False)
+
+            members = np.unique(np.concatenate([a, b]))
+            ids = {}
+            for chunk in _chunks(members.tolist(), 10000):
+                ids.update(self._db.execute(
+                    "SELECT seq, id FROM documents WHERE seq IN (SELECT value FROM json_each(?))",
+                    (json.dumps(chunk),)
+                ))
+
+        # Pair similarity range of each component
+        highest = np.zeros(n)
+        lowest = np.ones(n)
+        np.maximum.at(highest, labels[a], pairs[:, 2])
+        np.minimum.at(lowest, labels[a], pairs[:, 2])
+
+        clusters = []
+        order = np.argsort(labels[members], kind="stable")
+        for group in np.split(members[order], np.flatnonzero(np.diff(labels[members][order])) + 1):
+            if len(group) < min_size:
+                continue
+            label = labels[group[0]]
+            clusters.append({
+                "documents": [ids[int(seq)] for seq in group],
+                "size": len(group),
+                "max_similarity": float(highest[label]),
+                "min_similarity": float(lowest[label]),
+            })
+        clusters.sort(key=lambda cluster: (-cluster["size"], -cluster["max_similarity"]))
+        return clusters
+
+    def stats(self) -> Dict[str, Any]:
+        """Describe the index"""
+        return {
+            "documents": len(self),
+            "pairs": self._db.execute("SELECT COUNT(*) FROM pairs").fetchone()[0],
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    """
+    Find clusters of near-duplicate submissions in the ipfs_mock history
+
+    Run from the backend directory:
+
+        python -m utils.near_duplicates --output clusters.json
+    """
+    from utils.history_index import HistoryIndex
+    from utils.storage import STORAGE_PATH, create_storage
+
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", default=os.path.join("..", "ipfs_mock"), help="ipfs_mock folder")
+    parser.add_argument("--index", default=NEAR_DUP_INDEX_PATH, help="Index file, kept for incremental runs")
+    parser.add_argument("--storage", default=STORAGE_PATH, help="SQLite storage whose NFTs are listed per cluster")
+    parser.add_argument("--threshold", type=float, default=NEAR_DUP_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=NEAR_DUP_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=NEAR_DUP_CHUNK_SIZE)
+    parser.add_argument("--min-size", type=int, default=2)
+    parser.add_argument("--output", help="Write the clusters to this JSON file instead of printing them")
+    args = parser.parse_args()
+
+    history = HistoryIndex(args.history)
+    index = NearDuplicateIndex(args.index, args.threshold, workers=args.workers, chunk_size=args.chunk_size)
+    try:
+        totals = index.update_from_history(history)
+        print(f"Indexed {totals['added']} new documents: {totals['candidates']} candidates, "
+              f"{totals['pairs']} near-duplicate pairs")
+        clusters = index.clusters(args.min_size)
+    finally:
+        index.close()
+        history.close()
+
+    # NFTs minted for clustered documents
+    if os.path.exists(args.storage):
+        storage = create_storage("sqlite", args.storage)
+        nfts: Dict[str, List[str]] = {}
+        for nft in storage.iter_nfts():
+            nfts.setdefault(nft.ipfs_cid, []).append(nft.id)
+        storage.close()
+        for cluster in clusters:
+            cluster["nfts"] = [nft_id for doc_id in cluster["documents"] for nft_id in nfts.get(doc_id, [])]
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(clusters, f, indent=2)
+        print(f"Wrote {len(clusters)} clusters to {args.output}")
+    else:
+        print(json.dumps(clusters, indent=2))
+
+
+if __name__ == "__main__":
+    main()
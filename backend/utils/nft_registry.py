@@ -0,0 +1,237 @@
+import threading
+from operator import attrgetter
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Fields every NFT entry has, in the order they are serialized
+NFT_FIELDS = (
+    "id", "title", "summary", "plagiarism_score", "wallet_address", "ipfs_cid", "timestamp",
+    "transaction_hash", "feedback", "student_name", "user_email", "teacher_feedback",
+)
+
+# Fields only entries built from previously checked documents have
+MOCK_FIELDS = ("filename", "is_mock")
+
+_get_nft_fields = attrgetter(*NFT_FIELDS)
+
+# Positions of the entries with one index value: a bare position while there
+# is only one (most ipfs_cid values), a sorted list otherwise
+Postings = Union[int, List[int]]
+
+
+def _add_posting(index: Dict[Any, Postings], key: Any, position: int) -> None:
+    current = index.get(key)
+    if current is None:
+        index[key] = position
+    elif isinstance(current, int):
+        index[key] = [min(current, position), max(current, position)]
+    elif position > current[-1]:
+        # New entries are appended, so this is the common case
+        current.append(position)
+    else:
+        insort(current, position)
+
+
+def _remove_posting(index: Dict[Any, Postings], key: Any, position: int) -> None:
+    current = index[key]
+    if isinstance(current, int):
+        del index[key]
+        return
+    del current[bisect_left(current, position)]
+    if len(current) == 1:
+        index[key] = current[0]
+
+
+def _postings(index: Dict[Any, Postings], key: Any) -> Sequence[int]:
+    current = index.get(key)
+    if current is None:
+        return ()
+    return (current,) if isinstance(current, int) else current
+
+
+def check_update_fields(fields: Dict[str, Any]) -> None:
+    """
+    Validate the fields of an NFT update, for every storage backend
+
+    Raises:
+        ValueError: For unknown fields or an attempt to change the id
+    """
+    unknown = set(fields) - set(NFTRecord.__slots__)
+    if unknown or "id" in fields:
+        raise ValueError(f"Cannot update fields: {sorted(unknown | ({'id'} & set(fields)))}")
+
+
+def parse_page_args(cursor: Optional[str], limit: int, filters: Dict[str, Any]) -> int:
+    """
+    Validate the arguments of an NFT page request, for every storage backend
+
+    Returns:
+        Position of the first entry of the page
+
+    Raises:
+        ValueError: For malformed cursors or filters on fields without an index
+    """
+    unknown = set(filters) - set(NFTRegistry.INDEXED_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot filter on: {sorted(unknown)}")
+    try:
+        start = int(cursor) if cursor else 0
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if start < 0 or limit < 1:
+        raise ValueError("Cursor and limit must be positive")
+    return start
+
+
+class NFTRecord:
+    """
+    One NFT entry
+
+    Uses ``__slots__`` instead of a per-record dict, which is what the
+    registry's memory is made of once it holds many entries.
+    """
+
+    __slots__ = NFT_FIELDS + MOCK_FIELDS
+
+    def __init__(self, id: str, title: str = "Untitled", summary: str = "", plagiarism_score: Any = 0.0,
+                 wallet_address: str = "", ipfs_cid: str = "", timestamp: str = "",
+                 transaction_hash: str = "", feedback: Any = None, student_name: str = "",
+                 user_email: str = "", teacher_feedback: Any = None,
+                 filename: Optional[str] = None, is_mock: bool = False):
+        self.id = id
+        self.title = title
+        self.summary = summary
+        self.plagiarism_score = plagiarism_score
+        self.wallet_address = wallet_address
+        self.ipfs_cid = ipfs_cid
+        self.timestamp = timestamp
+        self.transaction_hash = transaction_hash
+        self.feedback = feedback
+        self.student_name = student_name
+        self.user_email = user_email
+        self.teacher_feedback = teacher_feedback
+        self.filename = filename
+        self.is_mock = is_mock
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns:
+            The entry as served by the /nfts endpoint
+        """
+        data = dict(zip(NFT_FIELDS, _get_nft_fields(self)))
+        if self.is_mock:
+            data["filename"] = self.filename
+            data["is_mock"] = True
+        return data
+
+
+class NFTRegistry:
+    """
+    In-memory NFT entries with constant-time lookup by id
+
+    Entries keep their insertion order. Secondary indexes map each value of
+    INDEXED_FIELDS to the sorted positions of the entries having it, so
+    filtered pages are read without scanning the other entries. Page cursors
+    are positions, which stay valid as entries are added.
+    """
+
+    INDEXED_FIELDS = ("wallet_address", "student_name", "ipfs_cid")
+
+    def __init__(self):
+        self._records: List[NFTRecord] = []
+        self._positions: Dict[str, int] = {}
+        self._indexes: Dict[str, Dict[Any, Postings]] = {field: {} for field in self.INDEXED_FIELDS}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, nft_id: str) -> bool:
+        return nft_id in self._positions
+
+    def __iter__(self) -> Iterator[NFTRecord]:
+        return iter(list(self._records))
+
+    def add(self, record: NFTRecord) -> NFTRecord:
+        """
+        Add an entry at the end
+
+        Raises:
+            ValueError: If an entry with the same id exists
+        """
+        with self._lock:
+            if record.id in self._positions:
+                raise ValueError(f"Duplicate NFT id: {record.id}")
+            position = len(self._records)
+            self._records.append(record)
+            self._positions[record.id] = position
+            for field, index in self._indexes.items():
+                _add_posting(index, getattr(record, field), position)
+        return record
+
+    def get(self, nft_id: str) -> Optional[NFTRecord]:
+        position = self._positions.get(nft_id)
+        return self._records[position] if position is not None else None
+
+    def update(self, nft_id: str, **fields: Any) -> bool:
+        """
+        Set fields of an entry, keeping the secondary indexes in step
+
+        Args:
+            nft_id: Entry id
+            **fields: Field values to set (the id cannot change)
+
+        Returns:
+            False if there is no entry with that id
+        """
+        check_update_fields(fields)
+
+        with self._lock:
+            position = self._positions.get(nft_id)
+            if position is None:
+                return False
+            record = self._records[position]
+            for field, value in fields.items():
+                index = self._indexes.get(field)
+                if index is not None and getattr(record, field) != value:
+                    _remove_posting(index, getattr(record, field), position)
+                    _add_posting(index, value, position)
+                setattr(record, field, value)
+        return True
+
+    def page(self, cursor: Optional[str] = None, limit: int = 50,
+             **filters: Any) -> Tuple[List[NFTRecord], Optional[str]]:
+        """
+        Read entries in insertion order, a page at a time
+
+        Args:
+            cursor: next_cursor of the previous page, or None for the first page
+            limit: Maximum number of entries
+            **filters: Required values of INDEXED_FIELDS
+
+        Returns:
+            Tuple of (entries, cursor of the next page or None after the last page)
+
+        Raises:
+            ValueError: For malformed cursors or filters on fields without an index
+        """
+        start = parse_page_args(cursor, limit, filters)
+
+        with self._lock:
+            if filters:
+                # Walk the shortest matching position list, checking the other filters
+                lists = [_postings(self._indexes[field], value) for field, value in filters.items()]
+                positions = min(lists, key=len)
+                candidates = (positions[i] for i in range(bisect_left(positions, start), len(positions)))
+            else:
+                candidates = iter(range(start, len(self._records)))
+
+            page = []
+            for position in candidates:
+                record = self._records[position]
+                if any(getattr(record, field) != value for field, value in filters.items()):
+                    continue
+                if len(page) == limit:
+                    return page, str(position)
+                page.append(record)
+        return page, None
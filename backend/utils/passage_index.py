@@ -0,0 +1,179 @@
+from sklearn.feature_extraction.text import TfidfVectorizer
+import numpy as np
+from scipy import sparse
+from typing import List, Dict, Any, Optional
+
+from utils.text_pipeline import get_pipeline
+
+# Paragraphs shorter than this many words are not compared
+MIN_PARAGRAPH_WORDS = 10
+
+# Number of submission paragraphs scored per sparse product, to bound memory
+QUERY_BLOCK_SIZE = 256
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """
+    Split text into paragraphs on blank lines
+
+    Args:
+        text: Input text
+
+    Returns:
+        List of non-empty, stripped paragraphs
+    """
+    return [p.strip() for p in text.split("\n\n") if p.strip()]
+
+
+def is_comparable(paragraph: str) -> bool:
+    """Whether a paragraph is long enough to be compared"""
+    return len(paragraph.split()) >= MIN_PARAGRAPH_WORDS
+
+
+def paragraph_terms(paragraph: str) -> List[str]:
+    """
+    TF-IDF terms of a paragraph: its non-stopword tokens of two or more characters
+
+    Args:
+        paragraph: Paragraph text
+
+    Returns:
+        Terms in paragraph order
+    """
+    return [term for term in get_pipeline().content_tokens(paragraph) if len(term) > 1]
+
+
+class PassageIndex:
+    """
+    TF-IDF index over the paragraphs of the reference corpus
+
+    Corpus paragraphs are split and vectorized once with a shared vocabulary
+    and IDF. Submission paragraphs are scored against all of them with one
+    sparse product per block, keeping the top-k matches per paragraph.
+    """
+
+    def __init__(self, documents: List[str], filenames: Optional[List[str]] = None):
+        """
+        Args:
+            documents: Reference document texts
+            filenames: Name of each reference document, used in results
+        """
+        self.filenames = filenames or [f"document_{i}.txt" for i in range(len(documents))]
+        self.paragraphs: List[str] = []
+        self.paragraph_docs: List[int] = []
+
+        for doc_id, document in enumerate(documents):
+            for paragraph in split_paragraphs(document):
+                if is_comparable(paragraph):
+                    self.paragraphs.append(paragraph)
+                    self.paragraph_docs.append(doc_id)
+
+        # Tokenized like every other algorithm rather than with sklearn's own analyzer
+        self.vectorizer = TfidfVectorizer(analyzer=paragraph_terms)
+        self.matrix = None
+        if self.paragraphs:
+            try:
+                # Stored as (terms x paragraphs) so a block of queries is one product
+                self.matrix = self.vectorizer.fit_transform(self.paragraphs).T.tocsr()
+            except ValueError:
+                # Every corpus paragraph consisted only of stopwords
+                self.matrix = None
+
+        if self.matrix is not None:
+            self._analyzer = self.vectorizer.build_analyzer()
+            self._vocabulary = self.vectorizer.vocabulary_
+            self._idf = self.vectorizer.idf_
+            # IDF the vectorizer would assign to a term that no corpus paragraph contains
+            self._unseen_idf = float(np.log((1 + len(self.paragraphs)) / 1.0) + 1.0)
+
+    @classmethod
+    def from_corpus_index(cls, corpus_index) -> "PassageIndex":
+        """
+        Build a passage index over the documents of a CorpusIndex
+
+        Args:
+            corpus_index: CorpusIndex to read document texts and filenames from
+
+        Returns:
+            PassageIndex over the corpus
+        """
+        return cls(corpus_index.texts(), corpus_index.filenames)
+
+    def __len__(self) -> int:
+        return len(self.paragraphs)
+
+    def _vectorize(self, paragraphs: List[str]) -> sparse.csr_matrix:
+        """
+        Vectorize submission paragraphs with the corpus IDF
+
+        Terms no corpus paragraph contains cannot match, but still count
+        towards each paragraph's norm so that novel wording lowers the score.
+        """
+        rows, columns, values = [], [], []
+        norms = np.zeros(len(paragraphs), dtype=np.float64)
+
+        for row, paragraph in enumerate(paragraphs):
+            counts: Dict[str, int] = {}
+            for term in self._analyzer(paragraph):
+                counts[term] = counts.get(term, 0) + 1
+
+            squared = 0.0
+            for term, count in counts.items():
+                column = self._vocabulary.get(term)
+                weight = count * (self._idf[column] if column is not None else self._unseen_idf)
+                squared += weight * weight
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+                    values.append(weight)
+            norms[row] = np.sqrt(squared)
+
+        vectors = sparse.csr_matrix((values, (rows, columns)), shape=(len(paragraphs), len(self._vocabulary)))
+        scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+        return sparse.diags(scale) @ vectors
+
+    def query(self, text: str, threshold: float = 0.7, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Find corpus paragraphs similar to the paragraphs of a text
+
+        Args:
+            text: The document text to check
+            threshold: Similarity threshold (0-1)
+            top_k: Maximum number of matches kept per submission paragraph
+
+        Returns:
+            List of matched passage pairs, highest similarity first
+        """
+        if self.matrix is None:
+            return []
+
+        paragraphs = [p for p in split_paragraphs(text) if is_comparable(p)]
+        matches = []
+
+        for start in range(0, len(paragraphs), QUERY_BLOCK_SIZE):
+            block = paragraphs[start:start + QUERY_BLOCK_SIZE]
+            similarities = (self._vectorize(block) @ self.matrix).tocsr()
+
+            for row, paragraph in enumerate(block):
+                lo, hi = similarities.indptr[row], similarities.indptr[row + 1]
+                scores = similarities.data[lo:hi]
+                columns = similarities.indices[lo:hi]
+
+                keep = scores >= threshold
+                scores, columns = scores[keep], columns[keep]
+                if len(scores) > top_k:
+                    best = np.argpartition(-scores, top_k - 1)[:top_k]
+                    scores, columns = scores[best], columns[best]
+
+                for score, column in zip(scores, columns):
+                    doc_id = self.paragraph_docs[column]
+                    matches.append({
+                        "document_paragraph": paragraph,
+                        "corpus_paragraph": self.paragraphs[column],
+                        "corpus_file": self.filenames[doc_id],
+                        "similarity": float(min(score, 1.0))
+                    })
+
+        # Sort by similarity (highest first)
+        matches.sort(key=lambda x: x["similarity"], reverse=True)
+        return matches
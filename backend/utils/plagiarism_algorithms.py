@@ -1,19 +1,20 @@
 import re
 import math
 from collections import Counter
-from nltk.corpus import stopwords
-import nltk
 from typing import Dict, List, Tuple, Any
 import os
+import numpy as np
+from scipy import sparse
 
-# Download NLTK data if not already downloaded
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+from utils.winnowing import FingerprintIndex
+from utils.text_pipeline import analyze, get_pipeline
+from utils.metrics import algorithm
+from utils.log import get_logger
 
-# Regular expression for word matching
-WORD = re.compile(r'\w+')
+log = get_logger(__name__)
+
+# Sentence separators of the n-gram queries; words come from the shared text pipeline
+SENTENCE_ENDERS = re.compile("['.!?]")
 
 class CosineSimilarity:
     """Cosine similarity implementation for text comparison"""
@@ -60,10 +61,9 @@ class CosineSimilarity:
             text: Input text
             
         Returns:
-            Dictionary with words as keys and frequencies as values
+            Dictionary with normalized words as keys and frequencies as values
         """
-        words = WORD.findall(text)
-        return Counter(words)
+        return analyze(text).counts
     
     @staticmethod
     def cosine_sim(text1: str, text2: str) -> float:
@@ -77,11 +77,8 @@ class CosineSimilarity:
         Returns:
             Cosine similarity score between 0 and 1
         """
-        t1 = text1.lower()
-        t2 = text2.lower()
-        
-        vector1 = CosineSimilarity.text_to_vector(t1)
-        vector2 = CosineSimilarity.text_to_vector(t2)
+        vector1 = CosineSimilarity.text_to_vector(text1)
+        vector2 = CosineSimilarity.text_to_vector(text2)
         
         return CosineSimilarity.get_cosine(vector1, vector2)
 
@@ -89,89 +86,60 @@ class FileSimilarity:
     """File similarity implementation using TF-IDF approach"""
     
     @staticmethod
-    def find_file_similarity(input_query: str, database: str) -> float:
+    def term_vector(text: str) -> Dict[str, int]:
         """
-        Calculate similarity between input text and database text using TF-IDF
+        Convert text to a term frequency vector without stopwords
         
         Args:
-            input_query: Input text to check
-            database: Reference text to compare against
+            text: Input text
             
         Returns:
-            Similarity percentage (0-100)
+            Dictionary with non-stopword terms as keys and frequencies as values
         """
-        universal_set_of_unique_words = []
-        match_percentage = 0
-        
-        lowercase_query = input_query.lower()
-        en_stops = set(stopwords.words('english'))
-        
-        # Replace punctuation by space and split
-        query_word_list = re.sub(r"[^\w]", " ", lowercase_query).split()
-        
-        # Add unique words from query
-        for word in query_word_list:
-            if word not in universal_set_of_unique_words:
-                universal_set_of_unique_words.append(word)
-        
-        database_lower = database.lower()
-        
-        # Replace punctuation by space and split
-        database_word_list = re.sub(r"[^\w]", " ", database_lower).split()
-        
-        # Add unique words from database
-        for word in database_word_list:
-            if word not in universal_set_of_unique_words:
-                universal_set_of_unique_words.append(word)
-        
-        # Remove stop words
-        for word in universal_set_of_unique_words[:]:  # Use slice to avoid modification during iteration
-            if word in en_stops:
-                universal_set_of_unique_words.remove(word)
-        
-        # Calculate TF (Term Frequency) for both texts
-        query_tf = []
-        database_tf = []
+        return analyze(text).content_counts
+    
+    @staticmethod
+    def vector_similarity(query_vector: Dict[str, int], database_vector: Dict[str, int]) -> float:
+        """
+        Calculate similarity between two term frequency vectors
         
-        for word in universal_set_of_unique_words:
-            query_tf_counter = 0
-            database_tf_counter = 0
-            
-            # Count word frequency in query
-            for word2 in query_word_list:
-                if word == word2:
-                    query_tf_counter += 1
-            query_tf.append(query_tf_counter)
+        Args:
+            query_vector: Term vector of the input text
+            database_vector: Term vector of the reference text
             
-            # Count word frequency in database
-            for word2 in database_word_list:
-                if word == word2:
-                    database_tf_counter += 1
-            database_tf.append(database_tf_counter)
-        
-        # Calculate dot product
-        dot_product = 0
-        for i in range(len(query_tf)):
-            dot_product += query_tf[i] * database_tf[i]
-        
-        # Calculate vector magnitudes
-        query_vector_magnitude = 0
-        for i in range(len(query_tf)):
-            query_vector_magnitude += query_tf[i]**2
-        query_vector_magnitude = math.sqrt(query_vector_magnitude)
-        
-        database_vector_magnitude = 0
-        for i in range(len(database_tf)):
-            database_vector_magnitude += database_tf[i]**2
-        database_vector_magnitude = math.sqrt(database_vector_magnitude)
+        Returns:
+            Similarity percentage (0-100)
+        """
+        # Iterate over the smaller vector for the dot product
+        small, large = sorted((query_vector, database_vector), key=len)
+        dot_product = sum(count * large[word] for word, count in small.items() if word in large)
+        
+        query_vector_magnitude = math.sqrt(sum(count * count for count in query_vector.values()))
+        database_vector_magnitude = math.sqrt(sum(count * count for count in database_vector.values()))
         
         # Calculate similarity percentage
         if query_vector_magnitude * database_vector_magnitude == 0:
             return 0.0
         
-        match_percentage = (float(dot_product) / (query_vector_magnitude * database_vector_magnitude)) * 100
+        return (float(dot_product) / (query_vector_magnitude * database_vector_magnitude)) * 100
+    
+    @staticmethod
+    def find_file_similarity(input_query: str, database: str, query_vector: Dict[str, int] = None) -> float:
+        """
+        Calculate similarity between input text and database text using TF-IDF
+        
+        Args:
+            input_query: Input text to check
+            database: Reference text to compare against
+            query_vector: Precomputed term_vector(input_query), reused across comparisons
+            
+        Returns:
+            Similarity percentage (0-100)
+        """
+        if query_vector is None:
+            query_vector = FileSimilarity.term_vector(input_query)
         
-        return match_percentage
+        return FileSimilarity.vector_similarity(query_vector, FileSimilarity.term_vector(database))
 
 class NGramSimilarity:
     """N-gram based similarity for web search and advanced plagiarism detection"""
@@ -188,17 +156,9 @@ class NGramSimilarity:
         Returns:
             List of n-gram queries
         """
-        sentence_enders = re.compile("['.!?]")
-        sentence_list = sentence_enders.split(text)
-        sentence_splits = []
-        en_stops = set(stopwords.words('english'))
-        
-        # Process each sentence
-        for sentence in sentence_list:
-            x = re.compile(r'\W+', re.UNICODE).split(sentence)
-            # Remove stop words
-            x = [word for word in x if word.lower() not in en_stops and word != '']
-            sentence_splits.append(x)
+        pipeline = get_pipeline()
+        # Tokenize each sentence like the other algorithms, without stop words
+        sentence_splits = [pipeline.content_tokens(sentence) for sentence in SENTENCE_ENDERS.split(text)]
         
         final_queries = []
         
@@ -234,7 +194,7 @@ class NGramSimilarity:
             Tuple of (total_percentage, output_links)
         """
         queries = NGramSimilarity.get_queries(text, n)
-        print('GetQueries task complete')
+        log.debug("N-gram queries built", queries=len(queries), sample=True)
         
         q = [' '.join(d) for d in queries]
         
@@ -258,6 +218,115 @@ class NGramSimilarity:
         
         return total_percent, output_links
 
+class CorpusMatrix:
+    """Sparse document-term count matrix for one-vs-many similarity scoring"""
+    
+    def __init__(self, counts: sparse.spmatrix, vocab: Dict[str, int], file_norms: np.ndarray = None):
+        """
+        Args:
+            counts: (n_docs, n_terms) term frequency matrix
+            vocab: Mapping from term to column index
+            file_norms: Precomputed per-row norms over non-stopword terms
+        """
+        self.counts = counts.tocsc()
+        self.vocab = vocab
+        # Row-major copy, built on first use for scoring a subset of rows
+        self._rows = None
+        
+        en_stops = get_pipeline().stopwords
+        self.is_stop = np.zeros(len(vocab), dtype=bool)
+        for term, column in vocab.items():
+            self.is_stop[column] = term in en_stops
+        
+        # Per-document norms over non-stopword terms, as FileSimilarity uses
+        if file_norms is None:
+            file_counts = self.counts.multiply(~self.is_stop[None, :]).tocsr()
+            file_norms = np.sqrt(np.asarray(file_counts.multiply(file_counts).sum(axis=1), dtype=np.float64).ravel())
+        self.file_norms = file_norms
+    
+    @classmethod
+    def from_texts(cls, texts: List[str]) -> "CorpusMatrix":
+        """
+        Build the matrix by tokenizing each reference text once
+        
+        Args:
+            texts: Reference texts
+            
+        Returns:
+            CorpusMatrix with one row per text
+        """
+        vocab: Dict[str, int] = {}
+        rows, columns, values = [], [], []
+        pipeline = get_pipeline()
+        for row, text in enumerate(texts):
+            for word, count in Counter(pipeline.tokens(text)).items():
+                rows.append(row)
+                columns.append(vocab.setdefault(word, len(vocab)))
+                values.append(count)
+        
+        counts = sparse.csc_matrix(
+            (np.array(values, dtype=np.float64), (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64))),
+            shape=(len(texts), len(vocab))
+        )
+        return cls(counts, vocab)
+    
+    @property
+    def n_docs(self) -> int:
+        return self.counts.shape[0]
+    
+    def score(self, text: str, doc_ids: np.ndarray = None) -> Tuple[List[float], List[float]]:
+        """
+        Score a text against every row with one sparse matrix-vector product per algorithm
+        
+        Returns the same values as CosineSimilarity.cosine_sim and
+        FileSimilarity.find_file_similarity computed row by row.
+        
+        Args:
+            text: Text to score
+            doc_ids: Only score these rows; the others get a score of 0
+            
+        Returns:
+            Tuple of (cosine_scores, file_scores), one entry per row
+        """
+        cosine_scores = np.zeros(self.n_docs, dtype=np.float64)
+        file_scores = np.zeros(self.n_docs, dtype=np.float64)
+        rows = np.arange(self.n_docs) if doc_ids is None else np.asarray(doc_ids, dtype=np.int64)
+        
+        stream = analyze(text)
+        query_counts = stream.counts
+        query_norm = math.sqrt(sum(c * c for c in query_counts.values()))
+        query_file_norm = math.sqrt(sum(c * c for c in stream.content_counts.values()))
+        
+        known = sorted((self.vocab[w], c) for w, c in query_counts.items() if w in self.vocab)
+        if not known or len(rows) == 0:
+            return cosine_scores.tolist(), file_scores.tolist()
+        
+        columns = np.array([column for column, _ in known], dtype=np.int64)
+        query = np.array([count for _, count in known], dtype=np.float64)
+        
+        # Restrict the matrix to the submission's terms (and requested rows)
+        if doc_ids is None:
+            shared = self.counts[:, columns].tocsr()
+        else:
+            if self._rows is None:
+                self._rows = self.counts.tocsr()
+            shared = self._rows[rows][:, columns]
+        
+        # FileSimilarity: plain dot product over non-stopword terms
+        file_dot = shared @ np.where(self.is_stop[columns], 0.0, query)
+        
+        # CosineSimilarity compares against reference counts clipped to the query counts
+        clipped = shared.copy()
+        clipped.data = np.minimum(clipped.data, query[clipped.indices])
+        cos_num = clipped @ query
+        cos_den = query_norm * np.sqrt(np.asarray(clipped.multiply(clipped).sum(axis=1)).ravel())
+        
+        file_den = query_file_norm * self.file_norms[rows]
+        cosine_scores[rows] = np.divide(cos_num, cos_den, out=np.zeros(len(rows)), where=cos_den > 0)
+        file_scores[rows] = np.divide(file_dot, file_den, out=np.zeros(len(rows)), where=file_den > 0) * 100
+        
+        return cosine_scores.tolist(), file_scores.tolist()
+
 class PlagiarismDetector:
     """Main plagiarism detection class that combines all algorithms"""
     
@@ -266,13 +335,14 @@ class PlagiarismDetector:
         self.file_sim = FileSimilarity()
         self.ngram_sim = NGramSimilarity()
     
-    def check_plagiarism_comprehensive(self, text: str, reference_texts: List[str] = None) -> Dict[str, Any]:
+    def check_plagiarism_comprehensive(self, text: str, reference_texts: List[str] = None, corpus_index=None) -> Dict[str, Any]:
         """
         Comprehensive plagiarism check using multiple algorithms
         
         Args:
             text: Text to check for plagiarism
             reference_texts: List of reference texts to compare against
+            corpus_index: CorpusIndex to score against instead of reference_texts
             
         Returns:
             Dictionary with plagiarism scores and details
@@ -283,30 +353,37 @@ class PlagiarismDetector:
             "ngram_similarity": 0.0,
             "overall_score": 0.0,
             "similar_passages": [],
+            "fingerprint_matches": [],
             "details": {}
         }
         
-        if not reference_texts:
-            # Use default corpus or return basic analysis
-            results["ngram_similarity"], _ = self.ngram_sim.find_similarity(text)
-            results["overall_score"] = results["ngram_similarity"] / 100.0
+        if corpus_index is not None and len(corpus_index) > 0:
+            # Score against the pre-tokenized corpus index; large corpora are
+            # narrowed to MinHash LSH candidates before exact scoring
+            candidates = None
+            if corpus_index.lsh_enabled:
+                with algorithm("lsh_candidates"):
+                    candidates = corpus_index.candidates(text)
+                results["details"]["candidates_scored"] = len(candidates)
+            with algorithm("cosine_file_similarity"):
+                cosine_scores, file_scores = corpus_index.score(text, doc_ids=candidates)
+            get_reference = corpus_index.document_text
+            fingerprint_index = corpus_index.fingerprint_index()
+        elif reference_texts:
+            with algorithm("reference_index"):
+                corpus_matrix = self.build_corpus_matrix(reference_texts)
+                fingerprint_index = FingerprintIndex(reference_texts)
+            with algorithm("cosine_file_similarity"):
+                cosine_scores, file_scores = self.score_batch(text, corpus_matrix)
+            get_reference = reference_texts.__getitem__
+        else:
+            # Nothing to compare against, so no text can be shown to be copied
             return results
         
-        # Calculate cosine similarity with each reference text
-        cosine_scores = []
-        file_scores = []
-        
-        for i, ref_text in enumerate(reference_texts):
-            # Cosine similarity
-            cosine_score = self.cosine_sim.cosine_sim(text, ref_text)
-            cosine_scores.append(cosine_score)
-            
-            # File similarity
-            file_score = self.file_sim.find_file_similarity(text, ref_text)
-            file_scores.append(file_score)
-            
-            # Add similar passages if similarity is high
+        # Add similar passages if similarity is high
+        for i, (cosine_score, file_score) in enumerate(zip(cosine_scores, file_scores)):
             if cosine_score > 0.7:
+                ref_text = get_reference(i)
                 results["similar_passages"].append({
                     "reference_index": i,
                     "cosine_similarity": cosine_score,
@@ -320,9 +397,11 @@ class PlagiarismDetector:
         if file_scores:
             results["file_similarity"] = max(file_scores)
         
-        # N-gram similarity
-        ngram_score, _ = self.ngram_sim.find_similarity(text)
-        results["ngram_similarity"] = ngram_score
+        # N-gram similarity: share of the text copied verbatim, from winnowed fingerprints
+        with algorithm("fingerprint"):
+            fingerprint_result = fingerprint_index.match(text, normalized=analyze(text).normalized)
+        results["ngram_similarity"] = fingerprint_result["similarity"]
+        results["fingerprint_matches"] = fingerprint_result["spans"]
         
         # Calculate overall score (weighted average)
         weights = {
@@ -338,14 +417,40 @@ class PlagiarismDetector:
         )
         
         results["overall_score"] = min(1.0, overall_score)
-        results["details"] = {
+        results["details"].update({
             "cosine_scores": cosine_scores,
             "file_scores": file_scores,
             "weights": weights
-        }
+        })
         
         return results
     
+    def build_corpus_matrix(self, reference_texts: List[str]) -> CorpusMatrix:
+        """
+        Build a sparse term matrix of the reference texts for batched scoring
+        
+        Args:
+            reference_texts: List of reference texts
+            
+        Returns:
+            CorpusMatrix that can be reused across submissions
+        """
+        return CorpusMatrix.from_texts(reference_texts)
+    
+    def score_batch(self, text: str, corpus_matrix: CorpusMatrix, doc_ids: np.ndarray = None) -> Tuple[List[float], List[float]]:
+        """
+        Score a text against all reference texts at once
+        
+        Args:
+            text: Text to check for plagiarism
+            corpus_matrix: Matrix from build_corpus_matrix or CorpusIndex.matrix
+            doc_ids: Only score these references; the others get a score of 0
+            
+        Returns:
+            Tuple of (cosine_scores, file_scores) in reference order
+        """
+        return corpus_matrix.score(text, doc_ids=doc_ids)
+    
     def compare_two_texts(self, text1: str, text2: str) -> Dict[str, float]:
         """
         Compare two texts directly
@@ -357,7 +462,11 @@ class PlagiarismDetector:
         Returns:
             Dictionary with similarity scores
         """
+        with algorithm("cosine_similarity"):
+            cosine_similarity = self.cosine_sim.cosine_sim(text1, text2)
+        with algorithm("file_similarity"):
+            file_similarity = self.file_sim.find_file_similarity(text1, text2)
         return {
-            "cosine_similarity": self.cosine_sim.cosine_sim(text1, text2),
-            "file_similarity": self.file_sim.find_file_similarity(text1, text2)
+            "cosine_similarity": cosine_similarity,
+            "file_similarity": file_similarity
         } 
\ No newline at end of file
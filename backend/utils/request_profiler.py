@@ -0,0 +1,353 @@
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import random
+import marshal
+import cProfile
+import tempfile
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Secret that authorizes profiling requests and profile downloads (empty disables both)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+
+# Share of analysis requests profiled without being asked to, with the sampling profiler
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+# Milliseconds between two stack samples
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+# Where profiles are stored, and how many are kept
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "profiles")
+)
+PROFILE_MAX_PROFILES = int(os.getenv("PROFILE_MAX_PROFILES", "200"))
+
+# "sample": periodic stack samples as collapsed stacks (flamegraph.pl, speedscope)
+# "trace": every call, with cProfile (pstats, snakeviz)
+MODES = {"sample": ("collapsed", "text/plain; charset=utf-8"), "trace": ("prof", "application/octet-stream")}
+
+REQUEST_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class ProfileDenied(Exception):
+    """Raised when profiling is requested without a valid token"""
+    pass
+
+
+@dataclass
+class ProfileSpec:
+    """How one request is profiled"""
+    request_id: str
+    mode: str
+    reason: str
+
+
+def check_token(headers: Mapping[str, str], token: Optional[str] = None) -> None:
+    """
+    Check the X-Profile-Token header against PROFILE_TOKEN
+
+    Raises:
+        ProfileDenied: If profiling is disabled or the token does not match
+    """
+    expected = PROFILE_TOKEN if token is None else token
+    provided = headers.get("X-Profile-Token") or ""
+    if not expected or not hmac.compare_digest(provided.encode(), expected.encode()):
+        raise ProfileDenied("A valid X-Profile-Token header is required to profile requests")
+
+
+def resolve_profile(headers: Mapping[str, str], query: Mapping[str, str], token: Optional[str] = None,
+                    sample_rate: Optional[float] = None) -> Optional[ProfileSpec]:
+    """
+    Decide whether a request is profiled
+
+    A request asks to be profiled with an ``X-Profile`` header or a
+    ``profile`` query parameter (``1``/``sample`` or ``trace``), and must
+    carry the profiling token. Other requests are profiled, by sampling, at
+    PROFILE_SAMPLE_RATE. The profile is stored under the request's
+    ``X-Request-ID`` only when it was requested with the token; sampled
+    profiles get a generated id.
+
+    Args:
+        headers: Request headers
+        query: Query parameters
+        token: Expected token (default: PROFILE_TOKEN)
+        sample_rate: Share of other requests profiled (default: PROFILE_SAMPLE_RATE)
+
+    Returns:
+        ProfileSpec, or None if the request is not profiled
+
+    Raises:
+        ProfileDenied: If profiling was asked for without a valid token
+        ValueError: If the requested mode is unknown
+    """
+    requested = headers.get("X-Profile") or query.get("profile")
+    if requested:
+        mode = "sample" if requested.lower() in ("1", "true", "sample") else requested.lower()
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode: {requested}")
+        check_token(headers, token)
+        reason = "requested"
+    else:
+        rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        if rate <= 0 or random.random() >= rate:
+            return None
+        mode, reason = "sample", "sampled"
+
+    # Only token holders choose the id; a sampled request cannot overwrite someone else's profile
+    request_id = (headers.get("X-Request-ID") or "") if reason == "requested" else ""
+    if not REQUEST_ID.match(request_id):
+        request_id = uuid.uuid4().hex
+    return ProfileSpec(request_id, mode, reason)
+
+
+def _frame_label(code) -> str:
+    # Collapsed stacks separate frames with ";" and the count with the last space
+    path = code.co_filename.replace("\\", "/").split("/")
+    location = "/".join(path[-2:])
+    return f"{code.co_name} ({location}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the thread that entered it, from a background thread
+
+    Samples are aggregated as collapsed stacks, one ``frame;frame;... count``
+    line per distinct stack, which flame graph tools read directly. The cost
+    to the profiled thread is a stack walk per sample under the GIL.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000.0):
+        """
+        Args:
+            interval: Seconds between two samples
+        """
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._target: Optional[int] = None
+
+    def _stack(self, frame) -> str:
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = _frame_label(code)
+            labels.append(label)
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            self.stacks[self._stack(frame)] += 1
+            self.samples += 1
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def output(self) -> bytes:
+        """The samples as collapsed stacks"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()).encode("utf-8")
+
+
+class TracingProfiler:
+    """Records every call of the thread that entered it with cProfile"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.samples = None
+
+    def __enter__(self) -> "TracingProfiler":
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.profile.disable()
+
+    def output(self) -> bytes:
+        """The profile in the pstats file format, as Profile.dump_stats writes it"""
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+
+class ProfileStore:
+    """
+    Profiles on disk, keyed by request id
+
+    Each profile is stored next to a small JSON description; only the most
+    recent ``max_profiles`` are kept. Files are written atomically, so worker
+    processes can share the directory.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, max_profiles: int = PROFILE_MAX_PROFILES):
+        """
+        Args:
+            directory: Directory of the profiles (created if missing)
+            max_profiles: Number of profiles kept
+        """
+        self.directory = directory
+        self.max_profiles = max_profiles
+        os.makedirs(directory, exist_ok=True)
+
+    def _write(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def save(self, spec: ProfileSpec, data: bytes, info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Store a profile
+
+        Args:
+            spec: How the request was profiled
+            data: Profile file content
+            info: Further description (endpoint, duration, ...)
+
+        Returns:
+            The stored description
+        """
+        extension, _ = MODES[spec.mode]
+        info = {
+            "request_id": spec.request_id,
+            "mode": spec.mode,
+            "reason": spec.reason,
+            "file": f"{spec.request_id}.{extension}",
+            "bytes": len(data),
+            "created": datetime.now().isoformat(),
+            **info
+        }
+        self._write(os.path.join(self.directory, info["file"]), data)
+        self._write(os.path.join(self.directory, f"{spec.request_id}.json"), json.dumps(info).encode("utf-8"))
+        self._prune()
+        return info
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Descriptions of the stored profiles, newest first"""
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    with open(entry.path) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    # Removed or being replaced by another worker
+                    continue
+        profiles.sort(key=lambda info: info["created"], reverse=True)
+        return profiles
+
+    def get(self, request_id: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Find a stored profile
+
+        Args:
+            request_id: Request id the profile was stored under
+
+        Returns:
+            Tuple of (file path, media type, description), or None
+        """
+        if not REQUEST_ID.match(request_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{request_id}.json")) as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        path = os.path.join(self.directory, info["file"])
+        if not os.path.exists(path):
+            return None
+        return path, MODES[info["mode"]][1], info
+
+    def _prune(self) -> None:
+        for info in self.list()[self.max_profiles:]:
+            for name in (info["file"], f"{info['request_id']}.json"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+_profile_store: Optional[ProfileStore] = None
+_profile_store_lock = threading.Lock()
+
+
+def get_profile_store() -> ProfileStore:
+    """
+    Get this process's profile store, created on first use
+    """
+    global _profile_store
+
+    with _profile_store_lock:
+        if _profile_store is None:
+            _profile_store = ProfileStore()
+        return _profile_store
+
+
+def run_profiled(spec: Optional[ProfileSpec], endpoint: str, fn: Callable, *args, **kwargs) -> Any:
+    """
+    Call a function, under a profiler if the request is profiled
+
+    The profile is stored whether or not the call raises. Must run on the
+    thread that does the work, e.g. inside run_in_threadpool.
+
+    Args:
+        spec: From resolve_profile (None runs fn unprofiled)
+        endpoint: Endpoint name stored with the profile
+        fn: Function to call
+        *args, **kwargs: Arguments passed to fn
+
+    Returns:
+        What fn returns
+    """
+    if spec is None:
+        return fn(*args, **kwargs)
+
+    profiler = SamplingProfiler() if spec.mode == "sample" else TracingProfiler()
+    error = None
+    start = time.perf_counter()
+    try:
+        with profiler:
+            return fn(*args, **kwargs)
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        try:
+            get_profile_store().save(spec, profiler.output(), {
+                "endpoint": endpoint,
+                "duration_s": round(duration, 4),
+                "samples": profiler.samples,
+                "error": error
+            })
+            log.info("Stored request profile", request_id=spec.request_id, mode=spec.mode, endpoint=endpoint,
+                     seconds=round(duration, 2))
+        except Exception as e:
+            # A failing profile store must not fail the request
+            log.error("Could not store profile", request_id=spec.request_id, error=str(e))
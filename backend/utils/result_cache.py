@@ -0,0 +1,205 @@
+import os
+import json
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Bump when scoring changes so results of older code are not served
+ANALYSIS_VERSION = 1
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a submission so trivially different encodings of the same text share results
+
+    Args:
+        text: Submitted text
+
+    Returns:
+        NFC-normalized text with Unix line endings
+    """
+    return unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of an already normalized text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache of analysis results keyed by (text hash, corpus version, configuration)
+
+    Recent results are kept in an in-memory LRU; all results are also written
+    under ``<cache_dir>/<corpus version>/`` so worker processes share them.
+    The corpus version is part of every key, so a result is never served for
+    a corpus it was not computed against, while workers still on an older
+    index generation keep using theirs. The disk tier is bounded by total size
+    across all versions: results of versions no longer read are the least
+    recently used and are removed first.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = 256, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: Directory of the disk tier (None keeps results in memory only)
+            max_entries: Number of results kept in memory
+            max_bytes: Maximum total size of the disk tier
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._disk_bytes = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    @staticmethod
+    def _key(text_digest: str, config: Dict[str, Any]) -> str:
+        digest = hashlib.sha256(text_digest.encode("utf-8"))
+        digest.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, corpus_version: str, key: str) -> str:
+        return os.path.join(self.cache_dir, corpus_version or "empty", key[:2], key + ".json")
+
+    def get(self, text_digest: str, corpus_version: str, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result
+
+        Args:
+            text_digest: text_hash of the normalized submission
+            corpus_version: CorpusIndex.version the result must be computed against
+            config: Everything else that affects the result (endpoint, options, model settings)
+
+        Returns:
+            The cached result, or None
+        """
+        entry = (corpus_version, self._key(text_digest, config))
+        with self._lock:
+            self._version = corpus_version
+            cached = self._memory.get(entry)
+            if cached is not None:
+                self._memory.move_to_end(entry)
+                self.hits += 1
+                return json.loads(cached)
+
+        cached = self._read_disk(*entry)
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(entry, cached)
+        return json.loads(cached)
+
+    def put(self, text_digest: str, corpus_version: str, config: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """
+        Store a result; arguments as for get
+        """
+        entry = (corpus_version, self._key(text_digest, config))
+        data = json.dumps(result)
+        with self._lock:
+            self._remember(entry, data)
+        if self.cache_dir:
+            self._write_disk(*entry, data)
+
+    def _remember(self, entry: Tuple[str, str], data: str) -> None:
+        self._memory[entry] = data
+        self._memory.move_to_end(entry)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, corpus_version: str, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        path = self._path(corpus_version, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = f.read()
+            # Mark as recently used for eviction
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, corpus_version: str, key: str, data: str) -> None:
+        path = self._path(corpus_version, key)
+        encoded = data.encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.error("Error writing result cache", error=str(e))
+            return
+
+        with self._lock:
+            self._disk_bytes += len(encoded)
+            over_limit = self._disk_bytes > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def _disk_files(self) -> List[Tuple[float, int, str]]:
+        files = []
+        for version in os.scandir(self.cache_dir):
+            if not version.is_dir():
+                continue
+            for shard in os.scandir(version.path):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _evict(self) -> None:
+        """Remove least recently used files, of any version, until the disk tier is at 90% of its limit"""
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        emptied = set()
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                emptied.add(os.path.dirname(path))
+            except OSError:
+                pass
+        # Remove directories left empty; rmdir fails harmlessly on ones still in use
+        for shard in emptied:
+            for path in (shard, os.path.dirname(shard)):
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    break
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "corpus_version": self._version,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
@@ -0,0 +1,499 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.batching import MicroBatcher
+from utils.nft_registry import NFTRecord, NFTRegistry, check_update_fields, parse_page_args
+
+# Storage of uploads and NFTs: "sqlite" (shared by all worker processes) or "memory"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+STORAGE_PATH = os.getenv("STORAGE_PATH", os.path.join("data", "backend.sqlite"))
+
+# Records kept in each worker's read cache
+STORAGE_CACHE_ENTRIES = int(os.getenv("STORAGE_CACHE_ENTRIES", "1024"))
+
+# Writes queued while a transaction commits go into the next one; a wait adds
+# writes arriving within that many milliseconds, trading latency for fewer syncs
+STORAGE_BATCH_WAIT_MS = float(os.getenv("STORAGE_BATCH_WAIT_MS", "0"))
+STORAGE_BATCH_SIZE = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nfts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    wallet_address TEXT,
+    student_name TEXT,
+    ipfs_cid TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS nfts_wallet_address ON nfts (wallet_address, seq);
+CREATE INDEX IF NOT EXISTS nfts_student_name ON nfts (student_name, seq);
+CREATE INDEX IF NOT EXISTS nfts_ipfs_cid ON nfts (ipfs_cid, seq);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL,
+    finished_at REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at);
+"""
+
+
+def _json_default(value: Any) -> Any:
+    # numpy scalars and arrays in analysis results
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class MemoryStorage:
+    """
+    Uploads and NFTs in process memory
+
+    Nothing survives a restart and every worker process has its own copy;
+    meant for tests and single-process development.
+    """
+
+    def __init__(self):
+        self._uploads: Dict[str, Dict[str, Any]] = {}
+        self._nfts = NFTRegistry()
+        self._meta: Dict[str, str] = {}
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    def put_upload(self, upload: Dict[str, Any]) -> None:
+        """
+        Store an upload record
+
+        Args:
+            upload: Record with at least an "id"
+        """
+        self._uploads[upload["id"]] = dict(upload)
+
+    def get_upload(self, file_id: str) -> Optional[Dict[str, Any]]:
+        upload = self._uploads.get(file_id)
+        return dict(upload) if upload is not None else None
+
+    def add_nfts(self, records: List[NFTRecord], skip_existing: bool = False) -> None:
+        """
+        Append NFT records
+
+        Args:
+            records: Records to add, in order
+            skip_existing: Silently skip ids already stored instead of raising
+
+        Raises:
+            ValueError: On a duplicate id, unless skip_existing
+        """
+        for record in records:
+            if skip_existing and record.id in self._nfts:
+                continue
+            self._nfts.add(record)
+
+    def add_nft(self, record: NFTRecord) -> NFTRecord:
+        self.add_nfts([record])
+        return record
+
+    def get_nft(self, nft_id: str) -> Optional[NFTRecord]:
+        return self._nfts.get(nft_id)
+
+    def update_nft(self, nft_id: str, **fields: Any) -> bool:
+        """
+        Set fields of an NFT
+
+        Returns:
+            False if there is no NFT with that id
+        """
+        return self._nfts.update(nft_id, **fields)
+
+    def page_nfts(self, cursor: Optional[str] = None, limit: int = 50,
+                  **filters: Any) -> Tuple[List[NFTRecord], Optional[str]]:
+        """Read NFTs a page at a time; see NFTRegistry.page"""
+        return self._nfts.page(cursor, limit, **filters)
+
+    def iter_nfts(self) -> Iterator[NFTRecord]:
+        """Every NFT, oldest first"""
+        return iter(self._nfts)
+
+    def get_meta(self, key: str) -> Optional[str]:
+        return self._meta.get(key)
+
+    def set_meta(self, key: str, value: str) -> None:
+        self._meta[key] = value
+
+    def put_job(self, job: Dict[str, Any], wait: bool = True) -> None:
+        """Store a job's state unless a later revision of it is stored; see SQLiteStorage.put_job"""
+        stored = self._jobs.get(job["job_id"])
+        if stored is None or job["revision"] > stored["revision"]:
+            self._jobs[job["job_id"]] = json.loads(json.dumps(job, default=_json_default))
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def prune_jobs(self, keep: int) -> None:
+        """Remove all but the ``keep`` most recently finished jobs"""
+        finished = sorted((job for job in self._jobs.values() if job.get("finished_at") is not None),
+                          key=lambda job: job["finished_at"], reverse=True)
+        for job in finished[keep:]:
+            del self._jobs[job["job_id"]]
+
+    def close(self) -> None:
+        pass
+
+
+class _LRU:
+    """Small thread-safe least-recently-used map"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+class SQLiteStorage:
+    """
+    Uploads and NFTs in an SQLite database in WAL mode
+
+    Several worker processes can share one database file. Writes from
+    concurrent requests are group-committed: a writer thread runs all writes
+    queued while the previous transaction committed in one transaction, and
+    each request returns once its write is durable. Reads go through a bounded
+    per-process cache that is dropped whenever another connection commits,
+    so workers never serve each other stale records.
+    """
+
+    def __init__(self, path: str, cache_entries: int = 1024, batch_wait: float = 0.0,
+                 batch_size: int = STORAGE_BATCH_SIZE):
+        """
+        Args:
+            path: Database file (created with its directory if missing)
+            cache_entries: Records kept in the read cache
+            batch_wait: Seconds the writer waits for more writes after the first
+            batch_size: Maximum writes per transaction
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._read_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._reader = self._connect()
+        self._reader.executescript(_SCHEMA)
+        self._data_version = None
+        # Text of uploads can be large, so fewer of them are cached
+        self._upload_cache = _LRU(max(1, cache_entries // 16))
+        self._nft_cache = _LRU(cache_entries)
+
+        self._writer: Optional[sqlite3.Connection] = None
+        self._batcher = MicroBatcher(self._run_writes, max_batch_size=batch_size, max_wait=batch_wait,
+                                     name="storage-writer")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # Every commit is synced; group commit is what keeps that affordable
+        connection.execute("PRAGMA synchronous=FULL")
+        return connection
+
+    def _check_process(self) -> None:
+        """Reopen the reader in a forked child; SQLite connections must not cross a fork"""
+        if self._pid != os.getpid():
+            with self._read_lock:
+                if self._pid != os.getpid():
+                    self._reader = self._connect()
+                    self._writer = None
+                    self._data_version = None
+                    self._upload_cache.clear()
+                    self._nft_cache.clear()
+                    self._pid = os.getpid()
+
+    def _run_writes(self, writes: List[Tuple[str, Tuple]], _params: Any) -> List[Any]:
+        """
+        Commit a batch of (sql, args) writes; runs on the writer thread
+
+        Returns:
+            Per write, its row count or the exception it raised
+        """
+        self._check_process()
+        if self._writer is None:
+            self._writer = self._connect()
+        db = self._writer
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            counts = [db.execute(sql, args).rowcount for sql, args in writes]
+            db.execute("COMMIT")
+            return counts
+        except sqlite3.Error:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+
+        # One write failed (e.g. a duplicate id): apply them one by one so the others still succeed
+        results = []
+        for sql, args in writes:
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                results.append(db.execute(sql, args).rowcount)
+                db.execute("COMMIT")
+            except sqlite3.Error as e:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                results.append(e)
+        return results
+
+    def _write(self, sql: str, args: Tuple) -> int:
+        result = self._batcher.submit((sql, args)).result()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _read(self, sql: str, args: Tuple = ()) -> List[Tuple]:
+        self._check_process()
+        with self._read_lock:
+            return self._reader.execute(sql, args).fetchall()
+
+    def _check_cache(self) -> None:
+        """Drop cached records if anyone committed since the last read"""
+        self._check_process()
+        with self._read_lock:
+            version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self._upload_cache.clear()
+                self._nft_cache.clear()
+                self._data_version = version
+
+    def put_upload(self, upload: Dict[str, Any]) -> None:
+        """
+        Store an upload record
+
+        Args:
+            upload: JSON-serializable record with at least an "id"
+        """
+        self._write("INSERT OR REPLACE INTO uploads (id, data) VALUES (?, ?)",
+                    (upload["id"], json.dumps(upload)))
+
+    def get_upload(self, file_id: str) -> Optional[Dict[str, Any]]:
+        self._check_cache()
+        upload = self._upload_cache.get(file_id)
+        if upload is None:
+            rows = self._read("SELECT data FROM uploads WHERE id = ?", (file_id,))
+            if not rows:
+                return None
+            upload = json.loads(rows[0][0])
+            self._upload_cache.put(file_id, upload)
+        return dict(upload)
+
+    @staticmethod
+    def _nft_row(record: NFTRecord) -> Tuple:
+        data = {field: getattr(record, field) for field in NFTRecord.__slots__}
+        return record.id, record.wallet_address, record.student_name, record.ipfs_cid, json.dumps(data)
+
+    def add_nfts(self, records: List[NFTRecord], skip_existing: bool = False) -> None:
+        """
+        Append NFT records
+
+        Args:
+            records: Records to add, in order
+            skip_existing: Silently skip ids already stored instead of raising
+
+        Raises:
+            ValueError: On a duplicate id, unless skip_existing
+        """
+        verb = "INSERT OR IGNORE" if skip_existing else "INSERT"
+        sql = f"{verb} INTO nfts (id, wallet_address, student_name, ipfs_cid, data) VALUES (?, ?, ?, ?, ?)"
+        futures = [self._batcher.submit((sql, self._nft_row(record))) for record in records]
+        for record, future in zip(records, futures):
+            result = future.result()
+            if isinstance(result, sqlite3.IntegrityError):
+                raise ValueError(f"Duplicate NFT id: {record.id}")
+            if isinstance(result, Exception):
+                raise result
+
+    def add_nft(self, record: NFTRecord) -> NFTRecord:
+        self.add_nfts([record])
+        return record
+
+    def get_nft(self, nft_id: str) -> Optional[NFTRecord]:
+        self._check_cache()
+        record = self._nft_cache.get(nft_id)
+        if record is None:
+            rows = self._read("SELECT data FROM nfts WHERE id = ?", (nft_id,))
+            if not rows:
+                return None
+            record = NFTRecord(**json.loads(rows[0][0]))
+            self._nft_cache.put(nft_id, record)
+        return record
+
+    def update_nft(self, nft_id: str, **fields: Any) -> bool:
+        """
+        Set fields of an NFT in one atomic statement, safe against other workers
+
+        Returns:
+            False if there is no NFT with that id
+        """
+        check_update_fields(fields)
+        if not fields:
+            return self.get_nft(nft_id) is not None
+
+        assignments = []
+        args: List[Any] = []
+        data = "data"
+        for field, value in fields.items():
+            data = f"json_set({data}, '$.{field}', json(?))"
+            args.append(json.dumps(value))
+        assignments.append(f"data = {data}")
+        for field in NFTRegistry.INDEXED_FIELDS:
+            if field in fields:
+                assignments.append(f"{field} = ?")
+                args.append(fields[field])
+
+        updated = self._write(f"UPDATE nfts SET {', '.join(assignments)} WHERE id = ?", (*args, nft_id))
+        self._nft_cache.discard(nft_id)
+        return updated > 0
+
+    def page_nfts(self, cursor: Optional[str] = None, limit: int = 50,
+                  **filters: Any) -> Tuple[List[NFTRecord], Optional[str]]:
+        """
+        Read NFTs in insertion order, a page at a time
+
+        Args:
+            cursor: next_cursor of the previous page, or None for the first page
+            limit: Maximum number of NFTs
+            **filters: Required values of NFTRegistry.INDEXED_FIELDS
+
+        Returns:
+            Tuple of (NFTs, cursor of the next page or None after the last page)
+
+        Raises:
+            ValueError: For malformed cursors or filters on fields without an index
+        """
+        start = parse_page_args(cursor, limit, filters)
+        conditions = ["seq >= ?"] + [f"{field} = ?" for field in filters]
+        rows = self._read(
+            f"SELECT seq, data FROM nfts WHERE {' AND '.join(conditions)} ORDER BY seq LIMIT ?",
+            (start, *filters.values(), limit + 1)
+        )
+        records = [NFTRecord(**json.loads(data)) for _, data in rows[:limit]]
+        next_cursor = str(rows[limit][0]) if len(rows) > limit else None
+        return records, next_cursor
+
+    def iter_nfts(self) -> Iterator[NFTRecord]:
+        """Every NFT, oldest first"""
+        for (data,) in self._read("SELECT data FROM nfts ORDER BY seq"):
+            yield NFTRecord(**json.loads(data))
+
+    def get_meta(self, key: str) -> Optional[str]:
+        rows = self._read("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self._write("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def put_job(self, job: Dict[str, Any], wait: bool = True) -> None:
+        """
+        Store a job's state unless a later revision of it is stored
+
+        Job state is written on every status or progress change, from
+        threads that must not wait for the commit, so writes may be queued
+        without waiting; the revision check keeps a late write of an older
+        state from replacing a newer one.
+
+        Args:
+            job: Job.to_record(), JSON-serializable apart from numpy values
+            wait: Return only once the write is committed
+        """
+        sql = ("INSERT INTO jobs (id, revision, finished_at, data) VALUES (?, ?, ?, ?) "
+               "ON CONFLICT (id) DO UPDATE SET revision = excluded.revision, finished_at = excluded.finished_at, "
+               "data = excluded.data WHERE excluded.revision > jobs.revision")
+        args = (job["job_id"], job["revision"], job.get("finished_at"), json.dumps(job, default=_json_default))
+        if wait:
+            self._write(sql, args)
+        else:
+            self._batcher.submit((sql, args))
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # Not cached: the state of a running job changes all the time
+        rows = self._read("SELECT data FROM jobs WHERE id = ?", (job_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def prune_jobs(self, keep: int) -> None:
+        """Remove all but the ``keep`` most recently finished jobs, without waiting"""
+        self._batcher.submit((
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND id NOT IN "
+            "(SELECT id FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?)",
+            (keep,)
+        ))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "path": self.path, **self._batcher.stats()}
+
+    def close(self) -> None:
+        with self._read_lock:
+            self._reader.close()
+
+
+def create_storage(name: str, path: Optional[str] = None):
+    """
+    Create a storage backend by name
+
+    Args:
+        name: "sqlite" or "memory"
+        path: Database file of the sqlite backend (default: STORAGE_PATH)
+
+    Returns:
+        Storage instance
+    """
+    if name == "sqlite":
+        return SQLiteStorage(path or STORAGE_PATH, cache_entries=STORAGE_CACHE_ENTRIES,
+                             batch_wait=STORAGE_BATCH_WAIT_MS / 1000)
+    if name == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """
+    Get this process's storage, created from STORAGE_* environment variables on first use
+    """
+    global _storage
+
+    with _storage_lock:
+        if _storage is None:
+            _storage = create_storage(STORAGE_BACKEND)
+        return _storage
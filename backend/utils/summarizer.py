@@ -1,7 +1,13 @@
 from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
 import os
+import threading
+import time
 import torch
-from typing import Optional, List
+from typing import Optional, List, Tuple, Dict, Any
+from utils.summary_service import SummaryCache, SummaryService, extractive_summary
+from utils.log import get_logger
+
+log = get_logger(__name__)
 
 # Check if GPU is available
 device = 0 if torch.cuda.is_available() else -1
@@ -13,35 +19,132 @@ MODEL_NAME = "t5-small"  # Alternative: "google/pegasus-xsum"
 MODELS_DIR = "models"
 os.makedirs(MODELS_DIR, exist_ok=True)
 
+# Summary cache on disk, shared by worker processes (empty string disables it)
+SUMMARY_CACHE_DIR = os.getenv("SUMMARY_CACHE_DIR", os.path.join(MODELS_DIR, "summary_cache"))
+
+# Model variant: "fp32" (default), "int8" (dynamically quantized linear layers)
+# or "onnx" (exported with optimum and run on onnxruntime, an optional dependency)
+SUMMARIZER_BACKEND = os.getenv("SUMMARIZER_BACKEND", "fp32")
+
+# Short input run once after loading so the first real request skips one-time setup costs
+WARMUP_TEXT = (
+    "The committee reviewed the proposal and agreed that the project should continue. "
+    "Funding will be reviewed again after the first year of work."
+)
+
 # Initialize summarization pipeline
 summarizer = None
 
-def load_summarizer():
+# "idle" until a load starts, then "loading", "ready" or "failed"
+summarizer_state = "idle"
+_load_lock = threading.Lock()
+_warmed_up = False
+_load_thread = None
+_load_thread_lock = threading.Lock()
+
+# Batching and caching service around the pipeline
+summary_service = None
+_service_lock = threading.Lock()
+
+def build_model(backend: str = SUMMARIZER_BACKEND):
+    """
+    Load the summarization model in the requested variant
+    
+    Args:
+        backend: "fp32", "int8" or "onnx"
+        
+    Returns:
+        Model usable by the transformers summarization pipeline
+    """
+    if backend == "onnx":
+        # Optional dependency: pip install optimum[onnxruntime]
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        onnx_dir = os.path.join(MODELS_DIR, f"{MODEL_NAME}-onnx")
+        if os.path.isdir(onnx_dir):
+            return ORTModelForSeq2SeqLM.from_pretrained(onnx_dir)
+        model = ORTModelForSeq2SeqLM.from_pretrained(MODEL_NAME, export=True, cache_dir=MODELS_DIR)
+        # Export once; later starts load the saved ONNX graphs
+        model.save_pretrained(onnx_dir)
+        return model
+    
+    model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME, cache_dir=MODELS_DIR)
+    model.eval()
+    if backend == "int8":
+        # CPU-only: int8 weights for the linear layers, activations quantized on the fly
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif backend != "fp32":
+        raise ValueError(f"Unknown summarizer backend: {backend}")
+    return model
+
+def load_summarizer(backend: str = SUMMARIZER_BACKEND, warmup: bool = True):
     """
     Load the summarization model
+    
+    Concurrent callers wait for a load in progress instead of loading twice.
+    
+    Args:
+        backend: Model variant, see build_model
+        warmup: Run one short summary after loading
     """
-    global summarizer
+    global summarizer, summarizer_state, _warmed_up
     
-    if summarizer is None:
+    with _load_lock:
+        if summarizer is not None:
+            # Loaded by a pre-fork server master, which leaves warming up to each worker
+            if warmup and not _warmed_up:
+                summarizer(WARMUP_TEXT, max_length=20, min_length=5, do_sample=False)
+                _warmed_up = True
+            return
+        
+        summarizer_state = "loading"
         try:
             # Load tokenizer and model
-            print(f"Loading summarization model: {MODEL_NAME}")
+            log.info("Loading summarization model", model=MODEL_NAME, backend=backend)
+            start = time.perf_counter()
             tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, cache_dir=MODELS_DIR)
-            model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME, cache_dir=MODELS_DIR)
+            model = build_model(backend)
             
             # Create summarization pipeline
-            summarizer = pipeline(
+            pipe = pipeline(
                 "summarization",
                 model=model,
                 tokenizer=tokenizer,
-                device=device
+                device=device if backend == "fp32" else -1
             )
             
-            print(f"Successfully loaded summarization model: {MODEL_NAME}")
+            if warmup:
+                pipe(WARMUP_TEXT, max_length=20, min_length=5, do_sample=False)
+                _warmed_up = True
+            
+            summarizer = pipe
+            summarizer_state = "ready"
+            log.info("Loaded summarization model", model=MODEL_NAME, seconds=round(time.perf_counter() - start, 1))
         except Exception as e:
-            print(f"Error loading summarization model: {str(e)}")
+            log.exception("Error loading summarization model", model=MODEL_NAME, error=str(e))
             # Fallback to a simple extractive summarization
             summarizer = None
+            summarizer_state = "failed"
+
+def start_background_load(backend: str = SUMMARIZER_BACKEND) -> threading.Thread:
+    """
+    Load and warm up the model on a background thread so the API can serve
+    other routes meanwhile; summary requests wait for the load to finish
+    
+    Args:
+        backend: Model variant, see build_model
+        
+    Returns:
+        The loading thread (the running one if a load was already started)
+    """
+    global _load_thread
+    
+    with _load_thread_lock:
+        if _load_thread is None or (not _load_thread.is_alive() and summarizer is None):
+            _load_thread = threading.Thread(
+                target=load_summarizer, args=(backend,), name="summarizer-load", daemon=True
+            )
+            _load_thread.start()
+        return _load_thread
 
 def chunk_text(text: str, max_length: int = 1024) -> List[str]:
     """
@@ -86,95 +189,77 @@ def generate_summary(text: str, max_length: int = 150, min_length: int = 40) ->
     Returns:
         Generated summary
     """
-    # Load summarizer if not already loaded
-    if summarizer is None:
-        load_summarizer()
-    
     # If text is too short, return it as is
     if len(text.split()) < min_length:
         return text
     
+    # Load summarizer if not already loaded (waits for a background load in progress)
+    if summarizer is None:
+        load_summarizer()
+    
     try:
         if summarizer:
-            # Chunk text if it's too long
-            if len(text) > 1024:
-                chunks = chunk_text(text)
-                chunk_summaries = []
-                
-                for chunk in chunks:
-                    try:
-                        # Generate summary for each chunk
-                        summary = summarizer(
-                            chunk,
-                            max_length=max_length // len(chunks),
-                            min_length=min_length // len(chunks),
-                            do_sample=False
-                        )
-                        chunk_summaries.append(summary[0]['summary_text'])
-                    except Exception as chunk_error:
-                        print(f"Error summarizing chunk: {str(chunk_error)}")
-                        # Use first few sentences as fallback
-                        chunk_summaries.append(extractive_summary(chunk, sentences=1))
-                
-                # Combine chunk summaries
-                combined_summary = " ".join(chunk_summaries)
-                
-                # If combined summary is still too long, summarize it again
-                if len(combined_summary.split()) > max_length:
-                    try:
-                        final_summary = summarizer(
-                            combined_summary,
-                            max_length=max_length,
-                            min_length=min_length,
-                            do_sample=False
-                        )
-                        return final_summary[0]['summary_text']
-                    except Exception as final_error:
-                        print(f"Error generating final summary: {str(final_error)}")
-                        return extractive_summary(combined_summary, sentences=3)
-                
-                return combined_summary
-            else:
-                # Generate summary directly
-                try:
-                    summary = summarizer(
-                        text,
-                        max_length=max_length,
-                        min_length=min_length,
-                        do_sample=False
-                    )
-                    return summary[0]['summary_text']
-                except Exception as direct_error:
-                    print(f"Error generating direct summary: {str(direct_error)}")
-                    return extractive_summary(text, sentences=3)
+            return get_summary_service().summarize(text, max_length, min_length)
         else:
             # Fallback to a simple extractive summary
-            print("Using extractive summary fallback")
+            log.debug("Using extractive summary fallback", sample=True)
             return extractive_summary(text, sentences=3)
     except Exception as e:
-        print(f"Error generating summary: {str(e)}")
+        log.exception("Error generating summary", error=str(e))
         return extractive_summary(text, sentences=3)
 
-def extractive_summary(text: str, sentences: int = 3) -> str:
+def summarize_batch(texts: List[str], params: Tuple[int, int]) -> List[str]:
     """
-    Generate a simple extractive summary by selecting the first few sentences
+    Summarize several texts in one pipeline call
     
     Args:
-        text: The text to summarize
-        sentences: Number of sentences to include
+        texts: Texts to summarize
+        params: (max_length, min_length) in tokens
         
     Returns:
-        Extractive summary
+        One summary per text
     """
-    # Split text into sentences
-    text_sentences = [s.strip() for s in text.replace('\n', ' ').split('.') if s.strip()]
-    
-    # Select the first few sentences
-    summary_sentences = text_sentences[:sentences]
-    
-    # Join sentences into a summary
-    summary = ". ".join(summary_sentences)
-    if not summary.endswith("."):
-        summary += "."
+    max_length, min_length = params
+    summaries = summarizer(
+        texts,
+        max_length=max_length,
+        min_length=min_length,
+        do_sample=False,
+        batch_size=len(texts)
+    )
+    return [summary['summary_text'] for summary in summaries]
+
+def get_summary_service() -> SummaryService:
+    """
+    Get the shared summarization service, creating it on first use
+    """
+    global summary_service
     
-    return summary
\ No newline at end of file
+    with _service_lock:
+        if summary_service is None:
+            cache = SummaryCache(
+                cache_dir=SUMMARY_CACHE_DIR or None,
+                max_entries=int(os.getenv("SUMMARY_CACHE_ENTRIES", "1024")),
+                max_bytes=int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+            )
+            summary_service = SummaryService(
+                summarize_batch,
+                chunker=chunk_text,
+                fallback=lambda text, sentences: extractive_summary(text, sentences=sentences),
+                cache=cache,
+                # int8/onnx summaries differ from fp32 ones; the disk tier is shared by all deployments
+                model_name=f"{MODEL_NAME}:{SUMMARIZER_BACKEND}",
+                max_batch_size=int(os.getenv("SUMMARY_BATCH_SIZE", "8")),
+                max_wait=float(os.getenv("SUMMARY_BATCH_WAIT_MS", "10")) / 1000.0
+            )
+        return summary_service
+
+def get_summary_metrics() -> Dict[str, Any]:
+    """
+    Get cache and batching metrics of the summarization service
+    """
+    metrics = get_summary_service().metrics()
+    metrics["model_loaded"] = summarizer is not None
+    metrics["model_state"] = summarizer_state
+    metrics["model_backend"] = SUMMARIZER_BACKEND
+    return metrics
@@ -0,0 +1,282 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.batching import MicroBatcher
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+class SummaryCache:
+    """
+    Two-tier cache of summaries keyed by a content hash
+
+    Recent summaries are kept in an in-memory LRU; all summaries are also
+    written to a sharded directory on disk so they survive restarts and are
+    shared between worker processes. The disk tier is bounded by total size:
+    once it grows past ``max_bytes`` the least recently used files are removed.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: Directory of the disk tier (None keeps summaries in memory only)
+            max_entries: Number of summaries kept in memory
+            max_bytes: Maximum total size of the disk tier
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._disk_bytes = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    @staticmethod
+    def make_key(text: str, *params: Any) -> str:
+        """
+        Hash a text and the parameters that affect its summary
+
+        Args:
+            text: Source text
+            *params: Model name, length limits and similar settings
+
+        Returns:
+            Hex digest used as the cache key
+        """
+        digest = hashlib.sha256(text.encode("utf-8"))
+        digest.update(repr(params).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".txt")
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        summary = self._read_disk(key)
+        with self._lock:
+            if summary is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, summary)
+            return summary
+
+    def put(self, key: str, summary: str) -> None:
+        with self._lock:
+            self._remember(key, summary)
+        if self.cache_dir:
+            self._write_disk(key, summary)
+
+    def _remember(self, key: str, summary: str) -> None:
+        self._memory[key] = summary
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                summary = f.read()
+            # Mark as recently used for eviction
+            os.utime(path)
+            return summary
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, summary: str) -> None:
+        path = self._path(key)
+        data = summary.encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.error("Error writing summary cache", error=str(e))
+            return
+
+        with self._lock:
+            self._disk_bytes += len(data)
+            over_limit = self._disk_bytes > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def _disk_files(self) -> List[Tuple[float, int, str]]:
+        files = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".txt"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _evict(self) -> None:
+        """Remove least recently used files until the disk tier is at 90% of its limit"""
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
+
+
+class SummaryService:
+    """
+    Summarizes texts with a batched model call and a summary cache
+
+    Long texts are split into chunks that are summarized in one batch
+    together with chunks of other concurrent requests; the joined chunk
+    summaries are summarized again if still too long. Summaries are cached
+    by content hash, so the same document is only summarized once.
+    """
+
+    def __init__(self, run_batch: Callable[[List[str], Tuple[int, int]], List[str]],
+                 chunker: Callable[[str], List[str]], fallback: Callable[[str, int], str],
+                 cache: Optional[SummaryCache] = None, model_name: str = "",
+                 max_input_chars: int = 1024, max_batch_size: int = 8, max_wait: float = 0.01):
+        """
+        Args:
+            run_batch: Summarizes a list of texts with (max_length, min_length)
+            chunker: Splits a long text into model-sized chunks
+            fallback: Extractive summary of (text, sentences), used when a model call fails
+            cache: Summary cache (default: in-memory SummaryCache)
+            model_name: Included in cache keys so a model change invalidates them
+            max_input_chars: Texts longer than this are chunked
+            max_batch_size: Maximum chunks per model call
+            max_wait: Seconds to wait for concurrent chunks to join a batch
+        """
+        self.batcher = MicroBatcher(run_batch, max_batch_size, max_wait, name="summary-batcher")
+        self.chunker = chunker
+        self.fallback = fallback
+        self.cache = cache or SummaryCache()
+        self.model_name = model_name
+        self.max_input_chars = max_input_chars
+
+    def summarize(self, text: str, max_length: int = 150, min_length: int = 40) -> str:
+        """
+        Summarize a text, using the cache when possible
+
+        Args:
+            text: The text to summarize
+            max_length: Maximum summary length in tokens
+            min_length: Minimum summary length in tokens
+
+        Returns:
+            Generated summary
+        """
+        key = SummaryCache.make_key(text, self.model_name, max_length, min_length)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        summary, complete = self._summarize(text, max_length, min_length)
+        # Summaries that fell back to extraction are not cached, so a later call can retry the model
+        if complete:
+            self.cache.put(key, summary)
+        return summary
+
+    def _summarize(self, text: str, max_length: int, min_length: int) -> Tuple[str, bool]:
+        if len(text) <= self.max_input_chars:
+            try:
+                return self.batcher.submit(text, (max_length, min_length)).result(), True
+            except Exception as direct_error:
+                log.exception("Error generating direct summary", error=str(direct_error))
+                return self.fallback(text, 3), False
+
+        chunks = self.chunker(text)
+        if not chunks:
+            return self.fallback(text, 3), False
+        params = (max_length // len(chunks), min_length // len(chunks))
+        # Submit every chunk before waiting so they share batches
+        futures = [self.batcher.submit(chunk, params) for chunk in chunks]
+
+        complete = True
+        chunk_summaries = []
+        for chunk, future in zip(chunks, futures):
+            try:
+                chunk_summaries.append(future.result())
+            except Exception as chunk_error:
+                log.exception("Error summarizing chunk", error=str(chunk_error))
+                # Use first few sentences as fallback
+                chunk_summaries.append(self.fallback(chunk, 1))
+                complete = False
+
+        combined_summary = " ".join(chunk_summaries)
+
+        # If combined summary is still too long, summarize it again
+        if len(combined_summary.split()) > max_length:
+            try:
+                return self.batcher.submit(combined_summary, (max_length, min_length)).result(), complete
+            except Exception as final_error:
+                log.exception("Error generating final summary", error=str(final_error))
+                return self.fallback(combined_summary, 3), False
+
+        return combined_summary, complete
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "cache": self.cache.stats(),
+            "batching": self.batcher.stats(),
+        }
+
+
+def extractive_summary(text: str, sentences: int = 3) -> str:
+    """
+    Generate a simple extractive summary by selecting the first few sentences
+
+    Args:
+        text: The text to summarize
+        sentences: Number of sentences to include
+
+    Returns:
+        Extractive summary
+    """
+    # Split text into sentences
+    text_sentences = [s.strip() for s in text.replace('\n', ' ').split('.') if s.strip()]
+
+    # Select the first few sentences
+    summary_sentences = text_sentences[:sentences]
+
+    # Join sentences into a summary
+    summary = ". ".join(summary_sentences)
+    if not summary.endswith("."):
+        summary += "."
+
+    return summary
@@ -0,0 +1,290 @@
+import os
+import re
+import zipfile
+import threading
+import multiprocessing
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from utils.text_pipeline import get_pipeline
+
+# Maximum characters extracted from one upload before giving up
+MAX_EXTRACTED_CHARS = int(os.getenv("MAX_EXTRACTED_CHARS", str(5_000_000)))
+
+# PDF pages extracted per worker task, and number of worker processes
+PDF_PAGES_PER_TASK = 8
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+
+# PDFs with fewer pages are extracted in-process; sending them to the pool costs more than it saves
+PDF_PARALLEL_MIN_PAGES = 32
+
+# Block size for reading plain text files
+TXT_BLOCK_CHARS = 1 << 16
+
+# Word characters at the very end of a piece
+_TRAILING_WORD = re.compile(r'\w+$')
+
+_DOCX_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class ExtractionLimitError(Exception):
+    """Raised when an upload contains more text than MAX_EXTRACTED_CHARS"""
+
+
+def _pdf_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract pages [start, stop) of a PDF; runs in a worker process with its own reader"""
+    import PyPDF2
+
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return [(reader.pages[i].extract_text() or "") + "\n" for i in range(start, stop)]
+
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_pid: Optional[int] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def get_pdf_pool(workers: int = PDF_WORKERS) -> ProcessPoolExecutor:
+    """
+    Get this process's PDF extraction pool, created on first use
+
+    Args:
+        workers: Number of worker processes, used when this call creates the pool
+    """
+    global _pdf_pool, _pdf_pool_pid
+
+    with _pdf_pool_lock:
+        # A pool inherited through fork has no workers of this process
+        if _pdf_pool is None or _pdf_pool_pid != os.getpid():
+            # Spawned workers do not inherit the server's threads and locks
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pdf_pool_pid = os.getpid()
+        return _pdf_pool
+
+
+def _discard_pdf_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool (a worker died) so the next extraction starts a new one"""
+    global _pdf_pool
+
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False)
+
+
+def iter_pdf_pages(file_path: str, workers: int = PDF_WORKERS) -> Iterator[str]:
+    """
+    Yield the text of each PDF page, in order
+
+    Page ranges of long PDFs are extracted on a process pool shared by all
+    extractions of this process. Only a few ranges are in flight at a time,
+    so a long document is never held in memory at once.
+
+    Args:
+        file_path: Path to the PDF
+        workers: Number of worker processes (1 extracts in-process)
+
+    Yields:
+        Text of each page, newline terminated
+    """
+    import PyPDF2
+
+    with open(file_path, 'rb') as file:
+        page_count = len(PyPDF2.PdfReader(file).pages)
+
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+
+    if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+        for start, stop in ranges:
+            yield from _pdf_page_range(file_path, start, stop)
+        return
+
+    executor = get_pdf_pool(workers)
+    in_flight = deque()
+    pending = iter(ranges)
+    try:
+        for start, stop in pending:
+            in_flight.append(executor.submit(_pdf_page_range, file_path, start, stop))
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            pages = in_flight.popleft().result()
+            next_range = next(pending, None)
+            if next_range is not None:
+                in_flight.append(executor.submit(_pdf_page_range, file_path, *next_range))
+            yield from pages
+    except BrokenProcessPool:
+        _discard_pdf_pool(executor)
+        raise
+    finally:
+        # Abandoned generator (e.g. the size cap was hit): drop queued work
+        for future in in_flight:
+            future.cancel()
+
+
+def iter_docx_paragraphs(file_path: str) -> Iterator[str]:
+    """
+    Yield the text of each DOCX paragraph, in order
+
+    The document XML is parsed incrementally and each paragraph is freed
+    once read, instead of building the whole document object model.
+
+    Args:
+        file_path: Path to the DOCX file
+
+    Yields:
+        Text of each paragraph, newline terminated
+    """
+    paragraph_tag = _DOCX_NS + "p"
+    text_tag = _DOCX_NS + "t"
+    tab_tag = _DOCX_NS + "tab"
+    break_tag = _DOCX_NS + "br"
+
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open("word/document.xml") as document:
+            depth = 0
+            for event, element in ElementTree.iterparse(document, events=("start", "end")):
+                if element.tag != paragraph_tag:
+                    continue
+                if event == "start":
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth:
+                    # Paragraph nested in a text box; its text is part of the outer paragraph
+                    continue
+                parts = []
+                for node in element.iter():
+                    if node.tag == text_tag:
+                        parts.append(node.text or "")
+                    elif node.tag == tab_tag:
+                        parts.append("\t")
+                    elif node.tag == break_tag:
+                        parts.append("\n")
+                element.clear()
+                yield "".join(parts) + "\n"
+
+
+def iter_txt_blocks(file_path: str) -> Iterator[str]:
+    """
+    Yield a text file in blocks, falling back to latin-1 if it is not UTF-8
+
+    Args:
+        file_path: Path to the text file
+
+    Yields:
+        Consecutive blocks of the file's text
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            # Validate the encoding up front so no blocks are yielded twice
+            while file.read(TXT_BLOCK_CHARS):
+                pass
+        encoding = 'utf-8'
+    except UnicodeDecodeError:
+        encoding = 'latin-1'
+
+    with open(file_path, 'r', encoding=encoding) as file:
+        while True:
+            block = file.read(TXT_BLOCK_CHARS)
+            if not block:
+                return
+            yield block
+
+
+def iter_text(file_path: str, max_chars: Optional[int] = None) -> Iterator[str]:
+    """
+    Yield the text of an uploaded file piece by piece
+
+    Args:
+        file_path: Path to a PDF, DOCX or TXT file
+        max_chars: Stop with ExtractionLimitError past this many characters
+            (default: MAX_EXTRACTED_CHARS)
+
+    Yields:
+        Pages, paragraphs or blocks of text, in document order; pieces are
+        separated by whitespace so no word spans two pieces (except in TXT blocks)
+
+    Raises:
+        ValueError: For unsupported file extensions
+        ExtractionLimitError: If the file contains too much text
+    """
+    limit = MAX_EXTRACTED_CHARS if max_chars is None else max_chars
+    ext = file_path.split('.')[-1].lower()
+    if ext == 'pdf':
+        pieces = iter_pdf_pages(file_path)
+    elif ext == 'docx':
+        pieces = iter_docx_paragraphs(file_path)
+    elif ext == 'txt':
+        pieces = iter_txt_blocks(file_path)
+    else:
+        raise ValueError(f"Unsupported file format: {ext}")
+
+    total = 0
+    try:
+        for piece in pieces:
+            total += len(piece)
+            if total > limit:
+                raise ExtractionLimitError(f"Document has more than {limit} characters of text")
+            yield piece
+    finally:
+        pieces.close()
+
+
+class TermCounter:
+    """
+    Builds a FileSimilarity term vector from text pieces as they arrive
+
+    Words cut at a piece boundary are carried over to the next piece, so the
+    result equals ``FileSimilarity.term_vector`` of the joined text.
+    """
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self._carry = ""
+        self._pipeline = get_pipeline()
+
+    def update(self, piece: str) -> None:
+        text = self._carry + piece
+        # The last word may continue in the next piece
+        trailing = _TRAILING_WORD.search(text)
+        if trailing:
+            self._carry = trailing.group()
+            text = text[:trailing.start()]
+        else:
+            self._carry = ""
+        self.counts.update(self._pipeline.content_tokens(text))
+
+    def finish(self) -> Dict[str, int]:
+        """
+        Returns:
+            Term vector of everything passed to update
+        """
+        if self._carry:
+            self.counts.update(self._pipeline.content_tokens(self._carry))
+            self._carry = ""
+        return dict(self.counts)
+
+
+def extract_document(file_path: str, max_chars: Optional[int] = None) -> Tuple[str, Dict[str, int]]:
+    """
+    Extract an upload's text and its term vector in one streaming pass
+
+    Args:
+        file_path: Path to a PDF, DOCX or TXT file
+        max_chars: Character cap, see iter_text
+
+    Returns:
+        Tuple of (text, term vector usable as FileSimilarity query_vector)
+    """
+    pieces = []
+    terms = TermCounter()
+    for piece in iter_text(file_path, max_chars):
+        pieces.append(piece)
+        terms.update(piece)
+    return "".join(pieces), terms.finish()
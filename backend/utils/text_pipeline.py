@@ -0,0 +1,235 @@
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import nltk
+import numpy as np
+from nltk.corpus import stopwords
+
+from utils.winnowing import normalize as normalize_characters
+
+# Download NLTK data if not already downloaded
+try:
+    nltk.data.find('corpora/stopwords')
+except LookupError:
+    nltk.download('stopwords')
+
+# Regular expression for word matching
+WORD = re.compile(r'\w+')
+
+# Unicode normalization form applied before tokenizing (empty disables it)
+TEXT_UNICODE_FORM = os.getenv("TEXT_UNICODE_FORM", "NFC")
+
+# Reduce words to their Porter stems, so inflected forms of a word match
+TEXT_STEMMING = os.getenv("TEXT_STEMMING", "0") == "1"
+
+# Token streams of recently analyzed texts kept per process
+TEXT_CACHE_ENTRIES = int(os.getenv("TEXT_CACHE_ENTRIES", "16"))
+
+
+@lru_cache(maxsize=None)
+def get_stopwords() -> FrozenSet[str]:
+    """
+    Get the English stopword set, loaded once per process
+
+    Returns:
+        Frozen set of English stopwords
+    """
+    return frozenset(stopwords.words('english'))
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    """
+    Normalization applied to every text before the similarity algorithms see it
+
+    Changing it changes every token, so indexes and cached results record it.
+    """
+    unicode_form: str = "NFC"
+    lowercase: bool = True
+    stemming: bool = False
+
+    @classmethod
+    def from_env(cls) -> "PipelineConfig":
+        """Build a config from the TEXT_* environment variables"""
+        return cls(unicode_form=TEXT_UNICODE_FORM, stemming=TEXT_STEMMING)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class TokenStream:
+    """
+    Tokens of one text, with the views the similarity algorithms derive from them
+
+    Views are computed on first use and shared by every caller, so they must
+    not be modified.
+    """
+
+    __slots__ = ("text", "tokens", "_stopwords", "_counts", "_content_counts", "_normalized")
+
+    def __init__(self, text: str, tokens: List[str], stopwords: FrozenSet[str]):
+        self.text = text
+        self.tokens = tokens
+        self._stopwords = stopwords
+        self._counts: Optional[Counter] = None
+        self._content_counts: Optional[Dict[str, int]] = None
+        self._normalized: Optional[Tuple[str, np.ndarray]] = None
+
+    @property
+    def counts(self) -> Counter:
+        """Frequency of every token (CosineSimilarity, corpus scoring)"""
+        if self._counts is None:
+            self._counts = Counter(self.tokens)
+        return self._counts
+
+    @property
+    def content_counts(self) -> Dict[str, int]:
+        """Frequency of every non-stopword token (FileSimilarity)"""
+        if self._content_counts is None:
+            stops = self._stopwords
+            self._content_counts = {word: count for word, count in self.counts.items() if word not in stops}
+        return self._content_counts
+
+    @property
+    def normalized(self) -> Tuple[str, np.ndarray]:
+        """
+        Lowercase word characters with their offsets into the text (winnowing)
+
+        Character-level rather than token-level, so matched spans map back
+        to the original text.
+        """
+        if self._normalized is None:
+            self._normalized = normalize_characters(self.text)
+        return self._normalized
+
+
+class TextPipeline:
+    """
+    Compiled normalization and tokenization shared by all similarity algorithms
+
+    ``analyze`` keeps the token streams of the most recently analyzed texts,
+    so the algorithms scoring one submission tokenize it once between them.
+    """
+
+    def __init__(self, config: Optional[PipelineConfig] = None, cache_entries: int = TEXT_CACHE_ENTRIES):
+        """
+        Args:
+            config: Normalization settings (default: from TEXT_* environment variables)
+            cache_entries: Token streams kept
+        """
+        self.config = config or PipelineConfig.from_env()
+        self.cache_entries = cache_entries
+        self._stem = None
+        self.stopwords = get_stopwords()
+        if self.config.stemming:
+            from nltk.stem import PorterStemmer
+            self._stem = lru_cache(maxsize=65536)(PorterStemmer().stem)
+            self.stopwords = frozenset(self._stem(word) for word in self.stopwords)
+
+        self._cache: "OrderedDict[str, TokenStream]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def tokens(self, text: str) -> List[str]:
+        """
+        Tokenize a text
+
+        Args:
+            text: Input text
+
+        Returns:
+            Normalized word tokens, in text order
+        """
+        if self.config.unicode_form:
+            text = unicodedata.normalize(self.config.unicode_form, text)
+        if self.config.lowercase:
+            text = text.lower()
+        tokens = WORD.findall(text)
+        if self._stem is not None:
+            tokens = [self._stem(token) for token in tokens]
+        return tokens
+
+    def content_tokens(self, text: str) -> List[str]:
+        """
+        Tokenize a text, leaving out stopwords
+
+        Args:
+            text: Input text
+
+        Returns:
+            Normalized non-stopword tokens, in text order
+        """
+        stops = self.stopwords
+        return [token for token in self.tokens(text) if token not in stops]
+
+    def analyze(self, text: str) -> TokenStream:
+        """
+        Get the token stream of a text, tokenizing it only if it was not analyzed recently
+
+        Args:
+            text: Input text
+
+        Returns:
+            TokenStream of the text
+        """
+        with self._lock:
+            stream = self._cache.get(text)
+            if stream is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return stream
+            self.misses += 1
+
+        stream = TokenStream(text, self.tokens(text), self.stopwords)
+        if self.cache_entries > 0:
+            with self._lock:
+                self._cache[text] = stream
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+        return stream
+
+    def clear(self) -> None:
+        """Drop all cached token streams"""
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Describe the pipeline and its cache"""
+        with self._lock:
+            return {**self.config.to_dict(), "cached": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+_pipeline: Optional[TextPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> TextPipeline:
+    """
+    Get the shared text pipeline, created on first use
+    """
+    global _pipeline
+
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = TextPipeline()
+        return _pipeline
+
+
+def analyze(text: str) -> TokenStream:
+    """
+    Get the token stream of a text from the shared pipeline
+
+    Args:
+        text: Input text
+
+    Returns:
+        TokenStream of the text
+    """
+    return get_pipeline().analyze(text)
@@ -0,0 +1,197 @@
+import os
+import codecs
+import hashlib
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+from utils.blob_store import BlobStore, BlobWriter, make_cid
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Largest accepted upload, in bytes
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+
+# Most characters of text kept from one upload
+MAX_UPLOAD_TEXT_CHARS = int(os.getenv("MAX_UPLOAD_TEXT_CHARS", str(5_000_000)))
+
+# Uploads up to this size are held in memory until complete, so a repeat is
+# recognized before any chunking; larger ones are chunked as they arrive
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+
+# Content-addressed store of uploaded files
+UPLOAD_STORE_DIR = os.getenv("UPLOAD_STORE_DIR", os.path.join("uploads", "store"))
+
+# Formats whose text can only be read once the whole file is there: the PDF
+# cross-reference table and the DOCX zip directory are at the end of the file
+DEFERRED_FORMATS = ("pdf", "docx")
+
+_upload_store = None
+_upload_store_pid = None
+_upload_store_lock = threading.Lock()
+
+
+class UploadLimitError(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES or MAX_UPLOAD_TEXT_CHARS"""
+
+
+def get_upload_store() -> BlobStore:
+    """
+    Get the store of uploaded files, opening it on first use in each process
+    """
+    global _upload_store, _upload_store_pid
+
+    with _upload_store_lock:
+        # A forked worker must not share the parent's SQLite connection
+        if _upload_store is None or _upload_store_pid != os.getpid():
+            _upload_store = BlobStore(UPLOAD_STORE_DIR)
+            _upload_store_pid = os.getpid()
+        return _upload_store
+
+
+class StreamingUpload:
+    """
+    Writable sink for one uploaded file
+
+    Every block written is hashed and, past UPLOAD_SPOOL_BYTES, cut into
+    blob store chunks as it arrives; plain text is decoded in the same pass,
+    so a large file is never held in memory as a whole. PDF and DOCX text is
+    extracted from the stored file once it is complete. Size limits are
+    checked on each block.
+
+    Uploading the same bytes again stores nothing new, and the text
+    extracted from a PDF or DOCX file is stored next to it, keyed by the
+    file's CID, so it is not extracted again.
+    """
+
+    def __init__(self, store: BlobStore, filename: Optional[str],
+                 max_bytes: Optional[int] = None, max_chars: Optional[int] = None,
+                 spool_bytes: Optional[int] = None):
+        """
+        Args:
+            store: Blob store for the file and its text
+            filename: Name of the uploaded file; its extension selects the extractor
+            max_bytes: Largest accepted file (default: MAX_UPLOAD_BYTES)
+            max_chars: Most characters of text (default: MAX_UPLOAD_TEXT_CHARS)
+            spool_bytes: Bytes held before chunking starts (default: UPLOAD_SPOOL_BYTES)
+        """
+        self.store = store
+        self.filename = filename or ""
+        self.extension = self.filename.rsplit('.', 1)[-1].lower() if '.' in self.filename else ""
+        self.max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+        self.max_chars = MAX_UPLOAD_TEXT_CHARS if max_chars is None else max_chars
+        self.spool_bytes = UPLOAD_SPOOL_BYTES if spool_bytes is None else spool_bytes
+        self.size = 0
+
+        self._hash = hashlib.sha256()
+        self._spool: Optional[bytearray] = bytearray()
+        self._writer: BlobWriter = store.writer()
+        self._deferred = self.extension in DEFERRED_FORMATS
+        # Undecodable bytes are dropped, as when reading the file with errors='ignore'
+        self._decoder = None if self._deferred else codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self._pieces: List[str] = []
+        self._chars = 0
+        self._result: Optional[Dict[str, Any]] = None
+
+    def write(self, data: bytes) -> int:
+        """
+        Take the next block of the file
+
+        Raises:
+            UploadLimitError: Once the file or its text is too large
+        """
+        if self.size + len(data) > self.max_bytes:
+            raise UploadLimitError(f"File is larger than {self.max_bytes} bytes")
+        self.size += len(data)
+        self._hash.update(data)
+        if self._spool is not None:
+            self._spool += data
+            if len(self._spool) > self.spool_bytes:
+                self._spill()
+        else:
+            self._writer.write(data)
+        if self._decoder is not None:
+            self._add_text(self._decoder.decode(data))
+        return len(data)
+
+    def _spill(self) -> None:
+        """Start chunking into the store"""
+        self._writer.write(bytes(self._spool))
+        self._spool = None
+
+    def _add_text(self, piece: str) -> None:
+        self._chars += len(piece)
+        if self._chars > self.max_chars:
+            raise UploadLimitError(f"Document has more than {self.max_chars} characters of text")
+        self._pieces.append(piece)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        # Form parsers rewind finished files; the bytes are in the store instead
+        return 0
+
+    def close(self) -> None:
+        self._pieces = []
+        self._spool = None
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Store the file and get its text
+
+        Returns:
+            Dict with the file's "cid" and "size", its "text", and
+            "duplicate", true if the same bytes were uploaded before
+
+        Raises:
+            UploadLimitError: If the text of a PDF or DOCX file is too long
+        """
+        if self._result is not None:
+            return self._result
+
+        cid = make_cid(self._hash.digest())
+        duplicate = self.store.exists(cid)
+        if not duplicate:
+            if self._spool is not None:
+                self._spill()
+            self._writer.commit()
+
+        if not self._deferred:
+            self._add_text(self._decoder.decode(b"", final=True))
+            text = "".join(self._pieces)
+        else:
+            text_cid = (self.store.metadata(cid) or {}).get("text_cid")
+            if text_cid is not None:
+                # Extracted before; its text is stored next to the file
+                text = self.store.get(text_cid).decode("utf-8")
+            else:
+                text = self._extract_stored(cid)
+                if text is None:
+                    # Not cached, so the file is extracted again once extraction works
+                    text = "Text extraction not available for this file type"
+                else:
+                    self.store.set_metadata(cid, {"text_cid": self.store.put(text.encode("utf-8"))})
+
+        self._result = {"cid": cid, "size": self.size, "text": text, "duplicate": duplicate}
+        self.close()
+        return self._result
+
+    def _extract_stored(self, cid: str) -> Optional[str]:
+        """Extract the text of a stored PDF or DOCX file; None if that fails"""
+        fd, path = tempfile.mkstemp(suffix=f".{self.extension}")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in self.store.iter_chunks(cid):
+                    f.write(chunk)
+            # Needs the analysis dependencies (PyPDF2, nltk)
+            from utils.text_extraction import iter_text, ExtractionLimitError
+            try:
+                return "".join(iter_text(path, self.max_chars))
+            except ExtractionLimitError as e:
+                raise UploadLimitError(str(e))
+        except UploadLimitError:
+            raise
+        except Exception as e:
+            log.warning("Text extraction failed", filename=self.filename, error=str(e))
+            return None
+        finally:
+            os.remove(path)
@@ -0,0 +1,341 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple, Any
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Runs of word characters; everything else is dropped during normalization
+_WORD_RUN = re.compile(r'\w+')
+
+# Base of the polynomial k-gram hash
+_HASH_BASE = np.uint64(1000003)
+
+# Number of normalized reference documents kept for span verification
+_NORMALIZED_CACHE_SIZE = 64
+
+
+def normalize(text: str) -> Tuple[str, np.ndarray]:
+    """
+    Normalize text for fingerprinting: lowercase, word characters only
+
+    Args:
+        text: Original text
+
+    Returns:
+        Tuple of (normalized text, offsets) where ``offsets[i]`` is the
+        position in ``text`` of normalized character ``i``
+    """
+    parts = []
+    offsets = []
+    for match in _WORD_RUN.finditer(text):
+        word = match.group()
+        lowered = word.lower()
+        start = match.start()
+        if len(lowered) == len(word):
+            parts.append(lowered)
+            offsets.append(np.arange(start, start + len(word), dtype=np.int64))
+        else:
+            # Lowercasing changed the length (e.g. dotted capital I); map character by character
+            for i, char in enumerate(word):
+                lowered_char = char.lower()
+                parts.append(lowered_char)
+                offsets.append(np.full(len(lowered_char), start + i, dtype=np.int64))
+
+    if not parts:
+        return "", np.zeros(0, dtype=np.int64)
+    return "".join(parts), np.concatenate(offsets)
+
+
+def _mix(hashes: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer so window minima are evenly spread"""
+    with np.errstate(over="ignore"):
+        hashes = hashes ^ (hashes >> np.uint64(30))
+        hashes = hashes * np.uint64(0xBF58476D1CE4E5B9)
+        hashes = hashes ^ (hashes >> np.uint64(27))
+        hashes = hashes * np.uint64(0x94D049BB133111EB)
+        return hashes ^ (hashes >> np.uint64(31))
+
+
+class Winnower:
+    """
+    Local fingerprinting by winnowing (Schleimer, Wilkerson & Aiken)
+
+    Every k-gram of the normalized text is hashed with a polynomial rolling
+    hash, and the minimum hash of each window of ``window`` consecutive
+    k-grams is kept. Any shared substring of at least ``k + window - 1``
+    normalized characters is guaranteed to share a fingerprint.
+    """
+
+    def __init__(self, k: int = 25, window: int = 20):
+        """
+        Args:
+            k: Length of the hashed k-grams, in normalized characters
+            window: Number of consecutive k-grams per winnowing window
+        """
+        self.k = k
+        self.window = window
+
+    def kgram_hashes(self, normalized: str) -> np.ndarray:
+        """
+        Hash every k-gram of a normalized text
+
+        Args:
+            normalized: Output of ``normalize``
+
+        Returns:
+            uint64 array with one hash per k-gram start position
+        """
+        n_kgrams = len(normalized) - self.k + 1
+        if n_kgrams <= 0:
+            return np.zeros(0, dtype=np.uint64)
+
+        codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        hashes = np.zeros(n_kgrams, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for j in range(self.k):
+                hashes = hashes * _HASH_BASE + codes[j:j + n_kgrams]
+        return _mix(hashes)
+
+    def fingerprints(self, normalized: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Select the winnowed fingerprints of a normalized text
+
+        Args:
+            normalized: Output of ``normalize``
+
+        Returns:
+            Tuple of (hashes, positions) of the selected k-grams
+        """
+        hashes = self.kgram_hashes(normalized)
+        if len(hashes) == 0:
+            return hashes, np.zeros(0, dtype=np.int64)
+
+        window = min(self.window, len(hashes))
+        windows = sliding_window_view(hashes, window)
+        # Rightmost minimum of each window (robust winnowing)
+        chosen = window - 1 - np.argmin(windows[:, ::-1], axis=1)
+        positions = np.unique(np.arange(len(windows)) + chosen)
+        return hashes[positions], positions
+
+
+class FingerprintIndex:
+    """
+    Fingerprint -> (document, offset) index over a reference corpus
+
+    Matching a submission looks up its fingerprints in the index, merges
+    hits that lie on the same diagonal of the same document, and verifies
+    and extends them character by character into exact matched spans.
+    """
+
+    def __init__(self, documents: Sequence[str], winnower: Optional[Winnower] = None,
+                 max_doc_frequency: Optional[int] = None):
+        """
+        Args:
+            documents: Reference document texts; any sequence, so texts can be
+                read on demand (only matched documents are re-read)
+            winnower: Fingerprint settings (default: Winnower())
+            max_doc_frequency: Ignore fingerprints found in more documents than
+                this, such as shared boilerplate (default: no limit)
+        """
+        self.winnower = winnower or Winnower()
+        self._documents = documents
+        self._normalized_cache: Dict[int, Tuple[str, np.ndarray]] = {}
+
+        hash_parts, doc_parts, pos_parts = [], [], []
+        for doc_id in range(len(documents)):
+            document = documents[doc_id]
+            hashes, positions = self.winnower.fingerprints(normalize(document)[0])
+            hash_parts.append(hashes)
+            doc_parts.append(np.full(len(hashes), doc_id, dtype=np.int32))
+            pos_parts.append(positions)
+
+        hashes = np.concatenate(hash_parts) if hash_parts else np.zeros(0, dtype=np.uint64)
+        docs = np.concatenate(doc_parts) if doc_parts else np.zeros(0, dtype=np.int32)
+        positions = np.concatenate(pos_parts) if pos_parts else np.zeros(0, dtype=np.int64)
+
+        if max_doc_frequency is not None and len(hashes):
+            pairs = np.unique(np.stack([hashes, docs.astype(np.uint64)], axis=1), axis=0)
+            unique_hashes, doc_frequency = np.unique(pairs[:, 0], return_counts=True)
+            common = unique_hashes[doc_frequency > max_doc_frequency]
+            keep = ~np.isin(hashes, common)
+            hashes, docs, positions = hashes[keep], docs[keep], positions[keep]
+
+        order = np.argsort(hashes, kind="stable")
+        self.hashes = hashes[order]
+        self.docs = docs[order]
+        self.positions = positions[order]
+
+    @classmethod
+    def from_corpus_index(cls, corpus_index, winnower: Optional[Winnower] = None) -> "FingerprintIndex":
+        """
+        Build a fingerprint index over the documents of a CorpusIndex
+
+        Args:
+            corpus_index: CorpusIndex to read document texts from
+            winnower: Fingerprint settings
+
+        Returns:
+            FingerprintIndex over the corpus
+        """
+        return cls(_IndexTexts(corpus_index), winnower)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def _normalized(self, doc_id: int) -> Tuple[str, np.ndarray]:
+        if doc_id not in self._normalized_cache:
+            if len(self._normalized_cache) >= _NORMALIZED_CACHE_SIZE:
+                self._normalized_cache.clear()
+            self._normalized_cache[doc_id] = normalize(self._documents[doc_id])
+        return self._normalized_cache[doc_id]
+
+    def _lookup(self, hashes: np.ndarray, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Expand submission fingerprints into (submission position, doc, reference position) hits"""
+        lo = np.searchsorted(self.hashes, hashes, side="left")
+        hi = np.searchsorted(self.hashes, hashes, side="right")
+        counts = hi - lo
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+
+        # Index of every hit within the sorted fingerprint arrays
+        starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        hit_index = np.arange(total) + starts
+        return (
+            np.repeat(positions, counts),
+            self.docs[hit_index].astype(np.int64),
+            self.positions[hit_index],
+        )
+
+    def match(self, text: str, max_spans: int = 100,
+              normalized: Optional[Tuple[str, np.ndarray]] = None) -> Dict[str, Any]:
+        """
+        Find text shared verbatim (after normalization) with the corpus
+
+        Args:
+            text: Submission text
+            max_spans: Maximum number of spans returned, longest first
+            normalized: ``normalize(text)``, if already computed
+
+        Returns:
+            Dictionary with the percentage of the submission covered by
+            matches ("similarity", 0-100), per-document coverage and the
+            matched spans with character offsets into the original texts
+        """
+        k = self.winnower.k
+        normalized, offsets = normalized if normalized is not None else normalize(text)
+        result = {"similarity": 0.0, "document_coverage": {}, "spans": []}
+        if not normalized or len(self.hashes) == 0:
+            return result
+
+        hashes, positions = self.winnower.fingerprints(normalized)
+        sub_pos, docs, ref_pos = self._lookup(hashes, positions)
+        if len(sub_pos) == 0:
+            return result
+
+        # Group hits by document and diagonal, ordered along the submission
+        diagonals = ref_pos - sub_pos
+        order = np.lexsort((sub_pos, diagonals, docs))
+        sub_pos, docs, diagonals = sub_pos[order], docs[order], diagonals[order]
+
+        # Start a new run when the document or diagonal changes, or when
+        # consecutive hits are too far apart to come from one copied region
+        breaks = np.ones(len(sub_pos), dtype=bool)
+        breaks[1:] = (docs[1:] != docs[:-1]) | (diagonals[1:] != diagonals[:-1]) | \
+            (sub_pos[1:] - sub_pos[:-1] > k + self.winnower.window)
+        run_starts = np.flatnonzero(breaks)
+        run_ends = np.append(run_starts[1:], len(sub_pos))
+
+        intervals: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        for run_start, run_end in zip(run_starts, run_ends):
+            doc_id = int(docs[run_start])
+            diagonal = int(diagonals[run_start])
+            reference = self._normalized(doc_id)[0]
+            for start, end in self._verify_run(normalized, reference, diagonal, sub_pos[run_start:run_end], k):
+                intervals.setdefault((doc_id, diagonal), []).append((start, end))
+
+        spans = []
+        covered = np.zeros(len(normalized), dtype=bool)
+        doc_intervals: Dict[int, List[Tuple[int, int]]] = {}
+        for (doc_id, diagonal), found in intervals.items():
+            ref_offsets = self._normalized(doc_id)[1]
+            for start, end in _merge_intervals(found):
+                covered[start:end] = True
+                doc_intervals.setdefault(doc_id, []).append((start, end))
+                sub_start, sub_end = int(offsets[start]), int(offsets[end - 1]) + 1
+                spans.append({
+                    "reference_index": doc_id,
+                    "submission_start": sub_start,
+                    "submission_end": sub_end,
+                    "reference_start": int(ref_offsets[start + diagonal]),
+                    "reference_end": int(ref_offsets[end - 1 + diagonal]) + 1,
+                    "length": end - start,
+                    "text": text[sub_start:sub_end][:200]
+                })
+
+        spans.sort(key=lambda span: span["length"], reverse=True)
+        result["similarity"] = float(covered.mean() * 100)
+        result["document_coverage"] = {
+            doc_id: sum(end - start for start, end in _merge_intervals(found)) / len(normalized) * 100
+            for doc_id, found in doc_intervals.items()
+        }
+        result["spans"] = spans[:max_spans]
+        return result
+
+    @staticmethod
+    def _verify_run(submission: str, reference: str, diagonal: int,
+                    positions: np.ndarray, k: int) -> List[Tuple[int, int]]:
+        """
+        Turn a run of fingerprint hits on one diagonal into verified, maximal spans
+
+        Args:
+            submission: Normalized submission text
+            reference: Normalized reference text
+            diagonal: Reference position minus submission position of the run
+            positions: Submission positions of the run's hits, ascending
+            k: K-gram length
+
+        Returns:
+            List of (start, end) intervals in normalized submission coordinates
+        """
+        start, end = int(positions[0]), int(positions[-1]) + k
+        if submission[start:end] != reference[start + diagonal:end + diagonal]:
+            # The run spans an edit or a hash collision; keep only verified k-grams
+            verified = [
+                (int(p), int(p) + k) for p in positions
+                if submission[p:p + k] == reference[p + diagonal:p + diagonal + k]
+            ]
+            return _merge_intervals(verified)
+
+        # Extend the verified region while the texts keep agreeing
+        while start > 0 and start + diagonal > 0 and submission[start - 1] == reference[start - 1 + diagonal]:
+            start -= 1
+        while end < len(submission) and end + diagonal < len(reference) and \
+                submission[end] == reference[end + diagonal]:
+            end += 1
+        return [(start, end)]
+
+
+class _IndexTexts:
+    """Sequence view reading document texts from a CorpusIndex on demand"""
+
+    def __init__(self, corpus_index):
+        self._corpus_index = corpus_index
+
+    def __len__(self) -> int:
+        return len(self._corpus_index)
+
+    def __getitem__(self, doc_id: int) -> str:
+        return self._corpus_index.document_text(doc_id)
+
+
+def _merge_intervals(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merge overlapping or touching (start, end) intervals"""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark the intra-batch comparison of a class's submissions
+
+Compares every pair of documents two ways: one FileSimilarity call and one
+fingerprint set intersection per pair, as looping over /compare-texts would,
+and the two sparse matrix products of build_batch_report. A few planted
+copies check that both find the same pairs:
+
+    python benchmarks/bench_batch.py --documents 200 --copies 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from synthetic import SyntheticCorpus
+from utils.batch_analysis import document_features, similarity_matrices
+from utils.plagiarism_algorithms import FileSimilarity
+
+
+def pairwise(features, threshold):
+    pairs = set()
+    fingerprint_sets = [set(feature["fingerprints"].tolist()) for feature in features]
+    for i in range(len(features)):
+        for j in range(i + 1, len(features)):
+            FileSimilarity.vector_similarity(features[i]["terms"], features[j]["terms"])
+            shared = len(fingerprint_sets[i] & fingerprint_sets[j])
+            overlap = max(
+                shared / len(fingerprint_sets[i]) if fingerprint_sets[i] else 0.0,
+                shared / len(fingerprint_sets[j]) if fingerprint_sets[j] else 0.0
+            )
+            if overlap >= threshold:
+                pairs.add((i, j))
+    return pairs
+
+
+def vectorized(features, threshold):
+    _, fingerprint_overlap = similarity_matrices(features)
+    similarity = np.maximum(fingerprint_overlap, fingerprint_overlap.T)
+    return {(int(i), int(j)) for i, j in zip(*np.nonzero(np.triu(similarity >= threshold, k=1)))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--copies", type=int, default=5, help="Documents that copy another one")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    generator = SyntheticCorpus(seed=18)
+    texts = generator.documents(args.documents)
+    rng = random.Random(18)
+    planted = set()
+    copies = rng.sample(range(args.documents), args.copies)
+    originals = sorted(set(range(args.documents)) - set(copies))
+    for copy in copies:
+        source = rng.choice(originals)
+        # Most of the source, with a paragraph of its own
+        texts[copy] = texts[source][:int(len(texts[source]) * 0.8)] + "\n\n" + generator.paragraph()
+        planted.add((min(source, copy), max(source, copy)))
+
+    start = time.perf_counter()
+    features = [document_features(text) for text in texts]
+    feature_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loop_pairs = pairwise(features, args.threshold)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix_pairs = vectorized(features, args.threshold)
+    matrix_time = time.perf_counter() - start
+
+    comparisons = args.documents * (args.documents - 1) // 2
+    print(f"{args.documents} documents, {comparisons} pairs; features {feature_time:.2f}s")
+    print(f"{'method':>10} {'seconds':>8} {'pairs/s':>10} {'found':>6}")
+    print(f"{'pairwise':>10} {loop_time:>8.3f} {comparisons / loop_time:>10.0f} {len(loop_pairs):>6}")
+    print(f"{'matrix':>10} {matrix_time:>8.3f} {comparisons / matrix_time:>10.0f} {len(matrix_pairs):>6}")
+    print(f"speedup {loop_time / matrix_time:.1f}x; same pairs: {loop_pairs == matrix_pairs}; "
+          f"planted copies found: {len(planted & matrix_pairs)}/{len(planted)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark the content-addressed blob store against the old per-upload JSON files
+
+Stores analysis metadata documents the way upload_to_ipfs does, for repeated
+identical submissions, near-identical resubmissions (one sentence edited)
+and distinct documents, and reports write throughput and disk usage:
+
+    python benchmarks/bench_blob_store.py --submissions 200 --paragraphs 40
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticCorpus
+from utils.blob_store import BlobStore
+
+
+def disk_usage(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def make_metadata(text, title):
+    return {
+        "title": title,
+        "text": text,
+        "summary": text[:300],
+        "plagiarism_analysis": {"overall_score": 0.12, "cosine_similarity": 0.2},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def scenarios(generator, submissions, paragraphs):
+    base = generator.document(paragraphs=paragraphs)
+    yield "identical", [base] * submissions
+
+    near = []
+    text = base
+    for _ in range(submissions):
+        # Each resubmission edits one sentence of the previous version
+        at = generator.rng.randrange(len(text))
+        text = text[:at] + " " + generator.sentence() + text[at:]
+        near.append(text)
+    yield "near-identical", near
+
+    yield "distinct", generator.documents(submissions, paragraphs=paragraphs)
+
+
+def write_legacy(directory, documents):
+    for i, text in enumerate(documents):
+        # The old mock: pretty-printed JSON, one file per upload, timestamped CID
+        with open(os.path.join(directory, f"bafybeih{uuid.uuid4().hex[:16]}{i}.json"), "w") as f:
+            json.dump(make_metadata(text, f"Doc {i}"), f, indent=2)
+
+
+def write_store(directory, documents, compression):
+    store = BlobStore(directory, compression=compression)
+    for i, text in enumerate(documents):
+        store.put_json(make_metadata(text, f"Doc {i}"), {"title": f"Doc {i}"})
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--compression", choices=["auto", "zstd", "none"], default="auto")
+    args = parser.parse_args()
+
+    compression = None if args.compression == "none" else args.compression
+    generator = SyntheticCorpus(seed=12)
+
+    print(f"{'scenario':>15} {'store':>8} {'logical MB':>11} {'disk MB':>8} {'MB/s':>8}")
+    for name, documents in scenarios(generator, args.submissions, args.paragraphs):
+        logical = sum(len(json.dumps(make_metadata(text, "Doc")).encode()) for text in documents) / 1e6
+        for label, writer in (("legacy", write_legacy),
+                              ("blobs", lambda d, docs: write_store(d, docs, compression))):
+            with tempfile.TemporaryDirectory() as directory:
+                start = time.perf_counter()
+                writer(directory, documents)
+                elapsed = time.perf_counter() - start
+                usage = disk_usage(directory) / 1e6
+            print(f"{name:>15} {label:>8} {logical:>11.2f} {usage:>8.2f} {logical / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
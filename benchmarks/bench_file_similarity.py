@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of FileSimilarity against the original implementation
+
+Times one submission compared against a small corpus, as
+check_plagiarism_comprehensive does, at increasing document lengths:
+
+    python benchmarks/bench_file_similarity.py --paragraphs 5 20 80
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from legacy_algorithms import legacy_find_file_similarity
+from synthetic import SyntheticCorpus
+from utils.plagiarism_algorithms import FileSimilarity
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[5, 20, 80])
+    parser.add_argument("--references", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy-above", type=int, default=20000,
+                        help="Skip the original implementation above this many words per document")
+    args = parser.parse_args()
+
+    generator = SyntheticCorpus(seed=1)
+    print(f"{'words':>8} {'legacy ms':>11} {'new ms':>9} {'cached ms':>10} {'speedup':>8}")
+    for paragraphs in args.paragraphs:
+        query = generator.document(paragraphs=paragraphs)
+        references = generator.documents(args.references, paragraphs=paragraphs)
+        words = len(query.split())
+
+        def new():
+            for reference in references:
+                FileSimilarity.find_file_similarity(query, reference)
+
+        def cached():
+            query_vector = FileSimilarity.term_vector(query)
+            for reference in references:
+                FileSimilarity.find_file_similarity(query, reference, query_vector=query_vector)
+
+        new_time = best_of(new, args.repeat)
+        cached_time = best_of(cached, args.repeat)
+        if words <= args.skip_legacy_above:
+            def legacy():
+                for reference in references:
+                    legacy_find_file_similarity(query, reference)
+            legacy_time = best_of(legacy, 1)
+            print(f"{words:>8} {legacy_time * 1000:>11.1f} {new_time * 1000:>9.2f} {cached_time * 1000:>10.2f} "
+                  f"{legacy_time / cached_time:>7.0f}x")
+        else:
+            print(f"{words:>8} {'-':>11} {new_time * 1000:>9.2f} {cached_time * 1000:>10.2f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark exact corpus scoring against MinHash LSH candidate retrieval
+
+Builds a corpus index over synthetic documents at each corpus size, then
+times scoring a submission that copies one corpus document:
+
+    python benchmarks/bench_lsh.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticCorpus, write_corpus
+from utils.corpus_index import CorpusIndex
+from utils.minhash_lsh import LSHConfig
+
+
+def time_call(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], result
+
+
+def run(size, config, repeat):
+    generator = SyntheticCorpus(seed=size)
+    documents = generator.documents(size, paragraphs=2, sentences=4)
+    target = size // 2
+    # A submission that copies one corpus document with a new paragraph appended
+    submission = documents[target] + "\n\n" + generator.paragraph()
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        write_corpus(corpus_dir, documents)
+
+        start = time.perf_counter()
+        index = CorpusIndex(corpus_dir, lsh_config=config)
+        build_time = time.perf_counter() - start
+
+        exact_time, (exact_cosine, _) = time_call(lambda: index.score(submission), repeat)
+
+        def lsh_score():
+            candidates = index.candidates(submission)
+            return candidates, index.score(submission, doc_ids=candidates)
+
+        index.candidates(submission)  # build the LSH buckets outside the timed runs
+        lsh_time, (candidates, (lsh_cosine, _)) = time_call(lsh_score, repeat)
+
+    best_exact = max(range(size), key=exact_cosine.__getitem__)
+    best_lsh = max(range(size), key=lsh_cosine.__getitem__)
+    return {
+        "size": size,
+        "build_s": build_time,
+        "exact_ms": exact_time * 1000,
+        "lsh_ms": lsh_time * 1000,
+        "candidates": len(candidates),
+        "match_found": best_exact == target and best_lsh == target,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--bands", type=int, default=LSHConfig.bands)
+    parser.add_argument("--rows", type=int, default=LSHConfig.rows)
+    parser.add_argument("--max-candidates", type=int, default=LSHConfig.max_candidates)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    config = LSHConfig(bands=args.bands, rows=args.rows, max_candidates=args.max_candidates, min_corpus_size=0)
+    print(f"bands={config.bands} rows={config.rows} threshold~{config.threshold:.2f} "
+          f"max_candidates={config.max_candidates}")
+    print(f"{'docs':>8} {'build s':>9} {'exact ms':>10} {'lsh ms':>9} {'cands':>6} {'match':>6}")
+    for size in args.sizes:
+        r = run(size, config, args.repeat)
+        print(f"{r['size']:>8} {r['build_s']:>9.2f} {r['exact_ms']:>10.2f} {r['lsh_ms']:>9.2f} "
+              f"{r['candidates']:>6} {str(r['match_found']):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark near-duplicate clustering as the submission archive grows
+
+For each archive size, indexes synthetic submissions with planted
+near-copies, then adds one more percent of submissions incrementally.
+Reports build and incremental times, candidate pairs checked, and the
+share of planted copies found, next to the estimated time of comparing
+every pair with PlagiarismDetector.compare_two_texts:
+
+    python benchmarks/bench_near_duplicates.py --sizes 1000 10000 50000 --workers 4
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticCorpus
+from utils.near_duplicates import NearDuplicateIndex
+from utils.plagiarism_algorithms import PlagiarismDetector
+
+
+def make_archive(size, copy_rate, seed):
+    """Synthetic submissions where copy_rate of them lightly edit an earlier one"""
+    generator = SyntheticCorpus(seed=seed)
+    rng = random.Random(seed)
+    texts = []
+    planted = set()
+    for i in range(size):
+        if i and rng.random() < copy_rate:
+            source = rng.randrange(i)
+            words = texts[source].split(" ")
+            # Replace a few words and append a sentence
+            for position in rng.sample(range(len(words)), max(1, len(words) // 50)):
+                words[position] = generator.sentence(1, 1).rstrip(".")
+            texts.append(" ".join(words) + " " + generator.sentence())
+            planted.add((f"doc{source}", f"doc{i}"))
+        else:
+            texts.append(generator.document(paragraphs=2, sentences=4))
+    return [(f"doc{i}", text) for i, text in enumerate(texts)], planted
+
+
+def pairwise_seconds(documents, samples=200):
+    """Estimated time to compare every pair of documents directly"""
+    detector = PlagiarismDetector()
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(samples):
+        (_, a), (_, b) = rng.sample(documents, 2)
+        detector.compare_two_texts(a, b)
+    per_pair = (time.perf_counter() - start) / samples
+    return per_pair * len(documents) * (len(documents) - 1) / 2
+
+
+def found_pairs(clusters):
+    pairs = set()
+    for cluster in clusters:
+        members = cluster["documents"]
+        pairs.update((a, b) for i, a in enumerate(members) for b in members[i + 1:])
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--copy-rate", type=float, default=0.02)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f"{'docs':>7} {'build s':>8} {'docs/s':>7} {'+1% s':>7} {'candidates':>10} "
+          f"{'recall':>7} {'clusters':>8} {'pairwise s':>11}")
+    for size in args.sizes:
+        extra = max(1, size // 100)
+        documents, planted = make_archive(size + extra, args.copy_rate, seed=size)
+
+        with tempfile.TemporaryDirectory() as directory:
+            index = NearDuplicateIndex(os.path.join(directory, "index.sqlite"), args.threshold,
+                                       workers=args.workers, chunk_size=args.chunk_size)
+            start = time.perf_counter()
+            totals = index.add_documents(documents[:size])
+            build_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            added = index.add_documents(documents)
+            incremental_time = time.perf_counter() - start
+
+            clusters = index.clusters()
+            index.close()
+
+        found = found_pairs(clusters)
+        recall = len(planted & found) / len(planted) if planted else 1.0
+        candidates = totals["candidates"] + added["candidates"]
+        print(f"{size:>7} {build_time:>8.2f} {size / build_time:>7.0f} {incremental_time:>7.2f} "
+              f"{candidates:>10} {recall:>7.1%} {len(clusters):>8} {pairwise_seconds(documents):>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark the indexed NFT registry against the old list of dicts
+
+Builds both with the same records and compares the memory of the containers
+(field values are shared and not counted), lookup by id (what /feedback
+does), one filtered /nfts page, and serializing the full listing:
+
+    python benchmarks/bench_nft_registry.py --records 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from utils.nft_registry import NFTRegistry, NFTRecord
+
+
+def make_fields(i, wallets):
+    return {
+        "id": f"{i:08x}-0000-4000-8000-000000000000",
+        "title": f"Paper {i}",
+        "summary": "",
+        "plagiarism_score": 0.1,
+        "wallet_address": f"0x{i % wallets:064x}",
+        "ipfs_cid": f"bafk{i:052x}",
+        "timestamp": "2025-07-05T18:17:44",
+        "transaction_hash": f"mock_tx_{i:016x}",
+        "feedback": None,
+        "student_name": "Current User",
+        "user_email": "user@example.com",
+        "teacher_feedback": None,
+    }
+
+
+def container_bytes(container):
+    """Bytes of the list or registry structure itself, without the field values"""
+    if isinstance(container, list):
+        return sys.getsizeof(container) + sum(sys.getsizeof(nft) for nft in container)
+    size = sys.getsizeof(container._records) + sys.getsizeof(container._positions)
+    size += sum(sys.getsizeof(record) for record in container._records)
+    for index in container._indexes.values():
+        size += sys.getsizeof(index) + sum(sys.getsizeof(positions) for positions in index.values()
+                                           if isinstance(positions, list))
+    # Positions above the small-int cache are int objects of their own
+    return size + len(container._records) * sys.getsizeof(len(container._records))
+
+
+def build(rows, registry):
+    """Build the list of dicts or the registry; returns (container, seconds)"""
+    start = time.perf_counter()
+    if registry:
+        container = NFTRegistry()
+        for row in rows:
+            container.add(NFTRecord(**row))
+    else:
+        container = [dict(row) for row in rows]
+    return container, time.perf_counter() - start
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--wallets", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    ids = [make_fields(rng.randrange(args.records), args.wallets)["id"] for _ in range(args.lookups)]
+    wallet = make_fields(args.records // 2, args.wallets)["wallet_address"]
+
+    # Field values are created up front, as request data would be
+    rows = [make_fields(i, args.wallets) for i in range(args.records)]
+
+    nfts, build_s = build(rows, registry=False)
+    size = container_bytes(nfts)
+    lookup_s = timed(lambda: [next(nft for nft in nfts if nft["id"] == nft_id) for nft_id in ids], 1) / len(ids)
+    page_s = timed(lambda: [nft for nft in nfts if nft["wallet_address"] == wallet][:50], 3)
+    listing_s = timed(lambda: json.dumps(nfts), 1)
+    print(f"{'store':>9} {'build s':>8} {'MB':>8} {'B/record':>9} {'lookup ms':>10} {'page ms':>8} {'list ms':>8}")
+    print(f"{'list':>9} {build_s:>8.2f} {size / 1e6:>8.1f} {size / args.records:>9.0f} "
+          f"{lookup_s * 1000:>10.3f} {page_s * 1000:>8.3f} {listing_s * 1000:>8.1f}")
+    del nfts
+
+    registry, build_s = build(rows, registry=True)
+    size = container_bytes(registry)
+    lookup_s = timed(lambda: [registry.get(nft_id) for nft_id in ids], 100) / len(ids)
+    page_s = timed(lambda: registry.page(None, 50, wallet_address=wallet), 100)
+    listing_s = timed(lambda: json.dumps([nft.to_dict() for nft in registry]), 1)
+    print(f"{'registry':>9} {build_s:>8.2f} {size / 1e6:>8.1f} {size / args.records:>9.0f} "
+          f"{lookup_s * 1000:>10.3f} {page_s * 1000:>8.3f} {listing_s * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Compare request throughput of the development launcher and the production profile
+
+Starts each server in turn from the backend directory, drives it with
+concurrent keep-alive clients for a fixed time, and reports requests per
+second and latency percentiles:
+
+    python benchmarks/bench_server.py --clients 16 --duration 10
+    python benchmarks/bench_server.py --path "/nfts?limit=50" --workers 4
+    python benchmarks/bench_server.py --profiles gunicorn --reload-at 3
+
+The dev profile is ``python main.py`` (Flask development server); the
+gunicorn profile is ``gunicorn -c gunicorn.conf.py main:app``. With
+--reload-at, the gunicorn master gets a HUP (graceful worker replacement)
+that many seconds into the run; failed requests are reported as errors.
+"""
+
+import argparse
+import http.client
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+
+def wait_for_port(port, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def get(connection, path):
+    connection.request("GET", path)
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+
+def client(port, path, stop, latencies, errors):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            try:
+                status = get(connection, path)
+            except http.client.RemoteDisconnected:
+                # The server closed an idle keep-alive connection (e.g. a worker
+                # being replaced) without reading the request; clients retry that
+                connection.close()
+                status = get(connection, path)
+            if status != 200:
+                errors.append(status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def load(port, path, clients, duration, reload_at=None, pid_file=None):
+    stop = threading.Event()
+    latencies, errors = [], []
+    threads = [threading.Thread(target=client, args=(port, path, stop, latencies, errors)) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    if reload_at is not None:
+        time.sleep(reload_at)
+        with open(pid_file) as f:
+            os.kill(int(f.read()), signal.SIGHUP)
+        time.sleep(max(duration - reload_at, 0))
+    else:
+        time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return {
+        "requests_per_s": len(latencies) / duration,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=["dev", "gunicorn"], choices=["dev", "gunicorn"])
+    parser.add_argument("--path", default="/nfts?limit=50")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=0, help="gunicorn workers (default: one per core)")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gunicorn worker")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--reload-at", type=float, help="send HUP to the gunicorn master after this many seconds")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    pid_file = os.path.join(directory, "gunicorn.pid")
+    commands = {
+        "dev": [sys.executable, "main.py"],
+        "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--pid", pid_file, "main:app"],
+    }
+
+    print(f"{'profile':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    try:
+        env = dict(os.environ, PORT=str(args.port), GUNICORN_THREADS=str(args.threads),
+                   STORAGE_PATH=os.path.join(directory, "backend.sqlite"))
+        if args.workers:
+            env["WEB_CONCURRENCY"] = str(args.workers)
+        for profile in args.profiles:
+            # In a session of its own, so the Flask reloader's child is stopped with it
+            server = subprocess.Popen(commands[profile], cwd=BACKEND_DIR, env=env, start_new_session=True,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                if not wait_for_port(args.port):
+                    print(f"{profile:>9} did not start")
+                    continue
+                # One request to open storage and indexes before measuring
+                load(args.port, args.path, 1, 0.5)
+                reload_at = args.reload_at if profile == "gunicorn" else None
+                r = load(args.port, args.path, args.clients, args.duration, reload_at, pid_file)
+                print(f"{profile:>9} {r['requests_per_s']:>9.0f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>7}")
+            finally:
+                os.killpg(server.pid, signal.SIGTERM)
+                server.wait()
+                time.sleep(1)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark suite of the similarity algorithms, with JSON baselines
+
+Generates a synthetic corpus and submissions, a share of which copy a
+corpus passage verbatim or reworded, then measures throughput, p50/p99
+latency and peak Python memory of each target, and the mean score it gives
+original, verbatim and paraphrased submissions:
+
+    python benchmarks/bench_suite.py --save benchmarks/baselines/default.json
+    python benchmarks/bench_suite.py --baseline benchmarks/baselines/default.json --check
+
+Targets: cosine (CosineSimilarity.cosine_sim), file_similarity
+(FileSimilarity.find_file_similarity), similar_passages
+(get_similar_passages), summary (generate_summary with the model),
+summary_extractive (extractive_summary, what generate_summary returns
+when the model cannot be loaded) and comprehensive
+(PlagiarismDetector.check_plagiarism_comprehensive against the corpus
+index). The same --seed and sizes always give the same workload; its
+digest is stored with the results, and baselines are only compared
+against runs of the same workload. Latencies depend on the machine, so
+compare runs made on the same one.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Summaries of earlier runs must not be served from the disk cache
+os.environ.setdefault("SUMMARY_CACHE_DIR", "")
+
+# Keep the report readable; warnings and errors are still logged
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from synthetic import SyntheticCorpus, write_corpus
+from utils import plagiarism_check
+from utils.plagiarism_algorithms import CosineSimilarity, FileSimilarity, PlagiarismDetector
+from utils.summary_service import extractive_summary
+from utils.text_pipeline import get_pipeline
+
+SUITE_VERSION = 1
+
+TARGETS = ["cosine", "file_similarity", "similar_passages", "summary", "summary_extractive", "comprehensive"]
+
+KINDS = ["original", "verbatim", "paraphrased"]
+
+# Largest change in a mean score not reported as a regression
+SCORE_TOLERANCE = 0.05
+
+
+def make_workload(args):
+    """Corpus and submissions, determined by the seed and sizes"""
+    generator = SyntheticCorpus(vocab_size=args.vocabulary, seed=args.seed)
+    corpus = generator.documents(args.documents, paragraphs=args.paragraphs)
+    submissions = generator.submissions(corpus, args.submissions, args.verbatim, args.paraphrased,
+                                        paragraphs=args.paragraphs)
+    warmup = generator.document(paragraphs=args.paragraphs)
+
+    # Submissions without a source are compared pairwise with a random document
+    rng = random.Random(args.seed)
+    references = [corpus[s.source] if s.source is not None else rng.choice(corpus) for s in submissions]
+
+    digest = hashlib.sha256()
+    for text in corpus + [s.text for s in submissions]:
+        digest.update(text.encode("utf-8"))
+    workload = {
+        "documents": args.documents,
+        "submissions": args.submissions,
+        "paragraphs": args.paragraphs,
+        "vocabulary": args.vocabulary,
+        "verbatim": args.verbatim,
+        "paraphrased": args.paraphrased,
+        "seed": args.seed,
+        "digest": digest.hexdigest()[:16],
+    }
+    return corpus, submissions, references, warmup, workload
+
+
+def make_targets(references):
+    """Each target as (setup, call): call(index, text) returns a score in [0, 1] or None"""
+    detector = PlagiarismDetector()
+
+    def comprehensive(i, text):
+        index = plagiarism_check.get_corpus_index()
+        return detector.check_plagiarism_comprehensive(text, corpus_index=index)["overall_score"]
+
+    def similar_passages(i, text):
+        passages = plagiarism_check.get_similar_passages(text)
+        return max((p["similarity"] for p in passages), default=0.0)
+
+    def setup_summary():
+        from utils import summarizer
+        summarizer.load_summarizer()
+        if summarizer.summarizer is None:
+            # Timing the extractive fallback would say nothing about the model
+            raise RuntimeError("summarization model could not be loaded")
+
+    def summary(i, text):
+        from utils.summarizer import generate_summary
+        generate_summary(text)
+        return None
+
+    def summary_extractive(i, text):
+        # Needs neither transformers nor the model, so it is tracked on every machine
+        extractive_summary(text, sentences=3)
+        return None
+
+    return {
+        "cosine": (None, lambda i, text: CosineSimilarity.cosine_sim(text, references[i])),
+        "file_similarity": (None, lambda i, text: FileSimilarity.find_file_similarity(text, references[i]) / 100.0),
+        "similar_passages": (plagiarism_check.get_passage_index, similar_passages),
+        "summary": (setup_summary, summary),
+        "summary_extractive": (None, summary_extractive),
+        "comprehensive": (plagiarism_check.get_corpus_index, comprehensive),
+    }
+
+
+def measure(setup, call, submissions, warmup, memory_samples):
+    """Time every submission, then trace memory over the first few"""
+    start = time.perf_counter()
+    if setup is not None:
+        setup()
+    call(0, warmup)
+    setup_time = time.perf_counter() - start
+
+    # Token streams cached by an earlier target would make this one look faster
+    get_pipeline().clear()
+    timings, scores = [], {kind: [] for kind in KINDS}
+    total_start = time.perf_counter()
+    for i, submission in enumerate(submissions):
+        start = time.perf_counter()
+        score = call(i, submission.text)
+        timings.append(time.perf_counter() - start)
+        if score is not None:
+            scores[submission.kind].append(score)
+    total = time.perf_counter() - total_start
+
+    get_pipeline().clear()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for i, submission in enumerate(submissions[:memory_samples]):
+        call(i, submission.text)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    timings_ms = np.array(timings) * 1000.0
+    return {
+        "calls": len(timings),
+        "setup_s": round(setup_time, 4),
+        "throughput_per_s": round(len(timings) / total, 2),
+        "mean_ms": round(float(timings_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(timings_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(timings_ms, 99)), 3),
+        "peak_kib": round(peak / 1024, 1),
+        "scores": {kind: round(float(np.mean(values)), 4) for kind, values in scores.items() if values},
+    }
+
+
+def run_suite(args):
+    """
+    Run the selected targets over the workload
+
+    Returns:
+        Results document, as saved by --save
+    """
+    corpus, submissions, references, warmup, workload = make_workload(args)
+
+    corpus_dir_before = plagiarism_check.CORPUS_DIR
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        write_corpus(corpus_dir, corpus)
+        # Point the shared corpus and passage indexes at the synthetic corpus
+        plagiarism_check.CORPUS_DIR = corpus_dir
+        plagiarism_check._corpus_index = None
+        plagiarism_check._passage_index = ("", None)
+
+        targets = make_targets(references)
+        results = {}
+        try:
+            for name in args.targets:
+                setup, call = targets[name]
+                try:
+                    results[name] = measure(setup, call, submissions, warmup, args.memory_samples)
+                except (ImportError, RuntimeError) as e:
+                    results[name] = {"skipped": str(e)}
+        finally:
+            plagiarism_check.CORPUS_DIR = corpus_dir_before
+            plagiarism_check._corpus_index = None
+            plagiarism_check._passage_index = ("", None)
+
+    return {
+        "suite_version": SUITE_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "workload": workload,
+        "results": results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, tolerance):
+    """
+    Find regressions of a run against a baseline
+
+    Args:
+        baseline: Results document of the baseline
+        current: Results document of this run
+        tolerance: Allowed relative slowdown or memory growth (p99 gets twice as much)
+
+    Returns:
+        List of regression descriptions (empty if none)
+    """
+    if baseline["workload"] != current["workload"]:
+        return ["workload differs from the baseline; rerun with its settings: "
+                + json.dumps(baseline["workload"], sort_keys=True)]
+
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or "skipped" in before or "skipped" in result:
+            continue
+        checks = [
+            ("p50_ms", result["p50_ms"], before["p50_ms"], tolerance),
+            ("p99_ms", result["p99_ms"], before["p99_ms"], 2 * tolerance),
+            ("peak_kib", result["peak_kib"], before["peak_kib"], tolerance),
+            ("1/throughput", 1 / result["throughput_per_s"], 1 / before["throughput_per_s"], tolerance),
+        ]
+        for metric, value, reference, allowed in checks:
+            if reference > 0 and value > reference * (1 + allowed):
+                regressions.append(f"{name}: {metric} {value:.4g} vs {reference:.4g} (+{value / reference - 1:.0%})")
+        for kind, score in result["scores"].items():
+            reference = before["scores"].get(kind)
+            if reference is not None and abs(score - reference) > SCORE_TOLERANCE:
+                regressions.append(f"{name}: mean {kind} score {score:.3f} vs {reference:.3f}")
+    return regressions
+
+
+def print_results(document):
+    workload = document["workload"]
+    print(f"{workload['documents']} corpus documents, {workload['submissions']} submissions "
+          f"(seed {workload['seed']}, workload {workload['digest']})")
+    print(f"{'target':<19} {'setup s':>8} {'calls/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>9} "
+          + " ".join(f"{kind:>11}" for kind in KINDS))
+    for name, result in document["results"].items():
+        if "skipped" in result:
+            print(f"{name:<19} skipped: {result['skipped']}")
+            continue
+        scores = " ".join(f"{result['scores'].get(kind, float('nan')):>11.3f}" for kind in KINDS)
+        print(f"{name:<19} {result['setup_s']:>8.2f} {result['throughput_per_s']:>9.1f} {result['p50_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {result['peak_kib']:>9.0f} {scores}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=500, help="Corpus documents")
+    parser.add_argument("--submissions", type=int, default=60)
+    parser.add_argument("--paragraphs", type=int, default=4, help="Paragraphs per document")
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--verbatim", type=float, default=0.25, help="Share of submissions copying verbatim")
+    parser.add_argument("--paraphrased", type=float, default=0.25, help="Share of submissions copying reworded")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=TARGETS)
+    parser.add_argument("--memory-samples", type=int, default=10, help="Submissions run under tracemalloc")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on regressions")
+    args = parser.parse_args()
+
+    document = run_suite(args)
+    print_results(document)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
+        print(f"Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, document, args.tolerance)
+        print(f"Compared with {args.baseline} (commit {baseline.get('commit')}, {baseline.get('created')}):")
+        for regression in regressions:
+            print(f"  REGRESSION {regression}")
+        if not regressions:
+            print("  no regressions")
+        if regressions and args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
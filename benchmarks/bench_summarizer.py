@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark summarizer model variants on CPU: load time, per-chunk latency and RSS
+
+Each variant is measured in a fresh process so load times and peak memory
+do not affect each other:
+
+    python benchmarks/bench_summarizer.py --backends fp32 int8 onnx --chunks 10
+
+The onnx variant needs the optional optimum[onnxruntime] package.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticCorpus
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(backend, chunks):
+    """Load one variant and time it; runs inside the child process"""
+    from utils import summarizer
+
+    start = time.perf_counter()
+    summarizer.load_summarizer(backend, warmup=False)
+    load_time = time.perf_counter() - start
+    if summarizer.summarizer is None:
+        return {"backend": backend, "error": "model failed to load"}
+
+    start = time.perf_counter()
+    summarizer.summarizer(summarizer.WARMUP_TEXT, max_length=20, min_length=5, do_sample=False)
+    warmup_time = time.perf_counter() - start
+
+    # Chunks of about the size generate_summary sends to the model
+    generator = SyntheticCorpus(seed=7)
+    texts = [generator.paragraph(sentences=8)[:1024] for _ in range(chunks)]
+    timings = []
+    for text in texts:
+        start = time.perf_counter()
+        summarizer.summarizer(text, max_length=60, min_length=20, do_sample=False)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    return {
+        "backend": backend,
+        "load_s": load_time,
+        "first_call_s": warmup_time,
+        "chunk_p50_ms": timings[len(timings) // 2] * 1000,
+        "chunk_max_ms": timings[-1] * 1000,
+        "rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["fp32", "int8", "onnx"])
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.chunks)))
+        return
+
+    print(f"{'backend':>8} {'load s':>8} {'1st call s':>11} {'p50 ms':>8} {'max ms':>8} {'rss MB':>8}")
+    for backend in args.backends:
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", backend, "--chunks", str(args.chunks)],
+            capture_output=True, text=True
+        )
+        lines = child.stdout.strip().splitlines()
+        try:
+            r = json.loads(lines[-1])
+        except (IndexError, ValueError):
+            print(f"{backend:>8} failed: {child.stderr.strip().splitlines()[-1:] or 'no output'}")
+            continue
+        if "error" in r:
+            print(f"{backend:>8} {r['error']}")
+            continue
+        print(f"{r['backend']:>8} {r['load_s']:>8.2f} {r['first_call_s']:>11.2f} {r['chunk_p50_ms']:>8.1f} "
+              f"{r['chunk_max_ms']:>8.1f} {r['rss_mb']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
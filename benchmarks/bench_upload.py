@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming upload path against save-then-reread
+
+Parses multipart upload requests the way the Flask /upload endpoint does.
+The old path spools the file, saves it to uploads/, then reads it back for
+its text. The streaming path hashes, stores and decodes each block as it is
+parsed. Reports throughput, bytes on disk and peak Python memory per upload,
+for distinct files and for repeats of one file:
+
+    python benchmarks/bench_upload.py --uploads 20 --size-mb 4
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from werkzeug.formparser import parse_form_data
+from werkzeug.test import EnvironBuilder
+
+from synthetic import SyntheticCorpus
+from utils.blob_store import BlobStore
+from utils.upload_stream import StreamingUpload
+
+
+def disk_usage(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def make_document(generator, size):
+    pieces = []
+    total = 0
+    while total < size:
+        paragraph = generator.paragraph() + "\n\n"
+        pieces.append(paragraph)
+        total += len(paragraph)
+    return "".join(pieces).encode("utf-8")[:size]
+
+
+def request_environ(body):
+    return EnvironBuilder(method="POST", data={
+        "title": "Essay",
+        "file": (io.BytesIO(body), "essay.txt"),
+    }).get_environ()
+
+
+def upload_legacy(directory, environ, i):
+    # The old endpoint: file.save(), then open the saved file for its text
+    _, _, files = parse_form_data(environ)
+    path = os.path.join(directory, f"{i}_essay.txt")
+    files["file"].save(path)
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def upload_streaming(store, environ, i):
+    _, _, files = parse_form_data(
+        environ, stream_factory=lambda total_content_length, content_type, filename=None, content_length=None:
+        StreamingUpload(store, filename)
+    )
+    return files["file"].stream.finish()["text"]
+
+
+def run(label, bodies, directory, measure_memory):
+    # Flush earlier runs' writes, which would otherwise slow this one down
+    os.sync()
+    store = BlobStore(os.path.join(directory, "store"), compression=None) if label == "stream" else None
+    peak = 0
+    elapsed = 0.0
+    for i, body in enumerate(bodies):
+        # The request body is built outside the measurement
+        environ = request_environ(body)
+        if measure_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        if store is None:
+            upload_legacy(directory, environ, i)
+        else:
+            upload_streaming(store, environ, i)
+        elapsed += time.perf_counter() - start
+        if measure_memory:
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    if store is not None:
+        store.close()
+    return elapsed, disk_usage(directory), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--size-mb", type=float, default=4)
+    args = parser.parse_args()
+
+    generator = SyntheticCorpus(seed=17)
+    size = int(args.size_mb * 1e6)
+    distinct = [make_document(generator, size) for _ in range(args.uploads)]
+    scenarios = (("distinct", distinct), ("repeated", [distinct[0]] * args.uploads))
+    logical = args.uploads * size / 1e6
+
+    print(f"{'scenario':>9} {'path':>7} {'MB/s':>8} {'disk MB':>8} {'peak MB':>8}")
+    for name, bodies in scenarios:
+        for label in ("legacy", "stream"):
+            with tempfile.TemporaryDirectory() as directory:
+                elapsed, usage, _ = run(label, bodies, directory, measure_memory=False)
+            # Memory is traced in a separate run, as tracing slows everything down
+            with tempfile.TemporaryDirectory() as directory:
+                _, _, peak = run(label, bodies[:3], directory, measure_memory=True)
+            print(f"{name:>9} {label:>7} {logical / elapsed:>8.1f} {usage / 1e6:>8.1f} {peak / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
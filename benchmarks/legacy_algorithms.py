@@ -0,0 +1,96 @@
+"""
+Reference implementations of algorithms that have since been replaced
+
+Kept verbatim so parity tests and benchmarks can compare the current
+implementations against the original behaviour.
+"""
+
+import re
+import math
+from nltk.corpus import stopwords
+
+
+def legacy_find_file_similarity(input_query: str, database: str) -> float:
+    """
+    Calculate similarity between input text and database text using TF-IDF
+    
+    Args:
+        input_query: Input text to check
+        database: Reference text to compare against
+        
+    Returns:
+        Similarity percentage (0-100)
+    """
+    universal_set_of_unique_words = []
+    match_percentage = 0
+    
+    lowercase_query = input_query.lower()
+    en_stops = set(stopwords.words('english'))
+    
+    # Replace punctuation by space and split
+    query_word_list = re.sub(r"[^\w]", " ", lowercase_query).split()
+    
+    # Add unique words from query
+    for word in query_word_list:
+        if word not in universal_set_of_unique_words:
+            universal_set_of_unique_words.append(word)
+    
+    database_lower = database.lower()
+    
+    # Replace punctuation by space and split
+    database_word_list = re.sub(r"[^\w]", " ", database_lower).split()
+    
+    # Add unique words from database
+    for word in database_word_list:
+        if word not in universal_set_of_unique_words:
+            universal_set_of_unique_words.append(word)
+    
+    # Remove stop words
+    for word in universal_set_of_unique_words[:]:  # Use slice to avoid modification during iteration
+        if word in en_stops:
+            universal_set_of_unique_words.remove(word)
+    
+    # Calculate TF (Term Frequency) for both texts
+    query_tf = []
+    database_tf = []
+    
+    for word in universal_set_of_unique_words:
+        query_tf_counter = 0
+        database_tf_counter = 0
+        
+        # Count word frequency in query
+        for word2 in query_word_list:
+            if word == word2:
+                query_tf_counter += 1
+        query_tf.append(query_tf_counter)
+        
+        # Count word frequency in database
+        for word2 in database_word_list:
+            if word == word2:
+                database_tf_counter += 1
+        database_tf.append(database_tf_counter)
+    
+    # Calculate dot product
+    dot_product = 0
+    for i in range(len(query_tf)):
+        dot_product += query_tf[i] * database_tf[i]
+    
+    # Calculate vector magnitudes
+    query_vector_magnitude = 0
+    for i in range(len(query_tf)):
+        query_vector_magnitude += query_tf[i]**2
+    query_vector_magnitude = math.sqrt(query_vector_magnitude)
+    
+    database_vector_magnitude = 0
+    for i in range(len(database_tf)):
+        database_vector_magnitude += database_tf[i]**2
+    database_vector_magnitude = math.sqrt(database_vector_magnitude)
+    
+    # Calculate similarity percentage
+    if query_vector_magnitude * database_vector_magnitude == 0:
+        return 0.0
+    
+    match_percentage = (float(dot_product) / (query_vector_magnitude * database_vector_magnitude)) * 100
+    
+    return match_percentage
+
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Synthetic academic corpus generator for benchmarks
+"""
+
+import itertools
+import os
+import random
+from typing import List, NamedTuple, Optional
+
+# Seed vocabulary; the rest of the vocabulary is made of generated words
+ACADEMIC_WORDS = [
+    "analysis", "approach", "algorithm", "data", "model", "results", "method",
+    "research", "study", "theory", "evidence", "hypothesis", "experiment",
+    "framework", "significant", "performance", "evaluation", "learning",
+    "network", "system", "distribution", "parameter", "variable", "sample",
+    "the", "of", "and", "to", "in", "is", "that", "for", "are", "with", "as",
+    "this", "be", "by", "on", "which", "we", "from", "these", "an", "can",
+]
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ra", "si", "tu", "ve", "zo", "pe", "dri", "on", "ex", "ul", "quo"]
+
+
+def make_vocabulary(size: int, seed: int = 0) -> List[str]:
+    """
+    Build a vocabulary of academic-looking words
+
+    Args:
+        size: Number of words
+        seed: Random seed
+
+    Returns:
+        List of unique words
+    """
+    rng = random.Random(seed)
+    vocab = list(ACADEMIC_WORDS)
+    seen = set(vocab)
+    while len(vocab) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            vocab.append(word)
+    return vocab[:size]
+
+
+class SyntheticCorpus:
+    """Deterministic generator of documents with a Zipf-like word distribution"""
+
+    def __init__(self, vocab_size: int = 20000, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.vocab = make_vocabulary(vocab_size, seed)
+        # Zipf weights make common words (including stopwords) dominate, like real text
+        self.cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(self.vocab))))
+
+    def sentence(self, min_words: int = 8, max_words: int = 20) -> str:
+        words = self.rng.choices(self.vocab, cum_weights=self.cum_weights, k=self.rng.randint(min_words, max_words))
+        return " ".join(words).capitalize() + "."
+
+    def paragraph(self, sentences: int = 5) -> str:
+        return " ".join(self.sentence() for _ in range(sentences))
+
+    def document(self, paragraphs: int = 4, sentences: int = 5) -> str:
+        """
+        Generate one document
+
+        Args:
+            paragraphs: Number of paragraphs, separated by blank lines
+            sentences: Sentences per paragraph
+
+        Returns:
+            Document text
+        """
+        return "\n\n".join(self.paragraph(sentences) for _ in range(paragraphs))
+
+    def documents(self, count: int, paragraphs: int = 4, sentences: int = 5) -> List[str]:
+        return [self.document(paragraphs, sentences) for _ in range(count)]
+
+    def paraphrase(self, text: str, rate: float = 0.3) -> str:
+        """
+        Reword a text: replace a share of its words and swap some neighbours
+
+        Only plain words change, so sentence ends and paragraph breaks stay.
+
+        Args:
+            text: Text to reword
+            rate: Share of words replaced; half as many are swapped
+
+        Returns:
+            Reworded text
+        """
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if not word.isalpha():
+                continue
+            roll = self.rng.random()
+            if roll < rate:
+                words[i] = self.rng.choices(self.vocab, cum_weights=self.cum_weights)[0]
+            elif roll < rate * 1.5 and i + 1 < len(words) and words[i + 1].isalpha():
+                words[i], words[i + 1] = words[i + 1], words[i]
+        return " ".join(words)
+
+    def plant(self, source: str, kind: str, fraction: float = 0.5, paragraphs: int = 4, sentences: int = 5) -> str:
+        """
+        Generate a submission that copies part of a source document
+
+        Args:
+            source: Document to copy from
+            kind: "verbatim" or "paraphrased"
+            fraction: Share of the source's paragraphs copied, as one block
+            paragraphs: Paragraphs of new text around the copied block
+            sentences: Sentences per new paragraph
+
+        Returns:
+            Submission text
+        """
+        source_paragraphs = source.split("\n\n")
+        size = max(1, round(len(source_paragraphs) * fraction))
+        start = self.rng.randrange(len(source_paragraphs) - size + 1)
+        copied = source_paragraphs[start:start + size]
+        if kind == "paraphrased":
+            copied = [self.paraphrase(paragraph) for paragraph in copied]
+        elif kind != "verbatim":
+            raise ValueError(f"Unknown copy kind: {kind}")
+
+        own = [self.paragraph(sentences) for _ in range(paragraphs)]
+        position = self.rng.randint(0, len(own))
+        return "\n\n".join(own[:position] + copied + own[position:])
+
+    def submissions(self, corpus: List[str], count: int, verbatim: float = 0.25, paraphrased: float = 0.25,
+                    paragraphs: int = 4, sentences: int = 5) -> List["Submission"]:
+        """
+        Generate submissions, some of which copy corpus documents
+
+        Args:
+            corpus: Reference documents copies are taken from
+            count: Number of submissions
+            verbatim: Share of submissions copying a passage verbatim
+            paraphrased: Share of submissions copying a reworded passage
+            paragraphs: Paragraphs of new text per submission
+            sentences: Sentences per new paragraph
+
+        Returns:
+            Submissions in random order
+        """
+        kinds = ["verbatim"] * round(count * verbatim) + ["paraphrased"] * round(count * paraphrased)
+        kinds += ["original"] * (count - len(kinds))
+        self.rng.shuffle(kinds)
+
+        result = []
+        for kind in kinds:
+            if kind == "original":
+                result.append(Submission(self.document(paragraphs, sentences), kind, None))
+            else:
+                source = self.rng.randrange(len(corpus))
+                result.append(Submission(self.plant(corpus[source], kind, paragraphs=paragraphs, sentences=sentences),
+                                         kind, source))
+        return result
+
+
+class Submission(NamedTuple):
+    """A synthetic submission and, if it copies one, its source document"""
+    text: str
+    kind: str
+    source: Optional[int]
+
+
+def write_corpus(corpus_dir: str, documents: List[str]) -> None:
+    """
+    Write documents as numbered .txt files
+
+    Args:
+        corpus_dir: Target directory (created if missing)
+        documents: Document texts
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    for i, text in enumerate(documents):
+        with open(os.path.join(corpus_dir, f"doc_{i:07d}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
@@ -20,8 +20,14 @@ def check_requirements():
         subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
         return False
 
-def start_backend():
-    """Start the FastAPI backend server"""
+def start_backend(production=False):
+    """
+    Start the FastAPI backend server
+    
+    Args:
+        production: Run the multi-worker gunicorn profile (backend/gunicorn.conf.py)
+            instead of the single-process reloading dev server
+    """
     print("\n🚀 Starting backend server...")
     
     # Create necessary directories if they don't exist
@@ -31,12 +37,18 @@ def start_backend():
     os.makedirs("blockchain_mock", exist_ok=True)
     os.makedirs("models", exist_ok=True)
     
-    backend_process = subprocess.Popen(
-        [sys.executable, "-m", "uvicorn", "backend.main:app", "--reload", "--host", "0.0.0.0", "--port", "8000"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
+    if production:
+        backend_process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-k", "uvicorn.workers.UvicornWorker", "api:app"],
+            cwd="backend"
+        )
+    else:
+        backend_process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--reload", "--host", "0.0.0.0", "--port", "8000"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
     
     # Wait for server to start
     time.sleep(2)
@@ -56,7 +68,7 @@ def main():
     check_requirements()
     
     # Start backend server
-    backend_process = start_backend()
+    backend_process = start_backend(production="--production" in sys.argv)
     
     # Start frontend
     start_frontend()
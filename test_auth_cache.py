@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for the token verification and user profile cache
+"""
+
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.auth_cache import AuthCache, LocalFirestore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingVerifier:
+    """Stands in for auth.verify_id_token, issuing tokens that expire in an hour"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.calls = 0
+
+    def __call__(self, token):
+        self.calls += 1
+        if not token.startswith("valid-"):
+            raise ValueError("Invalid token")
+        uid = token.split("-", 1)[1]
+        return {"uid": uid, "exp": int(self.clock()) + 3600}
+
+
+def load_profile(db):
+    def loader(uid):
+        doc = db.collection('users').document(uid).get()
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        data['uid'] = uid
+        return data
+    return loader
+
+
+def test_token_cache():
+    """Tokens are verified once until shortly before they expire"""
+    print("Testing token verification cache...")
+
+    clock = FakeClock()
+    verifier = CountingVerifier(clock)
+    cache = AuthCache(token_leeway=30, clock=clock)
+
+    for _ in range(5):
+        assert cache.verify("valid-alice", verifier)["uid"] == "alice"
+    assert verifier.calls == 1
+
+    # Callers changing the claims do not change the cached ones
+    cache.verify("valid-alice", verifier)["uid"] = "mallory"
+    assert cache.verify("valid-alice", verifier)["uid"] == "alice"
+
+    # Invalid tokens are never cached
+    for _ in range(2):
+        try:
+            cache.verify("forged", verifier)
+            assert False, "Expected the verifier to reject the token"
+        except ValueError:
+            pass
+    assert verifier.calls == 3
+
+    # Re-verified once within the leeway of exp
+    clock.now += 3600 - 29
+    cache.verify("valid-alice", verifier)
+    assert verifier.calls == 4
+
+    stats = cache.stats()["tokens"]
+    assert stats["hits"] == 6 and stats["misses"] == 4
+    assert stats["hit_rate"] == 0.6
+
+    print("✓ Token verification cache test passed\n")
+
+
+def test_profile_cache():
+    """Profiles are read from Firestore once per TTL and dropped on role changes"""
+    print("Testing user profile cache...")
+
+    clock = FakeClock()
+    db = LocalFirestore()
+    db.collection('users').document('alice').set({"email": "alice@example.com", "role": "pending_teacher"})
+    cache = AuthCache(profile_ttl=60, clock=clock)
+    loader = load_profile(db)
+
+    profile = cache.profile("alice", loader)
+    assert profile == {"email": "alice@example.com", "role": "pending_teacher", "uid": "alice"}
+    # Callers get copies, so changes do not leak into the cache
+    profile["role"] = "verified_teacher"
+    assert cache.profile("alice", loader)["role"] == "pending_teacher"
+    assert db.reads == 1
+
+    # Missing users are looked up again, so new accounts are found at once
+    assert cache.profile("bob", loader) is None
+    db.collection('users').document('bob').set({"role": "student"})
+    assert cache.profile("bob", loader)["role"] == "student"
+    assert db.reads == 3
+
+    # A role change is seen immediately after invalidation
+    db.collection('users').document('alice').update({"role": "verified_teacher"})
+    assert cache.profile("alice", loader)["role"] == "pending_teacher"
+    verifier = CountingVerifier(clock)
+    cache.verify("valid-alice", verifier)
+    cache.verify("valid-bob", verifier)
+    cache.invalidate_user("alice")
+    assert cache.profile("alice", loader)["role"] == "verified_teacher"
+    cache.verify("valid-alice", verifier)
+    cache.verify("valid-bob", verifier)
+    assert verifier.calls == 3
+
+    # Otherwise profiles expire after the TTL
+    db.collection('users').document('bob').update({"role": "pending_teacher"})
+    reads = db.reads
+    clock.now += 61
+    assert cache.profile("bob", loader)["role"] == "pending_teacher"
+    assert db.reads == reads + 1
+
+    print("✓ User profile cache test passed\n")
+
+
+def test_cache_bounds():
+    """Least recently used entries are dropped beyond the size limit"""
+    print("Testing auth cache size limits...")
+
+    clock = FakeClock()
+    db = LocalFirestore()
+    for uid in ("a", "b", "c"):
+        db.collection('users').document(uid).set({"role": "student"})
+    cache = AuthCache(profile_entries=2, clock=clock)
+    loader = load_profile(db)
+
+    cache.profile("a", loader)
+    cache.profile("b", loader)
+    cache.profile("a", loader)
+    cache.profile("c", loader)
+    assert len(cache.profiles) == 2
+    reads = db.reads
+    cache.profile("a", loader)
+    assert db.reads == reads
+    cache.profile("b", loader)
+    assert db.reads == reads + 1
+
+    print("✓ Auth cache size limits test passed\n")
+
+
+if __name__ == "__main__":
+    test_token_cache()
+    test_profile_cache()
+    test_cache_bounds()
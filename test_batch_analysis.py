@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tests for batch (whole-class) analysis
+"""
+
+import sys
+import os
+import io
+import zipfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+
+from utils.batch_analysis import (
+    BatchInputError, BatchLimitError, read_zip_documents, extract_text,
+    document_features, similarity_matrices, build_batch_report
+)
+from utils.plagiarism_algorithms import FileSimilarity
+
+ESSAYS = [
+    "Photosynthesis converts light energy into chemical energy stored in glucose molecules within plant cells.",
+    "The French Revolution reshaped European politics and spread ideas of liberty and equality across the continent.",
+    "Plate tectonics explains earthquakes, volcanoes and the slow drift of continents over millions of years.",
+    "Machine learning models learn statistical patterns from training data to make predictions on new inputs.",
+]
+
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def corpus_analysis(score):
+    return {
+        "overall_score": score,
+        "cosine_similarity": score,
+        "file_similarity": score * 100,
+        "ngram_similarity": 0.0,
+        "similar_passages": [],
+    }
+
+
+def test_read_zip_documents():
+    """Supported members of an archive should be read, others skipped"""
+    print("Testing batch zip reading...")
+
+    data = make_zip({
+        "class/alice.txt": "Alice's essay",
+        "class/bob.docx": b"PK docx bytes",
+        "class/notes.md": "skipped",
+        "class/": "",
+        "__MACOSX/class/._alice.txt": "resource fork",
+        "class/.hidden.txt": "hidden",
+    })
+    documents = read_zip_documents(data)
+    assert documents == [("class/alice.txt", b"Alice's essay"), ("class/bob.docx", b"PK docx bytes")]
+
+    try:
+        read_zip_documents(data, max_documents=1)
+        assert False, "archives with too many documents should be rejected"
+    except BatchLimitError:
+        pass
+
+    try:
+        read_zip_documents(b"not a zip")
+        assert False, "non-zip data should be rejected"
+    except BatchInputError:
+        pass
+
+    assert extract_text("essay.txt", "Résumé".encode("utf-8")) == "Résumé"
+
+    print("✓ Batch zip reading test passed\n")
+
+
+def test_similarity_matrices():
+    """The vectorized matrices should match the pairwise algorithms"""
+    print("Testing batch similarity matrices...")
+
+    texts = ESSAYS + [ESSAYS[0] + " " + ESSAYS[1], ""]
+    features = [document_features(text) for text in texts]
+    file_similarity, fingerprint_overlap = similarity_matrices(features)
+
+    n = len(texts)
+    assert file_similarity.shape == fingerprint_overlap.shape == (n, n)
+    for i in range(n):
+        for j in range(n):
+            expected = FileSimilarity.vector_similarity(features[i]["terms"], features[j]["terms"])
+            assert abs(file_similarity[i, j] - expected) < 1e-9
+
+            shared = len(np.intersect1d(features[i]["fingerprints"], features[j]["fingerprints"]))
+            count = len(features[i]["fingerprints"])
+            assert abs(fingerprint_overlap[i, j] - (shared / count if count else 0.0)) < 1e-12
+
+    # The combined essay contains all of the first essay's fingerprints
+    assert fingerprint_overlap[0, 4] == 1.0
+    assert fingerprint_overlap[4, 0] < 1.0
+    assert not fingerprint_overlap[5].any()
+
+    print("✓ Batch similarity matrices test passed\n")
+
+
+def test_batch_report():
+    """Copied submissions should be paired and ranked first"""
+    print("Testing batch report...")
+
+    names = ["alice.txt", "bob.txt", "carol.txt", "dave.txt", "erin.txt"]
+    texts = ESSAYS + [ESSAYS[2] + " Geologists measure this motion with satellite positioning."]
+    scores = [0.1, 0.6, 0.05, 0.2, 0.05]
+    results = [
+        {
+            "name": name,
+            "characters": len(text),
+            "plagiarism_analysis": corpus_analysis(score),
+            "cache_hit": False,
+            "features": document_features(text),
+        }
+        for name, text, score in zip(names, texts, scores)
+    ]
+    results.append({"name": "broken.pdf", "error": "No text found in document"})
+
+    report = build_batch_report(results, threshold=0.5)
+
+    assert report["success"]
+    assert report["document_count"] == 6
+    assert report["analyzed_count"] == 5
+    assert report["errors"] == [{"name": "broken.pdf", "error": "No text found in document"}]
+
+    # carol and erin submitted the same essay
+    assert report["pair_count"] == 1
+    pair = report["pairs"][0]
+    assert pair["documents"] == ["carol.txt", "erin.txt"]
+    assert pair["similarity"] > 0.8
+
+    ranking = report["ranking"]
+    assert [entry["rank"] for entry in ranking] == [1, 2, 3, 4, 5]
+    assert {entry["name"] for entry in ranking[:2]} == {"carol.txt", "erin.txt"}
+    assert ranking[0]["most_similar_peer"] in ("carol.txt", "erin.txt")
+    # A high corpus score ranks next, ahead of documents with neither
+    assert ranking[2]["name"] == "bob.txt"
+    assert ranking[2]["risk_score"] == 0.6
+
+    empty = build_batch_report([{"name": "broken.pdf", "error": "unreadable"}])
+    assert empty["ranking"] == [] and empty["pairs"] == []
+
+    print("✓ Batch report test passed\n")
+
+
+if __name__ == "__main__":
+    test_read_zip_documents()
+    test_similarity_matrices()
+    test_batch_report()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the synthetic submissions and baseline comparison of the benchmark suite
+"""
+
+import sys
+import os
+import copy
+import argparse
+
+# Add the backend and benchmarks directories to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'benchmarks'))
+
+from synthetic import SyntheticCorpus
+from bench_suite import run_suite, compare
+
+
+def test_planted_submissions():
+    """Submissions copy corpus passages verbatim or reworded, reproducibly"""
+    print("Testing planted submissions...")
+
+    generator = SyntheticCorpus(seed=23)
+    corpus = generator.documents(10)
+    submissions = generator.submissions(corpus, 20, verbatim=0.25, paraphrased=0.25)
+    assert [s.kind for s in submissions].count("verbatim") == 5
+    assert [s.kind for s in submissions].count("paraphrased") == 5
+
+    for submission in submissions:
+        if submission.kind == "original":
+            assert submission.source is None
+            continue
+        source = corpus[submission.source].split("\n\n")
+        copied = [p for p in source if p in submission.text.split("\n\n")]
+        if submission.kind == "verbatim":
+            assert len(copied) == 2
+        else:
+            # Reworded paragraphs keep their length but not their wording
+            assert not copied
+            assert len(submission.text.split("\n\n")) == 6
+
+    again = SyntheticCorpus(seed=23)
+    assert again.submissions(again.documents(10), 20) == submissions
+
+    print("✓ Planted submissions test passed\n")
+
+
+def test_baseline_comparison():
+    """A run compares clean against itself and flags slowdowns and score changes"""
+    print("Testing benchmark baseline comparison...")
+
+    args = argparse.Namespace(documents=30, submissions=8, paragraphs=2, vocabulary=2000, verbatim=0.25,
+                              paraphrased=0.25, seed=1, targets=["cosine", "comprehensive"], memory_samples=2)
+    document = run_suite(args)
+    result = document["results"]["comprehensive"]
+    assert result["calls"] == 8
+    assert 0 < result["p50_ms"] <= result["p99_ms"]
+    assert result["scores"]["verbatim"] > 0
+    assert compare(document, document, 0.25) == []
+
+    slower = copy.deepcopy(document)
+    slower["results"]["comprehensive"]["p50_ms"] *= 2
+    slower["results"]["cosine"]["scores"]["verbatim"] -= 0.2
+    regressions = compare(document, slower, 0.25)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("cosine: mean verbatim score")
+    assert regressions[1].startswith("comprehensive: p50_ms")
+
+    other = copy.deepcopy(document)
+    other["workload"]["seed"] = 2
+    assert compare(document, other, 0.25)[0].startswith("workload differs")
+
+    print("✓ Benchmark baseline comparison test passed\n")
+
+
+if __name__ == "__main__":
+    test_planted_submissions()
+    test_baseline_comparison()
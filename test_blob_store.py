@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for the local content-addressed blob store
+"""
+
+import sys
+import os
+import random
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.blob_store import BlobStore, MAX_CHUNK_SIZE, MIN_CHUNK_SIZE, WRITER_BUFFER_SIZE, chunk_boundaries
+
+
+def random_bytes(size, seed=0):
+    rng = random.Random(seed)
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+
+def test_chunk_boundaries():
+    """Chunks should respect the size limits and survive insertions"""
+    print("Testing content-defined chunking...")
+
+    data = random_bytes(300_000)
+    boundaries = chunk_boundaries(data)
+    sizes = [end - start for start, end in zip([0] + boundaries, boundaries)]
+    assert boundaries[-1] == len(data)
+    assert all(MIN_CHUNK_SIZE <= size <= MAX_CHUNK_SIZE for size in sizes[:-1])
+
+    edited = data[:150_000] + b"inserted words" + data[150_000:]
+    shifted = {end + 14 for end in boundaries if end > 150_000 + 64}
+    # Boundaries well past the edit move with the content
+    assert len(shifted & set(chunk_boundaries(edited))) >= len(shifted) - 1
+
+    assert chunk_boundaries(b"") == []
+    assert chunk_boundaries(b"short") == [5]
+
+    print("✓ Content-defined chunking test passed\n")
+
+
+def test_roundtrip_and_dedup():
+    """Identical content is stored once, near-identical content shares chunks"""
+    print("Testing blob store deduplication...")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root, compression=None)
+        data = random_bytes(200_000, seed=1)
+
+        cid = store.put(data, {"title": "Thesis"})
+        assert store.get(cid) == data
+        assert store.metadata(cid) == {"title": "Thesis"}
+        assert store.put(data) == cid
+        stored_once = store.stats()["stored_bytes"]
+
+        near = data[:100_000] + b"one changed sentence" + data[100_000:]
+        near_cid = store.put(near)
+        assert near_cid != cid and store.get(near_cid) == near
+        stats = store.stats()
+        assert stats["objects"] == 2
+        assert stats["stored_bytes"] - stored_once < 40_000
+        assert stats["dedup_ratio"] > 1.5
+
+        # Chunks live in a sharded layout
+        shard = os.listdir(os.path.join(root, "chunks"))[0]
+        assert len(shard) == 2
+
+        assert store.put_json({"b": 1, "a": [1, 2]}) == store.put_json({"a": [1, 2], "b": 1})
+        try:
+            store.get("bafkmissing")
+            assert False, "unknown CIDs should raise KeyError"
+        except KeyError:
+            pass
+
+        # The index persists
+        store.close()
+        reopened = BlobStore(root, compression=None)
+        assert reopened.get(cid) == data
+        assert [c for c, _, _ in reopened.iter_metadata()][:2] == [cid, near_cid]
+
+    print("✓ Blob store deduplication test passed\n")
+
+
+def test_streaming_writer():
+    """Writing an object in pieces should store the same chunks as put()"""
+    print("Testing streaming blob writer...")
+
+    data = random_bytes(3 * WRITER_BUFFER_SIZE + 12_345, seed=3)
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root, compression=None)
+        writer = store.writer()
+        for start in range(0, len(data), 7_777):
+            writer.write(data[start:start + 7_777])
+        assert not store.exists(writer.cid)
+        cid = writer.commit({"title": "streamed"})
+
+        stats = store.stats()
+        assert store.get(cid) == data
+        assert b"".join(store.iter_chunks(cid)) == data
+        assert store.metadata(cid) == {"title": "streamed"}
+        assert stats["chunks"] == len(chunk_boundaries(data))
+
+        # Same bytes in one piece: same CID, nothing new stored
+        assert store.put(data) == cid
+        assert store.stats()["chunks"] == stats["chunks"]
+        assert store.set_metadata(cid, {"title": "renamed"})
+        assert store.metadata(cid) == {"title": "renamed"}
+        assert not store.set_metadata("missing", {})
+
+    print("✓ Streaming blob writer test passed\n")
+
+
+if __name__ == "__main__":
+    test_chunk_boundaries()
+    test_roundtrip_and_dedup()
+    test_streaming_writer()
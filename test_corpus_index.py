@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent corpus index
+"""
+
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.corpus_index import CorpusIndex, tokenize
+from utils.minhash_lsh import LSHConfig, LSHIndex, MinHasher
+from utils.plagiarism_algorithms import CosineSimilarity, FileSimilarity, PlagiarismDetector
+
+DOCUMENTS = {
+    "fox.txt": "A quick brown fox jumps over a lazy dog. This is another sample text for testing.",
+    "weather.txt": "The weather is beautiful today. I love going for walks in the park.",
+    "ml.txt": "Machine learning algorithms are used for pattern recognition and data analysis.",
+}
+
+QUERY = "The quick brown fox jumps over the lazy dog. This is a sample text for testing plagiarism detection algorithms."
+
+
+def write_corpus(corpus_dir, documents):
+    for filename, content in documents.items():
+        with open(os.path.join(corpus_dir, filename), "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+def test_index_matches_pairwise_scores():
+    """Index scores should equal the pairwise algorithms"""
+    print("Testing corpus index score parity...")
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        write_corpus(corpus_dir, DOCUMENTS)
+        index = CorpusIndex(corpus_dir)
+
+        cosine_scores, file_scores = index.score(QUERY)
+        for i, filename in enumerate(index.filenames):
+            ref_text = DOCUMENTS[filename]
+            assert index.document_text(i) == ref_text
+            assert abs(cosine_scores[i] - CosineSimilarity.cosine_sim(QUERY, ref_text)) < 1e-9
+            assert abs(file_scores[i] - FileSimilarity.find_file_similarity(QUERY, ref_text)) < 1e-9
+
+    print("✓ Corpus index score parity test passed\n")
+
+
+def test_index_incremental_updates():
+    """Added, changed and removed files should be reflected after a refresh"""
+    print("Testing corpus index incremental updates...")
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        write_corpus(corpus_dir, DOCUMENTS)
+        index = CorpusIndex(corpus_dir, refresh_interval=0)
+        first_version = index.version
+
+        assert not index.refresh()
+
+        os.remove(os.path.join(corpus_dir, "weather.txt"))
+        write_corpus(corpus_dir, {"new.txt": QUERY, "ml.txt": "Completely rewritten reference document."})
+        # Make sure the rewritten file is seen as changed even on coarse mtime clocks
+        os.utime(os.path.join(corpus_dir, "ml.txt"), ns=(0, 0))
+
+        assert index.refresh()
+        assert index.version != first_version
+        assert sorted(index.filenames) == ["fox.txt", "ml.txt", "new.txt"]
+
+        texts = dict(zip(index.filenames, index.texts()))
+        assert texts["ml.txt"] == "Completely rewritten reference document."
+
+        cosine_scores, file_scores = index.score(QUERY)
+        new_id = index.filenames.index("new.txt")
+        assert abs(cosine_scores[new_id] - 1.0) < 1e-9
+        assert abs(file_scores[new_id] - 100.0) < 1e-9
+
+        # A second instance opens the persisted index without re-tokenizing
+        reopened = CorpusIndex(corpus_dir)
+        assert reopened.version == index.version
+        assert reopened.texts() == index.texts()
+
+    print("✓ Corpus index incremental update test passed\n")
+
+
+def test_detector_uses_index():
+    """The detector should give the same results from the index as from raw texts"""
+    print("Testing detector against corpus index...")
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        write_corpus(corpus_dir, DOCUMENTS)
+        index = CorpusIndex(corpus_dir)
+        detector = PlagiarismDetector()
+
+        from_index = detector.check_plagiarism_comprehensive(QUERY, corpus_index=index)
+        from_texts = detector.check_plagiarism_comprehensive(QUERY, index.texts())
+
+        assert abs(from_index["overall_score"] - from_texts["overall_score"]) < 1e-9
+        assert len(from_index["similar_passages"]) == len(from_texts["similar_passages"])
+
+    print("✓ Detector corpus index test passed\n")
+
+
+def test_minhash_lsh_candidates():
+    """Near-duplicates should share LSH buckets, unrelated texts should not"""
+    print("Testing MinHash LSH candidate retrieval...")
+
+    hasher = MinHasher(num_perm=128, shingle_size=3)
+    texts = [QUERY] + list(DOCUMENTS.values())
+    signatures = [hasher.signature(tokenize(t)) for t in texts]
+
+    lsh = LSHIndex(np.vstack(signatures[1:]), bands=32, rows=4)
+
+    near_duplicate = QUERY.replace("plagiarism detection algorithms", "plagiarism detection methods")
+    assert list(lsh.query(hasher.signature(tokenize(near_duplicate)))) == []
+
+    lsh = LSHIndex(np.vstack(signatures), bands=32, rows=4)
+    assert 0 in lsh.query(hasher.signature(tokenize(near_duplicate)))
+    assert list(lsh.query(hasher.signature([]))) == []
+
+    print("✓ MinHash LSH candidate test passed\n")
+
+
+def test_lsh_config_validation():
+    """Band settings that do not fit the signature are refused when the config is built"""
+    print("Testing LSH config validation...")
+
+    assert LSHConfig(num_perm=64, bands=16, rows=4).threshold > 0
+    for values in ({"bands": 64, "rows": 4}, {"bands": 0}):
+        try:
+            LSHConfig(**values)
+            assert False, f"Expected {values} to be refused"
+        except ValueError:
+            pass
+
+    os.environ["LSH_NUM_PERM"] = "64"
+    try:
+        LSHConfig.from_env()
+        assert False, "Expected the default 32 bands of 4 rows not to fit 64 permutations"
+    except ValueError as e:
+        assert "num_perm (64)" in str(e)
+    finally:
+        del os.environ["LSH_NUM_PERM"]
+
+    print("✓ LSH config validation test passed\n")
+
+
+def test_index_candidate_scoring():
+    """Scoring LSH candidates should match full scoring for those documents"""
+    print("Testing corpus index candidate scoring...")
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        write_corpus(corpus_dir, dict(DOCUMENTS, **{"copy.txt": QUERY}))
+        index = CorpusIndex(corpus_dir, lsh_config=LSHConfig(shingle_size=3, min_corpus_size=0))
+        assert index.lsh_enabled
+
+        candidates = index.candidates(QUERY)
+        assert index.filenames.index("copy.txt") in candidates
+
+        full_cosine, full_file = index.score(QUERY)
+        cand_cosine, cand_file = index.score(QUERY, doc_ids=candidates)
+        for i in range(len(index)):
+            if i in candidates:
+                assert abs(cand_cosine[i] - full_cosine[i]) < 1e-9
+                assert abs(cand_file[i] - full_file[i]) < 1e-9
+            else:
+                assert cand_cosine[i] == 0.0 and cand_file[i] == 0.0
+
+        all_ids = list(range(len(index)))
+        assert np.allclose(index.score(QUERY, doc_ids=all_ids)[1], full_file)
+
+    print("✓ Corpus index candidate scoring test passed\n")
+
+
+if __name__ == "__main__":
+    test_index_matches_pairwise_scores()
+    test_index_incremental_updates()
+    test_detector_uses_index()
+    test_minhash_lsh_candidates()
+    test_lsh_config_validation()
+    test_index_candidate_scoring()
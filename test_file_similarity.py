@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Parity tests for the hashed-vector FileSimilarity implementation
+"""
+
+import sys
+import os
+
+# Add the backend and benchmarks directories to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'benchmarks'))
+
+from utils.plagiarism_algorithms import FileSimilarity, PlagiarismDetector
+from legacy_algorithms import legacy_find_file_similarity
+from synthetic import SyntheticCorpus
+
+TEXT_PAIRS = [
+    ("The quick brown fox jumps over the lazy dog. This is a sample text for testing.",
+     "A quick brown fox jumps over a lazy dog. This is another sample text for testing."),
+    ("The quick brown fox jumps over the lazy dog. This is a sample text for testing.",
+     "The weather is beautiful today. I love going for walks in the park."),
+    ("Identical text, identical text!", "Identical text, identical text!"),
+    ("", "Some reference text"),
+    ("the and of to", "the and of to"),
+    ("Hello world", "Hello world"),
+    ("Ünïcödé wörds and snake_case_words 123 numbers", "ünïcödé WÖRDS, snake_case_words; 123-numbers"),
+    ("Line one\nline two\ttabbed\r\nline three", "line ONE line Two tabbed"),
+]
+
+
+def test_file_similarity_parity():
+    """New implementation should return exactly what the original returned"""
+    print("Testing FileSimilarity parity on hand-written pairs...")
+
+    for query, database in TEXT_PAIRS:
+        expected = legacy_find_file_similarity(query, database)
+        assert FileSimilarity.find_file_similarity(query, database) == expected, (query, database)
+        assert FileSimilarity.find_file_similarity(database, query) == legacy_find_file_similarity(database, query)
+
+    print("✓ FileSimilarity hand-written parity test passed\n")
+
+
+def test_file_similarity_parity_synthetic():
+    """Parity on generated documents, including a cached query vector"""
+    print("Testing FileSimilarity parity on synthetic documents...")
+
+    generator = SyntheticCorpus(vocab_size=2000, seed=3)
+    query = generator.document(paragraphs=3)
+    corpus = generator.documents(20, paragraphs=2) + [query]
+
+    query_vector = FileSimilarity.term_vector(query)
+    for reference in corpus:
+        expected = legacy_find_file_similarity(query, reference)
+        assert FileSimilarity.find_file_similarity(query, reference) == expected
+        assert FileSimilarity.find_file_similarity(query, reference, query_vector=query_vector) == expected
+
+    print("✓ FileSimilarity synthetic parity test passed\n")
+
+
+def test_detector_file_scores_parity():
+    """Detector file scores should match the original per-pair results"""
+    print("Testing detector file score parity...")
+
+    generator = SyntheticCorpus(vocab_size=2000, seed=4)
+    query = generator.document()
+    corpus = generator.documents(10)
+
+    results = PlagiarismDetector().check_plagiarism_comprehensive(query, corpus)
+    assert results["details"]["file_scores"] == [legacy_find_file_similarity(query, ref) for ref in corpus]
+
+    print("✓ Detector file score parity test passed\n")
+
+
+if __name__ == "__main__":
+    test_file_similarity_parity()
+    test_file_similarity_parity_synthetic()
+    test_detector_file_scores_parity()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for the index of previously checked documents
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.blob_store import BlobStore
+from utils.history_index import HistoryIndex
+
+
+def write_legacy(directory, doc_id, title, text):
+    with open(os.path.join(directory, f"{doc_id}.json"), "w") as f:
+        json.dump({"title": title, "text": text, "summary": text[:20],
+                   "plagiarism_score": "0.25", "timestamp": "2025-07-05T18:17:44"}, f)
+
+
+def test_incremental_index():
+    """The index picks up new and removed documents without re-reading old ones"""
+    print("Testing incremental history index...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_legacy(directory, "bafybeihaaa", "First", "first document text, which is longer than its summary")
+        write_legacy(directory, "bafybeihbbb", "Second", "second document text")
+
+        history = HistoryIndex(directory)
+        entries = list(history.entries())
+        assert [entry[:2] for entry in entries] == [("bafybeihaaa", "First"), ("bafybeihbbb", "Second")]
+        # Scores are kept as stored
+        assert entries[0][3] == "0.25"
+        # Listings hold no document bodies
+        assert all("longer than its summary" not in str(field) for field in entries[0])
+
+        # Bodies are read on demand
+        assert history.document("bafybeihaaa")["text"] == "first document text, which is longer than its summary"
+        assert history.document("unknown") is None
+
+        # Documents stored in the blob store are listed too; file contents are not
+        store = BlobStore(os.path.join(directory, "store"), compression=None)
+        store.put(b"raw file content")
+        cid = store.put_json({"title": "Third", "text": "third"}, {"title": "Third", "plagiarism_score": 0.1})
+        write_legacy(directory, "bafybeihccc", "Fourth", "fourth document text")
+        os.remove(os.path.join(directory, "bafybeihbbb.json"))
+
+        ids = [entry[0] for entry in history.entries()]
+        assert sorted(ids) == sorted(["bafybeihaaa", "bafybeihccc", cid])
+        assert history.document(cid)["text"] == "third"
+        assert "bafybeihbbb" not in history
+        history.close()
+
+        # A fresh index loads the stored listing without parsing any legacy file
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                with open(os.path.join(directory, name), "w") as f:
+                    f.write("not json")
+        os.utime(directory, ns=(os.stat(directory).st_atime_ns, os.stat(directory).st_mtime_ns - 10 ** 10))
+        reopened = HistoryIndex(directory)
+        reopened._connect().execute(
+            "UPDATE state SET value = ? WHERE key = 'legacy_mtime'", (os.stat(directory).st_mtime_ns,)
+        )
+        assert sorted(entry[0] for entry in reopened.entries()) == sorted(ids)
+        reopened.close()
+        store.close()
+
+    print("✓ Incremental history index test passed\n")
+
+
+def test_shared_index():
+    """Documents indexed by one worker process are listed by the others"""
+    print("Testing history index shared between workers...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_legacy(directory, "bafybeihaaa", "First", "first document text")
+        first, second = HistoryIndex(directory), HistoryIndex(directory)
+        assert len(list(first.entries())) == len(list(second.entries())) == 1
+        _, seq = second.entries_since(0)
+
+        # The first worker indexes the new document; the second finds it already indexed
+        store = BlobStore(os.path.join(directory, "store"), compression=None)
+        cid = store.put_json({"title": "Second", "text": "second"}, {"title": "Second"})
+        assert [entry[0] for entry in first.entries()] == ["bafybeihaaa", cid]
+        assert [entry[0] for entry in second.entries()] == ["bafybeihaaa", cid]
+        assert cid in second
+
+        # Entries after a sequence number do not depend on the listing order of either worker
+        new, latest = first.entries_since(seq)
+        assert [entry[:2] for entry in new] == [(cid, "Second")] and latest > seq
+        assert first.entries_since(latest) == ([], latest)
+
+        # Removals by another worker are picked up too
+        os.remove(os.path.join(directory, "bafybeihaaa.json"))
+        assert [entry[0] for entry in first.entries()] == [cid]
+        assert [entry[0] for entry in second.entries()] == [cid]
+        first.close()
+        second.close()
+        store.close()
+
+    print("✓ Shared history index test passed\n")
+
+
+if __name__ == "__main__":
+    test_incremental_index()
+    test_shared_index()
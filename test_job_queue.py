@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Tests for the analysis job queue
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.job_queue import (
+    JobQueue, LocalBackend, ProcessPoolBackend, QueueFullError,
+    QUEUED, RUNNING, SUCCEEDED, FAILED
+)
+from utils.storage import SQLiteStorage
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def square(x):
+    if x < 0:
+        raise ValueError("negative")
+    return x * x
+
+
+def total(results, offset):
+    return sum(results) + offset
+
+
+def test_job_results_and_errors():
+    """Finished jobs should report their result or error"""
+    print("Testing job results...")
+
+    queue = JobQueue(LocalBackend(workers=2))
+    ok = queue.submit("sum", sum, [1, 2, 3])
+    bad = queue.submit("fail", fail, "broken input")
+
+    assert ok.wait(5) and bad.wait(5)
+    assert ok.status == SUCCEEDED and ok.result == 6
+    assert bad.status == FAILED and bad.error == "broken input"
+    assert "result" not in bad.to_dict()
+    assert queue.get(ok.id) is ok
+    assert queue.get("missing") is None
+    queue.shutdown()
+
+    print("✓ Job result test passed\n")
+
+
+def test_backpressure():
+    """Jobs beyond the worker count wait, and a full queue rejects submissions"""
+    print("Testing job queue backpressure...")
+
+    release = threading.Event()
+    queue = JobQueue(LocalBackend(workers=1), max_pending=2)
+    first = queue.submit("block", release.wait, 5)
+    second = queue.submit("block", release.wait, 5)
+
+    assert first.status == RUNNING
+    assert second.status == QUEUED
+    try:
+        queue.submit("block", release.wait, 5)
+        assert False, "submission to a full queue should fail"
+    except QueueFullError:
+        pass
+
+    release.set()
+    assert first.wait(5) and second.wait(5)
+    assert second.status == SUCCEEDED
+    assert queue.stats()["pending"] == 0
+
+    # Capacity is available again once jobs finish
+    assert queue.submit("sum", sum, [1]).wait(5)
+    queue.shutdown()
+
+    print("✓ Job queue backpressure test passed\n")
+
+
+def test_finished_jobs_evicted():
+    """Only the most recent finished jobs are kept"""
+    print("Testing finished job eviction...")
+
+    queue = JobQueue(LocalBackend(workers=1), max_finished=3)
+    jobs = [queue.submit("sum", sum, [i]) for i in range(6)]
+    for job in jobs:
+        job.wait(5)
+    queue.submit("sum", sum, [0]).wait(5)
+
+    assert queue.get(jobs[0].id) is None
+    assert queue.get(jobs[-1].id) is jobs[-1]
+    queue.shutdown()
+
+    print("✓ Finished job eviction test passed\n")
+
+
+def test_process_pool_backend():
+    """The process backend should run jobs in worker processes"""
+    print("Testing process pool backend...")
+
+    queue = JobQueue(ProcessPoolBackend(workers=1))
+    job = queue.submit("pow", pow, 2, 10)
+    assert job.wait(60)
+    assert job.status == SUCCEEDED and job.result == 1024
+    queue.shutdown()
+
+    print("✓ Process pool backend test passed\n")
+
+
+def test_drain():
+    """Draining waits for queued and running jobs, up to a timeout"""
+    print("Testing job queue draining...")
+
+    release = threading.Event()
+    queue = JobQueue(LocalBackend(workers=1))
+    jobs = [queue.submit("wait", release.wait, 5) for _ in range(3)]
+    assert not queue.drain(timeout=0.05)
+
+    release.set()
+    assert queue.drain(timeout=5)
+    assert all(job.status == SUCCEEDED for job in jobs) and queue.pending == 0
+    assert queue.drain(timeout=0)
+    queue.shutdown()
+
+    print("✓ Job queue draining test passed\n")
+
+
+def test_submit_map():
+    """A map job should report progress and reduce its results in item order"""
+    print("Testing map jobs...")
+
+    queue = JobQueue(LocalBackend(workers=2))
+    job = queue.submit_map("squares", square, [1, 2, 3, 4])
+    assert job.wait(5) and job.status == SUCCEEDED
+    assert job.result == [1, 4, 9, 16]
+    assert job.to_dict()["progress"] == {"done": 4, "total": 4}
+
+    reduced = queue.submit_map("total", square, range(5), total, 100)
+    assert reduced.wait(5) and reduced.result == 130
+    assert queue.submit_map("empty", square, [], total, 7).wait(5)
+
+    # One failing call fails the job; its other calls are dropped
+    failed = queue.submit_map("squares", square, [1, -1] + list(range(50)), total, 0)
+    assert failed.wait(5) and failed.status == FAILED and failed.error == "negative"
+    assert failed.progress["done"] < 52
+    assert queue.drain(timeout=5) and queue.pending == 0
+    queue.shutdown()
+
+    # Tasks and the reduce step run in worker processes too
+    queue = JobQueue(ProcessPoolBackend(workers=2))
+    job = queue.submit_map("total", square, range(10), total, 0)
+    assert job.wait(60) and job.result == 285
+    queue.shutdown()
+
+    print("✓ Map job test passed\n")
+
+
+def stored_status(queue, job_id, status, timeout=5):
+    """Look a job up until it reports the status; state changes are stored without waiting"""
+    deadline = time.time() + timeout
+    while True:
+        job = queue.get(job_id)
+        if (job is not None and job.status == status) or time.time() > deadline:
+            return job
+        time.sleep(0.01)
+
+
+def test_shared_job_store():
+    """A job accepted by one worker process can be followed from any other"""
+    print("Testing job state shared between workers...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "jobs.sqlite")
+        # Two server workers, each with its own queue and connection
+        accepting = JobQueue(LocalBackend(workers=1), max_finished=2, store=SQLiteStorage(path))
+        polled = JobQueue(LocalBackend(workers=1), store=SQLiteStorage(path))
+
+        release = threading.Event()
+        job = accepting.submit("block", release.wait, 5)
+        remote = polled.get(job.id)
+        assert remote is not None and remote is not job and not remote.finished
+        release.set()
+        assert job.wait(5)
+        remote = stored_status(polled, job.id, SUCCEEDED)
+        assert remote.to_dict() == job.to_dict() and remote.result is True
+
+        mapped = accepting.submit_map("total", square, range(4), total, 1)
+        failed = accepting.submit("fail", fail, "broken input")
+        assert mapped.wait(5) and failed.wait(5)
+        remote = stored_status(polled, mapped.id, SUCCEEDED)
+        assert remote.result == 15 and remote.progress == {"done": 4, "total": 4}
+        # A late write of an older state does not replace the finished one
+        accepting.store.put_job({**remote.to_record(), "status": RUNNING, "revision": 1})
+        assert polled.get(mapped.id).status == SUCCEEDED
+        assert stored_status(polled, failed.id, FAILED).error == "broken input"
+        assert polled.get("missing") is None
+
+        # Only the most recently finished jobs are kept in the store too
+        accepting.submit("sum", sum, [1]).wait(5)
+        # Writes commit in order: once this one is, the pruning is too
+        accepting.store.set_meta("barrier", "1")
+        assert polled.get(job.id) is None and polled.get(mapped.id) is not None
+        accepting.shutdown()
+        polled.shutdown()
+
+    print("✓ Shared job state test passed\n")
+
+
+if __name__ == "__main__":
+    test_job_results_and_errors()
+    test_backpressure()
+    test_finished_jobs_evicted()
+    test_process_pool_backend()
+    test_drain()
+    test_submit_map()
+    test_shared_job_store()
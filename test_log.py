@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tests for structured, queued and sampled logging
+"""
+
+import sys
+import os
+import io
+import json
+import logging
+import threading
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.log import JsonFormatter, NonBlockingQueueHandler, StructuredLogger, TextFormatter, truncate
+
+
+class BlockedOutput(logging.Handler):
+    """Output that writes nothing until released, like a stalled pipe"""
+
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.released.wait()
+        self.records.append(record)
+
+
+def make_logger(name, output, maxsize=100):
+    handler = NonBlockingQueueHandler(output, maxsize=maxsize)
+    logger = logging.getLogger(f"test_log.{name}")
+    logger.handlers = [handler]
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return StructuredLogger(logger), handler
+
+
+def test_truncation():
+    """Long values are shortened and objects snapshotted when logged"""
+    print("Testing log value truncation...")
+
+    assert truncate("short", 10) == "short"
+    assert truncate("x" * 25, 10) == "x" * 10 + "...(+15 chars)"
+    assert truncate(b"\xff" + b"a" * 20, 5) == "�aaaa...(+16 chars)"
+    assert truncate(0.5) == 0.5 and truncate(None) is None and truncate(True) is True
+
+    result = {"plagiarism_score": 0.1}
+    snapshot = truncate(result)
+    result["plagiarism_score"] = 0.9
+    assert snapshot == "{'plagiarism_score': 0.1}"
+
+    print("✓ Log value truncation test passed\n")
+
+
+def test_non_blocking():
+    """A stalled output never blocks callers; records beyond the queue are counted as dropped"""
+    print("Testing non-blocking log queue...")
+
+    output = BlockedOutput()
+    log, handler = make_logger("blocked", output, maxsize=5)
+    log.info("Request body", body="b" * 10000, i=0)
+    while handler.queue.qsize():
+        time.sleep(0.01)
+    # The writer is stuck on the first record
+    start = time.perf_counter()
+    for i in range(1, 50):
+        log.info("Request body", body="b" * 10000, i=i)
+    assert time.perf_counter() - start < 1.0
+    assert handler.dropped == 44
+
+    output.released.set()
+    handler.flush()
+    assert [record.fields["i"] for record in output.records] == [0, 1, 2, 3, 4, 5]
+    assert len(output.records[0].fields["body"]) < 600
+
+    print("✓ Non-blocking log queue test passed\n")
+
+
+def test_sampling_and_levels():
+    """Sampled and disabled messages are dropped before a record is built"""
+    print("Testing log sampling and levels...")
+
+    output = BlockedOutput()
+    output.released.set()
+    log, handler = make_logger("sampled", output)
+    reads = []
+
+    def read_body():
+        reads.append(1)
+        return b"body"
+
+    for _ in range(200):
+        log.debug("Hot path", sample=0.0, body=read_body)
+    for _ in range(3):
+        log.debug("Hot path", sample=1.0)
+    log.logger.setLevel(logging.INFO)
+    log.debug("Disabled", body=read_body)
+    # Lazy values are built only for written records
+    assert reads == []
+    log.info("Written", body=read_body)
+    assert reads == [1]
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        log.exception("Failed", error="division")
+    handler.flush()
+
+    assert [record.getMessage() for record in output.records] == ["Hot path"] * 3 + ["Written", "Failed"]
+    assert output.records[3].fields == {"body": "body"}
+    assert output.records[0].fields == {"sampled": 1.0}
+    failed = output.records[-1]
+    assert failed.levelname == "ERROR" and "ZeroDivisionError" in failed.exc_text
+    # The record points at the caller, not the logging module
+    assert failed.filename == "test_log.py"
+
+    print("✓ Log sampling and levels test passed\n")
+
+
+def test_formats():
+    """Text lines quote values with spaces; JSON lines carry the fields at the top level"""
+    print("Testing log formats...")
+
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(TextFormatter())
+    log, handler = make_logger("text", output)
+    log.info("Analysis complete", file_id="abc", title="Two words", score=0.25)
+    handler.flush()
+    line = stream.getvalue().strip()
+    assert line.endswith('INFO    test_log.text: Analysis complete file_id=abc title="Two words" score=0.25')
+
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    log, handler = make_logger("json", output)
+    log.warning("File not found", file_id="abc")
+    handler.flush()
+    data = json.loads(stream.getvalue())
+    assert data["level"] == "WARNING" and data["message"] == "File not found"
+    assert data["file_id"] == "abc" and data["logger"] == "test_log.json"
+
+    print("✓ Log formats test passed\n")
+
+
+if __name__ == "__main__":
+    test_truncation()
+    test_non_blocking()
+    test_sampling_and_levels()
+    test_formats()
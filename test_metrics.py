@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for latency instrumentation and the Prometheus metrics format
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.metrics import MetricsRegistry, get_registry, stage, ALGORITHM_SECONDS, STAGE_SECONDS
+from utils.job_queue import JobQueue, ProcessPoolBackend, SUCCEEDED
+from utils.plagiarism_algorithms import PlagiarismDetector
+
+
+def timed_square(x):
+    with stage("test_square"):
+        return x * x
+
+
+def test_histogram_format():
+    """Histograms render cumulative buckets, sum and count per label set"""
+    print("Testing histogram rendering...")
+
+    registry = MetricsRegistry()
+    latency = registry.histogram("test_seconds", "Test latency", buckets=(0.1, 1.0), labelnames=("stage",))
+    latency.observe(0.05, stage="a")
+    latency.observe(0.5, stage="a")
+    latency.observe(5, stage="a")
+    latency.observe(1.0, stage='b"c')
+    requests = registry.counter("test_requests", "Test requests", labelnames=("route",))
+    requests.inc(route="/x")
+    requests.inc(2, route="/x")
+    registry.register_collector("test_cache", "Test cache", lambda: {
+        "hits": 3, "hit_rate": 0.75, "loaded": True, "backend": "memory", "tier": {"disk-bytes": 10}
+    })
+
+    lines = registry.render().splitlines()
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{stage="a"} 5.55' in lines
+    assert 'test_seconds_count{stage="a"} 3' in lines
+    # Values on a bucket bound fall into that bucket; label values are escaped
+    assert 'test_seconds_bucket{stage="b\\"c",le="1.0"} 1' in lines
+    assert 'test_requests_total{route="/x"} 3' in lines
+    assert "test_cache_hits 3" in lines
+    assert "test_cache_hit_rate 0.75" in lines
+    assert "test_cache_loaded 1" in lines
+    assert "test_cache_tier_disk_bytes 10" in lines
+    assert not any(line.startswith("test_cache_backend") for line in lines)
+
+    # A failing collector does not break the endpoint
+    registry.register_collector("test_cache", "Test cache", lambda: 1 / 0)
+    assert "test_seconds_count" in registry.render()
+
+    print("✓ Histogram rendering test passed\n")
+
+
+def test_shared_between_workers():
+    """Scrapes answered by different server workers report the sum over all of them"""
+    print("Testing metrics shared between server workers...")
+
+    def worker(directory):
+        registry = MetricsRegistry()
+        requests = registry.counter("test_requests", "Test requests")
+        latency = registry.histogram("test_seconds", "Test latency", buckets=(1.0,))
+        registry.register_collector("test_cache", "Test cache", lambda: {"hits": 1})
+        registry.share(directory, interval=3600)
+        return registry, requests, latency
+
+    with tempfile.TemporaryDirectory() as directory:
+        first, first_requests, first_latency = worker(directory)
+        second, second_requests, second_latency = worker(directory)
+        first_requests.inc(3)
+        first_latency.observe(0.5)
+        assert "test_requests_total 3" in first.render().splitlines()
+
+        # The second worker's scrape includes what the first one reported
+        second_requests.inc(2)
+        second_latency.observe(2.0)
+        lines = second.render().splitlines()
+        assert "test_requests_total 5" in lines
+        assert 'test_seconds_bucket{le="1.0"} 1' in lines and "test_seconds_count 2" in lines
+        assert f'test_cache_hits{{pid="{os.getpid()}"}} 1' in lines
+
+        # Counts rendered by one worker never go back on the next scrape, wherever it lands
+        first_requests.inc()
+        assert "test_requests_total 6" in first.render().splitlines()
+        assert "test_requests_total 6" in second.render().splitlines()
+
+    print("✓ Metrics shared between server workers test passed\n")
+
+
+def test_worker_metrics_merged():
+    """Metrics recorded in job worker processes reach the server's registry"""
+    print("Testing metrics from worker processes...")
+
+    before = STAGE_SECONDS.series(stage="test_square")[0]
+    queue = JobQueue(ProcessPoolBackend(workers=1))
+    jobs = [queue.submit("square", timed_square, x) for x in range(3)]
+    for job in jobs:
+        assert job.wait(60) and job.status == SUCCEEDED
+    assert [job.result for job in jobs] == [0, 1, 4]
+    queue.shutdown()
+
+    after = STAGE_SECONDS.series(stage="test_square")[0]
+    assert sum(after) - sum(before) == 3
+
+    print("✓ Metrics from worker processes test passed\n")
+
+
+def test_detector_spans():
+    """Each algorithm of PlagiarismDetector is timed"""
+    print("Testing similarity algorithm spans...")
+
+    detector = PlagiarismDetector()
+    references = ["The quick brown fox jumps over the lazy dog near the river bank today."]
+
+    def count(name):
+        return sum(ALGORITHM_SECONDS.series(algorithm=name)[0])
+
+    names = ["reference_index", "cosine_file_similarity", "fingerprint", "cosine_similarity", "file_similarity"]
+    before = {name: count(name) for name in names}
+    detector.check_plagiarism_comprehensive("The quick brown fox jumps over the lazy dog.", references)
+    detector.compare_two_texts("The quick brown fox.", references[0])
+    assert all(count(name) == before[name] + 1 for name in names)
+    assert 'plagiarism_algorithm_seconds_count{algorithm="fingerprint"}' in get_registry().render()
+
+    # Timing a block costs microseconds
+    start = time.perf_counter()
+    for _ in range(10000):
+        with stage("test_overhead"):
+            pass
+    assert (time.perf_counter() - start) / 10000 < 50e-6
+
+    print("✓ Similarity algorithm spans test passed\n")
+
+
+if __name__ == "__main__":
+    test_histogram_format()
+    test_shared_between_workers()
+    test_worker_metrics_merged()
+    test_detector_spans()
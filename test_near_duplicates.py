@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for near-duplicate clustering over the submission history
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# Add the backend and benchmarks directories to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'benchmarks'))
+
+from utils.history_index import HistoryIndex
+from utils.near_duplicates import NearDuplicateIndex
+from synthetic import SyntheticCorpus
+
+
+def planted_documents(count=120):
+    """Distinct documents with a chain of three near-copies and one exact copy"""
+    generator = SyntheticCorpus(seed=19)
+    texts = generator.documents(count, paragraphs=2)
+    texts[10] = texts[5] + " " + generator.sentence()
+    texts[20] = texts[10][:int(len(texts[10]) * 0.9)]
+    texts[count - 1] = texts[50]
+    texts[60] = ""
+    texts[61] = ""
+    return [(f"doc{i}", text) for i, text in enumerate(texts)]
+
+
+def test_incremental_clusters():
+    """New documents are joined against stored signatures only"""
+    print("Testing incremental near-duplicate clusters...")
+
+    documents = planted_documents()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "near_duplicates.sqlite")
+        index = NearDuplicateIndex(path, threshold=0.5, workers=1, chunk_size=25)
+
+        totals = index.add_documents(documents[:100])
+        assert totals["added"] == 100
+        clusters = index.clusters()
+        assert [cluster["documents"] for cluster in clusters] == [["doc5", "doc10", "doc20"]]
+        assert clusters[0]["size"] == 3
+        assert 0.5 <= clusters[0]["min_similarity"] <= clusters[0]["max_similarity"] <= 1.0
+
+        # Known documents are skipped; the exact copy joins its original
+        index.close()
+        index = NearDuplicateIndex(path, threshold=0.5, workers=1, chunk_size=25)
+        totals = index.add_documents(documents)
+        assert totals["added"] == 20
+        assert totals["pairs"] == 1
+        clusters = index.clusters()
+        assert [cluster["documents"] for cluster in clusters] == [["doc5", "doc10", "doc20"], ["doc50", "doc119"]]
+        assert clusters[1]["max_similarity"] == 1.0
+        assert index.clusters(min_size=3) == clusters[:1]
+        # Empty documents are not near-duplicates of each other
+        assert all("doc60" not in cluster["documents"] for cluster in clusters)
+        assert index.stats()["documents"] == 120
+        index.close()
+
+        # A different threshold rebuilds the index
+        index = NearDuplicateIndex(path, threshold=0.9, workers=1)
+        assert len(index) == 0
+        index.add_documents(documents)
+        clusters = index.clusters()
+        assert ["doc50", "doc119"] in [cluster["documents"] for cluster in clusters]
+        assert all(cluster["size"] == 2 and cluster["min_similarity"] >= 0.9 for cluster in clusters)
+        index.close()
+
+    print("✓ Incremental near-duplicate clusters test passed\n")
+
+
+def test_history_clusters():
+    """Documents are read from the ipfs_mock history"""
+    print("Testing near-duplicate clusters from history...")
+
+    documents = planted_documents()[:40]
+    with tempfile.TemporaryDirectory() as directory:
+        history_dir = os.path.join(directory, "ipfs_mock")
+        os.makedirs(history_dir)
+        for doc_id, text in documents:
+            with open(os.path.join(history_dir, f"{doc_id}.json"), "w") as f:
+                json.dump({"title": doc_id, "text": text}, f)
+
+        history = HistoryIndex(history_dir)
+        index = NearDuplicateIndex(os.path.join(directory, "index.sqlite"), workers=1)
+        assert index.update_from_history(history)["added"] == 40
+        # Legacy documents are indexed in file name order
+        assert [cluster["documents"] for cluster in index.clusters()] == [["doc10", "doc20", "doc5"]]
+        assert index.update_from_history(history)["added"] == 0
+        index.close()
+        history.close()
+
+    print("✓ Near-duplicate clusters from history test passed\n")
+
+
+if __name__ == "__main__":
+    test_incremental_clusters()
+    test_history_clusters()
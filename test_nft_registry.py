@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the indexed NFT registry
+"""
+
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.nft_registry import NFTRegistry, NFTRecord
+
+
+def make_registry(count=25):
+    registry = NFTRegistry()
+    for i in range(count):
+        registry.add(NFTRecord(id=f"nft{i}", title=f"Paper {i}", wallet_address=f"wallet{i % 3}",
+                               student_name=f"Student {i % 5}", ipfs_cid=f"cid{i}"))
+    return registry
+
+
+def read_all(registry, limit, **filters):
+    ids, cursor = [], None
+    while True:
+        page, cursor = registry.page(cursor, limit, **filters)
+        ids.extend(record.id for record in page)
+        if cursor is None:
+            return ids
+
+
+def test_lookup_and_update():
+    """Entries are found by id and updates keep the secondary indexes in step"""
+    print("Testing NFT registry lookup and update...")
+
+    registry = make_registry()
+    assert len(registry) == 25 and "nft7" in registry
+    assert registry.get("nft7").title == "Paper 7"
+    assert registry.get("missing") is None
+
+    try:
+        registry.add(NFTRecord(id="nft7"))
+        assert False, "duplicate ids should be rejected"
+    except ValueError:
+        pass
+
+    assert registry.update("nft7", feedback="Well cited", wallet_address="wallet9")
+    assert not registry.update("missing", feedback="x")
+    assert registry.get("nft7").feedback == "Well cited"
+    assert read_all(registry, 10, wallet_address="wallet9") == ["nft7"]
+    assert "nft7" not in read_all(registry, 10, wallet_address="wallet1")
+
+    record = registry.get("nft7").to_dict()
+    assert record["id"] == "nft7" and "is_mock" not in record
+    assert NFTRecord(id="old", is_mock=True, filename="old.txt").to_dict()["is_mock"] is True
+
+    print("✓ NFT registry lookup and update test passed\n")
+
+
+def test_pagination():
+    """Cursor pages cover every matching entry once, in insertion order"""
+    print("Testing NFT registry pagination...")
+
+    registry = make_registry()
+    assert read_all(registry, 7) == [f"nft{i}" for i in range(25)]
+    assert read_all(registry, 4, wallet_address="wallet1") == [f"nft{i}" for i in range(1, 25, 3)]
+    assert read_all(registry, 2, wallet_address="wallet0", student_name="Student 0") == ["nft0", "nft15"]
+    assert read_all(registry, 5, ipfs_cid="cid-unknown") == []
+
+    # Cursors stay valid while entries are added
+    page, cursor = registry.page(None, 10)
+    registry.add(NFTRecord(id="late"))
+    page, cursor = registry.page(cursor, 100)
+    assert page[0].id == "nft10" and page[-1].id == "late" and cursor is None
+
+    for bad in ({"cursor": "abc"}, {"limit": 0}, {"title": "Paper 1"}):
+        try:
+            registry.page(**bad)
+            assert False, f"{bad} should be rejected"
+        except ValueError:
+            pass
+
+    print("✓ NFT registry pagination test passed\n")
+
+
+if __name__ == "__main__":
+    test_lookup_and_update()
+    test_pagination()
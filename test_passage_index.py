@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the corpus passage index
+"""
+
+import sys
+import os
+
+# Add the backend and benchmarks directories to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'benchmarks'))
+
+from utils.passage_index import PassageIndex
+from synthetic import SyntheticCorpus
+
+
+def test_copied_paragraph_is_found():
+    """A paragraph copied from the corpus should match its source exactly"""
+    print("Testing passage index on a copied paragraph...")
+
+    generator = SyntheticCorpus(vocab_size=3000, seed=5)
+    documents = generator.documents(20, paragraphs=4)
+    copied = documents[7].split("\n\n")[2]
+    submission = generator.paragraph() + "\n\n" + copied + "\n\nToo short to compare."
+
+    index = PassageIndex(documents, [f"doc_{i}.txt" for i in range(len(documents))])
+    matches = index.query(submission, threshold=0.7)
+
+    assert matches, "Copied paragraph should be found"
+    best = matches[0]
+    assert best["document_paragraph"] == copied
+    assert best["corpus_paragraph"] == copied
+    assert best["corpus_file"] == "doc_7.txt"
+    assert abs(best["similarity"] - 1.0) < 1e-9
+    assert all(m["document_paragraph"] != "Too short to compare." for m in matches)
+
+    print("✓ Copied paragraph test passed\n")
+
+
+def test_top_k_and_novel_terms():
+    """Top-k caps matches per paragraph; unseen words lower the similarity"""
+    print("Testing passage index top-k and unseen terms...")
+
+    paragraph = "Neural network models learn hierarchical feature representations from large labelled datasets efficiently"
+    documents = [paragraph, paragraph + " today", paragraph + " again"]
+    index = PassageIndex(documents)
+
+    assert len(index.query(paragraph, threshold=0.0, top_k=2)) == 2
+    assert len(index.query(paragraph, threshold=0.0, top_k=5)) == 3
+
+    extended = paragraph + " using zyxwv qwertyuiop asdfghjkl unseen vocabulary"
+    score = index.query(extended, threshold=0.0, top_k=1)[0]["similarity"]
+    assert score < 0.9, "Words absent from the corpus should still count against the match"
+
+    assert PassageIndex([]).query(paragraph) == []
+
+    print("✓ Top-k and unseen terms test passed\n")
+
+
+if __name__ == "__main__":
+    test_copied_paragraph_is_found()
+    test_top_k_and_novel_terms()
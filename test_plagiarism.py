@@ -100,6 +100,34 @@ def test_comprehensive_detector():
     
     print("✓ Comprehensive detector test passed\n")
 
+def test_batch_scoring():
+    """Test batched one-vs-many scoring against pairwise scoring"""
+    print("Testing Batched Scoring...")
+    
+    detector = PlagiarismDetector()
+    
+    test_text = "The quick brown fox jumps over the lazy dog. This is a sample text for testing plagiarism detection algorithms."
+    reference_texts = [
+        "A quick brown fox jumps over a lazy dog. This is another sample text for testing.",
+        "The weather is beautiful today. I love going for walks in the park.",
+        "",
+        test_text
+    ]
+    
+    corpus_matrix = detector.build_corpus_matrix(reference_texts)
+    cosine_scores, file_scores = detector.score_batch(test_text, corpus_matrix)
+    
+    for i, ref_text in enumerate(reference_texts):
+        assert abs(cosine_scores[i] - CosineSimilarity.cosine_sim(test_text, ref_text)) < 1e-9
+        assert abs(file_scores[i] - FileSimilarity.find_file_similarity(test_text, ref_text)) < 1e-9
+    
+    # Restricting to a subset leaves the other references at zero
+    cosine_subset, _ = detector.score_batch(test_text, corpus_matrix, doc_ids=[3])
+    assert cosine_subset[:3] == [0.0, 0.0, 0.0]
+    assert abs(cosine_subset[3] - cosine_scores[3]) < 1e-9
+    
+    print("✓ Batched scoring test passed\n")
+
 def test_edge_cases():
     """Test edge cases"""
     print("Testing Edge Cases...")
@@ -131,6 +159,7 @@ def main():
         test_file_similarity()
         test_ngram_similarity()
         test_comprehensive_detector()
+        test_batch_scoring()
         test_edge_cases()
         
         print("=" * 60)
@@ -138,10 +167,10 @@ def main():
         print("=" * 60)
         print("\nThe plagiarism detection algorithms have been successfully implemented.")
         print("You can now use the enhanced API endpoints:")
-        print("  - POST /api/v1/analyze-text")
-        print("  - POST /api/v1/compare-texts")
-        print("  - POST /api/v1/analyze-detailed")
-        print("  - GET /api/v1/corpus-info")
+        print("  - POST /analyze-text")
+        print("  - POST /compare-texts")
+        print("  - POST /analyze-detailed")
+        print("  - GET /corpus-info")
         
     except Exception as e:
         print(f"❌ Test failed: {str(e)}")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for on-demand request profiling
+"""
+
+import sys
+import os
+import time
+import pstats
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils import request_profiler
+from utils.request_profiler import ProfileDenied, ProfileStore, resolve_profile, run_profiled
+
+TOKEN = "secret-token"
+
+
+def busy_analysis(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(1000))
+    return total
+
+
+def failing_analysis():
+    busy_analysis(0.05)
+    raise ValueError("broken document")
+
+
+def test_resolve_profile():
+    """Only requests with the token are profiled on demand; others by sampling"""
+    print("Testing profile request resolution...")
+
+    assert resolve_profile({}, {}, token=TOKEN, sample_rate=0) is None
+
+    for headers, query in [({"X-Profile": "1"}, {}), ({}, {"profile": "1"}),
+                           ({"X-Profile": "1", "X-Profile-Token": "wrong"}, {})]:
+        try:
+            resolve_profile(headers, query, token=TOKEN, sample_rate=0)
+            assert False, "Expected profiling without the token to be refused"
+        except ProfileDenied:
+            pass
+    # An empty token disables on-demand profiling
+    try:
+        resolve_profile({"X-Profile": "1", "X-Profile-Token": ""}, {}, token="", sample_rate=0)
+        assert False, "Expected profiling to be disabled"
+    except ProfileDenied:
+        pass
+
+    spec = resolve_profile({"X-Profile-Token": TOKEN}, {"profile": "trace"}, token=TOKEN)
+    assert spec.mode == "trace" and spec.reason == "requested" and len(spec.request_id) == 32
+
+    spec = resolve_profile({"X-Profile": "1", "X-Profile-Token": TOKEN, "X-Request-ID": "req-42"}, {}, token=TOKEN)
+    assert (spec.request_id, spec.mode) == ("req-42", "sample")
+    spec = resolve_profile({"X-Profile": "1", "X-Profile-Token": TOKEN, "X-Request-ID": "../etc"}, {}, token=TOKEN)
+    assert spec.request_id != "../etc"
+
+    try:
+        resolve_profile({"X-Profile": "memory", "X-Profile-Token": TOKEN}, {}, token=TOKEN)
+        assert False, "Expected an unknown mode to be refused"
+    except ValueError:
+        pass
+
+    spec = resolve_profile({}, {}, token=TOKEN, sample_rate=1.0)
+    assert spec.mode == "sample" and spec.reason == "sampled"
+    # Without the token, a request cannot pick the id its profile is stored under
+    spec = resolve_profile({"X-Request-ID": "req-42"}, {}, token=TOKEN, sample_rate=1.0)
+    assert spec.reason == "sampled" and spec.request_id != "req-42" and len(spec.request_id) == 32
+
+    print("✓ Profile request resolution test passed\n")
+
+
+def test_profiles_stored():
+    """Profiles are stored by request id in flame graph and pstats formats"""
+    print("Testing stored request profiles...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        request_profiler._profile_store = store = ProfileStore(directory, max_profiles=2)
+        try:
+            spec = request_profiler.ProfileSpec("sampled-1", "sample", "requested")
+            assert run_profiled(spec, "/analyze-text", busy_analysis, 0.3) > 0
+            path, media_type, info = store.get("sampled-1")
+            assert media_type.startswith("text/plain")
+            assert info["endpoint"] == "/analyze-text" and info["samples"] > 10
+            with open(path) as f:
+                lines = f.read().splitlines()
+            counts = [int(line.rsplit(" ", 1)[1]) for line in lines]
+            assert sum(counts) == info["samples"]
+            assert any("busy_analysis (" in line and "test_request_profiler.py" in line for line in lines)
+
+            spec = request_profiler.ProfileSpec("traced-1", "trace", "requested")
+            try:
+                run_profiled(spec, "/analyze", failing_analysis)
+                assert False, "Expected the error to propagate"
+            except ValueError:
+                pass
+            path, _, info = store.get("traced-1")
+            assert info["error"] == "broken document"
+            functions = {name for (_, _, name) in pstats.Stats(path).stats}
+            assert "failing_analysis" in functions and "busy_analysis" in functions
+
+            # Unprofiled requests store nothing; only the newest profiles are kept
+            assert run_profiled(None, "/analyze", busy_analysis, 0) == 0
+            run_profiled(request_profiler.ProfileSpec("sampled-2", "sample", "sampled"), "/analyze", busy_analysis, 0.01)
+            assert [info["request_id"] for info in store.list()] == ["sampled-2", "traced-1"]
+            assert store.get("sampled-1") is None
+            assert store.get("../traced-1") is None
+        finally:
+            request_profiler._profile_store = None
+
+    print("✓ Stored request profiles test passed\n")
+
+
+if __name__ == "__main__":
+    test_resolve_profile()
+    test_profiles_stored()
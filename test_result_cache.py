@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for the analysis result cache
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.result_cache import ResultCache, normalize_text, text_hash
+
+RESULT = {"plagiarism_analysis": {"overall_score": 0.42, "document_coverage": {"3": 12.5}}, "summary": "Short."}
+CONFIG = {"kind": "analyze-text", "options": {}}
+
+
+def test_normalized_hash():
+    """Line endings and Unicode composition should not change the hash"""
+    print("Testing text normalization...")
+
+    assert text_hash(normalize_text("Café\r\nnoir")) == text_hash(normalize_text("Café\nnoir"))
+    assert text_hash(normalize_text("Café noir")) != text_hash(normalize_text("Cafe noir"))
+
+    print("✓ Text normalization test passed\n")
+
+
+def test_hits_and_config():
+    """Results are served for the same text, corpus version and configuration only"""
+    print("Testing result cache keys...")
+
+    cache = ResultCache()
+    digest = text_hash("some submission")
+    assert cache.get(digest, "v1", CONFIG) is None
+
+    cache.put(digest, "v1", CONFIG, RESULT)
+    assert cache.get(digest, "v1", CONFIG) == RESULT
+    assert cache.get(digest, "v1", dict(CONFIG, options={"include_ngram": False})) is None
+    assert cache.get(text_hash("another submission"), "v1", CONFIG) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 3
+
+    print("✓ Result cache key test passed\n")
+
+
+def test_corpus_versions():
+    """Results are kept per corpus version; other workers' versions stay usable"""
+    print("Testing result cache corpus versions...")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        digest = text_hash("some submission")
+        cache = ResultCache(cache_dir)
+        cache.put(digest, "v1", CONFIG, RESULT)
+
+        # Another process sees the stored result
+        assert ResultCache(cache_dir).get(digest, "v1", CONFIG) == RESULT
+
+        # A worker on a newer corpus does not get it, nor remove it from one still on the old corpus
+        newer = ResultCache(cache_dir)
+        assert newer.get(digest, "v2", CONFIG) is None
+        newer.put(digest, "v2", CONFIG, dict(RESULT, summary="Newer."))
+        assert ResultCache(cache_dir).get(digest, "v1", CONFIG) == RESULT
+        assert ResultCache(cache_dir).get(digest, "v2", CONFIG)["summary"] == "Newer."
+
+    print("✓ Result cache corpus version test passed\n")
+
+
+def test_eviction():
+    """The disk tier stays within its size, removing results of versions no longer read first"""
+    print("Testing result cache eviction...")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        size = len(json.dumps(RESULT).encode("utf-8"))
+        cache = ResultCache(cache_dir, max_entries=1, max_bytes=size * 3.5)
+        for i in range(3):
+            cache.put(text_hash(f"old {i}"), "v1", CONFIG, RESULT)
+        past = time.time() - 60
+        for root, _, files in os.walk(os.path.join(cache_dir, "v1")):
+            for name in files:
+                os.utime(os.path.join(root, name), (past, past))
+
+        for i in range(3):
+            cache.put(text_hash(f"new {i}"), "v2", CONFIG, RESULT)
+        assert cache.stats()["disk_bytes"] <= size * 3.5
+        assert not os.path.exists(os.path.join(cache_dir, "v1"))
+        assert all(cache.get(text_hash(f"new {i}"), "v2", CONFIG) == RESULT for i in range(3))
+
+    print("✓ Result cache eviction test passed\n")
+
+
+if __name__ == "__main__":
+    test_normalized_hash()
+    test_hits_and_config()
+    test_corpus_versions()
+    test_eviction()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests for the upload and NFT storage backends
+"""
+
+import sys
+import os
+import tempfile
+import threading
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.nft_registry import NFTRecord
+from utils.storage import MemoryStorage, SQLiteStorage
+
+
+def check_contract(storage):
+    storage.put_upload({"id": "f1", "filename": "essay.txt", "text": "Essay text"})
+    assert storage.get_upload("f1")["text"] == "Essay text"
+    assert storage.get_upload("missing") is None
+
+    storage.add_nfts([NFTRecord(id=f"nft{i}", wallet_address=f"w{i % 2}", ipfs_cid=f"cid{i}") for i in range(5)])
+    storage.add_nft(NFTRecord(id="old", is_mock=True, filename="old.txt", plagiarism_score="0.25"))
+    try:
+        storage.add_nft(NFTRecord(id="nft1"))
+        assert False, "duplicate ids should be rejected"
+    except ValueError:
+        pass
+    storage.add_nfts([NFTRecord(id="nft1"), NFTRecord(id="nft5")], skip_existing=True)
+
+    assert storage.get_nft("old").to_dict()["is_mock"] is True
+    assert storage.get_nft("old").plagiarism_score == "0.25"
+    assert storage.update_nft("nft2", feedback={"grade": "A"}, wallet_address="w9")
+    assert not storage.update_nft("missing", feedback="x")
+    assert storage.get_nft("nft2").feedback == {"grade": "A"}
+
+    ids = [nft.id for nft in storage.iter_nfts()]
+    assert ids == ["nft0", "nft1", "nft2", "nft3", "nft4", "old", "nft5"]
+
+    page, cursor = storage.page_nfts(None, 2, wallet_address="w0")
+    assert [nft.id for nft in page] == ["nft0", "nft4"] and cursor is None
+    page, cursor = storage.page_nfts(None, 3)
+    rest, end = storage.page_nfts(cursor, 10)
+    assert [nft.id for nft in page + rest] == ids and end is None
+    assert [nft.id for nft in storage.page_nfts(None, 5, wallet_address="w9")[0]] == ["nft2"]
+    for bad in ({"cursor": "abc"}, {"limit": 0}, {"title": "x"}):
+        try:
+            storage.page_nfts(**bad)
+            assert False, f"{bad} should be rejected"
+        except ValueError:
+            pass
+
+    storage.set_meta("history_synced", "3")
+    assert storage.get_meta("history_synced") == "3"
+    assert storage.get_meta("missing") is None
+
+
+def test_backends():
+    """Both backends store and page uploads and NFTs the same way"""
+    print("Testing storage backends...")
+
+    check_contract(MemoryStorage())
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteStorage(os.path.join(directory, "db", "backend.sqlite"))
+        check_contract(storage)
+        storage.close()
+
+    print("✓ Storage backends test passed\n")
+
+
+def test_sqlite_shared_and_durable():
+    """Workers sharing a database see each other's writes, which survive a restart"""
+    print("Testing shared SQLite storage...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "backend.sqlite")
+        first = SQLiteStorage(path, batch_wait=0.02)
+        second = SQLiteStorage(path)
+
+        first.add_nft(NFTRecord(id="nft", title="Thesis"))
+        # Cached in the second worker, then changed by the first
+        assert second.get_nft("nft").feedback is None
+        first.update_nft("nft", feedback="Good")
+        assert second.get_nft("nft").feedback == "Good"
+
+        # Concurrent writes are committed together
+        threads = [threading.Thread(target=first.put_upload, args=({"id": f"f{i}", "text": "x"},))
+                   for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = first.stats()
+        assert stats["items"] == 22 and stats["batches"] < 22
+
+        first.close()
+        second.close()
+        reopened = SQLiteStorage(path)
+        assert reopened.get_upload("f19")["text"] == "x"
+        assert reopened.get_nft("nft").feedback == "Good"
+        reopened.close()
+
+    print("✓ Shared SQLite storage test passed\n")
+
+
+def write_in_child(storage):
+    # Runs in a forked worker: the parent's connections and writer thread are not usable here
+    storage.update_nft("nft", feedback="From worker")
+    storage.add_nft(NFTRecord(id="child"))
+    os._exit(0 if storage.get_nft("child") is not None else 1)
+
+
+def test_sqlite_after_fork():
+    """A storage opened before a fork (preloaded server master) works in the forked workers"""
+    print("Testing SQLite storage across fork...")
+    if not hasattr(os, "fork"):
+        print("fork is not available on this platform; skipped\n")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteStorage(os.path.join(directory, "backend.sqlite"))
+        storage.add_nft(NFTRecord(id="nft"))
+        assert storage.get_nft("nft").feedback is None
+
+        pid = os.fork()
+        if pid == 0:
+            write_in_child(storage)
+        _, status = os.waitpid(pid, 0)
+        assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+        assert storage.get_nft("nft").feedback == "From worker"
+        assert storage.get_nft("child") is not None
+        storage.add_nft(NFTRecord(id="parent"))
+        storage.close()
+
+    print("✓ SQLite storage across fork test passed\n")
+
+
+if __name__ == "__main__":
+    test_backends()
+    test_sqlite_shared_and_durable()
+    test_sqlite_after_fork()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for the batched, cached summarization service
+"""
+
+import sys
+import os
+import tempfile
+import threading
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.batching import MicroBatcher
+from utils.summary_service import SummaryCache, SummaryService
+
+
+class RecordingModel:
+    """Stand-in model that records the batches it is called with"""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts, params):
+        with self.lock:
+            self.calls.append(list(texts))
+        return [f"summary of {text[:10]}" for text in texts]
+
+
+def chunker(text):
+    return [text[i:i + 100] for i in range(0, len(text), 100)]
+
+
+def fallback(text, sentences):
+    return "extractive"
+
+
+def test_summary_cache_hits():
+    """Repeated texts should be served from the cache"""
+    print("Testing summary cache hits...")
+
+    model = RecordingModel()
+    service = SummaryService(model, chunker, fallback, max_input_chars=100, max_wait=0)
+
+    first = service.summarize("A short text to summarize.")
+    second = service.summarize("A short text to summarize.")
+    assert first == second
+    assert len(model.calls) == 1
+
+    # Different length limits are a different summary
+    service.summarize("A short text to summarize.", max_length=60)
+    assert len(model.calls) == 2
+
+    stats = service.metrics()["cache"]
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+    print("✓ Summary cache hit test passed\n")
+
+
+def test_chunks_are_batched():
+    """Chunks of a long text should be summarized in one model call"""
+    print("Testing chunk batching...")
+
+    model = RecordingModel()
+    service = SummaryService(model, chunker, fallback, max_input_chars=100, max_batch_size=8, max_wait=0.05)
+
+    service.summarize("x" * 450)
+    assert len(model.calls) == 1
+    assert len(model.calls[0]) == 5
+
+    print("✓ Chunk batching test passed\n")
+
+
+def test_concurrent_requests_share_batches():
+    """Requests from concurrent callers should be batched together"""
+    print("Testing cross-request batching...")
+
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=16, max_wait=0.2)
+    start = threading.Barrier(4)
+    results = {}
+
+    def call(i):
+        start.wait()
+        results[i] = batcher.submit(f"text {i}", (150, 40)).result()
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results[2] == "summary of text 2"
+    assert batcher.stats()["max_batch_size"] > 1
+    assert batcher.stats()["items"] == 4
+
+    print("✓ Cross-request batching test passed\n")
+
+
+def test_disk_cache_persistence_and_eviction():
+    """The disk tier should survive restarts and stay under its size limit"""
+    print("Testing summary disk cache...")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = SummaryCache(cache_dir, max_entries=2, max_bytes=1000)
+        cache.put("a" * 64, "first summary")
+        assert SummaryCache(cache_dir).get("a" * 64) == "first summary"
+
+        for i in range(20):
+            cache.put(f"{i:064d}", "y" * 100)
+        assert cache.stats()["disk_bytes"] <= 1000
+        assert len(cache._memory) == 2
+        assert SummaryCache(cache_dir).get(f"{19:064d}") == "y" * 100
+
+    print("✓ Summary disk cache test passed\n")
+
+
+def test_failed_summaries_not_cached():
+    """Model failures fall back to extraction without caching the fallback"""
+    print("Testing summary failure fallback...")
+
+    def broken(texts, params):
+        raise RuntimeError("model unavailable")
+
+    service = SummaryService(broken, chunker, fallback, max_wait=0)
+    assert service.summarize("Some text.") == "extractive"
+    assert service.metrics()["cache"]["memory_entries"] == 0
+
+    print("✓ Summary failure fallback test passed\n")
+
+
+if __name__ == "__main__":
+    test_summary_cache_hits()
+    test_chunks_are_batched()
+    test_concurrent_requests_share_batches()
+    test_disk_cache_persistence_and_eviction()
+    test_failed_summaries_not_cached()
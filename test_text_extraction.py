@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming text extraction
+"""
+
+import sys
+import os
+import random
+import tempfile
+import zipfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.plagiarism_algorithms import FileSimilarity
+from utils.text_extraction import (
+    ExtractionLimitError, TermCounter, extract_document, iter_docx_paragraphs, iter_text
+)
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def write_docx(path, paragraphs):
+    body = "".join(
+        f'<w:p><w:r><w:t>{first}</w:t></w:r><w:r><w:tab/><w:t xml:space="preserve">{second}</w:t></w:r></w:p>'
+        for first, second in paragraphs
+    )
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f'<?xml version="1.0"?><w:document {W}><w:body>{body}</w:body></w:document>')
+
+
+def test_docx_paragraphs():
+    """DOCX paragraphs should be streamed in order with their runs joined"""
+    print("Testing DOCX paragraph streaming...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "thesis.docx")
+        write_docx(path, [("Chapter", "one"), ("Results", "and discussion")])
+
+        assert list(iter_docx_paragraphs(path)) == ["Chapter\tone\n", "Results\tand discussion\n"]
+        assert "".join(iter_text(path)) == "Chapter\tone\nResults\tand discussion\n"
+
+    print("✓ DOCX paragraph streaming test passed\n")
+
+
+def test_txt_blocks_and_limit():
+    """Text files should stream in blocks and respect the size cap"""
+    print("Testing TXT streaming and size cap...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "notes.txt")
+        with open(path, "wb") as f:
+            f.write("café ".encode("latin-1") * 30000)
+
+        text = "".join(iter_text(path))
+        assert text == "café " * 30000
+
+        try:
+            list(iter_text(path, max_chars=1000))
+            assert False, "extraction past the cap should fail"
+        except ExtractionLimitError:
+            pass
+
+        try:
+            list(iter_text(os.path.join(tmp, "slides.pptx")))
+            assert False, "unsupported formats should fail"
+        except ValueError:
+            pass
+
+    print("✓ TXT streaming and size cap test passed\n")
+
+
+def test_incremental_term_vector():
+    """Term vectors built from pieces should equal the vector of the whole text"""
+    print("Testing incremental term vectors...")
+
+    text = ("The quick brown fox jumps over the lazy dog. Plagiarism detection algorithms "
+            "compare documents_with_underscores and numbers like 2024 in academic papers. ") * 20
+    rng = random.Random(3)
+    cuts = sorted(rng.sample(range(1, len(text)), 40))
+
+    counter = TermCounter()
+    for start, end in zip([0] + cuts, cuts + [len(text)]):
+        counter.update(text[start:end])
+    assert counter.finish() == FileSimilarity.term_vector(text)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "paper.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        extracted, terms = extract_document(path)
+        assert extracted == text
+        assert FileSimilarity.find_file_similarity(text, text, query_vector=terms) > 99.99
+
+    print("✓ Incremental term vector test passed\n")
+
+
+if __name__ == "__main__":
+    test_docx_paragraphs()
+    test_txt_blocks_and_limit()
+    test_incremental_term_vector()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared tokenization pipeline
+"""
+
+import sys
+import os
+import re
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.text_pipeline import PipelineConfig, TextPipeline, get_pipeline, get_stopwords
+from utils.plagiarism_algorithms import CosineSimilarity, FileSimilarity, PlagiarismDetector
+from utils.text_extraction import TermCounter
+from utils.winnowing import normalize
+
+TEXT = "The Students copied the ESSAY; copying essays is what the students were warned about. Café résumé!"
+
+
+def test_default_pipeline():
+    """Default tokens match the algorithms' original regex tokenization"""
+    print("Testing default text pipeline...")
+
+    pipeline = TextPipeline(cache_entries=2)
+    assert pipeline.tokens(TEXT) == re.findall(r'\w+', TEXT.lower())
+    assert pipeline.content_tokens(TEXT) == [t for t in pipeline.tokens(TEXT) if t not in get_stopwords()]
+
+    stream = pipeline.analyze(TEXT)
+    assert pipeline.analyze(TEXT) is stream
+    assert stream.counts["students"] == 2
+    assert "the" in stream.counts and "the" not in stream.content_counts
+    assert stream.normalized[0] == normalize(TEXT)[0]
+
+    # Least recently used streams are dropped
+    pipeline.analyze("second text")
+    pipeline.analyze("third text")
+    assert pipeline.analyze(TEXT) is not stream
+    assert pipeline.stats()["hits"] == 1
+
+    # Decomposed accents are composed before tokenizing
+    decomposed = "Café"
+    assert pipeline.tokens(decomposed) == ["café"]
+    assert TextPipeline(PipelineConfig(unicode_form="")).tokens(decomposed) == ["cafe"]
+
+    print("✓ Default text pipeline test passed\n")
+
+
+def test_stemming():
+    """Stemming maps inflected forms, and stopwords, onto shared stems"""
+    print("Testing text pipeline stemming...")
+
+    pipeline = TextPipeline(PipelineConfig(stemming=True))
+    tokens = pipeline.tokens(TEXT)
+    assert tokens.count("copi") == 2
+    assert tokens.count("essay") == 2
+    assert "were" not in pipeline.content_tokens(TEXT)
+
+    print("✓ Text pipeline stemming test passed\n")
+
+
+def test_algorithms_share_tokens():
+    """A submission is tokenized once for all algorithms"""
+    print("Testing shared token streams...")
+
+    pipeline = get_pipeline()
+    submission = TEXT + " A sentence only this test submits."
+    references = ["The students copied the essay.", "Nothing in common here at all."]
+
+    misses = pipeline.misses
+    PlagiarismDetector().check_plagiarism_comprehensive(submission, references)
+    FileSimilarity.find_file_similarity(submission, references[0])
+    CosineSimilarity.cosine_sim(submission, references[0])
+    # The submission and the one directly compared reference are each tokenized once
+    assert pipeline.analyze(submission) is pipeline.analyze(submission)
+    assert pipeline.misses - misses == 2
+
+    counter = TermCounter()
+    for start in range(0, len(TEXT), 7):
+        counter.update(TEXT[start:start + 7])
+    assert counter.finish() == FileSimilarity.term_vector(TEXT)
+
+    print("✓ Shared token streams test passed\n")
+
+
+if __name__ == "__main__":
+    test_default_pipeline()
+    test_stemming()
+    test_algorithms_share_tokens()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming uploads into the blob store
+"""
+
+import sys
+import os
+import io
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from werkzeug.formparser import parse_form_data
+from werkzeug.test import EnvironBuilder
+
+from utils.blob_store import BlobStore
+from utils.upload_stream import StreamingUpload, UploadLimitError
+
+
+def stream(store, data, filename="essay.txt", block=1000, **limits):
+    upload = StreamingUpload(store, filename, **limits)
+    for start in range(0, len(data), block):
+        upload.write(data[start:start + block])
+    return upload.finish()
+
+
+def test_streaming_upload_dedup():
+    """Repeat uploads should reuse the stored file and its text"""
+    print("Testing streaming upload deduplication...")
+
+    text = "Résumé of the essay, with accents split across blocks. " * 500
+    # Held in memory until complete, and chunked while arriving
+    for spool_bytes in (None, 5000):
+        with tempfile.TemporaryDirectory() as root:
+            store = BlobStore(root, compression=None)
+
+            first = stream(store, text.encode("utf-8"), block=999, spool_bytes=spool_bytes)
+            assert first["text"] == text
+            assert first["size"] == len(text.encode("utf-8"))
+            assert not first["duplicate"]
+            assert store.get(first["cid"]) == text.encode("utf-8")
+            stats = store.stats()
+
+            again = stream(store, text.encode("utf-8"), filename="copy.txt", block=4096, spool_bytes=spool_bytes)
+            assert again["duplicate"]
+            assert again["cid"] == first["cid"]
+            assert again["text"] == text
+            assert store.stats() == stats
+
+            # Undecodable bytes are dropped
+            assert stream(store, b"ok \xff\xfe done")["text"] == "ok  done"
+
+    print("✓ Streaming upload deduplication test passed\n")
+
+
+def test_streaming_upload_limits():
+    """Oversized files and texts should be rejected while streaming"""
+    print("Testing streaming upload limits...")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root, compression=None)
+
+        upload = StreamingUpload(store, "big.txt", max_bytes=5000)
+        try:
+            for _ in range(10):
+                upload.write(b"x" * 1000)
+            assert False, "writes past max_bytes should fail"
+        except UploadLimitError:
+            assert upload.size == 5000
+
+        try:
+            stream(store, b"word " * 1000, max_chars=3000)
+            assert False, "text past max_chars should fail"
+        except UploadLimitError:
+            pass
+        assert store.stats()["objects"] == 0
+
+    print("✓ Streaming upload limits test passed\n")
+
+
+def test_form_parser_integration():
+    """Multipart file parts should stream into the sink"""
+    print("Testing streaming upload form parsing...")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root, compression=None)
+
+        def stream_factory(total_content_length, content_type, filename=None, content_length=None):
+            return StreamingUpload(store, filename)
+
+        body = b"Uploaded essay text\n" * 10_000
+        environ = EnvironBuilder(method="POST", data={
+            "title": "Essay",
+            "file": (io.BytesIO(body), "essay.txt"),
+        }).get_environ()
+        _, form, files = parse_form_data(environ, stream_factory=stream_factory)
+
+        assert form["title"] == "Essay"
+        stored = files["file"].stream.finish()
+        assert store.get(stored["cid"]) == body
+        assert stored["text"] == body.decode()
+
+    print("✓ Streaming upload form parsing test passed\n")
+
+
+if __name__ == "__main__":
+    test_streaming_upload_dedup()
+    test_streaming_upload_limits()
+    test_form_parser_integration()
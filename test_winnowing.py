@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for winnowing fingerprint copy detection
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from utils.corpus_index import CorpusIndex
+from utils.plagiarism_algorithms import PlagiarismDetector
+from utils.winnowing import FingerprintIndex, Winnower, normalize
+
+REFERENCE = (
+    "Photosynthesis converts light energy into chemical energy stored in glucose. "
+    "The mitochondria is the powerhouse of the cell, and it produces most of the energy "
+    "a cell needs through cellular respiration."
+)
+
+OTHER = "Machine learning algorithms are used for pattern recognition and data analysis in many fields."
+
+SUBMISSION = (
+    "In my essay I argue that The Mitochondria is the POWERHOUSE of the cell -- and it produces most "
+    "of the energy a cell needs! Everything else here is original writing about botany."
+)
+
+
+def test_normalize_offsets():
+    """Normalized characters should map back to the original text"""
+    print("Testing fingerprint normalization...")
+
+    text = "Hello, World -- it's 42!"
+    normalized, offsets = normalize(text)
+    assert normalized == "helloworldits42"
+    assert "".join(text[i] for i in offsets).lower() == normalized
+
+    print("✓ Normalization test passed\n")
+
+
+def test_winnowing_guarantee():
+    """Any shared substring of at least k + window - 1 characters must share a fingerprint"""
+    print("Testing winnowing guarantee...")
+
+    winnower = Winnower(k=5, window=4)
+    shared = "sharedsubstringofmanycharacters"
+    first = winnower.fingerprints("aaaaxyz" + shared + "qqqq")[0]
+    second = winnower.fingerprints("bcdefgh" + shared + "rrrr")[0]
+    assert set(first.tolist()) & set(second.tolist())
+
+    print("✓ Winnowing guarantee test passed\n")
+
+
+def test_match_spans():
+    """Copied text should be reported as exact spans with original offsets"""
+    print("Testing fingerprint match spans...")
+
+    index = FingerprintIndex([OTHER, REFERENCE], Winnower(k=15, window=10))
+    result = index.match(SUBMISSION)
+
+    assert result["similarity"] > 40
+    assert set(result["document_coverage"]) == {1}
+    span = result["spans"][0]
+    assert span["reference_index"] == 1
+    copied = SUBMISSION[span["submission_start"]:span["submission_end"]]
+    source = REFERENCE[span["reference_start"]:span["reference_end"]]
+    assert copied.startswith("The Mitochondria")
+    assert copied.endswith("a cell needs")
+    assert normalize(copied)[0] == normalize(source)[0]
+
+    assert index.match(OTHER.upper())["similarity"] == 100.0
+    assert index.match("original words only, nothing copied at all here")["spans"] == []
+
+    print("✓ Fingerprint match span test passed\n")
+
+
+def test_detector_fingerprint_matches():
+    """The detector should report fingerprint coverage as its n-gram score"""
+    print("Testing detector fingerprint integration...")
+
+    detector = PlagiarismDetector()
+    results = detector.check_plagiarism_comprehensive(SUBMISSION, [OTHER, REFERENCE])
+    assert results["ngram_similarity"] > 0
+    assert results["fingerprint_matches"][0]["reference_index"] == 1
+
+    original = detector.check_plagiarism_comprehensive("Entirely original text.", [OTHER, REFERENCE])
+    assert original["ngram_similarity"] == 0.0
+
+    assert detector.check_plagiarism_comprehensive(SUBMISSION)["ngram_similarity"] == 0.0
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        for filename, content in (("other.txt", OTHER), ("bio.txt", REFERENCE)):
+            with open(os.path.join(corpus_dir, filename), "w", encoding="utf-8") as f:
+                f.write(content)
+        index = CorpusIndex(corpus_dir)
+        from_index = detector.check_plagiarism_comprehensive(SUBMISSION, corpus_index=index)
+        bio_id = index.filenames.index("bio.txt")
+        assert from_index["fingerprint_matches"][0]["reference_index"] == bio_id
+        assert abs(from_index["ngram_similarity"] - results["ngram_similarity"]) < 1e-9
+
+    print("✓ Detector fingerprint integration test passed\n")
+
+
+if __name__ == "__main__":
+    test_normalize_offsets()
+    test_winnowing_guarantee()
+    test_match_spans()
+    test_detector_fingerprint_matches()